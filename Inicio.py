@@ -1,12 +1,15 @@
 ﻿# main.py  (página inicial)
 from __future__ import annotations
-from pathlib import Path
 from datetime import datetime
-import sqlite3
 import streamlit as st
-from ui_nav import hide_default_sidebar_nav, render_sidebar_nav
+from ui_nav import encerrar_perfil, hide_default_sidebar_nav, iniciar_perfil, render_sidebar_nav
+from leilao import db
+from leilao.backup import BACKUPS_DIR, get_scheduler
+from leilao.consultas import carregar_indicadores
+from leilao.perfil import etapa
 
 # ------------------ Config ------------------
+iniciar_perfil("Início")
 st.set_page_config(page_title="Início", page_icon="🏠", layout="wide")
 
 # Sidebar customizada com ícones
@@ -16,27 +19,9 @@ render_sidebar_nav()
 st.title("🏠 Início")
 st.sidebar.success("Selecione uma página acima.")
 
-APP_DIR = Path(__file__).resolve().parent
-DB_PATH = APP_DIR / "dados.db"
-BACKUPS_DIR = APP_DIR / "backups"
+get_scheduler()  # garante o agendador de backups automáticos rodando neste processo
 
 # ------------------ Helpers ------------------
-def _connect():
-    return sqlite3.connect(DB_PATH)
-
-def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
-    cur = conn.execute(
-        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=? LIMIT 1", (name,)
-    )
-    return cur.fetchone() is not None
-
-def _get_single_value(conn, sql: str, params: tuple = ()) -> int | float:
-    try:
-        row = conn.execute(sql, params).fetchone()
-        return float(row[0] if row and row[0] is not None else 0)
-    except Exception:
-        return 0
-
 def _fmt_bytes(n: int) -> str:
     for u in ["B", "KB", "MB", "GB", "TB"]:
         if n < 1024:
@@ -44,105 +29,14 @@ def _fmt_bytes(n: int) -> str:
         n /= 1024
     return f"{n:.1f} PB"
 
-def _colnames(conn, table: str) -> list[str]:
-    try:
-        return [r[1] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()]
-    except Exception:
-        return []
-
 # ------------------ Consultas ------------------
-duplicados_distintos = duplicados_linhas = 0
-total_lotes = pendentes = concluidos = 0
-itens_em_lotes = total_animais = 0
-animais_em_lote = animais_sem_lacre = animais_sem_lote = 0
-lacres_distintos = proprietarios_distintos = 0
-lotes_com_itens = lotes_vazios = 0
-media_itens_por_lote = 0.0
-qtd_m = qtd_f = 0
-total_individuos = 0
-db_size = DB_PATH.stat().st_size if DB_PATH.exists() else 0
+etapa("indicadores")
+ind = carregar_indicadores()
+db_size = db.DB_PATH.stat().st_size if db.DB_PATH.exists() else 0
 ultimo_backup = None
 
-with _connect() as conn:
-    # 1) Duplicados / animais
-    if _table_exists(conn, "animais"):
-        cols_animais = set(_colnames(conn, "animais"))
-
-        duplicados_distintos = _get_single_value(conn, """
-            SELECT COUNT(*) FROM (
-              SELECT Lacre FROM animais
-              WHERE Lacre IS NOT NULL AND TRIM(Lacre) <> ''
-              GROUP BY Lacre HAVING COUNT(*) > 1
-            ) x
-        """)
-        duplicados_linhas = _get_single_value(conn, """
-            SELECT COALESCE(SUM(cnt),0) FROM (
-              SELECT COUNT(*) AS cnt FROM animais
-              WHERE Lacre IS NOT NULL AND TRIM(Lacre) <> ''
-              GROUP BY Lacre HAVING COUNT(*) > 1
-            ) t
-        """)
-        total_animais = _get_single_value(conn, "SELECT COUNT(*) FROM animais")
-
-        if _table_exists(conn, "lote_itens"):
-            animais_em_lote = _get_single_value(conn, """
-                SELECT COUNT(DISTINCT li.animal_rowid)
-                FROM lote_itens li
-                JOIN animais a ON a.rowid = li.animal_rowid
-            """)
-            animais_sem_lote = _get_single_value(conn, """
-                SELECT COUNT(*) FROM animais a
-                WHERE NOT EXISTS (
-                  SELECT 1 FROM lote_itens li WHERE li.animal_rowid = a.rowid
-                )
-            """)
-        else:
-            animais_sem_lote = total_animais
-
-        animais_sem_lacre = _get_single_value(conn, """
-            SELECT COUNT(*) FROM animais
-            WHERE Lacre IS NULL OR TRIM(Lacre) = ''
-        """)
-        lacres_distintos = _get_single_value(conn, """
-            SELECT COUNT(DISTINCT Lacre) FROM animais
-            WHERE Lacre IS NOT NULL AND TRIM(Lacre) <> ''
-        """)
-        proprietarios_distintos = _get_single_value(conn, """
-            SELECT COUNT(DISTINCT "Proprietário Origem") FROM animais
-        """)
-
-        # ---- Sexo: somar colunas "Total M" / "Total F" ----
-        if "Total M" in cols_animais:
-            qtd_m = _get_single_value(conn, 'SELECT COALESCE(SUM("Total M"),0) FROM animais')
-        if "Total F" in cols_animais:
-            qtd_f = _get_single_value(conn, 'SELECT COALESCE(SUM("Total F"),0) FROM animais')
-
-        # ---- Indivíduos: somar "Total Animais" (se existir) ----
-        if "Total Animais" in cols_animais:
-            total_individuos = _get_single_value(conn, 'SELECT COALESCE(SUM("Total Animais"),0) FROM animais')
-
-    # 2) Lotes
-    if _table_exists(conn, "lotes"):
-        total_lotes = _get_single_value(conn, "SELECT COUNT(*) FROM lotes")
-        pendentes = _get_single_value(conn, "SELECT COUNT(*) FROM lotes WHERE COALESCE(status,'pendente')='pendente'")
-        concluidos = _get_single_value(conn, "SELECT COUNT(*) FROM lotes WHERE COALESCE(status,'pendente')='concluido'")
-
-    # 3) Itens em lotes
-    if _table_exists(conn, "lote_itens"):
-        itens_em_lotes = _get_single_value(conn, "SELECT COUNT(*) FROM lote_itens")
-        lotes_com_itens = _get_single_value(conn, """
-            SELECT COUNT(*) FROM (
-              SELECT lote_numero FROM lote_itens GROUP BY lote_numero HAVING COUNT(*)>0
-            )
-        """)
-        lotes_vazios = max(int(total_lotes) - int(lotes_com_itens), 0)
-        media_itens_por_lote = _get_single_value(conn, """
-            SELECT AVG(c*1.0) FROM (
-              SELECT COUNT(*) c FROM lote_itens GROUP BY lote_numero
-            )
-        """)
-
-# 4) Último backup
+# Último backup
+etapa("último backup")
 if BACKUPS_DIR.exists():
     try:
         last = max(BACKUPS_DIR.glob("dados-*.sqlite"), key=lambda p: p.stat().st_mtime, default=None)
@@ -152,6 +46,7 @@ if BACKUPS_DIR.exists():
         ultimo_backup = None
 
 # ------------------ UI: Cards ------------------
+etapa("cards")
 st.markdown("""
 <style>
 .card {
@@ -171,30 +66,30 @@ st.markdown("""
 # ---- Primeira linha ----
 c1, c2, c3, c4 = st.columns([1.2,1,1,1])
 with c1:
-    cls = "card warn" if int(duplicados_distintos) > 0 else "card ok"
+    cls = "card warn" if int(ind["duplicados_distintos"]) > 0 else "card ok"
     st.markdown(
         f"""
         <div class="{cls}">
           <h3>🧩 Lacres duplicados (distintos)</h3>
-          <div class="value">{int(duplicados_distintos)}</div>
-          <div class="sub">Linhas envolvidas: <b>{int(duplicados_linhas)}</b></div>
+          <div class="value">{int(ind["duplicados_distintos"])}</div>
+          <div class="sub">Linhas envolvidas: <b>{int(ind["duplicados_linhas"])}</b></div>
         </div>
         """, unsafe_allow_html=True)
-    st.caption("Use o atalho abaixo: **Duplicatas**." if duplicados_distintos else "Nenhuma duplicata encontrada.")
+    st.caption("Use o atalho abaixo: **Duplicatas**." if ind["duplicados_distintos"] else "Nenhuma duplicata encontrada.")
 
 with c2:
     st.markdown(f"""
         <div class="card">
           <h3>📦 Lotes (total)</h3>
-          <div class="value">{int(total_lotes)}</div>
-          <div class="sub">Pendentes: <b>{int(pendentes)}</b> • Concluídos: <b>{int(concluidos)}</b></div>
+          <div class="value">{int(ind["total_lotes"])}</div>
+          <div class="sub">Pendentes: <b>{int(ind["pendentes"])}</b> • Concluídos: <b>{int(ind["concluidos"])}</b></div>
         </div>""", unsafe_allow_html=True)
 
 with c3:
     st.markdown(f"""
         <div class="card">
           <h3>📋 Itens em lotes</h3>
-          <div class="value">{int(itens_em_lotes)}</div>
+          <div class="value">{int(ind["itens_em_lotes"])}</div>
           <div class="sub">Soma de registros em <span class="k">lote_itens</span></div>
         </div>""", unsafe_allow_html=True)
 
@@ -212,7 +107,7 @@ with r1:
     st.markdown(f"""
         <div class="card">
           <h3>🧮 Número de linhas</h3>
-          <div class="value">{int(total_animais)}</div>
+          <div class="value">{int(ind["total_animais"])}</div>
           <div class="sub">Linhas na tabela <span class="k">animais</span></div>
         </div>""", unsafe_allow_html=True)
 
@@ -220,7 +115,7 @@ with r2:
     st.markdown(f"""
         <div class="card">
           <h3>🐮 Animais fora de lotes</h3>
-          <div class="value">{int(animais_sem_lote)}</div>
+          <div class="value">{int(ind["animais_sem_lote"])}</div>
           <div class="sub">Sem vínculo em <span class="k">lote_itens</span></div>
         </div>""", unsafe_allow_html=True)
 
@@ -228,12 +123,12 @@ with r3:
     st.markdown(f"""
         <div class="card">
           <h3>📦→🐄 Animais em lotes</h3>
-          <div class="value">{int(animais_em_lote)}</div>
+          <div class="value">{int(ind["animais_em_lote"])}</div>
           <div class="sub">Com vínculo em <span class="k">lote_itens</span></div>
         </div>""", unsafe_allow_html=True)
 
 with r4:
-    pct = (animais_em_lote / total_animais * 100) if total_animais else 0
+    pct = (ind["animais_em_lote"] / ind["total_animais"] * 100) if ind["total_animais"] else 0
     st.markdown(f"""
         <div class="card">
           <h3>📈 Cobertura</h3>
@@ -247,7 +142,7 @@ with s1:
     st.markdown(f"""
         <div class="card">
           <h3>🏷️ Lacres distintos</h3>
-          <div class="value">{int(lacres_distintos)}</div>
+          <div class="value">{int(ind["lacres_distintos"])}</div>
           <div class="sub">Valores únicos válidos</div>
         </div>""", unsafe_allow_html=True)
 
@@ -255,7 +150,7 @@ with s2:
     st.markdown(f"""
         <div class="card">
           <h3>🚫 Animais sem lacre</h3>
-          <div class="value">{int(animais_sem_lacre)}</div>
+          <div class="value">{int(ind["animais_sem_lacre"])}</div>
           <div class="sub"><span class="k">Lacre</span> vazio/nulo</div>
         </div>""", unsafe_allow_html=True)
 
@@ -263,7 +158,7 @@ with s3:
     st.markdown(f"""
         <div class="card">
           <h3>👤 Proprietários distintos</h3>
-          <div class="value">{int(proprietarios_distintos)}</div>
+          <div class="value">{int(ind["proprietarios_distintos"])}</div>
           <div class="sub">Em <span class="k">Proprietário Origem</span></div>
         </div>""", unsafe_allow_html=True)
 
@@ -271,8 +166,8 @@ with s4:
     st.markdown(f"""
         <div class="card">
           <h3>📦 Lotes com itens / vazios</h3>
-          <div class="value">{int(lotes_com_itens)} / {int(lotes_vazios)}</div>
-          <div class="sub">Média itens/lote: <b>{float(media_itens_por_lote):.1f}</b></div>
+          <div class="value">{int(ind["lotes_com_itens"])} / {int(ind["lotes_vazios"])}</div>
+          <div class="sub">Média itens/lote: <b>{float(ind["media_itens_por_lote"]):.1f}</b></div>
         </div>""", unsafe_allow_html=True)
 
 # ---- Quarta linha ----
@@ -281,7 +176,7 @@ with t1:
     st.markdown(f"""
         <div class="card">
           <h3>♂️ Machos (indivíduos)</h3>
-          <div class="value">{int(qtd_m)}</div>
+          <div class="value">{int(ind["qtd_m"])}</div>
           <div class="sub">Soma de <span class="k">Total M</span></div>
         </div>""", unsafe_allow_html=True)
 
@@ -289,7 +184,7 @@ with t2:
     st.markdown(f"""
         <div class="card">
           <h3>♀️ Fêmeas (indivíduos)</h3>
-          <div class="value">{int(qtd_f)}</div>
+          <div class="value">{int(ind["qtd_f"])}</div>
           <div class="sub">Soma de <span class="k">Total F</span></div>
         </div>""", unsafe_allow_html=True)
 
@@ -297,10 +192,11 @@ with t3:
     st.markdown(f"""
         <div class="card">
           <h3>🐄🐄 Animais totais</h3>
-          <div class="value">{int(total_individuos)}</div>
+          <div class="value">{int(ind["total_individuos"])}</div>
           <div class="sub">Soma de <span class="k">Total Animais</span></div>
         </div>""", unsafe_allow_html=True)
 # ---- Atalhos (botões) ----
+etapa("atalhos")
 st.markdown("""
 <style>
 div.stButton > button { width: 100%; padding: .75rem 1rem; border-radius: 10px; }
@@ -321,3 +217,5 @@ go("Animais Fora",  "pages/6_Animais_Fora.py", icon="🐄")
 go("Duplicatas",    "pages/7_Duplicatas.py",   icon="🧩")
 go("Dados",         "pages/8_Dados.py",        icon="🗂️")
 go("Backup",        "pages/9_Backup.py",       icon="💾")
+
+encerrar_perfil()
@@ -0,0 +1,143 @@
+# benchmarks/bench_dados.py - mede as consultas de cada página em bancos de vários tamanhos
+"""
+Gera (ou reaproveita) bancos sintéticos com benchmarks/gerar_dados.py e cronometra
+as funções de consulta que as páginas chamam a cada rerun.
+
+    python benchmarks/bench_dados.py                               # 1k, 10k, 100k
+    python benchmarks/bench_dados.py --tamanhos 1000,500000 --repeat 3
+    python benchmarks/bench_dados.py --out depois.json --comparar antes.json
+
+O JSON de saída traz, para cada (tamanho, caso), min/mediana/máx em ms e as linhas
+devolvidas, além de metadados (commit, versão do SQLite). Com --comparar o script
+mostra a razão novo/antigo e sai com código 1 se algum caso ficou mais lento que
+o limite (--tolerancia).
+"""
+from __future__ import annotations
+import argparse
+import json
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from gerar_dados import gerar  # noqa: E402
+from leilao import consultas, db as leilao_db, lotes, relatorio  # noqa: E402
+from leilao.db import APP_DIR  # noqa: E402
+
+def _len(x) -> int:
+    if isinstance(x, tuple):  # (linhas, flag) de animais_fora
+        x = x[0]
+    try:
+        return len(x)
+    except TypeError:
+        return 1
+
+def casos(db: Path) -> list[tuple[str, str, callable]]:
+    """(página, caso, função sem argumentos) para o banco `db`."""
+    leilao_db.set_db_path(db)
+    leilao_db.ensure_schema()  # o app cria os índices na primeira abertura
+
+    with sqlite3.connect(db) as conn:
+        maior_lote = conn.execute(
+            "SELECT lote_numero FROM lote_itens GROUP BY lote_numero ORDER BY COUNT(*) DESC LIMIT 1"
+        ).fetchone()[0]
+        lacre = conn.execute("SELECT Lacre FROM animais WHERE rowid = (SELECT MAX(rowid) / 2 FROM animais)").fetchone()[0]
+
+    def duplicatas():
+        with leilao_db.connect() as conn:
+            return consultas.grupos_duplicados(conn)
+
+    return [
+        ("Início", "carregar_indicadores", consultas.carregar_indicadores),
+        ("Lotes", "list_lotes", lotes.list_lotes),
+        ("Criar Lote", "fetch_animal_by_lacre", lambda: lotes.fetch_animal_by_lacre(str(lacre))),
+        ("Imprimir", f"fetch_lote_agrupado(maior lote #{maior_lote})", lambda: relatorio.fetch_lote_agrupado(maior_lote)),
+        ("Animais Fora", "animais_fora", lambda: consultas.animais_fora("N.º Série", "Lacre", "Proprietário Origem")),
+        ("Duplicatas", "grupos_duplicados", duplicatas),
+    ]
+
+def medir(fn, repeat: int) -> dict:
+    fn()  # aquecimento (cache de páginas do SQLite / do SO)
+    tempos, linhas = [], 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        res = fn()
+        tempos.append((time.perf_counter() - t0) * 1000)
+        linhas = _len(res)
+    return {
+        "min_ms": round(min(tempos), 3),
+        "mediana_ms": round(statistics.median(tempos), 3),
+        "max_ms": round(max(tempos), 3),
+        "linhas": linhas,
+        "runs": repeat,
+    }
+
+def _meta() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "quando": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "plataforma": platform.platform(),
+    }
+
+def comparar(novo: list[dict], antigo: list[dict], tolerancia: float, min_ms: float = 1.0) -> bool:
+    base = {(r["tamanho"], r["pagina"], r["caso"].split("(")[0]): r for r in antigo}
+    ok = True
+    print(f"\n{'tamanho':>8} {'página':<13} {'caso':<28} {'antes':>9} {'agora':>9} {'razão':>6}")
+    for r in novo:
+        a = base.get((r["tamanho"], r["pagina"], r["caso"].split("(")[0]))
+        if not a:
+            continue
+        razao = r["mediana_ms"] / a["mediana_ms"] if a["mediana_ms"] else float("inf")
+        # abaixo de `min_ms` de diferença é ruído de medição, não regressão
+        pior = razao > tolerancia and (r["mediana_ms"] - a["mediana_ms"]) > min_ms
+        ok &= not pior
+        print(f"{r['tamanho']:>8} {r['pagina']:<13} {r['caso'].split('(')[0]:<28} "
+              f"{a['mediana_ms']:>7.2f}ms {r['mediana_ms']:>7.2f}ms {razao:>5.2f}x{'  <-- MAIS LENTO' if pior else ''}")
+    return ok
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--tamanhos", default="1000,10000,100000", help="quantidades de animais, separadas por vírgula")
+    ap.add_argument("--dup", type=float, default=0.01, help="fração de lacres duplicados")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--workdir", type=Path, default=Path(".bench"), help="onde ficam os bancos gerados (reaproveitados)")
+    ap.add_argument("--out", type=Path, default=Path("bench_dados.json"))
+    ap.add_argument("--comparar", type=Path, help="JSON de uma execução anterior para comparar")
+    ap.add_argument("--tolerancia", type=float, default=1.25, help="razão novo/antigo acima da qual acusa regressão")
+    ap.add_argument("--min-ms", type=float, default=1.0, help="diferença mínima (ms) para contar como regressão")
+    args = ap.parse_args(argv)
+
+    resultados = []
+    for tamanho in (int(t) for t in args.tamanhos.split(",") if t.strip()):
+        db_dir = (args.workdir / f"animais-{tamanho}-dup{args.dup}").resolve()
+        db = db_dir / "dados.db"
+        if not db.exists():
+            print(f"gerando {db} ...", flush=True)
+            gerar(db, tamanho, dup=args.dup)
+        for pagina, caso, fn in casos(db):
+            r = {"tamanho": tamanho, "pagina": pagina, "caso": caso, **medir(fn, args.repeat)}
+            resultados.append(r)
+            print(f"{tamanho:>8} {pagina:<13} {caso:<45} {r['mediana_ms']:>9.2f}ms  ({r['linhas']} linhas)", flush=True)
+
+    args.out.write_text(json.dumps({"meta": _meta(), "resultados": resultados}, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\nresultados em {args.out}")
+
+    if args.comparar:
+        antigo = json.loads(args.comparar.read_text(encoding="utf-8"))["resultados"]
+        return 0 if comparar(resultados, antigo, args.tolerancia, args.min_ms) else 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+# benchmarks/bench_escrita.py - vazão e latência das gravações com vários operadores ao mesmo tempo
+"""
+Simula operadores clicando ao mesmo tempo (threads no mesmo processo, como no
+Streamlit) e, opcionalmente, outros processos (CLI) gravando no mesmo banco,
+enquanto um leitor roda as consultas das páginas sem parar.
+
+    python benchmarks/bench_escrita.py                          # 3 operadores, 10 s
+    python benchmarks/bench_escrita.py --operadores 5 --processos 2 --segundos 20
+    python benchmarks/bench_escrita.py --journal delete         # compara com o modo antigo (sem WAL)
+
+Operações: concluir/reabrir lote (set_lote_status), salvar e remover item de lote
+(save_lote_itens/remove_lote_item). Mostra, por operação, vazão, p50/p95/máx em ms
+e falhas (BancoOcupado ou outro erro); e as mesmas medidas para o leitor.
+"""
+from __future__ import annotations
+import argparse
+import json
+import multiprocessing as mp
+import random
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from bench_dados import _meta  # noqa: E402
+from gerar_dados import gerar  # noqa: E402
+from leilao import backup, consultas, db as leilao_db, lotes  # noqa: E402
+from leilao.perfil import percentil  # noqa: E402
+
+def _preparar(db: Path, journal: str):
+    leilao_db.set_db_path(db)
+    leilao_db.USAR_WAL = journal == "wal"
+    backup.AUTO_START = False
+    if journal != "wal":
+        leilao_db.fechar_wal(db)
+    leilao_db.ensure_schema()
+
+def _livres(db: Path) -> tuple[list[int], list[int]]:
+    with closing(sqlite3.connect(db)) as conn:
+        numeros = [r[0] for r in conn.execute("SELECT numero FROM lotes")]
+        livres = [r[0] for r in conn.execute(
+            "SELECT rowid FROM animais a WHERE NOT EXISTS (SELECT 1 FROM lote_itens i WHERE i.animal_rowid = a.rowid)"
+        )]
+    return numeros, livres
+
+def _operador(segundos: float, seed: int, numeros: list[int], livres: list[int]) -> list[tuple[str, float, str]]:
+    """Grava até acabar o tempo. Retorna [(operação, ms, resultado)], resultado: ok/ocupado/erro."""
+    rng = random.Random(seed)
+    out = []
+    fim = time.perf_counter() + segundos
+    while time.perf_counter() < fim:
+        numero = rng.choice(numeros)
+        if rng.random() < 0.5:
+            ops = [("status", lambda: lotes.set_lote_status(numero, rng.choice(("concluido", "pendente")), "BENCH"))]
+        else:
+            rid = rng.choice(livres)
+            ops = [("salvar_item", lambda: lotes.save_lote_itens(numero, [rid])),
+                   ("remover_item", lambda: lotes.remove_lote_item(numero, rid))]
+        for nome, fn in ops:
+            t0 = time.perf_counter()
+            try:
+                fn()
+                res = "ok"
+            except leilao_db.BancoOcupado:
+                res = "ocupado"
+            except sqlite3.Error:
+                res = "erro"
+            out.append((nome, (time.perf_counter() - t0) * 1000, res))
+        time.sleep(rng.uniform(0, 0.01))  # intervalo entre cliques
+    return out
+
+def _processo(db: str, journal: str, segundos: float, seed: int, numeros, livres, fila):
+    _preparar(Path(db), journal)
+    fila.put(_operador(segundos, seed, numeros, livres))
+
+def _leitor(segundos: float, parar: threading.Event) -> list[tuple[str, float, str]]:
+    out = []
+    fim = time.perf_counter() + segundos
+    while time.perf_counter() < fim and not parar.is_set():
+        for nome, fn in (("ler:list_lotes", lotes.list_lotes),
+                         ("ler:animais_fora", lambda: consultas.animais_fora("N.º Série", "Lacre", "Proprietário Origem"))):
+            t0 = time.perf_counter()
+            try:
+                fn()
+                res = "ok"
+            except sqlite3.OperationalError:
+                res = "erro"
+            out.append((nome, (time.perf_counter() - t0) * 1000, res))
+    return out
+
+def resumir(amostras: list[tuple[str, float, str]], segundos: float) -> list[dict]:
+    por_op: dict[str, list] = {}
+    for nome, ms, res in amostras:
+        por_op.setdefault(nome, []).append((ms, res))
+    linhas = []
+    for nome, vals in sorted(por_op.items()):
+        tempos = [ms for ms, _ in vals]
+        linhas.append({
+            "operacao": nome,
+            "n": len(vals),
+            "por_s": round(len(vals) / segundos, 1),
+            "p50_ms": round(percentil(tempos, 50), 2),
+            "p95_ms": round(percentil(tempos, 95), 2),
+            "max_ms": round(max(tempos), 2),
+            "ocupado": sum(1 for _, r in vals if r == "ocupado"),
+            "erro": sum(1 for _, r in vals if r == "erro"),
+        })
+    return linhas
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--animais", type=int, default=10_000)
+    ap.add_argument("--operadores", type=int, default=3, help="threads gravando no mesmo processo")
+    ap.add_argument("--processos", type=int, default=0, help="processos extras gravando (como a CLI)")
+    ap.add_argument("--segundos", type=float, default=10.0)
+    ap.add_argument("--journal", choices=["wal", "delete"], default="wal")
+    ap.add_argument("--workdir", type=Path, default=Path(".bench"))
+    ap.add_argument("--out", type=Path, default=Path("bench_escrita.json"))
+    args = ap.parse_args(argv)
+
+    # banco próprio: as gravações alteram os dados
+    db = (args.workdir / f"escrita-{args.animais}" / "dados.db").resolve()
+    print(f"gerando {db} ...", flush=True)
+    gerar(db, args.animais)
+    _preparar(db, args.journal)
+    numeros, livres = _livres(db)
+
+    fila = mp.get_context("spawn").Queue()
+    procs = [
+        mp.get_context("spawn").Process(
+            target=_processo, args=(str(db), args.journal, args.segundos, 1000 + i, numeros, livres, fila))
+        for i in range(args.processos)
+    ]
+    for p in procs:
+        p.start()
+
+    amostras: list = []
+    lock = threading.Lock()
+    parar = threading.Event()
+
+    def rodar(fn, *a):
+        res = fn(*a)
+        with lock:
+            amostras.extend(res)
+
+    threads = [threading.Thread(target=rodar, args=(_operador, args.segundos, i, numeros, livres))
+               for i in range(args.operadores)]
+    threads.append(threading.Thread(target=rodar, args=(_leitor, args.segundos, parar)))
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for _ in procs:
+        amostras.extend(fila.get())
+    for p in procs:
+        p.join()
+    duracao = time.perf_counter() - t0
+
+    linhas = resumir(amostras, duracao)
+    print(f"\njournal={args.journal} operadores={args.operadores} processos={args.processos} {duracao:.1f}s")
+    print(f"{'operação':<18} {'n':>6} {'/s':>7} {'p50':>9} {'p95':>9} {'máx':>9} {'ocupado':>8} {'erro':>5}")
+    for r in linhas:
+        print(f"{r['operacao']:<18} {r['n']:>6} {r['por_s']:>7} {r['p50_ms']:>7.2f}ms {r['p95_ms']:>7.2f}ms "
+              f"{r['max_ms']:>7.1f}ms {r['ocupado']:>8} {r['erro']:>5}")
+
+    args.out.write_text(json.dumps({
+        "meta": _meta(),
+        "config": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+        "resultados": linhas,
+    }, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\nresultados em {args.out}")
+    return 1 if any(r["erro"] for r in linhas) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,344 @@
+# benchmarks/bench_sessoes.py - quantos operadores o app aguenta: sessões simultâneas com AppTest
+"""
+Simula N operadores usando o app ao mesmo tempo. Cada sessão repete fluxos reais
+das páginas com streamlit.testing (AppTest roda o script da página como o
+servidor, sem navegador nem rede) num banco gerado por gerar_dados.py:
+
+- bipar:    Criar Lote — carrega um lote, bipa lacres livres, insere e salva o lote;
+- status:   Lotes — concluir/reabrir um lote pelo card;
+- imprimir: Imprimir — abre um lote e gera o PDF (tarefa em segundo plano) até o download aparecer;
+- planilha: Planilha — pesquisa um lacre ou nome.
+
+    python benchmarks/bench_sessoes.py                                   # 4 sessões, 30 s
+    python benchmarks/bench_sessoes.py --sessoes 1 2 4 8 --segundos 60   # curva latência x operadores
+    python benchmarks/bench_sessoes.py --fluxos bipar status --animais 5000
+
+Cada sessão é um processo: o AppTest troca globais do Streamlit (Runtime._instance,
+config) a cada execução e não roda em paralelo em threads do mesmo processo. No
+servidor as sessões são threads de um processo só (um GIL, o lock de escrita de
+leilao/db.py e o retrato compartilhados); aqui cada processo tem os seus, e a
+disputa pela escrita passa pelo lock do SQLite (busy_timeout e novas tentativas),
+como a CLI. Espere latências um pouco melhores que as do servidor nas páginas que
+só gastam CPU, e mais disputa de escrita.
+
+Mede cada execução da página (rerun): por fluxo, vazão (fluxos completos e reruns
+por segundo), p50/p95/p99/máx do rerun e quantos reruns mostraram banco ocupado
+(BancoOcupado / "database is locked": disputa pelo lock de escrita) ou outro erro.
+Com vários valores em --sessoes, roda um nível por vez, cada um num banco novo.
+Depois de cada nível confere que o banco padrão do app (dados.db) não foi tocado.
+"""
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from bench_dados import _meta  # noqa: E402
+from gerar_dados import gerar  # noqa: E402
+from leilao.db import APP_DIR  # noqa: E402
+from leilao.perfil import percentil  # noqa: E402
+
+FLUXOS = ("bipar", "status", "imprimir", "planilha")
+LACRES_POR_LOTE = 5
+ESPERA_PDF_S = 60.0
+LOTE_BASE = 900_000   # lotes criados pelo fluxo bipar: LOTE_BASE + sessão * 10_000 + n (não colidem entre sessões)
+BANCO_PADRAO = APP_DIR / "dados.db"
+
+# ------------------ Dentro de cada sessão (processo) ------------------
+def _preparar_sessao(db: Path, pasta_tarefas: Path):
+    """Banco do teste, sem agendador de backup e com a pasta de tarefas própria da sessão
+    (um Executor marca como interrompidas as tarefas ativas que encontra no arquivo ao abrir)."""
+    os.chdir(APP_DIR)  # as páginas usam caminhos relativos (pages/..., Inicio.py)
+    if str(APP_DIR) not in sys.path:
+        sys.path.insert(0, str(APP_DIR))
+    # herdado pelos processos que as páginas criam (pool do PDF): set_db_path só vale neste
+    os.environ["PLANILHA_DB"] = str(db)
+    from leilao import backup, db as leilao_db, tarefas
+
+    leilao_db.set_db_path(db)
+    backup.AUTO_START = False
+    tarefas._instance = tarefas.Executor(pasta=pasta_tarefas)
+
+def _abrir(pagina: str, timeout: float, **query):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(APP_DIR / "Inicio.py"), default_timeout=timeout)
+    at.switch_page(pagina)
+    for k, v in query.items():
+        at.query_params[k] = str(v)
+    return at
+
+def _resultado(at) -> str:
+    """ok / ocupado (lock de escrita) / erro, pelo que a página mostrou neste rerun."""
+    textos = [str(e.value) for e in at.exception] + [str(e.value) for e in at.error]
+    if any("ocupado" in t.lower() or "locked" in t.lower() for t in textos):
+        return "ocupado"
+    return "erro" if textos else "ok"
+
+class _Sessao:
+    def __init__(self, n: int, timeout: float, livres: list[tuple[int, object]], numeros: list[int], termos: list[str]):
+        self.n = n
+        self.timeout = timeout
+        self.rng = random.Random(1000 + n)
+        self.livres = livres
+        self.numeros = numeros
+        self.termos = termos
+        self.lotes_criados = 0
+        self.reruns: list[tuple[str, str, float, str]] = []   # (fluxo, passo, ms, resultado)
+        self.fluxos: list[tuple[str, float, bool]] = []       # (fluxo, ms, completo)
+
+    def passo(self, fluxo: str, passo: str, acao) -> bool:
+        """Roda `acao` (que termina num .run() do AppTest) e registra o rerun. False encerra o fluxo."""
+        t0 = time.perf_counter()
+        try:
+            at = acao()
+            res = _resultado(at)
+        except Exception as e:  # timeout do AppTest, widget que não apareceu...
+            res = "ocupado" if "locked" in str(e).lower() else "erro"
+        self.reruns.append((fluxo, passo, (time.perf_counter() - t0) * 1000, res))
+        return res == "ok"
+
+    # ---- fluxos: True se chegou ao fim ----
+    def bipar(self) -> bool:
+        self.lotes_criados += 1
+        numero = LOTE_BASE + self.n * 10_000 + self.lotes_criados
+        at = _abrir("pages/2_Criar_Lote.py", self.timeout)
+        if not self.passo("bipar", "abrir", at.run):
+            return False
+        def carregar():
+            at.number_input(key="numero_lote_input").set_value(numero)
+            return at.button(key="carregar_lote").click().run()
+        if not self.passo("bipar", "carregar", carregar):
+            return False
+        for rid, lacre in self.rng.sample(self.livres, min(LACRES_POR_LOTE, len(self.livres))):
+            if not self.passo("bipar", "bipar", lambda: at.text_input(key="lacre_input").input(str(lacre)).run()):
+                return False
+            botao = next((b for b in at.button if b.key == f"ins_{rid}"), None)
+            if botao is None or botao.disabled:
+                continue  # outra sessão já pôs este animal num lote
+            if not self.passo("bipar", "inserir", lambda: botao.click().run()):
+                return False
+        return self.passo("bipar", "salvar", lambda: at.button(key="salvar_lote").click().run())
+
+    def status(self) -> bool:
+        numero = self.rng.choice(self.numeros)
+        at = _abrir("pages/1_Lotes.py", self.timeout)
+        if not self.passo("status", "abrir", at.run):
+            return False
+        if not self.passo("status", "painel", lambda: at.button(key=f"toggle_{numero}").click().run()):
+            return False
+        chaves = {b.key for b in at.button}
+        chave = f"btn_concluir_sem_gta_{numero}" if f"btn_concluir_sem_gta_{numero}" in chaves else f"btn_reabrir_{numero}"
+        return self.passo("status", "gravar", lambda: at.button(key=chave).click().run())
+
+    def imprimir(self) -> bool:
+        numero = self.rng.choice(self.numeros)
+        at = _abrir("pages/5_Imprimir.py", self.timeout, lote=numero)
+        if not self.passo("imprimir", "abrir", at.run):
+            return False
+        if not self.passo("imprimir", "gerar", lambda: at.button(key=f"gerar_pdf_{numero}").click().run()):
+            return False
+        limite = time.perf_counter() + ESPERA_PDF_S
+        while not at.get("download_button"):
+            if time.perf_counter() > limite:
+                return False
+            time.sleep(0.25)  # como o fragmento de acompanhar_tarefa, que roda a cada 1 s
+            if not self.passo("imprimir", "aguardar", at.run):
+                return False
+        return True
+
+    def planilha(self) -> bool:
+        at = _abrir("pages/3_Planilha.py", self.timeout)
+        if not self.passo("planilha", "abrir", at.run):
+            return False
+        return self.passo("planilha", "pesquisar", lambda: at.text_input[0].input(self.rng.choice(self.termos)).run())
+
+    def aquecer(self, fluxos: list[str]):
+        """Importações e retrato da primeira execução de cada página, fora da medição."""
+        paginas = {"bipar": "pages/2_Criar_Lote.py", "status": "pages/1_Lotes.py",
+                   "imprimir": "pages/5_Imprimir.py", "planilha": "pages/3_Planilha.py"}
+        for f in fluxos:
+            try:
+                _abrir(paginas[f], self.timeout, lote=self.numeros[0]).run()
+            except Exception:
+                pass
+
+    def rodar(self, fluxos: list[str], segundos: float):
+        fim = time.perf_counter() + segundos
+        while time.perf_counter() < fim:
+            fluxo = self.rng.choice(fluxos)
+            t0 = time.perf_counter()
+            completo = getattr(self, fluxo)()
+            self.fluxos.append((fluxo, (time.perf_counter() - t0) * 1000, completo))
+            time.sleep(self.rng.uniform(0.05, 0.3))  # o operador olha a tela antes do próximo clique
+
+def _processo_sessao(n: int, db: str, pasta: str, fluxos: list[str], segundos: float, timeout: float,
+                     livres, numeros, termos, barreira, fila):
+    _preparar_sessao(Path(db), Path(pasta))
+    s = _Sessao(n, timeout, livres, numeros, termos)
+    s.aquecer(fluxos)
+    barreira.wait()  # todas as sessões começam juntas
+    s.rodar(fluxos, segundos)
+    fila.put((s.reruns, s.fluxos))
+    # o pool de processos do PDF não é daemon: sem isto o processo da sessão espera por ele ao sair
+    from leilao import tarefas
+    ex = tarefas.get_executor()
+    ex._threads.shutdown(wait=False, cancel_futures=True)
+    if ex._processos is not None:
+        ex._processos.shutdown(wait=True, cancel_futures=True)
+
+# ------------------ Orquestração ------------------
+def _impressao_padrao() -> dict[str, str | None]:
+    """md5 do dados.db do app e do -wal (o -shm muda com simples leituras)."""
+    out = {}
+    for p in (BANCO_PADRAO, Path(f"{BANCO_PADRAO}-wal")):
+        out[p.name] = hashlib.md5(p.read_bytes()).hexdigest() if p.exists() else None
+    return out
+
+def _dados_do_banco(db: Path) -> tuple[list[tuple[int, object]], list[int], list[str]]:
+    """Animais fora de lote (rowid, lacre), números dos lotes e termos de pesquisa da Planilha."""
+    with closing(sqlite3.connect(db)) as conn:
+        livres = conn.execute(
+            "SELECT rowid, Lacre FROM animais a WHERE NOT EXISTS (SELECT 1 FROM lote_itens i WHERE i.animal_rowid = a.rowid)"
+        ).fetchall()
+        numeros = [r[0] for r in conn.execute("SELECT numero FROM lotes ORDER BY numero")]
+        amostra = conn.execute('SELECT Lacre, "Proprietário Origem" FROM animais ORDER BY random() LIMIT 50').fetchall()
+    termos = [str(l)[:4] for l, _ in amostra[:25]] + [str(p).split()[0] for _, p in amostra[25:] if p]
+    return livres, numeros, termos
+
+def resumir(reruns: list, fluxos: list, segundos: float) -> list[dict]:
+    linhas = []
+    for nome in sorted({f for f, *_ in reruns}):
+        tempos = [ms for f, _, ms, _ in reruns if f == nome]
+        feitos = [ms for f, ms, ok in fluxos if f == nome and ok]
+        linhas.append({
+            "fluxo": nome,
+            "fluxos": len(feitos),
+            "incompletos": sum(1 for f, _, ok in fluxos if f == nome and not ok),
+            "fluxos_por_min": round(len(feitos) / segundos * 60, 1),
+            "reruns": len(tempos),
+            "reruns_por_s": round(len(tempos) / segundos, 2),
+            "p50_ms": round(percentil(tempos, 50), 1),
+            "p95_ms": round(percentil(tempos, 95), 1),
+            "p99_ms": round(percentil(tempos, 99), 1),
+            "max_ms": round(max(tempos), 1),
+            "fluxo_p50_ms": round(percentil(feitos, 50), 1),
+            "ocupado": sum(1 for f, _, _, r in reruns if f == nome and r == "ocupado"),
+            "erro": sum(1 for f, _, _, r in reruns if f == nome and r == "erro"),
+        })
+    return linhas
+
+def resumir_passos(reruns: list) -> list[dict]:
+    por_passo: dict[tuple[str, str], list[float]] = {}
+    for fluxo, passo, ms, _ in reruns:
+        por_passo.setdefault((fluxo, passo), []).append(ms)
+    return [{"fluxo": f, "passo": p, "n": len(t), "p50_ms": round(percentil(t, 50), 1),
+             "p95_ms": round(percentil(t, 95), 1)} for (f, p), t in sorted(por_passo.items())]
+
+def rodar_nivel(modelo: Path, pasta: Path, sessoes: int, fluxos: list[str], segundos: float, timeout: float) -> dict:
+    """Uma rodada com `sessoes` processos num banco copiado de `modelo`."""
+    shutil.rmtree(pasta, ignore_errors=True)
+    pasta.mkdir(parents=True)
+    db = pasta / "dados.db"
+    shutil.copyfile(modelo, db)
+    livres, numeros, termos = _dados_do_banco(db)
+
+    antes = _impressao_padrao()
+    ctx = mp.get_context("spawn")
+    barreira = ctx.Barrier(sessoes + 1)
+    fila = ctx.Queue()
+    procs = [
+        ctx.Process(target=_processo_sessao, args=(
+            i, str(db), str(pasta / f"tarefas-{i}"), fluxos, segundos, timeout, livres, numeros, termos, barreira, fila))
+        for i in range(sessoes)
+    ]
+    for p in procs:
+        p.start()
+    barreira.wait(timeout=600)  # aquecimento; BrokenBarrierError se uma sessão morreu antes de começar
+    t0 = time.perf_counter()
+    reruns, feitos = [], []
+    for _ in procs:
+        # o último fluxo de cada sessão pode passar do prazo em até um timeout por rerun
+        r, f = fila.get(timeout=segundos + 20 * timeout)
+        reruns += r
+        feitos += f
+    duracao = time.perf_counter() - t0
+    for p in procs:
+        p.join(timeout=30)
+        if p.is_alive():
+            p.terminate()
+    return {"sessoes": sessoes, "segundos": round(duracao, 1),
+            "fluxos": resumir(reruns, feitos, duracao), "passos": resumir_passos(reruns),
+            "banco_padrao_alterado": _impressao_padrao() != antes}
+
+def _imprimir(nivel: dict, detalhe: bool):
+    print(f"\n{nivel['sessoes']} sessão(ões), {nivel['segundos']} s")
+    if nivel["banco_padrao_alterado"]:
+        print(f"ATENÇÃO: {BANCO_PADRAO} foi alterado durante o nível (algum processo não usou o banco do teste)")
+    print(f"{'fluxo':<10} {'feitos':>6} {'/min':>6} {'reruns':>7} {'/s':>6} {'p50':>8} {'p95':>8} {'p99':>8} "
+          f"{'máx':>8} {'ocupado':>8} {'erro':>5} {'incomp.':>7}")
+    for r in nivel["fluxos"]:
+        print(f"{r['fluxo']:<10} {r['fluxos']:>6} {r['fluxos_por_min']:>6} {r['reruns']:>7} {r['reruns_por_s']:>6} "
+              f"{r['p50_ms']:>6.0f}ms {r['p95_ms']:>6.0f}ms {r['p99_ms']:>6.0f}ms {r['max_ms']:>6.0f}ms "
+              f"{r['ocupado']:>8} {r['erro']:>5} {r['incompletos']:>7}")
+    if detalhe:
+        for r in nivel["passos"]:
+            print(f"    {r['fluxo']:<10} {r['passo']:<10} {r['n']:>6}  p50 {r['p50_ms']:>6.0f}ms  p95 {r['p95_ms']:>6.0f}ms")
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sessoes", type=int, nargs="+", default=[4], help="operadores simultâneos (vários = curva)")
+    ap.add_argument("--segundos", type=float, default=30.0, help="duração de cada nível")
+    ap.add_argument("--fluxos", nargs="+", choices=FLUXOS, default=list(FLUXOS))
+    ap.add_argument("--animais", type=int, default=2_000,
+                    help="tamanho do banco (a Planilha desenha uma linha por animal sem pesquisa)")
+    ap.add_argument("--lotes", type=int, default=None, help="padrão: animais / 50")
+    ap.add_argument("--timeout", type=float, default=60.0, help="limite de um rerun (s)")
+    ap.add_argument("--detalhe", action="store_true", help="também p50/p95 por passo de cada fluxo")
+    ap.add_argument("--workdir", type=Path, default=Path(".bench"))
+    ap.add_argument("--out", type=Path, default=Path("bench_sessoes.json"))
+    args = ap.parse_args(argv)
+
+    # em_lote=0.5: sobram animais livres para o fluxo bipar
+    modelo = (args.workdir / f"sessoes-{args.animais}" / "modelo.db").resolve()
+    print(f"gerando {modelo} ...", flush=True)
+    gerar(modelo, args.animais, lotes=args.lotes, em_lote=0.5)
+    from leilao import db as leilao_db
+
+    leilao_db.set_db_path(modelo)
+    leilao_db.ensure_schema()  # resumo, diário e índices prontos antes de copiar para cada nível
+    leilao_db.fechar_wal(modelo)
+
+    niveis = []
+    for n in args.sessoes:
+        nivel = rodar_nivel(modelo, modelo.parent / f"nivel-{n}", n, args.fluxos, args.segundos, args.timeout)
+        _imprimir(nivel, args.detalhe)
+        niveis.append(nivel)
+
+    if len(niveis) > 1:
+        print("\np95 do rerun (ms) por nº de sessões")
+        print(f"{'fluxo':<10} " + " ".join(f"{n['sessoes']:>8}" for n in niveis))
+        for fluxo in args.fluxos:
+            p95 = [next((r["p95_ms"] for r in n["fluxos"] if r["fluxo"] == fluxo), None) for n in niveis]
+            print(f"{fluxo:<10} " + " ".join(f"{v:>8.0f}" if v is not None else f"{'—':>8}" for v in p95))
+
+    args.out.write_text(json.dumps({
+        "meta": _meta(),
+        "config": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+        "niveis": niveis,
+    }, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\nresultados em {args.out}")
+    falhou = any(r["erro"] for n in niveis for r in n["fluxos"]) or any(n["banco_padrao_alterado"] for n in niveis)
+    return 1 if falhou else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+# benchmarks/gerar_dados.py - gera um dados.db sintético (animais + lotes) para medições
+"""
+Gera um banco no mesmo formato que a página Dados grava (tabela `animais` com as
+COLUNAS_OBRIGATORIAS de leilao/importacao.py) e que Lotes/Criar Lote usam
+(`lotes` + `lote_itens`).
+
+    python benchmarks/gerar_dados.py --animais 100000 --lotes 2000 --out /tmp/dados.db
+    python benchmarks/gerar_dados.py --animais 500000 --dup 0.02 --em-lote 0.8
+
+Com a mesma semente o resultado é sempre o mesmo, então medições em versões
+diferentes do código usam exatamente os mesmos dados.
+"""
+from __future__ import annotations
+import argparse
+import random
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from leilao.importacao import COLUNAS_OBRIGATORIAS  # noqa: E402
+FAIXAS_PLANILHA = ["0 - 8", "9 - 12", "13 - 24", "25 - 36", "36 +"]
+
+NOMES = [
+    "João", "José", "Antônio", "Francisco", "Carlos", "Paulo", "Pedro", "Lucas", "Marcos", "Luiz",
+    "Maria", "Ana", "Francisca", "Antônia", "Adriana", "Juliana", "Márcia", "Fernanda", "Aparecida", "Sebastião",
+]
+SOBRENOMES = [
+    "da Silva", "dos Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Lima", "Gomes",
+    "Ribeiro", "Carvalho", "de Almeida", "Lopes", "Soares", "Fernandes", "Vieira", "Barbosa", "Rocha", "Dias",
+]
+SUFIXOS = ["", "", "", " Filho", " Júnior", " Neto", " - Fazenda Boa Vista", " - Sítio São João", " ME", " e Outros"]
+MUNICIPIOS = [
+    "Ji-Paraná", "Cacoal", "Rolim de Moura", "Ariquemes", "Vilhena", "Pimenta Bueno", "Jaru", "Ouro Preto do Oeste",
+    "Presidente Médici", "Alta Floresta D'Oeste", "Espigão D'Oeste", "Nova Brasilândia D'Oeste", "Machadinho D'Oeste",
+    "São Miguel do Guaporé", "Alvorada D'Oeste", "Urupá", "Mirante da Serra", "Theobroma", "Vale do Paraíso", "Teixeirópolis",
+]
+
+def _tipo_sql(col: str) -> str:
+    # tipos iguais aos que o pandas.to_sql cria a partir da planilha
+    if col == "Data Emissão":
+        return "TIMESTAMP"
+    if col in ("Proprietário Origem", "Município Origem"):
+        return "TEXT"
+    return "INTEGER"
+
+def _proprietarios(rng: random.Random, n: int) -> list[tuple[str, str]]:
+    vistos, out = set(), []
+    while len(out) < n:
+        nome = f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}{rng.choice(SUFIXOS)}".upper()
+        if nome in vistos and len(vistos) < len(NOMES) * len(SOBRENOMES) ** 2:
+            continue
+        vistos.add(nome)
+        out.append((nome, rng.choice(MUNICIPIOS)))
+    return out
+
+def _cabecas(rng: random.Random) -> dict[str, int]:
+    """Quantidades por sexo/faixa de uma GTA: poucas faixas preenchidas, números pequenos."""
+    q = {f"{sx} {fx}": 0 for fx in FAIXAS_PLANILHA for sx in ("M", "F")}
+    for _ in range(rng.choice((1, 1, 1, 2, 2, 3))):
+        col = f"{rng.choice('MF')} {rng.choices(FAIXAS_PLANILHA, weights=(2, 3, 5, 3, 2))[0]}"
+        q[col] += max(1, int(rng.expovariate(1 / 6)))
+    return q
+
+def gerar(out: Path, animais: int, lotes: int | None = None, dup: float = 0.01,
+          em_lote: float = 0.7, concluidos: float = 0.5, seed: int = 42) -> dict:
+    """Cria `out` do zero. Retorna um resumo do que foi gerado."""
+    rng = random.Random(seed)
+    lotes = lotes if lotes is not None else max(1, animais // 50)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    for suf in ("", "-wal", "-shm", "-journal"):
+        Path(f"{out}{suf}").unlink(missing_ok=True)
+
+    t0 = time.perf_counter()
+    donos = _proprietarios(rng, max(1, animais // 8))
+    base = date(2025, 1, 1)
+    lacres = rng.sample(range(100_000, 100_000 + animais * 3), animais)
+    n_dup = 0
+
+    def linhas():
+        nonlocal n_dup
+        for i in range(animais):
+            dono, muni = rng.choice(donos)
+            q = _cabecas(rng)
+            tot_m = sum(v for k, v in q.items() if k.startswith("M"))
+            tot_f = sum(v for k, v in q.items() if k.startswith("F"))
+            if i and rng.random() < dup:
+                lacre = lacres[rng.randrange(i)]  # reaproveita um lacre já usado
+                n_dup += 1
+            else:
+                lacre = lacres[i]
+            reg = {
+                "N.º Série": 1_000_000 + i,
+                "Data Emissão": f"{base + timedelta(days=rng.randrange(300))} 00:00:00",
+                "Proprietário Origem": dono,
+                "Município Origem": muni,
+                **q,
+                "Total M": tot_m, "Total F": tot_f, "Total Animais": tot_m + tot_f,
+                "Lacre": lacre,
+            }
+            yield tuple(reg.get(c) for c in COLUNAS_OBRIGATORIAS)
+
+    with closing(sqlite3.connect(out)) as conn:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        cols_sql = ", ".join(f'"{c}" {_tipo_sql(c)}' for c in COLUNAS_OBRIGATORIAS)
+        conn.execute(f'CREATE TABLE "animais" ({cols_sql})')
+        conn.executemany(f'INSERT INTO "animais" VALUES ({", ".join("?" * len(COLUNAS_OBRIGATORIAS))})', linhas())
+
+        # mesmo schema que leilao/db.py::ensure_schema cria (o índice fica para o ensure_schema)
+        conn.execute("""
+        CREATE TABLE lotes (
+            numero INTEGER PRIMARY KEY,
+            criado_em TEXT,
+            status TEXT NOT NULL DEFAULT 'pendente',
+            concluido_em TEXT,
+            gta_saida TEXT
+        )""")
+        conn.execute("""
+        CREATE TABLE lote_itens (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            lote_numero INTEGER NOT NULL,
+            animal_rowid INTEGER NOT NULL,
+            UNIQUE(lote_numero, animal_rowid)
+        )""")
+        lotes_rows = []
+        for n in range(1, lotes + 1):
+            criado = f"{base + timedelta(days=rng.randrange(300))} {rng.randrange(7, 19):02d}:{rng.randrange(60):02d}:00"
+            if rng.random() < concluidos:
+                lotes_rows.append((n, criado, "concluido", criado, f"{rng.randrange(1, 999_999):06d}-E"))
+            else:
+                lotes_rows.append((n, criado, "pendente", None, None))
+        conn.executemany("INSERT INTO lotes VALUES (?, ?, ?, ?, ?)", lotes_rows)
+
+        # cada animal em no máximo um lote (regra do Criar Lote); tamanhos de lote variados
+        escolhidos = rng.sample(range(1, animais + 1), int(animais * em_lote))
+        pesos = [rng.paretovariate(1.5) for _ in range(lotes)]
+        destino = rng.choices(range(1, lotes + 1), weights=pesos, k=len(escolhidos))
+        conn.executemany(
+            "INSERT INTO lote_itens(lote_numero, animal_rowid) VALUES (?, ?)",
+            sorted(zip(destino, escolhidos)),
+        )
+        conn.commit()
+
+    return {
+        "arquivo": str(out),
+        "animais": animais,
+        "lotes": lotes,
+        "itens_em_lote": len(escolhidos),
+        "lacres_duplicados": n_dup,
+        "proprietarios": len(donos),
+        "segundos": round(time.perf_counter() - t0, 2),
+        "bytes": out.stat().st_size,
+    }
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--animais", type=int, default=10_000, help="linhas em `animais` (1k a 500k)")
+    ap.add_argument("--lotes", type=int, default=None, help="quantidade de lotes (padrão: animais/50)")
+    ap.add_argument("--dup", type=float, default=0.01, help="fração de linhas com lacre repetido")
+    ap.add_argument("--em-lote", type=float, default=0.7, help="fração de animais associados a algum lote")
+    ap.add_argument("--concluidos", type=float, default=0.5, help="fração de lotes concluídos")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out", type=Path, default=Path("dados_sintetico.db"))
+    args = ap.parse_args(argv)
+
+    resumo = gerar(args.out, args.animais, args.lotes, args.dup, args.em_lote, args.concluidos, args.seed)
+    for k, v in resumo.items():
+        print(f"{k:>18}: {v}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
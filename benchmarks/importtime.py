@@ -0,0 +1,132 @@
+# benchmarks/importtime.py - orçamento de tempo de import por página (python -X importtime)
+"""
+Mede quanto cada página custa para importar no *cold start* (primeira navegação).
+
+Para cada script (Inicio.py e pages/*.py) extrai só os imports de nível de módulo
+(o resto da página depende de uma sessão Streamlit) e roda em um processo novo:
+
+    python -X importtime -c "import streamlit; <imports da página>"
+
+O `streamlit` é importado primeiro porque toda página paga esse custo de qualquer
+forma; o que conta no orçamento é o EXTRA que a página adiciona por cima dele.
+
+Uso:
+    python benchmarks/importtime.py              # tabela + verificação do orçamento
+    python benchmarks/importtime.py --runs 7     # mediana de 7 execuções
+    python benchmarks/importtime.py --json out.json
+
+Sai com código 1 se alguma página estourar o orçamento.
+"""
+from __future__ import annotations
+import argparse
+import ast
+import json
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+
+# Orçamento (ms) do custo extra de import de cada página, além do próprio streamlit.
+# Pensado para o notebook de campo: nenhuma página deve puxar pandas/ReportLab/openpyxl
+# só para desenhar a tela.
+BUDGET_MS = {
+    "Inicio.py": 40,
+    "pages/1_Lotes.py": 40,
+    "pages/2_Criar_Lote.py": 40,
+    "pages/3_Planilha.py": 40,
+    "pages/4_Editar.py": 40,
+    "pages/5_Imprimir.py": 40,
+    "pages/6_Animais_Fora.py": 40,
+    "pages/7_Duplicatas.py": 40,
+    "pages/8_Dados.py": 40,
+    "pages/9_Backup.py": 40,
+}
+DEFAULT_BUDGET_MS = 40
+
+# "import time:       882 |     202966 | streamlit"
+R_LINE = re.compile(r"^import time:\s+(\d+)\s*\|\s*(\d+)\s*\|( *)(\S.*)$")
+
+def _pages() -> list[str]:
+    pages = ["Inicio.py"] + sorted(f"pages/{p.name}" for p in (APP_DIR / "pages").glob("*.py"))
+    return [p for p in pages if (APP_DIR / p).exists()]
+
+def _module_imports(page: str) -> str:
+    """Devolve o código dos imports de nível de módulo da página (incluindo os dentro de try/if)."""
+    tree = ast.parse((APP_DIR / page).read_text(encoding="utf-8-sig"))
+    stmts: list[ast.stmt] = []
+
+    def visit(body):
+        for node in body:
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                if isinstance(node, ast.ImportFrom) and node.module == "__future__":
+                    continue
+                stmts.append(node)
+            elif isinstance(node, (ast.Try, ast.If)):
+                visit(node.body)
+
+    visit(tree.body)
+    return "\n".join(ast.unparse(s) for s in stmts)
+
+def _measure(code: str) -> dict[str, int]:
+    """Roda o código com -X importtime e devolve {módulo_top_level: cumulativo_us}."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=APP_DIR, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr else "falha no import")
+    top: dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        m = R_LINE.match(line)
+        if m and m.group(3) == " ":  # só módulos importados diretamente (sem recuo extra)
+            top[m.group(4).strip()] = top.get(m.group(4).strip(), 0) + int(m.group(2))
+    return top
+
+def _startup_modules() -> set[str]:
+    """Módulos que o interpretador já carrega antes do `-c` (site, encodings...)."""
+    return set(_measure("pass"))
+
+def measure_page(page: str, runs: int = 5, startup: set[str] | None = None) -> dict:
+    code = "import streamlit\n" + _module_imports(page)
+    startup = _startup_modules() if startup is None else startup
+    base_us, extra_us, pesados = [], [], {}
+    for _ in range(runs):
+        top = {m: us for m, us in _measure(code).items() if m not in startup}
+        base_us.append(top.pop("streamlit", 0))
+        extra_us.append(sum(top.values()))
+        for mod, us in top.items():
+            pesados[mod] = max(pesados.get(mod, 0), us)
+    budget = BUDGET_MS.get(page, DEFAULT_BUDGET_MS)
+    extra_ms = statistics.median(extra_us) / 1000
+    return {
+        "page": page,
+        "streamlit_ms": round(statistics.median(base_us) / 1000, 1),
+        "extra_ms": round(extra_ms, 1),
+        "budget_ms": budget,
+        "ok": extra_ms <= budget,
+        "top_modules": sorted(((m, round(us / 1000, 1)) for m, us in pesados.items()), key=lambda x: -x[1])[:5],
+    }
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=5, help="execuções por página (usa a mediana)")
+    ap.add_argument("--json", type=Path, help="grava os resultados neste arquivo")
+    ap.add_argument("pages", nargs="*", help="páginas específicas (padrão: todas)")
+    args = ap.parse_args(argv)
+
+    startup = _startup_modules()
+    results = [measure_page(p, args.runs, startup) for p in (args.pages or _pages())]
+    print(f"{'página':<26} {'streamlit':>10} {'extra':>8} {'orçamento':>10}  maiores imports")
+    for r in results:
+        flag = "" if r["ok"] else "  <-- ESTOUROU"
+        mods = ", ".join(f"{m} {ms}ms" for m, ms in r["top_modules"][:3])
+        print(f"{r['page']:<26} {r['streamlit_ms']:>8.1f}ms {r['extra_ms']:>6.1f}ms {r['budget_ms']:>8}ms  {mods}{flag}")
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+    return 0 if all(r["ok"] for r in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
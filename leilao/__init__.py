@@ -0,0 +1,25 @@
+"""Camada de serviço da Planilha de Leilão, sem dependência do Streamlit.
+
+As páginas (Inicio.py e pages/*) e a linha de comando (`python -m leilao`) usam
+os mesmos módulos:
+
+- `leilao.db`: caminho do banco, conexão e schema de lotes;
+- `leilao.esquema`: nomes das colunas de `animais` (série, lacre, faixas...) em cache por versão do schema;
+- `leilao.querylog`: tempo de cada consulta SQL e log das lentas;
+- `leilao.perfil`: tempo por etapa de cada execução das páginas (p50/p95);
+- `leilao.importacao`: leitura da planilha e gravação da tabela `animais`;
+- `leilao.lotes`: criar, preencher, concluir/reabrir e excluir lotes;
+- `leilao.relatorio`: itens do lote por faixa/sexo e geração do PDF do lote;
+- `leilao.faixas`: mapa de faixas da planilha e tabela `animal_faixas` (cabeças por sexo/faixa);
+- `leilao.resumo`: `lote_resumo` (itens e cabeças por faixa/sexo) mantida por gatilhos;
+- `leilao.gta`: GTA de Saída consolidada de vários lotes (PDF/XLSX);
+- `leilao.exportacao`: lotes e seus itens em XLSX (uma aba por lote ou planilha única);
+- `leilao.consultas`: números do Início, animais fora de lote, duplicatas;
+- `leilao.retrato`: cópia de `animais` em memória, por colunas, compartilhada pelas sessões;
+- `leilao.busca`: busca aproximada de lacre e proprietário (trigramas + distância de edição);
+- `leilao.diario`: diário de alterações (animais, lotes, itens) por gatilhos e leitura incremental;
+- `leilao.tarefas`: tarefas em segundo plano (importação, PDF, cópias) com progresso e cancelamento;
+- `leilao.edicao`: edição de vários registros de `animais` numa transação, com relatório de conflitos;
+- `leilao.backup`: backup online, restauração e agendador automático;
+- `leilao.manutencao`: ANALYZE, incremental_vacuum/VACUUM e tamanho/fragmentação do banco.
+"""
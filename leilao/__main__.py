@@ -0,0 +1,5 @@
+import sys
+
+from leilao.cli import main
+
+sys.exit(main())
@@ -0,0 +1,362 @@
+# leilao/backup.py - backup online, restauração e backups automáticos em uma thread de fundo
+from __future__ import annotations
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+
+from leilao import db, diario, manutencao, tarefas
+from leilao.db import APP_DIR
+
+BACKUPS_DIR = APP_DIR / "backups"
+CONFIG_PATH = BACKUPS_DIR / "agendamento.json"
+AUTO_PREFIX = "dados-auto-"
+
+DEFAULT_CONFIG = {
+    "ativo": True,
+    "intervalo_min": 60,     # backup periódico (só se o banco mudou desde o último)
+    "a_cada_escritas": 50,   # backup após N escritas registradas (0 = desliga)
+    "manter": 10,            # quantos backups automáticos manter na pasta
+}
+ESPERA_FALHA_S = 60          # depois de uma falha, espera isto (ou o intervalo, se menor) antes de tentar de novo
+
+# ------------------ Helpers ------------------
+def online_backup(src: Path, dst: Path) -> int:
+    """Copia o banco com a API de backup do SQLite (consistente mesmo com escritas em andamento).
+    Grava em um arquivo parcial e renomeia no final. Retorna o tamanho em bytes."""
+    tmp = dst.with_name(dst.name + ".partial")
+    try:
+        with closing(sqlite3.connect(src)) as origem, closing(sqlite3.connect(tmp)) as destino:
+            # copia em blocos e cede o lock entre eles para não travar os operadores;
+            # numa tarefa, informa o progresso (e cancelar interrompe a cópia)
+            origem.backup(destino, pages=256, sleep=0.005,
+                          progress=lambda _st, restantes, total: tarefas.avancar(1 - restantes / total if total else None))
+        os.replace(tmp, dst)
+    finally:
+        if tmp.exists():
+            tmp.unlink(missing_ok=True)
+    return dst.stat().st_size
+
+def _db_mtime(db_path: Path) -> float:
+    mts = [p.stat().st_mtime for p in (db_path, Path(f"{db_path}-wal")) if p.exists()]
+    return max(mts, default=0.0)
+
+def is_sqlite_file(buf_or_path) -> bool:
+    """Checa header 'SQLite format 3\\0' + abre e roda um integrity_check."""
+    try:
+        if isinstance(buf_or_path, (str, os.PathLike, Path)):
+            p = Path(buf_or_path)
+            if not p.exists():
+                return False
+            with p.open("rb") as f:
+                header = f.read(16)
+            tmp_path = p  # validaremos com conexão logo abaixo
+        else:
+            # Uploaded file-like
+            pos = buf_or_path.tell()
+            buf_or_path.seek(0)
+            header = buf_or_path.read(16)
+            buf_or_path.seek(pos)
+            # gravar temporariamente para testar com sqlite3
+            BACKUPS_DIR.mkdir(exist_ok=True)
+            tmp_path = BACKUPS_DIR / f"_tmp_validate_{int(time.time()*1000)}.sqlite"
+            with tmp_path.open("wb") as out:
+                buf_or_path.seek(0)
+                shutil.copyfileobj(buf_or_path, out)
+            buf_or_path.seek(0)
+
+        if header != b"SQLite format 3\x00":
+            if tmp_path.name.startswith("_tmp_validate_") and tmp_path.exists():
+                tmp_path.unlink(missing_ok=True)
+            return False
+
+        # tenta abrir e fazer integrity check
+        ok = False
+        try:
+            with closing(sqlite3.connect(f"file:{tmp_path}?mode=ro", uri=True)) as conn:
+                cur = conn.execute("PRAGMA integrity_check;")
+                row = cur.fetchone()
+                ok = bool(row and row[0] == "ok")
+        finally:
+            # limpar tmp se necessário
+            if tmp_path.name.startswith("_tmp_validate_") and tmp_path.exists():
+                tmp_path.unlink(missing_ok=True)
+        return ok
+    except Exception:
+        # limpeza de segurança
+        try:
+            if 'tmp_path' in locals() and tmp_path.name.startswith("_tmp_validate_") and tmp_path.exists():
+                tmp_path.unlink(missing_ok=True)
+        except Exception:
+            pass
+        return False
+
+def make_timestamped_backup(src: Path | None = None) -> Path | None:
+    src = Path(src or db.DB_PATH)
+    if not src.exists():
+        return None
+    BACKUPS_DIR.mkdir(exist_ok=True)
+    ts = datetime.now().strftime("%Y%m%d-%H%M%S")
+    dst = BACKUPS_DIR / f"dados-{ts}.sqlite"
+    online_backup(src, dst)
+    return dst
+
+def restore_backup(source, auto_backup: bool = True) -> Path | None:
+    """Substitui o banco atual por `source` (caminho ou arquivo enviado).
+
+    Valida o arquivo, opcionalmente faz um backup do banco atual e troca os arquivos
+    com os.replace, voltando ao banco anterior se a validação final falhar.
+    Retorna o caminho do backup automático (ou None). Levanta ValueError se o
+    arquivo não for um SQLite válido e RuntimeError se a troca falhar."""
+    tarefas.avancar(None, "Validando o arquivo (integrity_check)")
+    if not is_sqlite_file(source):
+        raise ValueError("Arquivo não parece ser um banco SQLite válido (falha na assinatura ou no `PRAGMA integrity_check`).")
+
+    db_path = Path(db.DB_PATH)
+    BACKUPS_DIR.mkdir(exist_ok=True)
+    # 1) grava para um tmp
+    tmp_incoming = BACKUPS_DIR / f"_incoming_{int(time.time()*1000)}.sqlite"
+    if isinstance(source, (str, os.PathLike, Path)):
+        shutil.copyfile(source, tmp_incoming)
+    else:
+        with tmp_incoming.open("wb") as out:
+            source.seek(0)
+            shutil.copyfileobj(source, out)
+
+    try:
+        # 2) backup automático (opcional)
+        backup_path = None
+        if auto_backup and db_path.exists():
+            tarefas.avancar(0.0, "Backup do banco atual")
+            backup_path = make_timestamped_backup(db_path)
+        tarefas.avancar(None, "Substituindo o banco")  # daqui em diante não dá mais para cancelar
+
+        # 3) troca atômica
+        #    - sem escritas durante a troca; com WAL, o conteúdo recente está no -wal:
+        #      leva tudo para o arquivo principal antes (um -wal antigo ao lado do banco novo o corromperia)
+        #    - renomeia DB atual para .old (fallback extra) e move o novo para o lugar
+        with db.sem_escritas():
+            db.fechar_wal(db_path)
+            old_path = db_path.with_name("dados.old.sqlite")
+            if old_path.exists():
+                old_path.unlink(missing_ok=True)
+            if db_path.exists():
+                os.replace(db_path, old_path)
+            os.replace(tmp_incoming, db_path)  # coloca o novo no lugar
+            db.esquecer_modo(db_path)
+
+            # 4) sanity check final
+            if not is_sqlite_file(db_path):
+                # rollback
+                if db_path.exists():
+                    db_path.unlink(missing_ok=True)
+                if old_path.exists():
+                    os.replace(old_path, db_path)
+                raise RuntimeError("Falha na validação final do banco restaurado. O banco anterior foi recuperado.")
+
+        # tudo certo — removemos o .old
+        if old_path.exists():
+            old_path.unlink(missing_ok=True)
+        # as seq do diário voltaram às do backup: quem acompanha o diário recalcula
+        diario.nova_geracao()
+        return backup_path
+    finally:
+        if tmp_incoming.exists():
+            tmp_incoming.unlink(missing_ok=True)
+
+def _load_config() -> dict:
+    cfg = dict(DEFAULT_CONFIG)
+    try:
+        cfg.update(json.loads(CONFIG_PATH.read_text(encoding="utf-8")))
+    except (OSError, ValueError):
+        pass
+    return cfg
+
+# ------------------ Agendador ------------------
+class BackupScheduler:
+    """Uma instância por processo (ver `get_scheduler`). Toda a cópia roda na thread própria,
+    então os reruns do Streamlit só leem o status."""
+
+    def __init__(self, db_path: Path | None = None, backups_dir: Path = BACKUPS_DIR):
+        self._db_path = Path(db_path) if db_path else None
+        self.backups_dir = Path(backups_dir)
+        self._lock = threading.Lock()          # protege config/contadores/status
+        self._backup_lock = threading.Lock()   # impede duas cópias simultâneas
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._forcar = False
+        self.config = _load_config()
+        self.escritas = 0
+        self.em_andamento = False
+        self.ultimo: dict | None = None        # {arquivo, inicio, duracao_s, tamanho, motivo}
+        self.ultimo_erro: str | None = None
+        self.execucoes = 0
+        self._ultimo_ts = time.time()          # referência para o intervalo
+        self._proxima_tentativa = 0.0          # após uma falha, nada de backup automático antes disto
+        self._ultimo_mtime = _db_mtime(self.db_path)
+
+    @property
+    def db_path(self) -> Path:
+        # acompanha leilao.db.set_db_path quando não foi fixado na criação
+        return self._db_path or Path(db.DB_PATH)
+
+    # ---- API usada pelas páginas ----
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._loop, name="backup-scheduler", daemon=True)
+            self._thread.start()
+
+    def notify_write(self, n: int = 1):
+        with self._lock:
+            self.escritas += int(n)
+            limite = int(self.config.get("a_cada_escritas") or 0)
+            disparar = self.config.get("ativo") and limite > 0 and self.escritas >= limite
+        if disparar:
+            self._wake.set()
+
+    def run_now(self):
+        """Pede um backup imediato; a cópia acontece na thread do agendador."""
+        with self._lock:
+            self._forcar = True
+        self._wake.set()
+
+    def configure(self, **kwargs):
+        with self._lock:
+            self.config.update({k: v for k, v in kwargs.items() if k in DEFAULT_CONFIG})
+            cfg = dict(self.config)
+        self.backups_dir.mkdir(exist_ok=True)
+        CONFIG_PATH.write_text(json.dumps(cfg, indent=2), encoding="utf-8")
+        self._wake.set()  # recalcula o próximo horário
+
+    def status(self) -> dict:
+        with self._lock:
+            intervalo = float(self.config.get("intervalo_min") or 0) * 60
+            proximo = (self._ultimo_ts + intervalo) if (self.config.get("ativo") and intervalo > 0) else None
+            return {
+                "config": dict(self.config),
+                "rodando": bool(self._thread and self._thread.is_alive()),
+                "em_andamento": self.em_andamento,
+                "escritas_pendentes": self.escritas,
+                "execucoes": self.execucoes,
+                "ultimo": dict(self.ultimo) if self.ultimo else None,
+                "ultimo_erro": self.ultimo_erro,
+                "proximo": datetime.fromtimestamp(proximo) if proximo else None,
+            }
+
+    # ---- thread ----
+    def _segundos_ate_proximo(self) -> float | None:
+        with self._lock:
+            if self._forcar:
+                return 0.0
+            if not self.config.get("ativo"):
+                return None
+            # backoff vem antes do gatilho por escritas: elas continuam pendentes depois de uma falha
+            if self._proxima_tentativa > time.time():
+                return self._proxima_tentativa - time.time()
+            limite = int(self.config.get("a_cada_escritas") or 0)
+            if limite > 0 and self.escritas >= limite:
+                return 0.0
+            intervalo = float(self.config.get("intervalo_min") or 0) * 60
+            if intervalo <= 0:
+                return None
+            return max(0.0, self._ultimo_ts + intervalo - time.time())
+
+    def _loop(self):
+        while True:
+            espera = self._segundos_ate_proximo()
+            if espera is None or espera > 0:
+                self._wake.wait(timeout=espera)
+                self._wake.clear()
+                continue
+            with self._lock:
+                forcado, self._forcar = self._forcar, False
+                por_escritas = self.escritas > 0
+            # no disparo por intervalo, só copia se o banco mudou desde o último backup
+            if forcado or por_escritas or _db_mtime(self.db_path) > self._ultimo_mtime:
+                self.backup("manual" if forcado else "agendado")
+            else:
+                with self._lock:
+                    self._ultimo_ts = time.time()
+
+    def _falhou(self, erro: str | None = None):
+        """Chamar com self._lock: adia a próxima tentativa automática."""
+        intervalo = float(self.config.get("intervalo_min") or 0) * 60
+        agora = time.time()
+        self._ultimo_ts = agora
+        self._proxima_tentativa = agora + (min(intervalo, ESPERA_FALHA_S) if intervalo > 0 else ESPERA_FALHA_S)
+        if erro:
+            self.ultimo_erro = f"{datetime.now():%d/%m/%Y %H:%M} — {erro}"
+
+    def backup(self, motivo: str = "agendado") -> Path | None:
+        if not self.db_path.exists():
+            with self._lock:
+                self._falhou()
+            return None
+        with self._backup_lock:
+            with self._lock:
+                self.em_andamento = True
+                escritas_antes = self.escritas
+            inicio = time.time()
+            dst = self.backups_dir / f"{AUTO_PREFIX}{datetime.now():%Y%m%d-%H%M%S}.sqlite"
+            try:
+                self.backups_dir.mkdir(exist_ok=True)
+                mtime = _db_mtime(self.db_path)
+                tamanho = online_backup(self.db_path, dst)
+                self._prune()
+            except Exception as e:
+                dst.unlink(missing_ok=True)  # não deixa na pasta uma cópia que não foi registrada
+                with self._lock:
+                    self.em_andamento = False
+                    self._falhou(str(e))
+                return None
+            with self._lock:
+                self.em_andamento = False
+                self.ultimo_erro = None
+                self._proxima_tentativa = 0.0
+                self.execucoes += 1
+                self.escritas = max(0, self.escritas - escritas_antes)
+                self._ultimo_ts = time.time()
+                self._ultimo_mtime = mtime
+                self.ultimo = {
+                    "arquivo": dst.name,
+                    "inicio": datetime.fromtimestamp(inicio),
+                    "duracao_s": time.time() - inicio,
+                    "tamanho": tamanho,
+                    "motivo": motivo,
+                }
+            return dst
+
+    def _prune(self):
+        manter = max(1, int(self.config.get("manter") or 1))
+        autos = sorted(self.backups_dir.glob(f"{AUTO_PREFIX}*.sqlite"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for antigo in autos[manter:]:
+            antigo.unlink(missing_ok=True)
+
+# ------------------ Singleton por processo ------------------
+_instance: BackupScheduler | None = None
+_instance_lock = threading.Lock()
+AUTO_START = True  # a CLI desliga: processo curto não deve iniciar thread de backup
+
+def get_scheduler() -> BackupScheduler:
+    """Retorna (e inicia, se preciso) o agendador único deste processo do servidor."""
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = BackupScheduler()
+    _instance.start()
+    return _instance
+
+def registrar_escrita(n: int = 1):
+    """Chamado pelas funções de escrita após cada commit que altera o banco."""
+    if _instance is None and not AUTO_START:
+        return
+    get_scheduler().notify_write(n)
+    manutencao.notificar(n)  # ANALYZE/espaço livre depois de muitas escritas (leilao/manutencao.py)
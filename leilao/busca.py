@@ -0,0 +1,257 @@
+# leilao/busca.py - busca tolerante a erros (lacre, proprietário) com índice de trigramas
+"""
+Lacre digitado/lido com um dígito trocado ou faltando, nome do proprietário com
+ou sem acento ou abreviado ("FAZ." / "FAZENDA"): a busca exata não acha nada.
+
+Para cada coluna indexada guarda-se, a partir do retrato de `animais`
+(leilao/retrato.py), os valores distintos já normalizados (sem acento,
+minúsculas, só letras/dígitos) e:
+
+- trigrama -> valores que o contêm (listas invertidas): uma consulta só olha os
+  valores que dividem trigramas com o texto, nunca a coluna inteira; os mais
+  parecidos (Jaccard dos trigramas) são ordenados pela distância de edição
+  (troca de dois dígitos vizinhos conta 1);
+- lista ordenada dos valores (e, para nomes, de cada início de palavra) para
+  completar pelo prefixo com bisect.
+
+O índice é montado na primeira busca e vale enquanto a versão do retrato não mudar.
+"""
+from __future__ import annotations
+import heapq
+import re
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import NamedTuple
+
+from leilao import esquema, retrato
+
+_NAO_ALNUM = re.compile(r"[^0-9a-z]+")
+
+_lock = threading.Lock()
+_indices: dict[str, "Indice"] = {}
+
+class Achado(NamedTuple):
+    valor: str               # valor como está na planilha (o primeiro encontrado)
+    distancia: int           # distância de edição até o texto buscado (0 = igual ou completa o texto)
+    similaridade: float      # trigramas em comum / trigramas dos dois (0..1)
+    posicoes: list[int]      # posições no retrato (ret.linha(pos))
+
+def normalizar(texto) -> str:
+    """Sem acentos, minúsculas, só letras e dígitos separados por um espaço."""
+    if texto is None:
+        return ""
+    s = unicodedata.normalize("NFKD", str(texto))
+    s = "".join(c for c in s if not unicodedata.combining(c)).lower()
+    return _NAO_ALNUM.sub(" ", s).strip()
+
+def trigramas(norm: str) -> set[str]:
+    """Trigramas de cada palavra, com dois espaços antes e um depois (palavras curtas também geram trigramas)."""
+    out = set()
+    for palavra in norm.split():
+        p = f"  {palavra} "
+        out.update(p[i:i + 3] for i in range(len(p) - 2))
+    return out
+
+def distancia(a: str, b: str, maximo: int | None = None) -> int:
+    """Distância de edição com transposição de vizinhos (OSA). Com `maximo`, para cedo e devolve maximo+1."""
+    if a == b:
+        return 0
+    if maximo is not None and abs(len(a) - len(b)) > maximo:
+        return maximo + 1
+    ant2, ant = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        atual = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            custo = ca != cb
+            v = min(ant[j] + 1, atual[j - 1] + 1, ant[j - 1] + custo)
+            if ant2 is not None and i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                v = min(v, ant2[j - 2] + 1)
+            atual[j] = v
+        if maximo is not None and min(atual) > maximo:
+            return maximo + 1
+        ant2, ant = ant, atual
+    return ant[-1]
+
+_DIGITOS = "0123456789"
+_ALFANUM = _DIGITOS + "abcdefghijklmnopqrstuvwxyz"
+
+def _vizinhos(q: str) -> set[str]:
+    """Tudo a distância 1 de `q` (tira, troca vizinhos, substitui, insere): para códigos curtos
+    como o lacre, onde há muitos valores parecidos e o certo poderia ficar fora dos candidatos."""
+    letras = _DIGITOS if q.isdigit() else _ALFANUM
+    out = {q[:i] + q[i + 1:] for i in range(len(q))}
+    out |= {q[:i] + q[i + 1] + q[i] + q[i + 2:] for i in range(len(q) - 1)}
+    for i in range(len(q) + 1):
+        for c in letras:
+            out.add(q[:i] + c + q[i:])
+            if i < len(q):
+                out.add(q[:i] + c + q[i + 1:])
+    out.discard(q)
+    return out
+
+def _distancia_palavras(q: str, chave: str, maximo: int) -> int:
+    """Para nomes: soma, por palavra buscada, da menor distância a uma palavra do nome
+    (0 se a palavra do nome começa com ela: "faz" -> "fazenda"). A ordem das palavras não importa."""
+    palavras = chave.split()
+    total = 0
+    for w in q.split():
+        melhor = maximo + 1
+        for p in palavras:
+            if p.startswith(w):
+                melhor = 0
+                break
+            melhor = min(melhor, distancia(w, p, melhor - 1 if melhor > 0 else 0))
+        total += melhor
+        if total > maximo:
+            return maximo + 1
+    return total
+
+def _tipo_erro(q: str, chave: str) -> int:
+    """Desempate entre valores à mesma distância: dígitos trocados de lugar (mesmos caracteres)
+    e dígito faltando/sobrando, os erros comuns ao digitar/ler o lacre, vêm antes de dígito errado."""
+    if len(q) != len(chave):
+        return 1
+    return 0 if sorted(q) == sorted(chave) else 2
+
+class Indice:
+    """Índice de trigramas e de prefixos dos valores distintos de uma coluna do retrato.
+    `por_palavra=True` (nomes): compara palavra a palavra e completa pelo início de qualquer palavra."""
+
+    def __init__(self, ret: retrato.Retrato, coluna: str, por_palavra: bool = False):
+        self.coluna = coluna
+        self.por_palavra = por_palavra
+        grupos = ret.grupos(coluna, lambda v: normalizar(v) or None)
+        self.chaves: list[str] = list(grupos)
+        self._por_chave = {c: k for k, c in enumerate(self.chaves)}
+        # posições de cada chave, todas num array só (chave k: posicoes[inicio[k]:inicio[k+1]])
+        self._inicio = array("I", [0])
+        self._posicoes = array("I")
+        for pos in grupos.values():
+            self._posicoes.extend(pos)
+            self._inicio.append(len(self._posicoes))
+        self._ret = ret
+
+        listas: dict[str, list[int]] = {}
+        self._n_trig = array("H")
+        for k, chave in enumerate(self.chaves):
+            tg = trigramas(chave)
+            self._n_trig.append(min(len(tg), 65535))
+            for t in tg:
+                listas.setdefault(t, []).append(k)
+        self._listas = {t: array("I", ks) for t, ks in listas.items()}
+
+        # prefixos: a chave inteira e, para nomes, cada início de palavra ("joao da silva" -> "silva")
+        entradas = []
+        for k, chave in enumerate(self.chaves):
+            entradas.append((chave, k))
+            if por_palavra:
+                entradas += [(chave[m.end():], k) for m in re.finditer(" ", chave)]
+        entradas.sort()
+        self._prefixos = [s for s, _k in entradas]
+        self._prefixos_k = array("I", (k for _s, k in entradas))
+
+    def __len__(self) -> int:
+        return len(self.chaves)
+
+    def _achado(self, k: int, dist: int, sim: float) -> Achado:
+        pos = self._posicoes[self._inicio[k]:self._inicio[k + 1]].tolist()
+        return Achado(self._ret.valor(pos[0], self.coluna), dist, sim, pos)
+
+    def parecidos(self, texto, limite: int = 10, minimo: float = 0.3) -> list[Achado]:
+        """Valores parecidos com `texto`, do mais para o menos parecido.
+
+        Candidatos = valores com mais trigramas em comum (Jaccard), mais, em códigos
+        curtos, os que estão a uma edição de distância; só esses são comparados.
+        Entram os com distância de edição até ~1/3 do texto (mín. 1 por palavra) ou
+        similaridade de trigramas >= `minimo`."""
+        q = normalizar(texto)
+        tq = trigramas(q)
+        if not tq:
+            return []
+        comuns: Counter = Counter()
+        for t in tq:
+            lista = self._listas.get(t)
+            if lista is not None:
+                comuns.update(lista)
+        n_q = len(tq)
+
+        def _sim(k: int) -> float:
+            n = comuns.get(k, 0)
+            return n / (n_q + self._n_trig[k] - n)
+
+        # pré-seleção pela contagem (ordenação em C), depois os melhores pela similaridade
+        pre = [k for k, _n in comuns.most_common(max(limite * 20, 200))]
+        candidatos = set(heapq.nlargest(max(limite * 4, 40), pre, key=_sim))
+        if not self.por_palavra and " " not in q and len(q) <= 12:
+            candidatos.update(k for v in _vizinhos(q) if (k := self._por_chave.get(v)) is not None)
+
+        max_dist = sum(max(1, len(w) // 3) for w in q.split())
+        achados = []
+        for k in candidatos:
+            sim = _sim(k)
+            chave = self.chaves[k]
+            if self.por_palavra:
+                dist = _distancia_palavras(q, chave, 2 * len(q))
+            else:
+                # parecido pelos trigramas: distância completa (para ordenar); senão basta saber se passa de max_dist
+                dist = distancia(q, chave, 2 * len(q) if sim >= minimo else max_dist)
+            if dist <= max_dist or sim >= minimo:
+                achados.append((dist, _tipo_erro(q, chave), -sim, chave, k))
+        achados.sort()
+        return [self._achado(k, dist, -msim) for dist, _t, msim, _c, k in achados[:limite]]
+
+    def prefixo(self, texto, limite: int = 10) -> list[Achado]:
+        """Valores que começam com `texto` (ou, em nomes, com uma palavra que começa com ele)."""
+        q = normalizar(texto)
+        if not q:
+            return []
+        vistos, out = set(), []
+        i = bisect_left(self._prefixos, q)
+        while i < len(self._prefixos) and self._prefixos[i].startswith(q) and len(out) < limite:
+            k = self._prefixos_k[i]
+            if k not in vistos:
+                vistos.add(k)
+                out.append(self._achado(k, 0, 1.0))
+            i += 1
+        return out
+
+def indice(coluna: str, por_palavra: bool = False) -> Indice | None:
+    """Índice da `coluna` para o retrato atual (None se `animais` ou a coluna não existe)."""
+    ret = retrato.animais()
+    if ret is None or coluna not in ret.colunas:
+        return None
+    idx = _indices.get(coluna)
+    if idx is not None and idx._ret is ret:  # mesmo retrato = mesma versão dos dados
+        return idx
+    with _lock:
+        idx = _indices.get(coluna)
+        if idx is None or idx._ret is not ret:
+            idx = Indice(ret, coluna, por_palavra)
+            if ret.versao is not None:
+                _indices[coluna] = idx
+        return idx
+
+def lacres(texto, limite: int = 10) -> list[Achado]:
+    """Lacres que completam `texto` e, depois, os parecidos (dígito trocado/faltando)."""
+    esq = esquema.animais()
+    idx = indice(esq.lacre) if esq and esq.lacre else None
+    if idx is None:
+        return []
+    out = idx.prefixo(texto, limite)
+    vistos = {a.valor for a in out}
+    out += [a for a in idx.parecidos(texto, limite) if a.valor not in vistos]
+    return out[:limite]
+
+def proprietarios(texto, limite: int = 10) -> list[Achado]:
+    """Proprietários cujo nome (ou uma palavra dele) começa com `texto` e, depois, os parecidos."""
+    esq = esquema.animais()
+    idx = indice(esq.proprietario, por_palavra=True) if esq and esq.proprietario else None
+    if idx is None:
+        return []
+    out = idx.prefixo(texto, limite)
+    vistos = {a.valor for a in out}
+    out += [a for a in idx.parecidos(texto, limite) if a.valor not in vistos]
+    return out[:limite]
@@ -0,0 +1,371 @@
+# leilao/cli.py - linha de comando para rotinas em lote (sem abrir o navegador)
+"""
+Exemplos:
+
+    python -m leilao importar planilha.xlsx --substituir
+    python -m leilao lote criar 12 --lacres 100234 100235 100236
+    python -m leilao lote criar-lista lotes.csv          # linhas "lote;lacre"
+    python -m leilao lote concluir 12 --gta 010101-E
+    python -m leilao lote listar --status pendente
+    python -m leilao pdf 12 13 14 --saida pdfs/
+    python -m leilao pdf --todos --status concluido --saida pdfs/
+    python -m leilao gta --de 2025-06-01 --ate 2025-06-30 --saida gta_junho.pdf
+    python -m leilao gta --lotes 12 13 14 --saida gta.xlsx
+    python -m leilao exportar --saida temporada.xlsx --por-lote
+    python -m leilao diario listar --desde 1200 --tabela lotes
+    python -m leilao diario compactar --manter 50000
+    python -m leilao backup
+    python -m leilao restaurar backups/dados-20250101-120000.sqlite
+    python -m leilao manutencao                          # ANALYZE do que mudou + espaço livre
+    python -m leilao manutencao --compactar              # VACUUM completo
+
+`--db` (ou a variável PLANILHA_DB) aponta para outro banco.
+"""
+from __future__ import annotations
+import argparse
+import csv
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from leilao import backup, db
+
+def _lacres_de_texto(texto: str) -> list[str]:
+    return [t for t in re.split(r"[\s,;]+", texto) if t]
+
+# ------------------ comandos ------------------
+def cmd_importar(args) -> int:
+    from leilao.importacao import carregar_dataframe, contar_animais, filtrar_colunas, salvar_animais
+
+    path = Path(args.arquivo)
+    try:
+        with path.open("rb") as f:
+            df = filtrar_colunas(carregar_dataframe(f))
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"Erro ao ler {path}: {e}", file=sys.stderr)
+        return 1
+    print(f"{len(df)} registro(s) lidos de {path.name}.")
+    if not args.substituir:
+        print("Nada gravado: use --substituir para trocar a tabela `animais` por este arquivo.")
+        return 1
+    antes = contar_animais()
+    salvar_animais(df)
+    print(f"Tabela `animais` substituída ({antes if antes is not None else 0} -> {len(df)} registros).")
+    return 0
+
+def _imprimir_resultado_lote(numero: int, res: dict):
+    print(f"Lote {numero}: {len(res['inseridos'])} inserido(s).")
+    if res["ja_no_lote"]:
+        print(f"  já estavam no lote: {', '.join(res['ja_no_lote'])}")
+    for lacre, lotes in res["em_outro_lote"].items():
+        print(f"  lacre {lacre} já pertence ao(s) lote(s) {', '.join(map(str, lotes))} — ignorado")
+    if res["nao_encontrados"]:
+        print(f"  não encontrados: {', '.join(res['nao_encontrados'])}")
+
+def cmd_lote_criar(args) -> int:
+    from leilao.lotes import criar_lote_por_lacres
+
+    lacres = list(args.lacres or [])
+    if args.arquivo:
+        lacres += _lacres_de_texto(Path(args.arquivo).read_text(encoding="utf-8-sig"))
+    if not lacres:
+        print("Informe --lacres ou --arquivo.", file=sys.stderr)
+        return 2
+    res = criar_lote_por_lacres(args.numero, lacres)
+    _imprimir_resultado_lote(args.numero, res)
+    return 0 if not (res["em_outro_lote"] or res["nao_encontrados"]) else 1
+
+def cmd_lote_criar_lista(args) -> int:
+    """CSV com colunas lote;lacre (ou lote,lacre), uma linha por animal."""
+    from leilao.lotes import criar_lote_por_lacres
+
+    por_lote: dict[int, list[str]] = {}
+    texto = Path(args.arquivo).read_text(encoding="utf-8-sig")
+    dialeto = csv.Sniffer().sniff(texto.splitlines()[0] if texto else ",", delimiters=",;\t")
+    for linha in csv.reader(texto.splitlines(), dialeto):
+        if len(linha) < 2 or not linha[0].strip().isdigit():
+            continue  # cabeçalho ou linha vazia
+        por_lote.setdefault(int(linha[0]), []).append(linha[1].strip())
+    problemas = 0
+    for numero, lacres in sorted(por_lote.items()):
+        res = criar_lote_por_lacres(numero, lacres)
+        _imprimir_resultado_lote(numero, res)
+        problemas += len(res["em_outro_lote"]) + len(res["nao_encontrados"])
+    return 0 if not problemas else 1
+
+def cmd_lote_status(args) -> int:
+    from leilao.lotes import get_lote, set_lote_status
+
+    status = "concluido" if args.acao == "concluir" else "pendente"
+    falhas = 0
+    for numero in args.numeros:
+        if not get_lote(numero):
+            print(f"Lote {numero} não encontrado.", file=sys.stderr)
+            falhas += 1
+            continue
+        if set_lote_status(numero, status, getattr(args, "gta", None) or None):
+            print(f"Lote {numero}: {status}.")
+        else:
+            print(f"Lote {numero}: já estava {status}.")
+    return 1 if falhas else 0
+
+def cmd_lote_excluir(args) -> int:
+    from leilao.lotes import delete_lote, lote_exists
+
+    if not args.sim:
+        print("Exclusão não pode ser desfeita: confirme com --sim.", file=sys.stderr)
+        return 2
+    for numero in args.numeros:
+        if lote_exists(numero):
+            delete_lote(numero)
+            print(f"Lote {numero} excluído.")
+        else:
+            print(f"Lote {numero} não encontrado.", file=sys.stderr)
+    return 0
+
+def cmd_lote_listar(args) -> int:
+    from leilao.lotes import list_lotes
+
+    lotes = sorted(list_lotes(), key=lambda l: l["numero"])
+    if args.status:
+        lotes = [l for l in lotes if l["status"] == args.status]
+    for l in lotes:
+        gta = f"  GTA {l['gta_saida']}" if l.get("gta_saida") else ""
+        print(f"{l['numero']:>6}  {l['status']:<9}  {l['itens']:>5} item(ns){gta}")
+    print(f"{len(lotes)} lote(s).")
+    return 0
+
+def cmd_pdf(args) -> int:
+    from leilao.lotes import get_lote, list_lotes
+    from leilao.relatorio import build_pdf, fetch_lote_agrupado
+    from leilao.resumo import totais
+
+    numeros = list(args.numeros or [])
+    if args.todos or args.status:
+        numeros += [l["numero"] for l in list_lotes() if not args.status or l["status"] == args.status]
+    numeros = sorted(set(numeros))
+    if not numeros:
+        print("Nenhum lote selecionado (informe números, --todos ou --status).", file=sys.stderr)
+        return 2
+
+    saida = Path(args.saida)
+    saida.mkdir(parents=True, exist_ok=True)
+    t0, falhas = time.perf_counter(), 0
+    for numero in numeros:
+        info = get_lote(numero)
+        if not info:
+            print(f"Lote {numero} não encontrado.", file=sys.stderr)
+            falhas += 1
+            continue
+        destino = saida / f"Lote_{numero}.pdf"
+        destino.write_bytes(build_pdf(info, fetch_lote_agrupado(numero), totais(numero)))
+        print(destino)
+    print(f"{len(numeros) - falhas} PDF(s) em {time.perf_counter() - t0:.1f}s.")
+    return 1 if falhas else 0
+
+def cmd_gta(args) -> int:
+    from leilao import gta
+
+    dados = gta.consolidado(args.lotes, args.status, args.de, args.ate)
+    if not dados["lotes"]:
+        print(f"Nenhum lote para os filtros ({dados['filtros']}).", file=sys.stderr)
+        return 1
+    saida = Path(args.saida)
+    if saida.suffix.lower() == ".xlsx":
+        saida.write_bytes(gta.build_xlsx(dados))
+    else:
+        saida.write_bytes(gta.build_pdf(dados))
+    tot = dados["total"]
+    print(f"{len(dados['lotes'])} lote(s), {tot['itens']} item(ns): {tot['total_M']} M / {tot['total_F']} F.")
+    print(saida)
+    return 0
+
+def cmd_exportar(args) -> int:
+    from leilao.exportacao import exportar_xlsx
+
+    saida = Path(args.saida)
+    n = exportar_xlsx(saida, args.lotes, args.status, args.de, args.ate, por_lote=args.por_lote)
+    print(f"{n['lotes']} lote(s), {n['itens']} item(ns).")
+    print(saida)
+    return 0
+
+def _data(texto: str) -> str:
+    try:
+        return datetime.strptime(texto, "%Y-%m-%d").date().isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data inválida: {texto!r} (use AAAA-MM-DD)")
+
+def cmd_diario_listar(args) -> int:
+    from leilao import diario
+
+    feed = diario.desde(args.desde, tabelas=args.tabela, limite=args.limite)
+    if feed.reiniciar:
+        print(f"Seq {args.desde} fora do diário (compactado ou banco restaurado); última seq: {feed.ate}.", file=sys.stderr)
+        return 1
+    for m in feed.mudancas:
+        dados = m.depois if m.depois is not None else m.antes
+        if m.operacao == "UPDATE":
+            dados = {k: v for k, v in (m.depois or {}).items() if (m.antes or {}).get(k) != v}
+        print(f"{m.seq:>8}  {m.quando}  {m.tabela:<10}  {m.operacao:<12}  {m.chave if m.chave is not None else '-':>7}  "
+              f"{m.sessao or '-'}  {dados}")
+    print(f"{len(feed.mudancas)} mudança(s); próxima: --desde {feed.ate}" + (" (há mais)" if feed.mais else ""))
+    return 0
+
+def cmd_diario_compactar(args) -> int:
+    from leilao import diario
+
+    n = diario.compactar(args.manter)
+    print(f"{n} linha(s) removida(s) do diário.")
+    return 0
+
+def cmd_backup(args) -> int:
+    if args.destino:
+        destino = Path(args.destino)
+        if not db.DB_PATH.exists():
+            print(f"Banco não encontrado: {db.DB_PATH}", file=sys.stderr)
+            return 1
+        backup.online_backup(db.DB_PATH, destino)
+    else:
+        destino = backup.make_timestamped_backup()
+        if destino is None:
+            print(f"Banco não encontrado: {db.DB_PATH}", file=sys.stderr)
+            return 1
+    print(destino)
+    return 0
+
+def cmd_restaurar(args) -> int:
+    try:
+        feito = backup.restore_backup(Path(args.arquivo), auto_backup=not args.sem_backup)
+    except (ValueError, RuntimeError) as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    print("Banco restaurado." + (f" Backup do anterior: {feito}" if feito else ""))
+    return 0
+
+def cmd_manutencao(args) -> int:
+    from leilao import manutencao
+
+    if args.situacao:
+        sit = manutencao.situacao()
+        if sit is None:
+            print(f"Banco não encontrado: {db.DB_PATH}", file=sys.stderr)
+            return 1
+        print(f"{sit['tamanho']} bytes (+{sit['wal']} no -wal) • {sit['paginas']} páginas de {sit['page_size']} • "
+              f"{sit['livres']} livres ({sit['fracao_livre']:.1%}) • auto_vacuum={sit['auto_vacuum']}")
+        for f in manutencao.fragmentacao():
+            print(f"{f['nome']:<32} {f['tipo']:<8} {f['paginas']:>8} pág.  {f['ocupacao']:>6.1%} ocupadas")
+        return 0
+    inicio = time.perf_counter()
+    if args.compactar:
+        feito = manutencao.compactar()
+        print(f"VACUUM: {feito['antes']} -> {feito['depois']} bytes")
+        tabelas = manutencao.analisar(todas=args.tudo)
+    else:
+        res = manutencao.rotina()
+        tabelas = res.get("analisadas", [])
+        if res.get("compactado"):
+            print(f"VACUUM (auto_vacuum=INCREMENTAL): {res['compactado']['antes']} -> {res['compactado']['depois']} bytes")
+        print(f"{res.get('liberadas', 0)} página(s) livre(s) devolvida(s) ao disco.")
+    print(f"ANALYZE: {', '.join(tabelas) or 'estatísticas em dia'} ({time.perf_counter() - inicio:.2f} s)")
+    return 0
+
+# ------------------ parser ------------------
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="python -m leilao", description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--db", help="caminho do banco (padrão: dados.db do app ou $PLANILHA_DB)")
+    sub = ap.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("importar", help="lê a planilha (xlsx/xls/ods/html) e substitui a tabela animais")
+    p.add_argument("arquivo")
+    p.add_argument("--substituir", action="store_true", help="confirma a substituição da tabela")
+    p.set_defaults(func=cmd_importar)
+
+    lote = sub.add_parser("lote", help="operações de lote").add_subparsers(dest="acao", required=True)
+    p = lote.add_parser("criar", help="cria o lote e insere os animais pelos lacres")
+    p.add_argument("numero", type=int)
+    p.add_argument("--lacres", nargs="+")
+    p.add_argument("--arquivo", help="arquivo texto com lacres (um por linha, ou separados por vírgula)")
+    p.set_defaults(func=cmd_lote_criar)
+    p = lote.add_parser("criar-lista", help="CSV lote;lacre com vários lotes de uma vez")
+    p.add_argument("arquivo")
+    p.set_defaults(func=cmd_lote_criar_lista)
+    p = lote.add_parser("concluir")
+    p.add_argument("numeros", type=int, nargs="+")
+    p.add_argument("--gta", help="nº da GTA de saída")
+    p.set_defaults(func=cmd_lote_status)
+    p = lote.add_parser("reabrir")
+    p.add_argument("numeros", type=int, nargs="+")
+    p.set_defaults(func=cmd_lote_status)
+    p = lote.add_parser("excluir")
+    p.add_argument("numeros", type=int, nargs="+")
+    p.add_argument("--sim", action="store_true", help="confirma a exclusão")
+    p.set_defaults(func=cmd_lote_excluir)
+    p = lote.add_parser("listar")
+    p.add_argument("--status", choices=["pendente", "concluido"])
+    p.set_defaults(func=cmd_lote_listar)
+
+    p = sub.add_parser("pdf", help="gera o PDF de um ou mais lotes")
+    p.add_argument("numeros", type=int, nargs="*")
+    p.add_argument("--todos", action="store_true")
+    p.add_argument("--status", choices=["pendente", "concluido"])
+    p.add_argument("--saida", default="pdfs", help="pasta de destino (padrão: ./pdfs)")
+    p.set_defaults(func=cmd_pdf)
+
+    p = sub.add_parser("gta", help="GTA de Saída consolidada (vários lotes) em PDF ou XLSX")
+    p.add_argument("--lotes", type=int, nargs="+", help="números dos lotes")
+    p.add_argument("--status", choices=["pendente", "concluido"])
+    p.add_argument("--de", type=_data, help="concluídos a partir de (AAAA-MM-DD)")
+    p.add_argument("--ate", type=_data, help="concluídos até (AAAA-MM-DD)")
+    p.add_argument("--saida", default="gta_consolidada.pdf", help="arquivo .pdf ou .xlsx (padrão: gta_consolidada.pdf)")
+    p.set_defaults(func=cmd_gta)
+
+    p = sub.add_parser("exportar", help="lotes e seus itens em XLSX (uma aba por lote ou planilha única)")
+    p.add_argument("--lotes", type=int, nargs="+", help="números dos lotes (padrão: todos)")
+    p.add_argument("--status", choices=["pendente", "concluido"])
+    p.add_argument("--de", type=_data, help="concluídos a partir de (AAAA-MM-DD)")
+    p.add_argument("--ate", type=_data, help="concluídos até (AAAA-MM-DD)")
+    p.add_argument("--por-lote", action="store_true", help="uma aba por lote (padrão: uma aba só)")
+    p.add_argument("--saida", default="lotes.xlsx", help="arquivo de destino (padrão: lotes.xlsx)")
+    p.set_defaults(func=cmd_exportar)
+
+    dia = sub.add_parser("diario", help="diário de alterações (animais, lotes, itens)").add_subparsers(dest="acao", required=True)
+    p = dia.add_parser("listar", help="mudanças depois de uma seq")
+    p.add_argument("--desde", type=int, default=0, help="última seq já vista (padrão: 0)")
+    p.add_argument("--tabela", nargs="+", choices=["animais", "lotes", "lote_itens"])
+    p.add_argument("--limite", type=int, default=100)
+    p.set_defaults(func=cmd_diario_listar)
+    p = dia.add_parser("compactar", help="apaga as linhas mais antigas do diário")
+    p.add_argument("--manter", type=int, default=100_000, help="linhas mais recentes que ficam (padrão: 100000)")
+    p.set_defaults(func=cmd_diario_compactar)
+
+    p = sub.add_parser("backup", help="backup online do banco")
+    p.add_argument("--destino", help="arquivo de destino (padrão: backups/dados-<data>.sqlite)")
+    p.set_defaults(func=cmd_backup)
+
+    p = sub.add_parser("restaurar", help="substitui o banco por um arquivo de backup")
+    p.add_argument("arquivo")
+    p.add_argument("--sem-backup", action="store_true", help="não copia o banco atual antes")
+    p.set_defaults(func=cmd_restaurar)
+
+    p = sub.add_parser("manutencao", help="ANALYZE, optimize e espaço livre do banco")
+    p.add_argument("--compactar", action="store_true", help="VACUUM completo (reescreve o arquivo)")
+    p.add_argument("--tudo", action="store_true", help="com --compactar: ANALYZE de todas as tabelas")
+    p.add_argument("--situacao", action="store_true", help="só mostra tamanho, páginas livres e ocupação por tabela")
+    p.set_defaults(func=cmd_manutencao)
+    return ap
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.db:
+        db.set_db_path(args.db)
+    backup.AUTO_START = False  # processo curto: sem thread de backup agendado
+    db.definir_sessao(f"cli {args.comando}")
+    try:
+        db.ensure_schema()
+        return args.func(args)
+    except db.BancoOcupado as e:
+        print(str(e), file=sys.stderr)
+        return 1
@@ -0,0 +1,169 @@
+# leilao/consultas.py - consultas de leitura usadas pelo Início, Animais Fora e Duplicatas
+from __future__ import annotations
+import sqlite3
+
+from leilao import esquema
+from leilao.db import connect, table_exists
+
+def _get_single_value(conn, sql: str, params: tuple = ()) -> int | float:
+    try:
+        row = conn.execute(sql, params).fetchone()
+        return float(row[0] if row and row[0] is not None else 0)
+    except Exception:
+        return 0
+
+def _q(nome: str) -> str:
+    return '"' + nome.replace('"', '""') + '"'
+
+# ------------------ Início ------------------
+def carregar_indicadores() -> dict:
+    """Calcula os números exibidos nos cards do Início."""
+    duplicados_distintos = duplicados_linhas = 0
+    total_lotes = pendentes = concluidos = 0
+    itens_em_lotes = total_animais = 0
+    animais_em_lote = animais_sem_lacre = animais_sem_lote = 0
+    lacres_distintos = proprietarios_distintos = 0
+    lotes_com_itens = lotes_vazios = 0
+    media_itens_por_lote = 0.0
+    qtd_m = qtd_f = 0
+    total_individuos = 0
+
+    with connect() as conn:
+        # 1) Duplicados / animais (nomes das colunas pelo registro: leilao/esquema.py)
+        esq = esquema.animais() if table_exists(conn, "animais") else None
+        if esq is not None:
+            total_animais = _get_single_value(conn, "SELECT COUNT(*) FROM animais")
+
+            if table_exists(conn, "lote_itens"):
+                animais_em_lote = _get_single_value(conn, """
+                    SELECT COUNT(DISTINCT li.animal_rowid)
+                    FROM lote_itens li
+                    JOIN animais a ON a.rowid = li.animal_rowid
+                """)
+                animais_sem_lote = _get_single_value(conn, """
+                    SELECT COUNT(*) FROM animais a
+                    WHERE NOT EXISTS (
+                      SELECT 1 FROM lote_itens li WHERE li.animal_rowid = a.rowid
+                    )
+                """)
+            else:
+                animais_sem_lote = total_animais
+
+            if esq.lacre:
+                lacre = _q(esq.lacre)
+                duplicados_distintos = _get_single_value(conn, f"""
+                    SELECT COUNT(*) FROM (
+                      SELECT {lacre} FROM animais
+                      WHERE {lacre} IS NOT NULL AND TRIM({lacre}) <> ''
+                      GROUP BY {lacre} HAVING COUNT(*) > 1
+                    ) x
+                """)
+                duplicados_linhas = _get_single_value(conn, f"""
+                    SELECT COALESCE(SUM(cnt),0) FROM (
+                      SELECT COUNT(*) AS cnt FROM animais
+                      WHERE {lacre} IS NOT NULL AND TRIM({lacre}) <> ''
+                      GROUP BY {lacre} HAVING COUNT(*) > 1
+                    ) t
+                """)
+                animais_sem_lacre = _get_single_value(conn, f"""
+                    SELECT COUNT(*) FROM animais
+                    WHERE {lacre} IS NULL OR TRIM({lacre}) = ''
+                """)
+                lacres_distintos = _get_single_value(conn, f"""
+                    SELECT COUNT(DISTINCT {lacre}) FROM animais
+                    WHERE {lacre} IS NOT NULL AND TRIM({lacre}) <> ''
+                """)
+            if esq.proprietario:
+                proprietarios_distintos = _get_single_value(
+                    conn, f"SELECT COUNT(DISTINCT {_q(esq.proprietario)}) FROM animais"
+                )
+
+            # ---- Sexo: somar colunas "Total M" / "Total F" ----
+            if esq.total_m:
+                qtd_m = _get_single_value(conn, f"SELECT COALESCE(SUM({_q(esq.total_m)}),0) FROM animais")
+            if esq.total_f:
+                qtd_f = _get_single_value(conn, f"SELECT COALESCE(SUM({_q(esq.total_f)}),0) FROM animais")
+
+            # ---- Indivíduos: somar "Total Animais" (se existir) ----
+            if esq.total_animais:
+                total_individuos = _get_single_value(conn, f"SELECT COALESCE(SUM({_q(esq.total_animais)}),0) FROM animais")
+
+        # 2) Lotes
+        if table_exists(conn, "lotes"):
+            total_lotes = _get_single_value(conn, "SELECT COUNT(*) FROM lotes")
+            pendentes = _get_single_value(conn, "SELECT COUNT(*) FROM lotes WHERE COALESCE(status,'pendente')='pendente'")
+            concluidos = _get_single_value(conn, "SELECT COUNT(*) FROM lotes WHERE COALESCE(status,'pendente')='concluido'")
+
+        # 3) Itens em lotes
+        if table_exists(conn, "lote_itens"):
+            itens_em_lotes = _get_single_value(conn, "SELECT COUNT(*) FROM lote_itens")
+            lotes_com_itens = _get_single_value(conn, """
+                SELECT COUNT(*) FROM (
+                  SELECT lote_numero FROM lote_itens GROUP BY lote_numero HAVING COUNT(*)>0
+                )
+            """)
+            lotes_vazios = max(int(total_lotes) - int(lotes_com_itens), 0)
+            media_itens_por_lote = _get_single_value(conn, """
+                SELECT AVG(c*1.0) FROM (
+                  SELECT COUNT(*) c FROM lote_itens GROUP BY lote_numero
+                )
+            """)
+
+    return {
+        "duplicados_distintos": duplicados_distintos,
+        "duplicados_linhas": duplicados_linhas,
+        "total_lotes": total_lotes,
+        "pendentes": pendentes,
+        "concluidos": concluidos,
+        "itens_em_lotes": itens_em_lotes,
+        "total_animais": total_animais,
+        "animais_em_lote": animais_em_lote,
+        "animais_sem_lacre": animais_sem_lacre,
+        "animais_sem_lote": animais_sem_lote,
+        "lacres_distintos": lacres_distintos,
+        "proprietarios_distintos": proprietarios_distintos,
+        "lotes_com_itens": lotes_com_itens,
+        "lotes_vazios": lotes_vazios,
+        "media_itens_por_lote": media_itens_por_lote,
+        "qtd_m": qtd_m,
+        "qtd_f": qtd_f,
+        "total_individuos": total_individuos,
+    }
+
+# ------------------ Animais Fora ------------------
+def animais_fora(serie_col: str, lacre_col: str, prop_col: str) -> tuple[list[tuple], bool]:
+    """(série, lacre, proprietário) dos animais sem lote; o bool indica se `lote_itens` existe."""
+    with connect() as conn:
+        has_lote_itens = table_exists(conn, "lote_itens")
+        if not has_lote_itens:
+            sql = f'SELECT "{serie_col}" as serie, "{lacre_col}" as lacre, "{prop_col}" as proprietario FROM animais'
+        else:
+            sql = f"""
+                SELECT a."{serie_col}" as serie,
+                       a."{lacre_col}" as lacre,
+                       a."{prop_col}"  as proprietario
+                FROM animais a
+                WHERE NOT EXISTS (
+                  SELECT 1 FROM lote_itens li
+                  WHERE li.animal_rowid = a.rowid
+                )
+            """
+        return conn.execute(sql).fetchall(), has_lote_itens
+
+# ------------------ Duplicatas ------------------
+def grupos_duplicados(conn: sqlite3.Connection) -> list[tuple[str, int]]:
+    """(lacre, quantidade) de cada lacre repetido, do maior grupo para o menor."""
+    esq = esquema.animais()
+    if esq is None or not esq.lacre:
+        return []
+    lacre = _q(esq.lacre)
+    return conn.execute(
+        f"""
+        SELECT {lacre}, COUNT(*) AS cnt
+        FROM animais
+        WHERE {lacre} IS NOT NULL AND TRIM({lacre}) <> ''
+        GROUP BY {lacre}
+        HAVING COUNT(*) > 1
+        ORDER BY cnt DESC, {lacre}
+        """
+    ).fetchall()
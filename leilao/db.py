@@ -0,0 +1,235 @@
+# leilao/db.py - caminho do banco, conexão compartilhada e schema de lotes
+from __future__ import annotations
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from pathlib import Path
+
+from leilao import querylog
+
+APP_DIR = Path(__file__).resolve().parent.parent
+# PLANILHA_DB permite apontar a CLI/benchmarks para outro arquivo sem mexer no app
+DB_PATH = Path(os.environ.get("PLANILHA_DB") or APP_DIR / "dados.db")
+
+# Concorrência (2-3 operadores + agendador de backup + CLI):
+# - WAL: leitores nunca esperam o escritor, e o escritor não espera leitores;
+# - busy_timeout: o próprio SQLite espera o lock por até BUSY_TIMEOUT_S;
+# - escrita(): BEGIN IMMEDIATE (pega o lock de escrita já no início, sem o
+#   "database is locked" de transação que começa lendo e depois tenta escrever),
+#   uma escrita por vez neste processo e novas tentativas com espera exponencial.
+USAR_WAL = True          # benchmarks/bench_escrita.py --journal delete desliga para comparar
+BUSY_TIMEOUT_S = 2.0
+TENTATIVAS_ESCRITA = 6
+ESPERA_INICIAL_S = 0.05
+ESPERA_MAX_S = 1.0
+
+class BancoOcupado(RuntimeError):
+    """Não foi possível obter o lock de escrita (outro operador/processo gravando por muito tempo)."""
+
+_wal_pronto: set[Path] = set()
+_wal_lock = threading.Lock()
+_escritor = threading.Lock()
+_local = threading.local()
+
+class Conexao(sqlite3.Connection):
+    """`with connect() as conn:` faz commit/rollback e também FECHA a conexão no fim do bloco.
+    No Python 3.11+ a conexão tem um ciclo de referência (cache de comandos) e, sem close(),
+    só seria fechada pelo coletor de lixo: até lá seguraria o WAL e atrapalharia checkpoints
+    e a troca de journal_mode na restauração."""
+
+    def __exit__(self, tipo, valor, tb):
+        try:
+            return super().__exit__(tipo, valor, tb)
+        finally:
+            self.close()
+
+def set_db_path(path: str | os.PathLike) -> Path:
+    """Troca o banco usado por todas as funções do pacote (CLI, testes de carga)."""
+    global DB_PATH
+    DB_PATH = Path(path)
+    return DB_PATH
+
+def _ativar_wal(conn: sqlite3.Connection, path: Path):
+    # journal_mode=WAL fica gravado no arquivo; basta uma vez por processo e por banco
+    with _wal_lock:
+        if path in _wal_pronto:
+            return
+        try:
+            # banco novo (ainda sem tabelas) já nasce com auto_vacuum=INCREMENTAL; nos existentes
+            # não muda nada: quem converte é o VACUUM de leilao/manutencao.py
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+            _wal_pronto.add(path)
+        except sqlite3.OperationalError:
+            pass  # outro processo com o banco ocupado: tenta de novo na próxima conexão
+
+def esquecer_modo(path: str | os.PathLike | None = None):
+    """O arquivo do banco foi trocado (restauração): reativa o WAL na próxima conexão."""
+    with _wal_lock:
+        _wal_pronto.discard(Path(path or DB_PATH))
+
+def connect() -> sqlite3.Connection:
+    # conexão instrumentada: tempo/linhas/página de cada comando (ver leilao/querylog.py)
+    path = DB_PATH
+    conn = querylog.connect(path, factory=Conexao, timeout=BUSY_TIMEOUT_S)
+    if USAR_WAL and path not in _wal_pronto:
+        _ativar_wal(conn, path)
+    return conn
+
+def definir_sessao(sessao: str | None):
+    """Marca das próximas escrita() desta thread no diário de alterações (leilao/diario.py)."""
+    _local.sessao = sessao
+
+def sessao_atual() -> str | None:
+    return getattr(_local, "sessao", None)
+
+def _marcar_sessao(conn: sqlite3.Connection, sessao: str | None):
+    try:
+        conn.execute("UPDATE diario_estado SET valor = ? WHERE chave = 'sessao'", (sessao,))
+    except sqlite3.OperationalError:
+        pass  # banco ainda sem diário (ensure_schema cria)
+
+def _travado(e: sqlite3.OperationalError) -> bool:
+    msg = str(e).lower()
+    return "locked" in msg or "busy" in msg
+
+@contextmanager
+def escrita():
+    """Conexão com a transação de escrita já aberta (BEGIN IMMEDIATE).
+
+    Commit ao sair do bloco, rollback se der erro. Só uma escrita por vez neste
+    processo; contra outros processos tenta `TENTATIVAS_ESCRITA` vezes com espera
+    exponencial (cada uma já espera `BUSY_TIMEOUT_S` no SQLite). Levanta
+    BancoOcupado se não conseguir o lock. Não aninhar (o bloco interno esperaria
+    pelo externo)."""
+    if getattr(_local, "escrevendo", False):
+        raise RuntimeError("escrita() aninhada: use a conexão do bloco externo.")
+    limite = BUSY_TIMEOUT_S * TENTATIVAS_ESCRITA
+    if not _escritor.acquire(timeout=limite):
+        raise BancoOcupado("Banco ocupado por outra gravação. Tente novamente em instantes.")
+    _local.escrevendo = True
+    conn = connect()
+    try:
+        espera = ESPERA_INICIAL_S
+        for tentativa in range(TENTATIVAS_ESCRITA):
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                break
+            except sqlite3.OperationalError as e:
+                if not _travado(e):
+                    raise
+                if tentativa == TENTATIVAS_ESCRITA - 1:
+                    raise BancoOcupado("Banco ocupado por outra gravação. Tente novamente em instantes.") from e
+                time.sleep(espera * (1 + random.random()))  # jitter: processos não tentam juntos
+                espera = min(espera * 2, ESPERA_MAX_S)
+        # marca de quem grava, lida pelos gatilhos do diário; limpa antes do commit
+        # (outro processo que grave sem marcar não herda a desta sessão)
+        sessao = getattr(_local, "sessao", None)
+        with conn:  # commit / rollback / close
+            if sessao:
+                _marcar_sessao(conn, sessao)
+            yield conn
+            if sessao:
+                _marcar_sessao(conn, None)
+    finally:
+        conn.close()
+        _local.escrevendo = False
+        _escritor.release()
+
+@contextmanager
+def sem_escritas():
+    """Segura o escritor do processo (nenhuma escrita() começa) enquanto o arquivo do banco é trocado."""
+    if not _escritor.acquire(timeout=BUSY_TIMEOUT_S * TENTATIVAS_ESCRITA):
+        raise BancoOcupado("Banco ocupado por outra gravação. Tente novamente em instantes.")
+    try:
+        yield
+    finally:
+        _escritor.release()
+
+def fechar_wal(path: str | os.PathLike | None = None):
+    """Checkpoint completo e volta ao journal_mode=DELETE: tudo fica no arquivo principal
+    (sem -wal/-shm), que então pode ser substituído sozinho. A próxima connect() reativa o WAL."""
+    path = Path(path or DB_PATH)
+    if not path.exists():
+        return
+    espera = ESPERA_INICIAL_S
+    for tentativa in range(TENTATIVAS_ESCRITA):
+        try:
+            with closing(sqlite3.connect(path, timeout=BUSY_TIMEOUT_S)) as conn:
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                conn.execute("PRAGMA journal_mode=DELETE")  # exige que ninguém mais esteja com o banco aberto
+            break
+        except sqlite3.OperationalError as e:
+            if not _travado(e):
+                raise
+            if tentativa == TENTATIVAS_ESCRITA - 1:
+                raise BancoOcupado("Banco em uso por outra página/processo; tente restaurar de novo em instantes.") from e
+            time.sleep(espera)
+            espera = min(espera * 2, ESPERA_MAX_S)
+    esquecer_modo(path)
+
+def table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    cur = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=? LIMIT 1", (name,)
+    )
+    return cur.fetchone() is not None
+
+def colnames(conn: sqlite3.Connection, table: str) -> list[str]:
+    try:
+        return [r[1] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+    except Exception:
+        return []
+
+_COLS_LOTES = {"numero", "criado_em", "status", "concluido_em", "gta_saida"}
+
+def _schema_ok(conn: sqlite3.Connection) -> bool:
+    nomes = {r[0] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE name IN ('lotes', 'lote_itens', 'idx_lote_itens_animal')"
+    )}
+    if len(nomes) != 3 or not _COLS_LOTES <= set(colnames(conn, "lotes")):
+        return False
+    from leilao import diario, resumo, retrato  # importam db: import tardio evita o ciclo
+    return resumo.resumo_ok(conn) and retrato.versao_ok(conn) and diario.diario_ok(conn)
+
+def ensure_schema():
+    """Cria/atualiza `lotes`, `lote_itens`, `lote_resumo`, `versao_dados` e o diário com seus gatilhos (idempotente)."""
+    # as páginas chamam a cada rerun: só pede o lock de escrita se faltar algo
+    with connect() as conn:
+        if _schema_ok(conn):
+            return
+    from leilao import diario, resumo, retrato
+    with escrita() as conn:
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS lotes (
+            numero INTEGER PRIMARY KEY,
+            criado_em TEXT,
+            status TEXT NOT NULL DEFAULT 'pendente',
+            concluido_em TEXT,
+            gta_saida TEXT
+        )""")
+        cols = set(colnames(conn, "lotes"))
+        if "status" not in cols:
+            conn.execute("ALTER TABLE lotes ADD COLUMN status TEXT NOT NULL DEFAULT 'pendente'")
+        if "concluido_em" not in cols:
+            conn.execute("ALTER TABLE lotes ADD COLUMN concluido_em TEXT")
+        if "gta_saida" not in cols:
+            conn.execute("ALTER TABLE lotes ADD COLUMN gta_saida TEXT")
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS lote_itens (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            lote_numero INTEGER NOT NULL,
+            animal_rowid INTEGER NOT NULL,
+            UNIQUE(lote_numero, animal_rowid)
+        )""")
+        # "animal está em algum lote?" (Animais Fora, Início, Criar Lote) busca por animal_rowid;
+        # o UNIQUE acima começa por lote_numero e não serve para isso.
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_lote_itens_animal ON lote_itens(animal_rowid)")
+        if not resumo.resumo_ok(conn):
+            resumo.reconstruir(conn)
+        if not retrato.versao_ok(conn):
+            retrato.instalar_versao(conn)
+        if not diario.diario_ok(conn):
+            diario.instalar(conn)
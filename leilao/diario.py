@@ -0,0 +1,212 @@
+# leilao/diario.py - diário de alterações de animais/lotes/lote_itens, alimentado por gatilhos
+"""
+Não havia registro do que mudou e quando: cache, resumo ou exportação que
+quisesse se manter em dia tinha de recalcular tudo. Aqui, gatilhos em
+`animais`, `lotes` e `lote_itens` gravam cada INSERT/UPDATE/DELETE na tabela
+`diario`:
+
+    seq (crescente) | quando | tabela | operacao | chave (rowid) | antes | depois | sessao
+
+`antes`/`depois` são os valores da linha em JSON (UPDATE que não muda nada
+não entra). `sessao` é a marca de quem gravou (página + sessão do navegador,
+ou "cli <comando>"), definida com db.definir_sessao() e gravada por escrita()
+em `diario_estado` durante a transação.
+
+Quem consome guarda (geracao, seq) e pede desde(seq, geracao): recebe só o que
+mudou depois. `reiniciar=True` na resposta quer dizer que não dá para seguir
+pelo diário (parte já foi compactada, o banco foi restaurado de um backup ou o
+diário é novo): recalcula tudo e continua de `ate`. Substituir `animais`
+(importação) grava uma única linha com operacao SUBSTITUICAO, que também pede
+recálculo do que depende de `animais`.
+
+Compactação: a cada BLOCO_COMPACTAR linhas um gatilho apaga as mais antigas,
+deixando as últimas MANTER; compactar() faz o mesmo sob demanda.
+"""
+from __future__ import annotations
+import json
+import sqlite3
+from typing import NamedTuple
+
+from leilao.db import colnames, connect, escrita, table_exists
+
+PREFIXO_GATILHO = "trg_diario_"
+TABELAS = ("animais", "lotes", "lote_itens")
+MANTER = 100_000          # linhas que ficam depois da compactação automática
+BLOCO_COMPACTAR = 1000    # a compactação automática roda a cada tantas linhas
+_ARGS_JSON = 60           # pares por json_object (o SQLite aceita até 127 argumentos por função)
+_NOVA_GERACAO = "lower(hex(randomblob(8)))"
+_SESSAO = "(SELECT valor FROM diario_estado WHERE chave = 'sessao')"
+
+class Mudanca(NamedTuple):
+    seq: int
+    quando: str
+    tabela: str
+    operacao: str            # INSERT, UPDATE, DELETE ou SUBSTITUICAO
+    chave: int | None        # rowid (lotes: número do lote; lote_itens: id)
+    antes: dict | None
+    depois: dict | None
+    sessao: str | None
+
+class Feed(NamedTuple):
+    geracao: str | None      # muda quando o histórico recomeça (diário novo, restauração)
+    ate: int                 # passar como `seq` na próxima chamada
+    mudancas: list[Mudanca]
+    reiniciar: bool          # True: recalcular do zero e seguir de `ate`
+    mais: bool               # há mais mudanças depois de `ate` (limite atingido)
+
+# ----------------- Gatilhos -----------------
+def _q(nome: str) -> str:
+    return '"' + nome.replace('"', '""') + '"'
+
+def _lit(texto: str) -> str:
+    return "'" + texto.replace("'", "''") + "'"
+
+def _json(ref: str, cols: list[str]) -> str:
+    """json_object com as colunas de NEW/OLD (em partes unidas por json_patch se forem muitas)."""
+    partes = [
+        "json_object(" + ", ".join(f"{_lit(c)}, {ref}.{_q(c)}" for c in cols[i:i + _ARGS_JSON]) + ")"
+        for i in range(0, len(cols), _ARGS_JSON)
+    ] or ["json_object()"]
+    sql = partes[0]
+    for p in partes[1:]:
+        sql = f"json_patch({sql}, {p})"
+    return sql
+
+def _gatilhos_tabela(tabela: str, cols: list[str]) -> list[str]:
+    p = f"{PREFIXO_GATILHO}{tabela}_"
+    inserir = "INSERT INTO diario(tabela, operacao, chave, antes, depois, sessao) VALUES"
+    mudou = " OR ".join(f"OLD.{_q(c)} IS NOT NEW.{_q(c)}" for c in cols) or "0"
+    return [
+        f"CREATE TRIGGER {p}ins AFTER INSERT ON {tabela} BEGIN "
+        f"{inserir} ('{tabela}', 'INSERT', NEW.rowid, NULL, {_json('NEW', cols)}, {_SESSAO}); END",
+        # Editar grava todas as colunas: só registra se alguma mudou de fato
+        f"CREATE TRIGGER {p}upd AFTER UPDATE ON {tabela} WHEN {mudou} BEGIN "
+        f"{inserir} ('{tabela}', 'UPDATE', NEW.rowid, {_json('OLD', cols)}, {_json('NEW', cols)}, {_SESSAO}); END",
+        f"CREATE TRIGGER {p}del AFTER DELETE ON {tabela} BEGIN "
+        f"{inserir} ('{tabela}', 'DELETE', OLD.rowid, {_json('OLD', cols)}, NULL, {_SESSAO}); END",
+    ]
+
+def _gatilhos(conn: sqlite3.Connection) -> list[str]:
+    sql = [
+        f"CREATE TRIGGER {PREFIXO_GATILHO}compactar AFTER INSERT ON diario "
+        f"WHEN NEW.seq % {BLOCO_COMPACTAR} = 0 BEGIN "
+        f"DELETE FROM diario WHERE seq <= NEW.seq - {MANTER}; "
+        f"UPDATE diario_estado SET valor = max(CAST(valor AS INTEGER), NEW.seq - {MANTER}) "
+        f"WHERE chave = 'compactado_ate'; END"
+    ]
+    for tabela in TABELAS:
+        if table_exists(conn, tabela):
+            sql += _gatilhos_tabela(tabela, colnames(conn, tabela))
+    return sql
+
+def _gatilhos_atuais(conn: sqlite3.Connection) -> dict[str, str]:
+    return {r[0]: r[1] for r in conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type='trigger' AND name LIKE ?", (PREFIXO_GATILHO + "%",)
+    )}
+
+def diario_ok(conn: sqlite3.Connection) -> bool:
+    """Tabelas do diário existem e os gatilhos são os das colunas atuais
+    (somem quando `animais` é substituída; mudam se uma coluna for acrescentada)."""
+    if not table_exists(conn, "diario") or not table_exists(conn, "diario_estado"):
+        return False
+    return sorted(_gatilhos_atuais(conn).values()) == sorted(_gatilhos(conn))
+
+def instalar(conn: sqlite3.Connection):
+    """Cria `diario`/`diario_estado` (se faltarem) e recria os gatilhos.
+    Roda dentro da transação de escrita do chamador (ensure_schema, importação)."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS diario (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        quando TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+        tabela TEXT NOT NULL,
+        operacao TEXT NOT NULL,
+        chave INTEGER,
+        antes TEXT,
+        depois TEXT,
+        sessao TEXT
+    )""")
+    conn.execute("CREATE TABLE IF NOT EXISTS diario_estado (chave TEXT PRIMARY KEY, valor)")
+    conn.execute(f"INSERT OR IGNORE INTO diario_estado(chave, valor) VALUES ('geracao', {_NOVA_GERACAO})")
+    conn.execute("INSERT OR IGNORE INTO diario_estado(chave, valor) VALUES ('compactado_ate', 0)")
+    conn.execute("INSERT OR IGNORE INTO diario_estado(chave, valor) VALUES ('sessao', NULL)")
+    for nome in _gatilhos_atuais(conn):
+        conn.execute(f"DROP TRIGGER IF EXISTS {nome}")
+    for sql in _gatilhos(conn):
+        conn.execute(sql)
+
+def registrar_substituicao(conn: sqlite3.Connection, tabela: str, linhas: int | None = None):
+    """Uma linha SUBSTITUICAO para a tabela trocada inteira (as linhas novas não passam pelos gatilhos)."""
+    conn.execute(
+        f"INSERT INTO diario(tabela, operacao, depois, sessao) VALUES (?, 'SUBSTITUICAO', ?, {_SESSAO})",
+        (tabela, json.dumps({"linhas": linhas}) if linhas is not None else None),
+    )
+
+def nova_geracao():
+    """Histórico recomeça (banco restaurado de um backup: as seq voltaram atrás)."""
+    with escrita() as conn:
+        try:
+            conn.execute(f"UPDATE diario_estado SET valor = {_NOVA_GERACAO} WHERE chave = 'geracao'")
+        except sqlite3.OperationalError:
+            pass  # backup anterior ao diário: ensure_schema cria com geração nova
+
+# ----------------- Leitura -----------------
+def _estado(conn: sqlite3.Connection) -> tuple[str | None, int, int]:
+    """(geracao, compactado_ate, última seq gravada)."""
+    est = dict(conn.execute("SELECT chave, valor FROM diario_estado").fetchall())
+    r = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'diario'").fetchone()
+    return est.get("geracao"), int(est.get("compactado_ate") or 0), int(r[0]) if r else 0
+
+def ponto_atual() -> tuple[str | None, int]:
+    """(geracao, seq) do fim do diário: ponto de partida de quem acabou de calcular do zero."""
+    with connect() as conn:
+        try:
+            geracao, _comp, ultimo = _estado(conn)
+        except sqlite3.OperationalError:
+            return None, 0
+    return geracao, ultimo
+
+def _mudanca(r: tuple) -> Mudanca:
+    seq, quando, tabela, operacao, chave, antes, depois, sessao = r
+    return Mudanca(seq, quando, tabela, operacao, chave,
+                   json.loads(antes) if antes else None, json.loads(depois) if depois else None, sessao)
+
+def desde(seq: int, geracao: str | None = None, tabelas=None, limite: int = 1000) -> Feed:
+    """Mudanças com seq > `seq` (de `tabelas`, ou todas), até `limite`, em ordem.
+
+    `geracao` é a recebida na chamada anterior (None na primeira: só não confere)."""
+    with connect() as conn:
+        conn.execute("BEGIN")  # estado e linhas da mesma foto do banco
+        try:
+            try:
+                atual, compactado, ultimo = _estado(conn)
+            except sqlite3.OperationalError:
+                return Feed(None, 0, [], True, False)  # banco ainda sem diário
+            seq = int(seq)
+            if (geracao is not None and geracao != atual) or seq < compactado or seq > ultimo:
+                return Feed(atual, ultimo, [], True, False)
+            sql = "SELECT seq, quando, tabela, operacao, chave, antes, depois, sessao FROM diario WHERE seq > ? AND seq <= ?"
+            params: list = [seq, ultimo]
+            if tabelas:
+                tabelas = list(tabelas)
+                sql += f" AND tabela IN ({', '.join('?' * len(tabelas))})"
+                params += tabelas
+            sql += " ORDER BY seq LIMIT ?"
+            linhas = conn.execute(sql, params + [int(limite)]).fetchall()
+        finally:
+            conn.rollback()
+    mudancas = [_mudanca(r) for r in linhas]
+    if len(mudancas) >= limite:
+        return Feed(atual, mudancas[-1].seq, mudancas, False, True)
+    return Feed(atual, ultimo, mudancas, False, False)
+
+# ----------------- Compactação -----------------
+def compactar(manter: int = MANTER) -> int:
+    """Apaga as linhas mais antigas, deixando as últimas `manter`. Retorna quantas saíram."""
+    with escrita() as conn:
+        _geracao, compactado, ultimo = _estado(conn)
+        corte = ultimo - max(int(manter), 0)
+        if corte <= compactado:
+            return 0
+        n = conn.execute("DELETE FROM diario WHERE seq <= ?", (corte,)).rowcount
+        conn.execute("UPDATE diario_estado SET valor = ? WHERE chave = 'compactado_ate'", (corte,))
+    return n
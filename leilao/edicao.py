@@ -0,0 +1,190 @@
+# leilao/edicao.py - edição de vários registros de `animais` de uma vez (grade da página Editar)
+"""
+A página Editar grava um registro por envio de formulário. Para corrigir nomes
+ou lacres de dezenas de linhas depois de uma importação, a grade (st.data_editor)
+junta as células alteradas numa lista de Alteracao e aplicar() grava tudo numa
+transação só, um executemany por coluna.
+
+Cada alteração leva o valor que estava na tela (`antes`). Dentro da transação
+o valor atual é relido: se outro operador mudou a célula nesse meio tempo (ou o
+registro sumiu), a alteração não é gravada e volta como Conflito; as demais
+células, inclusive da mesma linha, são gravadas. Valores que não cabem no tipo
+da coluna ou lacres que já existem em outro registro voltam como Invalida.
+"""
+from __future__ import annotations
+import math
+import sqlite3
+from typing import NamedTuple
+
+from leilao import esquema
+from leilao.backup import registrar_escrita
+from leilao.db import connect, escrita
+
+TAMANHO_BLOCO = 500   # rowids por consulta (o SQLite aceita até 999 parâmetros nas versões antigas)
+
+class Alteracao(NamedTuple):
+    rowid: int
+    coluna: str
+    antes: object            # valor carregado na grade
+    depois: object           # valor digitado
+
+class Conflito(NamedTuple):
+    alteracao: Alteracao
+    atual: object            # valor no banco na hora de gravar
+    motivo: str
+
+class Invalida(NamedTuple):
+    alteracao: Alteracao
+    motivo: str
+
+class Resultado(NamedTuple):
+    gravadas: int
+    conflitos: list[Conflito]
+    invalidas: list[Invalida]
+
+def _q(nome: str) -> str:
+    return '"' + nome.replace('"', '""') + '"'
+
+def _blocos(seq: list, n: int = TAMANHO_BLOCO):
+    for i in range(0, len(seq), n):
+        yield seq[i:i + n]
+
+# ----------------- Leitura -----------------
+def carregar(rowids: list[int]) -> list[dict]:
+    """Registros `rowids` do banco (não do retrato: são os valores de referência para os conflitos),
+    na ordem pedida; os que não existem mais ficam de fora."""
+    ids = [int(r) for r in rowids]
+    por_rid: dict[int, dict] = {}
+    with connect() as conn:
+        conn.row_factory = sqlite3.Row
+        for bloco in _blocos(ids):
+            marcas = ", ".join("?" * len(bloco))
+            for r in conn.execute(f"SELECT rowid, * FROM animais WHERE rowid IN ({marcas})", bloco):
+                por_rid[r["rowid"]] = dict(r)
+    return [por_rid[r] for r in ids if r in por_rid]
+
+def diferencas(linhas: list[dict], editadas: dict) -> list[Alteracao]:
+    """Células alteradas de uma grade carregada com `linhas`; `editadas` é o edited_rows do
+    st.data_editor ({posição da linha: {coluna: valor novo}}). Valor igual ao carregado não conta."""
+    out = []
+    for i, mudou in editadas.items():
+        linha = linhas[int(i)]
+        for col, novo in mudou.items():
+            antes = linha.get(col)
+            if novo == antes or (_vazio(novo) and _vazio(antes)):
+                continue
+            out.append(Alteracao(int(linha["rowid"]), col, antes, novo))
+    return out
+
+# ----------------- Validação -----------------
+def _vazio(v) -> bool:
+    return v is None or (isinstance(v, float) and math.isnan(v)) or (isinstance(v, str) and not v.strip())
+
+def _converter(valor, tipo: str):
+    """Valor pronto para gravar numa coluna do tipo declarado `tipo`; ValueError com o motivo."""
+    if _vazio(valor):
+        return None
+    tipo = tipo.upper()
+    if "INT" in tipo:
+        try:
+            f = float(str(valor).strip().replace(",", ".")) if isinstance(valor, str) else float(valor)
+        except (TypeError, ValueError):
+            raise ValueError("não é um número inteiro") from None
+        if not f.is_integer():
+            raise ValueError("não é um número inteiro")
+        if f < 0:
+            raise ValueError("não pode ser negativo")
+        return int(f)
+    if any(t in tipo for t in ("REAL", "FLOA", "DOUB")):
+        try:
+            return float(str(valor).strip().replace(",", ".")) if isinstance(valor, str) else float(valor)
+        except (TypeError, ValueError):
+            raise ValueError("não é um número") from None
+    return str(valor).strip()
+
+def _tipos(conn: sqlite3.Connection) -> dict[str, str]:
+    return {r[1]: (r[2] or "") for r in conn.execute("PRAGMA table_info(animais)")}
+
+def _lacres_repetidos(conn: sqlite3.Connection, col_lacre: str, novos: dict[int, object]) -> dict[int, int]:
+    """rowid -> outro rowid que ficaria com o mesmo lacre (no banco, depois desta gravação, ou no próprio lote)."""
+    out: dict[int, int] = {}
+    vistos: dict[object, int] = {}
+    for rid, lacre in novos.items():
+        if lacre is None:
+            continue
+        if lacre in vistos:
+            out[rid] = vistos[lacre]
+            continue
+        vistos[lacre] = rid
+        for (outro,) in conn.execute(
+            f"SELECT rowid FROM animais WHERE {_q(col_lacre)} = ? AND rowid <> ?", (lacre, rid)
+        ):
+            if outro not in novos:  # quem também troca de lacre nesta gravação já foi visto acima
+                out[rid] = outro
+                break
+    return out
+
+# ----------------- Gravação -----------------
+def aplicar(alteracoes: list[Alteracao]) -> Resultado:
+    """Grava as `alteracoes` numa transação (executemany por coluna); devolve o que ficou de fora."""
+    conflitos: list[Conflito] = []
+    invalidas: list[Invalida] = []
+    gravadas = 0
+    with escrita() as conn:
+        tipos = _tipos(conn)
+        col_lacre = esquema.escolher(esquema.CANDIDATOS["lacre"], tipos)  # schema lido nesta transação
+        validas: list[Alteracao] = []
+        for a in alteracoes:
+            if a.coluna not in tipos:
+                invalidas.append(Invalida(a, "coluna não existe"))
+                continue
+            try:
+                validas.append(a._replace(depois=_converter(a.depois, tipos[a.coluna])))
+            except ValueError as e:
+                invalidas.append(Invalida(a, str(e)))
+
+        # valores atuais das linhas tocadas, na mesma transação da gravação
+        ids = sorted({a.rowid for a in validas})
+        atuais: dict[int, dict] = {}
+        cols = sorted({a.coluna for a in validas})
+        if ids:
+            sel = ", ".join(_q(c) for c in cols)
+            for bloco in _blocos(ids):
+                marcas = ", ".join("?" * len(bloco))
+                for r in conn.execute(f"SELECT rowid, {sel} FROM animais WHERE rowid IN ({marcas})", bloco):
+                    atuais[r[0]] = dict(zip(cols, r[1:]))
+
+        por_coluna: dict[str, list[tuple]] = {}
+        lacres: dict[int, object] = {}
+        for a in validas:
+            linha = atuais.get(a.rowid)
+            if linha is None:
+                conflitos.append(Conflito(a, None, "registro não existe mais"))
+                continue
+            atual = linha[a.coluna]
+            if atual != a.antes and not (_vazio(atual) and _vazio(a.antes)):
+                conflitos.append(Conflito(a, atual, "alterado por outro operador"))
+                continue
+            if a.depois == atual:
+                continue
+            if a.coluna == col_lacre:
+                lacres[a.rowid] = a.depois
+            por_coluna.setdefault(a.coluna, []).append((a.depois, a.rowid))
+
+        if lacres:
+            repetidos = _lacres_repetidos(conn, col_lacre, lacres)
+            if repetidos:
+                fica = [(v, rid) for v, rid in por_coluna[col_lacre] if rid not in repetidos]
+                invalidas += [
+                    Invalida(a, f"lacre já usado pelo registro {repetidos[a.rowid]}")
+                    for a in validas if a.coluna == col_lacre and a.rowid in repetidos
+                ]
+                por_coluna[col_lacre] = fica
+
+        for coluna, valores in por_coluna.items():
+            if valores:
+                conn.executemany(f"UPDATE animais SET {_q(coluna)} = ? WHERE rowid = ?", valores)
+                gravadas += len(valores)
+    if gravadas:
+        registrar_escrita()
+    return Resultado(gravadas, conflitos, invalidas)
@@ -0,0 +1,132 @@
+# leilao/esquema.py - registro das colunas de `animais` (campo lógico -> coluna do banco)
+"""
+Planilhas de leilões diferentes e bancos antigos dão nomes diferentes às mesmas
+colunas ("N.º Série"/"Nº Série", "Proprietário Origem"/"Proprietario"...). Cada
+página rodava PRAGMA table_info e adivinhava os nomes a cada rerun; aqui isso é
+feito uma vez por versão do schema:
+
+    esq = esquema.animais()          # None se a tabela `animais` não existe
+    esq.serie, esq.lacre, esq.proprietario, esq.municipio, esq.idade   # nome da coluna ou None
+    esq.faixas                       # [(coluna, sexo, (de, até) em meses, faixa da planilha sem o sexo)]
+    esq.total_m, esq.total_f, esq.total_animais, esq.colunas, esq.tipos
+
+O cache vale enquanto não mudarem o arquivo do banco (restauração troca o arquivo)
+nem o PRAGMA schema_version (importação, coluna nova). Quem está numa transação que
+acabou de mudar `animais` (faixas.py, dentro da importação) usa as funções que
+recebem a lista de colunas: coluna_idade() e colunas_faixa().
+"""
+from __future__ import annotations
+import os
+import re
+import sqlite3
+import threading
+from typing import NamedTuple
+
+from leilao import db
+
+# nomes aceitos para cada campo, do preferido (o da planilha do leilão) para os alternativos
+CANDIDATOS = {
+    "serie": ["N.º Série", "Nº Série", "Numero Série", "N_Serie", "Serie", "Série"],
+    "lacre": ["Lacre", "LACRE", "lacre"],
+    "proprietario": ["Proprietário Origem", "Proprietario Origem", "Proprietário", "Proprietario", "Origem"],
+    "municipio": ["Município Origem", "Municipio Origem", "Município", "Municipio"],
+    "data_emissao": ["Data Emissão", "Data Emissao"],
+    "total_m": ["Total M"],
+    "total_f": ["Total F"],
+    "total_animais": ["Total Animais"],
+}
+
+POSSIVEIS_COLS_IDADE = [
+    "Idade", "Idade (meses)", "Idade_meses", "Meses", "Meses Idade",
+    "Idade em meses", "Idade Em Meses"
+]
+
+R_RANGE = re.compile(r"^(M|F)\s*(\d{1,2})\s*[-–]\s*(\d{1,2})$", re.IGNORECASE)
+R_36P   = re.compile(r"^(M|F)\s*36\s*\+$", re.IGNORECASE)
+
+class Esquema(NamedTuple):
+    colunas: list[str]
+    tipos: dict[str, str]            # coluna -> tipo declarado ("INTEGER", "TEXT"...)
+    serie: str | None
+    lacre: str | None
+    proprietario: str | None
+    municipio: str | None
+    data_emissao: str | None
+    total_m: str | None
+    total_f: str | None
+    total_animais: str | None
+    idade: str | None                # idade em meses (só algumas planilhas têm)
+    faixas: list[tuple[str, str, tuple[int, int], str]]
+
+_lock = threading.Lock()
+_cache: dict[tuple, Esquema | None] = {}
+
+# ----------------- Resolução (a partir da lista de colunas) -----------------
+def normalizar(s: str) -> str:
+    s = (s or "")
+    s = s.replace("–", "-").replace("—", "-").replace("−", "-")
+    s = re.sub(r"\s+", " ", s)
+    return s.strip()
+
+def escolher(candidatos: list[str], existentes) -> str | None:
+    """Primeiro candidato que existe (case-sensitive como no SQLite)."""
+    for c in candidatos:
+        if c in existentes:
+            return c
+    return None
+
+def coluna_idade(colunas: list[str]) -> str | None:
+    """Coluna com a idade em meses, se a planilha tiver uma."""
+    norm_cols = {normalizar(c).lower(): c for c in colunas}
+    for nome in POSSIVEIS_COLS_IDADE:
+        nc = normalizar(nome).lower()
+        for dbn, original in norm_cols.items():
+            if nc == dbn or nc in dbn:
+                return original
+    return None
+
+def colunas_faixa(colunas: list[str]) -> list[tuple[str, str, tuple[int, int], str]]:
+    """[(coluna, sexo, (lo, hi), faixa da planilha sem o sexo)] das colunas de cabeças ("M 0 - 8", "F 36 +")."""
+    encontrados = []
+    for c in colunas:
+        cname = normalizar(c)
+        m = R_RANGE.match(cname)
+        if m:
+            sexo = m.group(1).upper()
+            encontrados.append((c, sexo, (int(m.group(2)), int(m.group(3))), cname[1:]))
+            continue
+        m = R_36P.match(cname)
+        if m:
+            encontrados.append((c, m.group(1).upper(), (37, 10_000), cname[1:]))
+    return encontrados
+
+def montar(colunas: list[str], tipos: dict[str, str] | None = None) -> Esquema:
+    existentes = set(colunas)
+    campos = {campo: escolher(cands, existentes) for campo, cands in CANDIDATOS.items()}
+    return Esquema(
+        colunas=list(colunas), tipos=dict(tipos or {}), idade=coluna_idade(colunas),
+        faixas=colunas_faixa(colunas), **campos,
+    )
+
+# ----------------- Registro (cache por versão do schema) -----------------
+def _chave(conn: sqlite3.Connection) -> tuple:
+    path = db.DB_PATH
+    try:
+        ino = os.stat(path).st_ino
+    except OSError:
+        ino = None
+    return (str(path), ino, conn.execute("PRAGMA schema_version").fetchone()[0])
+
+def animais() -> Esquema | None:
+    """Esquema atual de `animais` (None se a tabela não existe), resolvido uma vez por versão do schema."""
+    with db.connect() as conn:
+        chave = _chave(conn)
+        if chave in _cache:
+            return _cache[chave]
+        with _lock:
+            if chave not in _cache:
+                info = conn.execute("PRAGMA table_info(animais)").fetchall()
+                esq = montar([r[1] for r in info], {r[1]: (r[2] or "") for r in info}) if info else None
+                _cache.clear()  # só a versão atual interessa
+                _cache[chave] = esq
+            return _cache[chave]
@@ -0,0 +1,150 @@
+# leilao/exportacao.py - exportação dos lotes e seus itens para Excel (XLSX)
+"""
+Lotes com os itens (animais) e as cabeças por sexo/faixa, em uma aba por lote
+ou numa planilha única. Feito para a temporada inteira (dezenas de milhares de
+itens): uma consulta só, lida do cursor em blocos de TAMANHO_BLOCO linhas, e o
+openpyxl em modo `write_only`, que grava cada linha num arquivo temporário em
+vez de montar a planilha na memória. Os totais de cada lote são somados
+enquanto as linhas passam.
+"""
+from __future__ import annotations
+from datetime import datetime
+
+from leilao import esquema
+from leilao.db import connect
+from leilao.faixas import FAIXAS
+from leilao.gta import _filtros_sql, descrever_filtros
+from leilao.relatorio import _SOMAS_FAIXAS, _coluna, _num_sql
+
+TAMANHO_BLOCO = 2000
+
+CABECALHO_ITEM = ["N.º Série", "Data Emissão", "Proprietário Origem", "Município Origem", "Lacre"]
+
+# campos lógicos (esquema.animais()) na ordem de CABECALHO_ITEM
+CAMPOS_ITEM = ["serie", "data_emissao", "proprietario", "municipio", "lacre"]
+
+def _sql_itens(esq, where: str) -> str:
+    serie, lacre = _coluna(esq, "serie"), _coluna(esq, "lacre")
+    return f"""
+    SELECT li.lote_numero,
+           COALESCE(L.status,'pendente'),
+           L.gta_saida,
+           {", ".join(_coluna(esq, c) for c in CAMPOS_ITEM)},
+           {_SOMAS_FAIXAS}
+    FROM lote_itens li
+    JOIN lotes L ON L.numero = li.lote_numero
+    JOIN animais a ON a.rowid = li.animal_rowid
+    LEFT JOIN animal_faixas af ON af.animal_rowid = li.animal_rowid
+    {where}
+    GROUP BY li.id
+    ORDER BY li.lote_numero, {_num_sql(lacre)}, {_num_sql(serie)}, li.id
+"""
+
+def _linhas(numeros=None, status=None, de=None, ate=None):
+    """(lote, status, gta, [campos do item], [M/F por faixa]) em ordem de lote; lê o cursor em blocos."""
+    where, params = _filtros_sql(numeros, status, de, ate)
+    esq = esquema.animais()
+    if esq is None:
+        return
+    with connect() as conn:
+        cur = conn.execute(_sql_itens(esq, where), params)
+        while True:
+            bloco = cur.fetchmany(TAMANHO_BLOCO)
+            if not bloco:
+                break
+            for r in bloco:
+                yield r[0], r[1], r[2], list(r[3:8]), list(r[8:])
+
+def _cabecalhos() -> tuple[list, list]:
+    topo = list(CABECALHO_ITEM)
+    sub = [""] * len(topo)
+    for label, _ in FAIXAS:
+        topo += [label, ""]
+        sub += ["M", "F"]
+    topo += ["Total", ""]
+    sub += ["M", "F"]
+    return topo, sub
+
+def _com_totais(qtds: list) -> list:
+    return qtds + [sum(qtds[0::2]), sum(qtds[1::2])]
+
+def _status_txt(status: str) -> str:
+    return "Concluído" if status == "concluido" else "Pendente"
+
+def exportar_xlsx(destino, numeros=None, status: str | None = None, de=None, ate=None,
+                  por_lote: bool = False) -> dict:
+    """Grava o XLSX em `destino` (caminho ou arquivo binário aberto).
+
+    `por_lote=True`: uma aba por lote ("Lote 12"), com os itens e a linha de total.
+    `por_lote=False`: uma aba só, com a coluna Lote, o total de cada lote após seus
+    itens e o total geral no fim. Filtros iguais aos da GTA consolidada.
+    Devolve {"lotes": n, "itens": n}."""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    wb = Workbook(write_only=True)
+    negrito = Font(bold=True)
+    topo, sub = _cabecalhos()
+    n_qtds = 2 * len(FAIXAS)
+
+    def _negrito(ws, valores):
+        out = []
+        for v in valores:
+            c = WriteOnlyCell(ws, value=v)
+            c.font = negrito
+            out.append(c)
+        return out
+
+    ws = None
+    if not por_lote:
+        ws = wb.create_sheet("Lotes")
+        ws.append(_negrito(ws, [f"Lotes e itens — {descrever_filtros(numeros, status, de, ate)}"]))
+        ws.append([f"Gerado em {datetime.now().strftime('%d/%m/%Y %H:%M')}"])
+        ws.append([])
+        ws.append(_negrito(ws, ["Lote", "Status", "GTA"] + topo))
+        ws.append(_negrito(ws, ["", "", ""] + sub))
+
+    n_lotes = n_itens = 0
+    atual, soma, geral = None, None, [0] * n_qtds
+
+    def _fecha_lote():
+        # linha de total do lote que acabou de passar
+        if por_lote:
+            ws.append(_negrito(ws, ["Total"] + [""] * (len(CABECALHO_ITEM) - 1) + _com_totais(soma)))
+            ws.close()  # libera o arquivo temporário da aba (pode haver milhares de abas)
+        else:
+            ws.append(_negrito(ws, [atual, "", "", f"Total do lote {atual}"]
+                               + [""] * (len(CABECALHO_ITEM) - 1) + _com_totais(soma)))
+
+    for numero, st_lote, gta, campos, qtds in _linhas(numeros, status, de, ate):
+        if numero != atual:
+            if atual is not None:
+                _fecha_lote()
+            atual, soma = numero, [0] * n_qtds
+            n_lotes += 1
+            if por_lote:
+                ws = wb.create_sheet(f"Lote {numero}")
+                ws.append(_negrito(ws, [f"Lote #{numero} — {_status_txt(st_lote)}" + (f" — GTA {gta}" if gta else "")]))
+                ws.append([])
+                ws.append(_negrito(ws, topo))
+                ws.append(_negrito(ws, sub))
+        n_itens += 1
+        for i, q in enumerate(qtds):
+            soma[i] += q
+            geral[i] += q
+        # zero fica em branco nas linhas de item (como o negrito só nos >0 do PDF): a planilha
+        # fica mais legível e a célula vazia nem é gravada, o que encurta bastante o XML
+        linha = campos + [q or None for q in _com_totais(qtds)]
+        ws.append(linha if por_lote else [numero, _status_txt(st_lote), gta or ""] + linha)
+
+    if atual is not None:
+        _fecha_lote()
+    if not por_lote:
+        ws.append(_negrito(ws, ["Total", f"{n_lotes} lote(s)", "", f"{n_itens} item(ns)"]
+                           + [""] * (len(CABECALHO_ITEM) - 1) + _com_totais(geral)))
+    elif not n_lotes:
+        wb.create_sheet("Lotes").append(["Nenhum lote para os filtros."])
+
+    wb.save(destino)
+    return {"lotes": n_lotes, "itens": n_itens}
@@ -0,0 +1,225 @@
+# leilao/faixas.py - faixas etárias do relatório e tabela animal_faixas (cabeças por sexo/faixa)
+"""
+A planilha do leilão traz as cabeças em colunas "M 0 - 8", "F 13 - 24", "M 36 +"...
+que não batem com as faixas do relatório (FAIXAS). O mapa de faixas diz para
+qual faixa do relatório vai cada faixa da planilha; a conversão é feita UMA vez,
+na importação, para a tabela longa
+
+    animal_faixas(animal_rowid, sexo, faixa, qtd)      -- só linhas com qtd > 0
+
+e gatilhos em `animais` mantêm a tabela quando um registro é editado/excluído.
+Relatórios e lote_resumo só fazem GROUP BY nela (sem regex nem conversão de texto).
+
+O mapa padrão (MAPA_PADRAO) pode ser sobrescrito em `faixas.json`, ao lado do
+dados.db, por exemplo:
+
+    {"13 - 24": "19–24", "25 - 36": {"padrao": "25–30", "por_idade": {"31–36": [31, 36]}}}
+
+Um destino em dicionário divide a coluna pela idade em meses (se a planilha tiver
+a coluna de idade; senão tudo vai para "padrao"). Colunas de faixa fora do mapa
+usam a faixa do relatório mais próxima. Depois de mudar o arquivo, a próxima
+abertura do banco (ensure_schema) refaz animal_faixas e lote_resumo.
+"""
+from __future__ import annotations
+import json
+import re
+import sqlite3
+
+from leilao.db import APP_DIR, colnames, table_exists
+from leilao.esquema import coluna_idade, colunas_faixa, normalizar
+
+# ----------------------------------------------------------------------
+# Faixas do relatório (as colunas da planilha são detectadas em leilao/esquema.py)
+# ----------------------------------------------------------------------
+FAIXAS = [
+    ("0–8",   (0, 8)),
+    ("9–12",  (9, 12)),
+    ("13–18", (13, 18)),
+    ("19–24", (19, 24)),
+    ("25–30", (25, 30)),
+    ("31–36", (31, 36)),
+    ("36+",   (37, 10_000)),
+]
+LABELS = [label for label, _ in FAIXAS]
+
+MAPA_PATH = APP_DIR / "faixas.json"
+
+# faixa da planilha (sem o sexo) -> faixa do relatório
+MAPA_PADRAO = {
+    "0 - 8": "0–8",
+    "9 - 12": "9–12",
+    "13 - 24": "13–18",
+    "25 - 36": {"padrao": "25–30", "por_idade": {"31–36": [31, 36]}},
+    "36 +": "36+",
+}
+
+PREFIXO_GATILHO = "trg_faixas_"
+
+def _chave(faixa_planilha: str) -> str:
+    # "13 - 24", "13-24" e "13 – 24" são a mesma faixa
+    return re.sub(r"\s+", "", normalizar(faixa_planilha))
+
+def _label_faixa_from_bounds(bounds: tuple[int, int]) -> str | dict:
+    """Faixa do relatório para uma faixa da planilha que não está no mapa."""
+    lo, hi = bounds
+    for label, (a, b) in FAIXAS:
+        if label == "36+" and lo >= 37:
+            return label
+        if lo == a and hi == b:
+            return label
+    # caso "25–36" quebrado em 25–30 e 31–36
+    if lo == 25 and hi == 36:
+        return MAPA_PADRAO["25 - 36"]
+    # aproxima pela faixa com centro mais próximo
+    mid = (lo + hi) / 2.0
+    return min(FAIXAS, key=lambda x: abs(((x[1][0] + x[1][1]) / 2.0) - mid))[0]
+
+# ----------------------------------------------------------------------
+# Mapa configurável
+# ----------------------------------------------------------------------
+_mapa_cache: tuple[float, dict] | None = None
+
+def _validar(mapa: dict) -> dict:
+    for origem, destino in mapa.items():
+        alvos = [destino] if isinstance(destino, str) else [destino.get("padrao"), *destino.get("por_idade", {})]
+        ruins = [a for a in alvos if a not in LABELS]
+        if ruins:
+            raise ValueError(f"{MAPA_PATH.name}: faixa {ruins[0]!r} (de {origem!r}) não existe; use uma de {LABELS}.")
+    return mapa
+
+def mapa() -> dict:
+    """MAPA_PADRAO + faixas.json (chaves normalizadas). Relido quando o arquivo muda."""
+    global _mapa_cache
+    try:
+        mtime = MAPA_PATH.stat().st_mtime
+    except OSError:
+        mtime = None
+    if _mapa_cache is None or _mapa_cache[0] != mtime:
+        cfg = dict(MAPA_PADRAO)
+        if mtime is not None:
+            cfg.update(json.loads(MAPA_PATH.read_text(encoding="utf-8")))
+        _mapa_cache = (mtime, {_chave(k): v for k, v in _validar(cfg).items()})
+    return _mapa_cache[1]
+
+def regras(cols_animais: list[str]) -> list[tuple[str, str, str | dict]]:
+    """[(coluna de animais, sexo, destino)] — destino é a faixa ou {"padrao", "por_idade"}."""
+    m = mapa()
+    return [
+        (col, sexo, m.get(_chave(faixa_planilha)) or _label_faixa_from_bounds(bounds))
+        for col, sexo, bounds, faixa_planilha in colunas_faixa(cols_animais)
+    ]
+
+# ----------------------------------------------------------------------
+# SQL gerado a partir do mapa
+# ----------------------------------------------------------------------
+def _q(nome: str) -> str:
+    return '"' + str(nome).replace('"', '""') + '"'
+
+def _lit(texto: str) -> str:
+    return "'" + texto.replace("'", "''") + "'"
+
+def expressoes(cols_animais: list[str], alias: str = "a") -> dict[tuple[str, str], str]:
+    """SQL que dá, para UMA linha de `animais` (`alias`), as cabeças de cada (sexo, faixa).
+    Valores <= 0 ou não numéricos contam 0."""
+    idade_col = coluna_idade(cols_animais)
+    partes = {(sexo, label): [] for sexo in ("M", "F") for label in LABELS}
+    for colname, sexo, destino in regras(cols_animais):
+        v = f"MAX(COALESCE(CAST({alias}.{_q(colname)} AS INTEGER), 0), 0)"
+        if isinstance(destino, str):
+            partes[(sexo, destino)].append(v)
+        elif not idade_col:
+            partes[(sexo, destino["padrao"])].append(v)
+        else:
+            i = f"{alias}.{_q(idade_col)}"
+            conds = []
+            for label, (lo, hi) in destino.get("por_idade", {}).items():
+                cond = f"({i} IS NOT NULL AND {i} <> '' AND CAST({i} AS REAL) BETWEEN {float(lo)} AND {float(hi)})"
+                partes[(sexo, label)].append(f"(CASE WHEN {cond} THEN {v} ELSE 0 END)")
+                conds.append(cond)
+            fora = " OR ".join(conds) or "0"
+            partes[(sexo, destino["padrao"])].append(f"(CASE WHEN {fora} THEN 0 ELSE {v} END)")
+    return {k: " + ".join(p) if p else "0" for k, p in partes.items()}
+
+def colunas_usadas(cols_animais: list[str]) -> list[str]:
+    """Colunas de `animais` que entram em animal_faixas (faixa/sexo e idade)."""
+    usadas = [c for c, _sx, _dst in regras(cols_animais)]
+    idade_col = coluna_idade(cols_animais)
+    if idade_col and idade_col not in usadas:
+        usadas.append(idade_col)
+    return usadas
+
+def _linhas_sql(expr: dict[tuple[str, str], str], rowid: str) -> str:
+    """SELECT com uma linha (rowid, sexo, faixa, qtd) por sexo/faixa com qtd > 0."""
+    uniao = " UNION ALL ".join(
+        f"SELECT {_lit(sexo)} AS sexo, {_lit(label)} AS faixa, ({sql}) AS qtd"
+        for (sexo, label), sql in expr.items() if sql != "0"
+    )
+    if not uniao:
+        return ""
+    return f"SELECT {rowid}, sexo, faixa, qtd FROM ({uniao}) WHERE qtd > 0"
+
+def _gatilhos(cols_animais: list[str]) -> list[str]:
+    p = PREFIXO_GATILHO
+    sql = [
+        f"CREATE TRIGGER {p}animais_del AFTER DELETE ON animais BEGIN "
+        f"DELETE FROM animal_faixas WHERE animal_rowid = OLD.rowid; END",
+    ]
+    ins_new = _linhas_sql(expressoes(cols_animais, "NEW"), "NEW.rowid")
+    if not ins_new:
+        return sql  # planilha sem colunas de faixa: nada a inserir
+    inserir = f"INSERT INTO animal_faixas(animal_rowid, sexo, faixa, qtd) {ins_new};"
+    sql.append(f"CREATE TRIGGER {p}animais_ins AFTER INSERT ON animais BEGIN {inserir} END")
+    usadas = colunas_usadas(cols_animais)
+    if usadas:
+        # só quando muda alguma coluna de faixa/idade (Editar grava todas as colunas)
+        sql.append(
+            f"CREATE TRIGGER {p}animais_upd AFTER UPDATE OF {', '.join(_q(c) for c in usadas)} ON animais BEGIN "
+            f"DELETE FROM animal_faixas WHERE animal_rowid = OLD.rowid; {inserir} END"
+        )
+    return sql
+
+# ----------------------------------------------------------------------
+# Schema
+# ----------------------------------------------------------------------
+def _gatilhos_atuais(conn) -> dict[str, str]:
+    return {r[0]: r[1] for r in conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type='trigger' AND name LIKE ?", (PREFIXO_GATILHO + "%",)
+    )}
+
+def faixas_ok(conn: sqlite3.Connection) -> bool:
+    """animal_faixas existe e os gatilhos em `animais` são os do mapa/colunas atuais
+    (somem quando a tabela é substituída; mudam se faixas.json mudar)."""
+    if not table_exists(conn, "animal_faixas"):
+        return False
+    if not table_exists(conn, "animais"):
+        return True
+    return sorted(_gatilhos_atuais(conn).values()) == sorted(_gatilhos(colnames(conn, "animais")))
+
+def reconstruir(conn: sqlite3.Connection):
+    """Refaz animal_faixas a partir de `animais` e recria os gatilhos.
+    Chamado por resumo.reconstruir(), que antes tira os gatilhos de lote_resumo."""
+    conn.execute("DROP TABLE IF EXISTS animal_faixas")
+    conn.execute("""
+    CREATE TABLE animal_faixas (
+        animal_rowid INTEGER NOT NULL,
+        sexo TEXT NOT NULL,
+        faixa TEXT NOT NULL,
+        qtd INTEGER NOT NULL,
+        PRIMARY KEY (animal_rowid, sexo, faixa)
+    ) WITHOUT ROWID""")
+    for nome in _gatilhos_atuais(conn):
+        conn.execute(f"DROP TRIGGER IF EXISTS {nome}")
+    if not table_exists(conn, "animais"):
+        return
+    cols = colnames(conn, "animais")
+    for sql in _gatilhos(cols):
+        conn.execute(sql)
+    # carga: uma passada por sexo/faixa, só com qtd > 0
+    for (sexo, label), expr in expressoes(cols, "a").items():
+        if expr == "0":
+            continue
+        conn.execute(
+            f"INSERT INTO animal_faixas(animal_rowid, sexo, faixa, qtd) "
+            f"SELECT rowid, ?, ?, qtd FROM (SELECT a.rowid AS rowid, ({expr}) AS qtd FROM animais a) WHERE qtd > 0",
+            (sexo, label),
+        )
@@ -0,0 +1,241 @@
+# leilao/gta.py - GTA de Saída consolidada: totais por sexo/faixa somando vários lotes
+"""
+Para o fechamento do leilão: soma as cabeças por sexo/faixa dos lotes escolhidos
+(por período de conclusão, status ou lista de números), com o subtotal de cada
+lote e o total geral, em PDF ou XLSX.
+
+Os números vêm de `lote_resumo` (leilao/resumo.py): uma consulta só, com uma
+linha por lote e a linha de total somada pelo próprio SQLite.
+"""
+from __future__ import annotations
+from datetime import date, datetime
+from io import BytesIO
+
+from leilao.db import connect
+from leilao.faixas import FAIXAS
+from leilao.resumo import CAMPOS, como_totais
+
+def _filtros_sql(numeros, status, de, ate) -> tuple[str, list]:
+    where, params = [], []
+    if numeros:
+        numeros = sorted({int(n) for n in numeros})
+        where.append(f"L.numero IN ({','.join('?' * len(numeros))})")
+        params += numeros
+    if status:
+        where.append("COALESCE(L.status,'pendente') = ?")
+        params.append(status)
+    # período = data de conclusão do lote (quando a GTA de saída é emitida)
+    if de:
+        where.append("date(L.concluido_em) >= ?")
+        params.append(str(de))
+    if ate:
+        where.append("date(L.concluido_em) <= ?")
+        params.append(str(ate))
+    return (" WHERE " + " AND ".join(where)) if where else "", params
+
+def descrever_filtros(numeros=None, status=None, de=None, ate=None) -> str:
+    """Texto curto dos filtros, para o cabeçalho do relatório."""
+    partes = []
+    if de or ate:
+        fmt = lambda d: d.strftime("%d/%m/%Y") if isinstance(d, date) else str(d)  # noqa: E731
+        partes.append(f"concluídos de {fmt(de) if de else '…'} a {fmt(ate) if ate else '…'}")
+    if status:
+        partes.append("concluídos" if status == "concluido" else "pendentes")
+    if numeros:
+        partes.append(f"lotes {', '.join(map(str, sorted({int(n) for n in numeros})))}")
+    return "; ".join(partes) or "todos os lotes"
+
+def consolidado(numeros=None, status: str | None = None, de=None, ate=None) -> dict:
+    """{"lotes": [subtotal de cada lote], "total": soma de todos, "filtros": texto}.
+
+    Cada subtotal traz numero, status, concluido_em, gta_saida e os campos de
+    resumo.totais() (itens, M/F por faixa, total_M/total_F). `de`/`ate` filtram
+    pela data de conclusão (lotes pendentes ficam de fora quando há período)."""
+    where, params = _filtros_sql(numeros, status, de, ate)
+    somas = ", ".join(f"COALESCE(SUM({c}), 0)" for c in CAMPOS[1:])
+    sql = f"""
+        WITH sel AS (
+            SELECT L.numero, COALESCE(L.status,'pendente') AS status, L.concluido_em, L.gta_saida,
+                   {', '.join('R.' + c for c in CAMPOS[1:])}
+            FROM lotes L
+            JOIN lote_resumo R ON R.numero = L.numero
+            {where}
+        )
+        SELECT 0 AS total, numero, status, concluido_em, gta_saida, {', '.join(CAMPOS[1:])} FROM sel
+        UNION ALL
+        SELECT 1, NULL, NULL, NULL, NULL, {somas} FROM sel
+        ORDER BY total, numero
+    """
+    with connect() as conn:
+        rows = conn.execute(sql, params).fetchall()
+
+    nomes = ["total", "numero", "status", "concluido_em", "gta_saida"] + CAMPOS[1:]
+    lotes, total = [], None
+    for r in rows:
+        d = dict(zip(nomes, r))
+        item = {**como_totais(d), "status": d["status"], "concluido_em": d["concluido_em"], "gta_saida": d["gta_saida"]}
+        if d["total"]:
+            total = item
+        else:
+            lotes.append(item)
+    return {"lotes": lotes, "total": total, "filtros": descrever_filtros(numeros, status, de, ate)}
+
+# ----------------------------------------------------------------------
+# Saídas
+# ----------------------------------------------------------------------
+CABECALHO_LOTE = ["Lote", "Status", "Concluído em", "GTA"]
+
+def _linha(it: dict, rotulo: list) -> list:
+    vals = list(rotulo) + [it["itens"]]
+    for label, _ in FAIXAS:
+        vals += [it["M"][label], it["F"][label]]
+    return vals + [it["total_M"], it["total_F"]]
+
+def _rotulo_lote(it: dict) -> list:
+    return [it["numero"], "Concluído" if it["status"] == "concluido" else "Pendente",
+            (it["concluido_em"] or "")[:10], it["gta_saida"] or ""]
+
+def build_xlsx(dados: dict) -> bytes:
+    """Planilha com uma linha por lote e o total no fim (openpyxl em modo write_only)."""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("GTA consolidada")
+    negrito = Font(bold=True)
+
+    def _negrito(valores):
+        out = []
+        for v in valores:
+            c = WriteOnlyCell(ws, value=v)
+            c.font = negrito
+            out.append(c)
+        return out
+
+    ws.append(_negrito([f"GTA de Saída consolidada — {dados['filtros']}"]))
+    ws.append([f"Gerado em {datetime.now().strftime('%d/%m/%Y %H:%M')}"])
+    ws.append([])
+    topo = CABECALHO_LOTE + ["Itens"]
+    sub = [""] * len(topo)
+    for label, _ in FAIXAS:
+        topo += [label, ""]
+        sub += ["M", "F"]
+    topo += ["Total", ""]
+    sub += ["M", "F"]
+    ws.append(_negrito(topo))
+    ws.append(_negrito(sub))
+    for it in dados["lotes"]:
+        ws.append(_linha(it, _rotulo_lote(it)))
+    if dados["total"]:
+        ws.append(_negrito(_linha(dados["total"], ["Total", f"{len(dados['lotes'])} lote(s)", "", ""])))
+
+    buf = BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+def build_pdf(dados: dict) -> bytes:
+    """PDF (A4 paisagem): subtotal por lote, total geral e o quadro da GTA de Saída somada."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.lib.units import mm
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    from leilao.relatorio import _pdf_num_cell
+
+    buf = BytesIO()
+    doc = SimpleDocTemplate(
+        buf,
+        pagesize=landscape(A4),
+        leftMargin=8 * mm, rightMargin=8 * mm, topMargin=10 * mm, bottomMargin=10 * mm,
+        title="GTA de Saída consolidada",
+        author="Sistema de Lotes",
+    )
+    styles = getSampleStyleSheet()
+    title = ParagraphStyle("title_center", parent=styles["Title"], alignment=1, fontSize=18, leading=22, spaceAfter=4)
+    legend_title = ParagraphStyle("legend", parent=styles["Heading4"], alignment=0, fontSize=12, leading=14)
+    num_style = ParagraphStyle("num", parent=styles["Normal"], fontSize=8, alignment=1)
+
+    story = [
+        Paragraph("GTA de Saída — consolidado", title),
+        Paragraph(
+            f"{dados['filtros'].capitalize()} • {len(dados['lotes'])} lote(s) • "
+            f"gerado em {datetime.now().strftime('%d/%m/%Y %H:%M')}",
+            styles["Normal"],
+        ),
+        Spacer(1, 8),
+    ]
+
+    head_top = ["Lote", "Status", "Concluído", "GTA", "Itens"]
+    head_sub = [""] * 5
+    for label, _ in FAIXAS:
+        head_top += [label, ""]
+        head_sub += ["M", "F"]
+    head_top += ["Total", ""]
+    head_sub += ["M", "F"]
+    data = [head_top, head_sub]
+    for it in dados["lotes"]:
+        vals = _linha(it, _rotulo_lote(it))
+        data.append(vals[:5] + [_pdf_num_cell(v, num_style) for v in vals[5:]])
+    total = dados["total"] or como_totais({c: 0 for c in CAMPOS})
+    vals = _linha(total, ["Total", "", "", ""])
+    data.append(vals[:5] + [_pdf_num_cell(v, num_style) for v in vals[5:]])
+
+    largura = doc.pagesize[0] - doc.leftMargin - doc.rightMargin
+    fixas = [14 * mm, 20 * mm, 20 * mm, 28 * mm, 12 * mm]
+    n_num = len(head_top) - len(fixas)
+    col_widths = fixas + [(largura - sum(fixas)) / n_num] * n_num
+
+    table = Table(data, colWidths=col_widths, hAlign="LEFT", repeatRows=2)
+    style_cmds = [
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#f1f5f9")),
+        ("BACKGROUND", (0, 1), (-1, 1), colors.HexColor("#f8fafc")),
+        ("FONTNAME",   (0, 0), (-1, 1), "Helvetica-Bold"),
+        ("FONTNAME",   (0, 2), (-1, -1), "Helvetica"),
+        ("FONTSIZE",   (0, 0), (-1, -1), 8),
+        ("ALIGN",      (0, 0), (-1, -1), "CENTER"),
+        ("VALIGN",     (0, 0), (-1, -1), "MIDDLE"),
+        ("GRID",       (0, 0), (-1, -1), 0.25, colors.HexColor("#cbd5e1")),
+        ("ROWBACKGROUNDS", (0, 2), (-1, -2), [colors.white, colors.HexColor("#fafafa")]),
+        ("BACKGROUND", (0, -1), (-1, -1), colors.HexColor("#eef2ff")),
+        ("FONTNAME",   (0, -1), (-1, -1), "Helvetica-Bold"),
+        ("SPAN",       (0, -1), (3, -1)),
+    ]
+    for c in range(5):
+        style_cmds.append(("SPAN", (c, 0), (c, 1)))
+    c = 5
+    for _ in range(len(FAIXAS) + 1):
+        style_cmds.append(("SPAN", (c, 0), (c + 1, 0)))
+        c += 2
+    table.setStyle(TableStyle(style_cmds))
+    story += [table, Spacer(1, 14), Paragraph("GTA de Saída (soma dos lotes)", legend_title), Spacer(1, 4)]
+
+    # quadro igual ao do PDF de cada lote, com o total geral
+    gta_top, gta_sub, gta_row = [], [], []
+    for label, _ in FAIXAS:
+        gta_top += [label, ""]
+        gta_sub += ["M", "F"]
+        gta_row += [_pdf_num_cell(total["M"][label], num_style), _pdf_num_cell(total["F"][label], num_style)]
+    gta_top += ["Total", ""]
+    gta_sub += ["M", "F"]
+    gta_row += [_pdf_num_cell(total["total_M"], num_style), _pdf_num_cell(total["total_F"], num_style)]
+    gta_table = Table([gta_top, gta_sub, gta_row], colWidths=[largura / len(gta_top)] * len(gta_top), hAlign="LEFT")
+    gta_style = [
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#eef2ff")),
+        ("BACKGROUND", (0, 1), (-1, 1), colors.HexColor("#f8fafc")),
+        ("GRID",       (0, 0), (-1, -1), 0.25, colors.HexColor("#cbd5e1")),
+        ("ALIGN",      (0, 0), (-1, -1), "CENTER"),
+        ("FONTNAME",   (0, 0), (-1, 1), "Helvetica-Bold"),
+        ("FONTSIZE",   (0, 0), (-1, -1), 9),
+        ("VALIGN",     (0, 0), (-1, -1), "MIDDLE"),
+    ]
+    c = 0
+    for _ in range(len(FAIXAS) + 1):
+        gta_style.append(("SPAN", (c, 0), (c + 1, 0)))
+        c += 2
+    gta_table.setStyle(TableStyle(gta_style))
+    story.append(gta_table)
+
+    doc.build(story)
+    return buf.getvalue()
@@ -0,0 +1,244 @@
+# leilao/importacao.py - leitura da planilha do leilão e gravação da tabela `animais`
+from __future__ import annotations
+import re
+import secrets
+from datetime import datetime, timedelta
+
+from leilao import diario, resumo, retrato, tarefas
+from leilao.backup import registrar_escrita
+from leilao.db import connect, escrita, table_exists
+
+TAMANHO_BLOCO = 5000  # linhas por executemany na gravação (entre blocos: progresso/cancelamento)
+PREFIXO_PREPARO = "importacao_"   # tabelas de preparo: importacao_AAAAMMDDHHMMSS_xxxxxxxx
+MANTER_PREPARO_HORAS = 24         # preparo não gravado é apagado depois disso (na próxima leitura)
+LIMITE_AMOSTRA = 200              # linhas da prévia na página Dados
+
+COLUNAS_OBRIGATORIAS = [
+    "N.º Série", "Data Emissão", "Proprietário Origem", "Município Origem",
+    "M 0 - 8", "F 0 - 8", "M 9 - 12", "F 9 - 12",
+    "M 13 - 24", "F 13 - 24", "M 25 - 36", "F 25 - 36",
+    "M 36 +", "F 36 +", "Total M", "Total F", "Total Animais", "Lacre"
+]
+
+def read_html_table(file):
+    """
+    Tenta ler a primeira tabela de um HTML usando lxml; se falhar, tenta bs4+html5lib.
+    """
+    import pandas as pd
+
+    # try lxml first
+    try:
+        file.seek(0)
+        tables = pd.read_html(file, flavor="lxml")
+        if not tables:
+            raise ValueError("Nenhuma tabela encontrada no HTML (lxml).")
+        return tables[0]
+    except Exception as e_lxml:
+        # fallback: bs4 + html5lib
+        try:
+            file.seek(0)
+            tables = pd.read_html(file, flavor="bs4")
+            if not tables:
+                raise ValueError("Nenhuma tabela encontrada no HTML (bs4).")
+            return tables[0]
+        except Exception as e_bs4:
+            raise RuntimeError(
+                "Falha ao ler HTML. Instale as dependências: "
+                "`pip install lxml` ou `pip install beautifulsoup4 html5lib`.\n"
+                f"Detalhes lxml: {e_lxml}\nDetalhes bs4/html5lib: {e_bs4}"
+            )
+
+def carregar_dataframe(uploaded_file):
+    # pandas (e openpyxl/odf, via read_excel) só são carregados quando há arquivo para ler
+    import pandas as pd
+
+    ext = uploaded_file.name.split(".")[-1].lower()
+    if ext == "html":
+        return read_html_table(uploaded_file)
+    elif ext in ["xlsx", "xls"]:
+        try:
+            uploaded_file.seek(0)
+            return pd.read_excel(uploaded_file)  # usa openpyxl (xlsx) / xlrd (xls) se instalados
+        except ImportError as e:
+            raise RuntimeError(
+                "Dependências para Excel não encontradas. "
+                "Instale com: `pip install openpyxl xlrd`.\n" + str(e)
+            )
+    elif ext == "ods":
+        try:
+            uploaded_file.seek(0)
+            return pd.read_excel(uploaded_file, engine="odf")
+        except ImportError as e:
+            raise RuntimeError(
+                "Dependência para ODS não encontrada. "
+                "Instale com: `pip install odfpy`.\n" + str(e)
+            )
+    else:
+        raise RuntimeError("❌ Tipo de arquivo não suportado.")
+
+def filtrar_colunas(df):
+    """Mantém só as COLUNAS_OBRIGATORIAS (na ordem). ValueError se faltar alguma."""
+    faltantes = [c for c in COLUNAS_OBRIGATORIAS if c not in df.columns.tolist()]
+    if faltantes:
+        raise ValueError(f"Colunas obrigatórias faltando no arquivo: {faltantes}")
+    return df[COLUNAS_OBRIGATORIAS].copy()
+
+def contar_animais() -> int | None:
+    """Registros atuais em `animais` (None se a tabela ainda não existe)."""
+    try:
+        with connect() as conn:
+            return conn.execute("SELECT COUNT(1) FROM animais").fetchone()[0]
+    except Exception:
+        return None
+
+# ----------------- Tabela de preparo -----------------
+# O arquivo lido vai para uma tabela de preparo no próprio banco (não fica um DataFrame
+# na sessão); a prévia e a validação são consultas nela, e gravar é trocar `animais`
+# por ela (DROP + RENAME numa transação): quem lê vê a tabela antiga até o commit.
+def _nome_preparo() -> str:
+    return f"{PREFIXO_PREPARO}{datetime.now():%Y%m%d%H%M%S}_{secrets.token_hex(4)}"
+
+def _conferir_nome(tabela: str) -> str:
+    if not re.fullmatch(re.escape(PREFIXO_PREPARO) + r"\d{14}_[0-9a-f]{8}", tabela or ""):
+        raise ValueError(f"Tabela de preparo inválida: {tabela!r}")
+    return tabela
+
+def carregar_preparo(df) -> str:
+    """Grava o DataFrame numa tabela de preparo nova (mesmos tipos de coluna do to_sql).
+    Cada bloco numa transação curta: a carga não segura a escrita do banco de uma vez."""
+    import pandas as pd
+
+    tabela = _nome_preparo()
+    total = len(df)
+    valores = _valores(df)
+    sql = f'INSERT INTO "{tabela}" VALUES ({", ".join("?" * len(df.columns))})'
+    try:
+        with escrita() as conn:
+            conn.execute(pd.io.sql.get_schema(df, tabela))
+        for i in range(0, total, TAMANHO_BLOCO):
+            tarefas.avancar(0.3 + 0.7 * i / max(total, 1), f"Preparando linhas ({i} de {total})")
+            with escrita() as conn:
+                conn.executemany(sql, valores.iloc[i:i + TAMANHO_BLOCO].itertuples(index=False, name=None))
+    except BaseException:
+        descartar_preparo(tabela)
+        raise
+    return tabela
+
+def descartar_preparo(tabela: str | None):
+    """Apaga a tabela de preparo (arquivo trocado/removido, leitura cancelada)."""
+    if not tabela:
+        return
+    with escrita() as conn:
+        conn.execute(f'DROP TABLE IF EXISTS "{_conferir_nome(tabela)}"')
+
+def limpar_preparos(horas: float = MANTER_PREPARO_HORAS) -> int:
+    """Apaga as tabelas de preparo esquecidas (sessão fechada sem gravar) com mais de `horas`."""
+    corte = (datetime.now() - timedelta(hours=horas)).strftime("%Y%m%d%H%M%S")
+    with connect() as conn:
+        nomes = [r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name LIKE ?", (PREFIXO_PREPARO + "%",)
+        )]
+    velhas = [n for n in nomes if n[len(PREFIXO_PREPARO):len(PREFIXO_PREPARO) + 14] < corte]
+    for n in velhas:
+        descartar_preparo(n)
+    return len(velhas)
+
+def preparo_existe(tabela: str) -> bool:
+    with connect() as conn:
+        return table_exists(conn, _conferir_nome(tabela))
+
+def amostra(tabela: str, limite: int = LIMITE_AMOSTRA) -> dict[str, list]:
+    """Primeiras `limite` linhas da tabela de preparo, por coluna (para st.dataframe)."""
+    with connect() as conn:
+        cur = conn.execute(f'SELECT * FROM "{_conferir_nome(tabela)}" LIMIT ?', (int(limite),))
+        linhas = cur.fetchall()
+        colunas = [d[0] for d in cur.description]
+    return {c: [r[i] for r in linhas] for i, c in enumerate(colunas)}
+
+def _q(nome: str) -> str:
+    return '"' + nome.replace('"', '""') + '"'
+
+def validar_preparo(tabela: str) -> list[tuple[str, int]]:
+    """Problemas encontrados na tabela de preparo: [(descrição, quantidade de linhas)].
+    Só avisos (a planilha do leilão pode vir assim e ser corrigida depois), exceto "sem linhas"."""
+    t = _q(_conferir_nome(tabela))
+    contagem = [c for c in COLUNAS_OBRIGATORIAS if c[:2] in ("M ", "F ") or c.startswith("Total")]
+
+    def soma(sx: str) -> str:  # faixas de um sexo ("M 0 - 8" + "M 9 - 12" + ...)
+        return " + ".join(f"COALESCE({_q(c)}, 0)" for c in COLUNAS_OBRIGATORIAS if c.startswith(sx + " "))
+    checagens = [
+        ("Linhas sem Lacre", f"SELECT COUNT(*) FROM {t} WHERE TRIM(COALESCE(CAST({_q('Lacre')} AS TEXT), '')) = ''"),
+        ("Linhas com Lacre repetido", f"SELECT COALESCE(SUM(n), 0) FROM (SELECT COUNT(*) AS n FROM {t} "
+                                      f"WHERE {_q('Lacre')} IS NOT NULL GROUP BY {_q('Lacre')} HAVING COUNT(*) > 1)"),
+        ("Linhas sem N.º Série", f"SELECT COUNT(*) FROM {t} WHERE TRIM(COALESCE(CAST({_q('N.º Série')} AS TEXT), '')) = ''"),
+        ("Contagens negativas", f"SELECT COUNT(*) FROM {t} WHERE " + " OR ".join(f"{_q(c)} < 0" for c in contagem)),
+        ("Total M diferente da soma das faixas M", f"SELECT COUNT(*) FROM {t} WHERE COALESCE({_q('Total M')}, 0) <> {soma('M')}"),
+        ("Total F diferente da soma das faixas F", f"SELECT COUNT(*) FROM {t} WHERE COALESCE({_q('Total F')}, 0) <> {soma('F')}"),
+        ("Total Animais diferente de Total M + Total F",
+         f"SELECT COUNT(*) FROM {t} WHERE COALESCE({_q('Total Animais')}, 0) <> "
+         f"COALESCE({_q('Total M')}, 0) + COALESCE({_q('Total F')}, 0)"),
+    ]
+    problemas = []
+    with connect() as conn:
+        if not conn.execute(f"SELECT 1 FROM {t} LIMIT 1").fetchone():
+            return [("Arquivo sem linhas", 0)]
+        for descricao, sql in checagens:
+            n = conn.execute(sql).fetchone()[0]
+            if n:
+                problemas.append((descricao, int(n)))
+    return problemas
+
+def ler_planilha(conteudo: bytes, nome: str) -> dict:
+    """Lê o arquivo (carregar_dataframe + filtrar_colunas) para uma tabela de preparo (tarefa em segundo plano).
+    Retorna {"tabela", "linhas"}: o DataFrame não fica em memória depois da tarefa."""
+    from io import BytesIO
+
+    limpar_preparos()
+    tarefas.avancar(None, f"Lendo {nome}")
+    buf = BytesIO(conteudo)
+    buf.name = nome
+    df = carregar_dataframe(buf)
+    tarefas.avancar(0.3, "Conferindo colunas")
+    df = filtrar_colunas(df)
+    return {"tabela": carregar_preparo(df), "linhas": len(df)}
+
+def _valores(df):
+    """Células como o to_sql gravaria: NaN/NaT -> NULL, datas como 'AAAA-MM-DD HH:MM:SS', escalares do Python."""
+    import pandas as pd
+
+    df = df.copy()
+    for c in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[c]):
+            df[c] = df[c].map(lambda t: None if pd.isna(t) else t.isoformat(" "))
+    return df.astype(object).where(df.notna(), None)
+
+def trocar_animais(tabela: str) -> int:
+    """Substitui completamente `animais` pela tabela de preparo. Retorna o nº de linhas.
+
+    Uma transação: DROP da tabela atual e RENAME da de preparo (sem copiar linhas) e o
+    recálculo do que depende de `animais`. Se falhar ou a tarefa for cancelada, fica a
+    tabela anterior, e quem lê durante a troca continua vendo a anterior até o commit."""
+    t = _conferir_nome(tabela)
+    with escrita() as conn:
+        if not table_exists(conn, t):
+            raise ValueError("A tabela de preparo não existe mais: carregue o arquivo de novo.")
+        total = conn.execute(f'SELECT COUNT(*) FROM "{t}"').fetchone()[0]
+        tarefas.avancar(0.1, "Trocando a tabela animais")
+        conn.execute("DROP TABLE IF EXISTS animais")
+        conn.execute(f'ALTER TABLE "{t}" RENAME TO animais')
+        tarefas.avancar(0.2, "Recalculando faixas e resumos dos lotes")
+        # a tabela nova não tem os gatilhos do resumo e os rowids mudaram: recalcula
+        if table_exists(conn, "lote_resumo"):
+            resumo.reconstruir(conn)
+        # gatilhos de versão também se foram com a tabela antiga; código novo invalida o retrato
+        retrato.instalar_versao(conn)
+        # idem os do diário; as linhas novas não passam por eles: uma linha SUBSTITUICAO avisa quem consome
+        diario.instalar(conn)
+        diario.registrar_substituicao(conn, "animais", total)
+        tarefas.avancar(1.0, "Gravando no disco")
+    registrar_escrita(total)
+    return total
+
+def salvar_animais(df) -> int:
+    """Substitui completamente a tabela `animais` pelo DataFrame (tabela de preparo + trocar_animais)."""
+    return trocar_animais(carregar_preparo(df))
@@ -0,0 +1,363 @@
+# leilao/lotes.py - lotes e seus itens (criar, preencher, concluir/reabrir, excluir)
+from __future__ import annotations
+import sqlite3
+from datetime import datetime
+
+from leilao import esquema
+from leilao.backup import registrar_escrita
+from leilao.db import connect, escrita
+
+def _agora() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+def _q(nome: str) -> str:
+    return '"' + nome.replace('"', '""') + '"'
+
+# ----------------- Leitura -----------------
+def get_lote(numero: int) -> dict | None:
+    with connect() as conn:
+        r = conn.execute(
+            "SELECT numero, COALESCE(status,'pendente'), criado_em, concluido_em, gta_saida FROM lotes WHERE numero=?",
+            (int(numero),)
+        ).fetchone()
+    if r:
+        return {"numero": r[0], "status": r[1], "criado_em": r[2], "concluido_em": r[3], "gta_saida": r[4]}
+    return None
+
+def list_lotes(numero: int | None = None) -> list[dict]:
+    # itens/cabeças vêm prontos de lote_resumo (gatilhos, ver leilao/resumo.py)
+    # `numero`: só esse lote (o card que acabou de mudar, sem reler todos)
+    sql = """
+            SELECT L.numero,
+                   COALESCE(L.status,'pendente') AS status,
+                   L.criado_em,
+                   L.gta_saida,
+                   COALESCE(R.itens, 0) AS itens,
+                   COALESCE(R.total_m + R.total_f, 0) AS cabecas
+            FROM lotes L
+            LEFT JOIN lote_resumo R ON R.numero = L.numero
+        """
+    with connect() as conn:
+        if numero is None:
+            rows = conn.execute(sql).fetchall()
+        else:
+            rows = conn.execute(sql + " WHERE L.numero = ?", (int(numero),)).fetchall()
+    return [
+        {"numero": r[0], "status": r[1], "criado_em": r[2], "gta_saida": r[3], "itens": r[4], "cabecas": r[5]}
+        for r in rows
+    ]
+
+def lote_exists(numero: int) -> bool:
+    with connect() as conn:
+        cur = conn.execute("SELECT 1 FROM lotes WHERE numero = ?", (int(numero),))
+        return cur.fetchone() is not None
+
+def get_lote_itens(numero: int) -> list[int]:
+    with connect() as conn:
+        cur = conn.execute("SELECT animal_rowid FROM lote_itens WHERE lote_numero = ? ORDER BY id", (int(numero),))
+        return [r[0] for r in cur.fetchall()]
+
+def lotes_of_animal(animal_rowid: int) -> list[int]:
+    with connect() as conn:
+        cur = conn.execute("SELECT DISTINCT lote_numero FROM lote_itens WHERE animal_rowid = ?", (int(animal_rowid),))
+        return [r[0] for r in cur.fetchall()]
+
+def fetch_animal_by_lacre(lacre_text: str) -> list[dict]:
+    """
+    Busca por Lacre aceitando texto ou inteiro (coluna resolvida por esquema.animais()).
+    """
+    q = str(lacre_text).strip()
+    esq = esquema.animais() if q else None
+    if not esq or not esq.lacre:
+        return []
+    col = _q(esq.lacre)
+    with connect() as conn:
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute(
+                f"""
+                SELECT rowid, *
+                FROM animais
+                WHERE CAST({col} AS TEXT) = ?
+                   OR {col} = CAST(? AS INTEGER)
+                """,
+                (q, q)
+            ).fetchall()
+        except Exception:
+            rows = []
+    return [dict(r) for r in rows]
+
+def fetch_animais_by_rowids(rowids: list[int]) -> dict[int, dict]:
+    """Retorna {rowid: registro}; a ordem de exibição fica por conta da lista de rowids."""
+    if not rowids:
+        return {}
+    with connect() as conn:
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(
+            f"SELECT rowid, * FROM animais WHERE rowid IN ({','.join(['?']*len(rowids))})",
+            tuple(rowids)
+        ).fetchall()
+    return {int(r["rowid"]): dict(r) for r in rows}
+
+# ----------------- Escrita -----------------
+# Todas passam por db.escrita() (BEGIN IMMEDIATE + nova tentativa); podem levantar db.BancoOcupado.
+def upsert_lote(numero: int):
+    with escrita() as conn:
+        conn.execute("INSERT OR IGNORE INTO lotes(numero, criado_em) VALUES(?, ?)", (int(numero), _agora()))
+    registrar_escrita()
+
+def _inserir_itens(conn, numero: int, rowids: list[int]) -> list[int]:
+    """Insere na transação aberta; devolve os rowids que já estão em OUTRO lote (não inseridos).
+    A checagem fica no próprio INSERT: outro operador pode ter salvo o animal depois da busca."""
+    ignorados = []
+    for rid in rowids:
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO lote_itens(lote_numero, animal_rowid) "
+            "SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM lote_itens WHERE animal_rowid = ? AND lote_numero <> ?)",
+            (int(numero), int(rid), int(rid), int(numero)),
+        )
+        if cur.rowcount == 0 and conn.execute(
+            "SELECT 1 FROM lote_itens WHERE animal_rowid = ? AND lote_numero <> ? LIMIT 1", (int(rid), int(numero))
+        ).fetchone():
+            ignorados.append(int(rid))
+    return ignorados
+
+def save_lote_itens(numero: int, rowids: list[int]) -> list[int]:
+    """Grava os itens do lote. Retorna os rowids ignorados por já pertencerem a outro lote."""
+    if not rowids:
+        return []
+    with escrita() as conn:
+        ignorados = _inserir_itens(conn, numero, rowids)
+    registrar_escrita(len(rowids) - len(ignorados))
+    return ignorados
+
+def remove_lote_item(numero: int, animal_rowid: int):
+    with escrita() as conn:
+        conn.execute("DELETE FROM lote_itens WHERE lote_numero = ? AND animal_rowid = ?", (int(numero), int(animal_rowid)))
+    registrar_escrita()
+
+def delete_lote(numero: int):
+    """Exclui TODA a estrutura do lote: itens e o próprio lote."""
+    with escrita() as conn:
+        conn.execute("DELETE FROM lote_itens WHERE lote_numero = ?", (int(numero),))
+        conn.execute("DELETE FROM lotes WHERE numero = ?", (int(numero),))
+    registrar_escrita()
+
+# ----------------- Reorganizar (mover / dividir / juntar) -----------------
+# Um UPDATE de lote_itens.lote_numero por operação, numa transação; os gatilhos de
+# lote_resumo (leilao/resumo.py) tiram os itens/cabeças de um lote e somam no outro.
+def proximo_numero() -> int:
+    """Primeiro número de lote depois do maior existente."""
+    with connect() as conn:
+        return int(conn.execute("SELECT COALESCE(MAX(numero), 0) + 1 FROM lotes").fetchone()[0])
+
+def _mover(conn, origens: list[int], destino: int, rowids: list[int] | None = None) -> dict:
+    """Passa os itens de `origens` (só os `rowids`, se dados) para `destino`, na transação aberta.
+    Um animal que (em dados antigos) já está também no destino só sai da origem; um que está
+    em mais de uma origem passa uma vez só (as outras cópias são apagadas)."""
+    marcas_o = ", ".join("?" * len(origens))
+    filtro, params = f"lote_numero IN ({marcas_o})", list(origens)
+    if rowids is not None:
+        filtro += f" AND animal_rowid IN ({', '.join('?' * len(rowids))})"
+        params += rowids
+    presentes = [r[0] for r in conn.execute(f"SELECT DISTINCT animal_rowid FROM lote_itens WHERE {filtro}", params)]
+    ja_no_destino = [r[0] for r in conn.execute(
+        f"SELECT animal_rowid FROM lote_itens WHERE lote_numero = ? AND animal_rowid IN "
+        f"(SELECT animal_rowid FROM lote_itens WHERE {filtro})", [destino] + params,
+    )]
+    if ja_no_destino:
+        conn.execute(
+            f"DELETE FROM lote_itens WHERE {filtro} AND animal_rowid IN ({', '.join('?' * len(ja_no_destino))})",
+            params + ja_no_destino,
+        )
+    repetidos = [r[0] for r in conn.execute(
+        f"SELECT animal_rowid FROM lote_itens WHERE {filtro} GROUP BY animal_rowid HAVING COUNT(*) > 1", params,
+    )]
+    if repetidos:
+        # fica o item mais antigo de cada animal; senão o UPDATE abaixo violaria UNIQUE(lote_numero, animal_rowid)
+        conn.execute(
+            f"DELETE FROM lote_itens WHERE {filtro} AND id NOT IN "
+            f"(SELECT MIN(id) FROM lote_itens WHERE {filtro} GROUP BY animal_rowid)",
+            params + params,
+        )
+    conn.execute("INSERT OR IGNORE INTO lotes(numero, criado_em) VALUES(?, ?)", (destino, _agora()))
+    conn.execute(f"UPDATE lote_itens SET lote_numero = ? WHERE {filtro}", [destino] + params)
+    fora = [] if rowids is None else sorted(set(rowids) - set(presentes))
+    return {"movidos": sorted(set(presentes) - set(ja_no_destino)), "ja_no_destino": sorted(ja_no_destino),
+            "repetidos": sorted(repetidos), "fora_da_origem": fora}
+
+def mover_itens(origem: int, destino: int, rowids: list[int]) -> dict:
+    """Move os animais `rowids` do lote `origem` para `destino` (criado se não existir).
+
+    Retorna {"movidos": [...], "ja_no_destino": [...], "repetidos": [...], "fora_da_origem": [...]} (rowids):
+    os que não estão na origem (outro operador tirou/moveu antes) ficam de fora."""
+    origem, destino = int(origem), int(destino)
+    if origem == destino:
+        raise ValueError("O lote de destino é o próprio lote.")
+    ids = sorted({int(r) for r in rowids})
+    if not ids:
+        return {"movidos": [], "ja_no_destino": [], "repetidos": [], "fora_da_origem": []}
+    with escrita() as conn:
+        res = _mover(conn, [origem], destino, ids)
+    registrar_escrita(len(ids))
+    return res
+
+def dividir_lote(origem: int, rowids: list[int], novo: int | None = None) -> tuple[int, dict]:
+    """Leva os `rowids` do lote `origem` para um lote novo (`novo` ou o próximo número livre).
+    Retorna (número do lote novo, resultado como em mover_itens). ValueError se `novo` já existe."""
+    ids = sorted({int(r) for r in rowids})
+    with escrita() as conn:
+        if novo is None:
+            novo = int(conn.execute("SELECT COALESCE(MAX(numero), 0) + 1 FROM lotes").fetchone()[0])
+        elif conn.execute("SELECT 1 FROM lotes WHERE numero = ?", (int(novo),)).fetchone():
+            raise ValueError(f"O lote {int(novo)} já existe: use Mover para levar itens a um lote existente.")
+        res = _mover(conn, [int(origem)], int(novo), ids) if ids else {"movidos": [], "ja_no_destino": [], "repetidos": [], "fora_da_origem": []}
+    registrar_escrita(len(ids))
+    return int(novo), res
+
+def juntar_lotes(origens: list[int], destino: int) -> dict:
+    """Passa todos os itens dos lotes `origens` para `destino` e exclui as origens (vazias).
+    Retorna como mover_itens ("repetidos": animais que estavam em mais de uma origem),
+    mais "excluidos": os lotes de origem que existiam."""
+    destino = int(destino)
+    nums = sorted({int(n) for n in origens} - {destino})
+    if not nums:
+        return {"movidos": [], "ja_no_destino": [], "repetidos": [], "fora_da_origem": [], "excluidos": []}
+    with escrita() as conn:
+        marcas = ", ".join("?" * len(nums))
+        existiam = [r[0] for r in conn.execute(f"SELECT numero FROM lotes WHERE numero IN ({marcas}) ORDER BY numero", nums)]
+        res = _mover(conn, nums, destino)
+        conn.execute(f"DELETE FROM lotes WHERE numero IN ({marcas})", nums)
+    registrar_escrita(len(res["movidos"]) + len(existiam))
+    res["excluidos"] = existiam
+    return res
+
+def set_lote_status(numero: int, status: str, gta_saida: str | None = None) -> bool:
+    """Conclui/reabre o lote. A troca só acontece se o status anterior for o oposto
+    (checado no próprio UPDATE): se dois operadores concluírem o mesmo lote ao mesmo
+    tempo, só o primeiro grava; o segundo recebe False e não sobrescreve a GTA."""
+    status = "concluido" if status == "concluido" else "pendente"
+    with escrita() as conn:
+        if status == "concluido":
+            cur = conn.execute(
+                "UPDATE lotes SET status=?, concluido_em=?, gta_saida=? "
+                "WHERE numero=? AND COALESCE(status,'pendente') <> 'concluido'",
+                (status, _agora(), gta_saida, int(numero)),
+            )
+        else:
+            cur = conn.execute(
+                "UPDATE lotes SET status=?, concluido_em=NULL, gta_saida=NULL "
+                "WHERE numero=? AND status = 'concluido'",
+                (status, int(numero)),
+            )
+        mudou = cur.rowcount > 0
+    if mudou:
+        registrar_escrita()
+    return mudou
+
+# resultado por lote das operações em vários lotes
+ALTERADO = "alterado"
+SEM_MUDANCA = "sem mudança"
+NAO_EXISTE = "não existe"
+PENDENTE = "pendente"
+
+def _status_de(conn: sqlite3.Connection, numeros: list[int]) -> dict[int, tuple[str, str | None]]:
+    marcas = ", ".join("?" * len(numeros))
+    return {
+        r[0]: (r[1], r[2]) for r in conn.execute(
+            f"SELECT numero, COALESCE(status,'pendente'), gta_saida FROM lotes WHERE numero IN ({marcas})", numeros
+        )
+    }
+
+def set_lotes_status(numeros, status: str, gta_saida: str | None = None) -> dict[int, str]:
+    """Conclui/reabre vários lotes com um UPDATE só, numa transação.
+
+    Mesma regra de set_lote_status: só muda quem está no status oposto. Retorna
+    {numero: ALTERADO | SEM_MUDANCA (já estava assim) | NAO_EXISTE}."""
+    status = "concluido" if status == "concluido" else "pendente"
+    nums = sorted({int(n) for n in numeros})
+    if not nums:
+        return {}
+    with escrita() as conn:
+        antes = _status_de(conn, nums)  # sob a trava de escrita: o UPDATE vê o mesmo estado
+        marcas = ", ".join("?" * len(nums))
+        if status == "concluido":
+            conn.execute(
+                f"UPDATE lotes SET status=?, concluido_em=?, gta_saida=? "
+                f"WHERE numero IN ({marcas}) AND COALESCE(status,'pendente') <> 'concluido'",
+                [status, _agora(), gta_saida] + nums,
+            )
+        else:
+            conn.execute(
+                f"UPDATE lotes SET status=?, concluido_em=NULL, gta_saida=NULL "
+                f"WHERE numero IN ({marcas}) AND status = 'concluido'",
+                [status] + nums,
+            )
+    res = {n: NAO_EXISTE if n not in antes else SEM_MUDANCA if antes[n][0] == status else ALTERADO for n in nums}
+    if ALTERADO in res.values():
+        registrar_escrita()
+    return res
+
+def atribuir_gta(numeros, gta_saida: str) -> dict[int, str]:
+    """Grava a GTA de saída em vários lotes concluídos (um UPDATE, uma transação).
+    Retorna {numero: ALTERADO | SEM_MUDANCA (já tinha essa GTA) | PENDENTE (não concluído) | NAO_EXISTE}."""
+    nums = sorted({int(n) for n in numeros})
+    if not nums:
+        return {}
+    with escrita() as conn:
+        antes = _status_de(conn, nums)
+        marcas = ", ".join("?" * len(nums))
+        conn.execute(
+            f"UPDATE lotes SET gta_saida=? WHERE numero IN ({marcas}) AND status = 'concluido' "
+            f"AND gta_saida IS NOT ?",
+            [gta_saida] + nums + [gta_saida],
+        )
+    res = {}
+    for n in nums:
+        if n not in antes:
+            res[n] = NAO_EXISTE
+        elif antes[n][0] != "concluido":
+            res[n] = PENDENTE
+        else:
+            res[n] = SEM_MUDANCA if antes[n][1] == gta_saida else ALTERADO
+    if ALTERADO in res.values():
+        registrar_escrita()
+    return res
+
+def criar_lote_por_lacres(numero: int, lacres: list[str]) -> dict:
+    """Cria (se preciso) o lote `numero` e insere os animais dos `lacres`.
+
+    Segue a mesma regra do Criar Lote: um animal só pode estar em um lote.
+    Retorna {"inseridos": [...], "ja_no_lote": [...], "em_outro_lote": {lacre: [lotes]},
+    "nao_encontrados": [...]} com os lacres em cada situação."""
+    res = {"inseridos": [], "ja_no_lote": [], "em_outro_lote": {}, "nao_encontrados": []}
+    novos: list[int] = []
+    for lacre in (str(l).strip() for l in lacres):
+        if not lacre:
+            continue
+        achados = fetch_animal_by_lacre(lacre)
+        if not achados:
+            res["nao_encontrados"].append(lacre)
+            continue
+        for animal in achados:
+            rid = int(animal["rowid"])
+            lotes = lotes_of_animal(rid)
+            if int(numero) in lotes or rid in novos:
+                res["ja_no_lote"].append(lacre)
+            elif lotes:
+                res["em_outro_lote"][lacre] = lotes
+            else:
+                novos.append(rid)
+                res["inseridos"].append(lacre)
+    # lote + itens numa transação só
+    with escrita() as conn:
+        conn.execute("INSERT OR IGNORE INTO lotes(numero, criado_em) VALUES(?, ?)", (int(numero), _agora()))
+        ignorados = set(_inserir_itens(conn, numero, novos))
+    registrar_escrita(1 + len(novos) - len(ignorados))
+    if ignorados:
+        # gravados por outro operador entre a checagem e a transação
+        for lacre, rid in list(zip(res["inseridos"], novos)):
+            if rid in ignorados:
+                res["inseridos"].remove(lacre)
+                res["em_outro_lote"][lacre] = lotes_of_animal(rid)
+    return res
@@ -0,0 +1,237 @@
+# leilao/manutencao.py - ANALYZE, incremental_vacuum/VACUUM e tamanho/fragmentação do banco
+"""
+Cada importação substitui a tabela `animais` inteira e excluir lotes apaga
+milhares de itens: as páginas liberadas ficam na freelist do arquivo (ele não
+encolhe) e as estatísticas do planejador (sqlite_stat1) ficam velhas ou somem
+junto com a tabela antiga. Nada disso era feito; agora:
+
+    manutencao.situacao()        # tamanho, páginas livres, auto_vacuum, estatísticas (só PRAGMAs: barato)
+    manutencao.fragmentacao()    # ocupação por tabela/índice (dbstat: lê o banco inteiro)
+    manutencao.rotina()          # ANALYZE do que mudou + PRAGMA optimize + incremental_vacuum
+    manutencao.compactar()       # VACUUM completo (passa o banco para auto_vacuum=INCREMENTAL)
+
+A rotina roda sozinha como tarefa em segundo plano (leilao/tarefas.py) depois de
+A_CADA_ESCRITAS escritas registradas ou, havendo escritas, a cada INTERVALO_H
+horas: backup.registrar_escrita() chama notificar(). Bancos novos já nascem com
+auto_vacuum=INCREMENTAL (db.connect); os antigos são convertidos pela primeira
+rotina, com um VACUUM, se o arquivo não passar de COMPACTAR_ATE_MB (acima disso,
+só pelo botão da página Backup ou `python -m leilao manutencao --compactar`).
+"""
+from __future__ import annotations
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from leilao import db, tarefas
+
+A_CADA_ESCRITAS = 2000       # escritas registradas que disparam a rotina (importação conta as linhas)
+INTERVALO_H = 24             # rotina ao menos uma vez por dia, se houve escritas
+LIMITE_ANALISE = 1000        # PRAGMA analysis_limit: ANALYZE por amostragem (linhas por índice)
+MUDANCA_ESTATISTICA = 2.0    # reanalisa a tabela quando o nº de linhas mudou mais que isso (para mais ou menos)
+LIVRES_MIN = 0.10            # fração de páginas livres a partir da qual a rotina devolve espaço ao disco
+COMPACTAR_ATE_MB = 256       # conversão automática para INCREMENTAL só até este tamanho
+
+MODOS_AUTO_VACUUM = {0: "NONE", 1: "FULL", 2: "INCREMENTAL"}
+TIPO_TAREFA = "manutencao"
+
+_lock = threading.Lock()
+_escritas = 0
+_ultima_ts: float | None = None   # início da última rotina (None = ainda não lido das tarefas)
+
+# ------------------ Situação ------------------
+def _pragma(conn: sqlite3.Connection, nome: str):
+    return conn.execute(f"PRAGMA {nome}").fetchone()[0]
+
+def situacao() -> dict | None:
+    """Tamanho e páginas do banco (None se o arquivo não existe)."""
+    path = Path(db.DB_PATH)
+    if not path.exists():
+        return None
+    with db.connect() as conn:
+        page_size = _pragma(conn, "page_size")
+        paginas = _pragma(conn, "page_count")
+        livres = _pragma(conn, "freelist_count")
+        modo = _pragma(conn, "auto_vacuum")
+        com_estatisticas = db.table_exists(conn, "sqlite_stat1")
+    wal = Path(f"{path}-wal")
+    return {
+        "tamanho": path.stat().st_size,
+        "wal": wal.stat().st_size if wal.exists() else 0,
+        "page_size": page_size,
+        "paginas": paginas,
+        "livres": livres,
+        "fracao_livre": livres / paginas if paginas else 0.0,
+        "auto_vacuum": MODOS_AUTO_VACUUM.get(modo, str(modo)),
+        "estatisticas": com_estatisticas,
+    }
+
+def fragmentacao() -> list[dict]:
+    """Por tabela/índice: páginas, bytes e ocupação das páginas (1 = cheias), do maior para o menor.
+    Usa a tabela virtual dbstat, que percorre o arquivo todo: chamar sob demanda, não a cada rerun."""
+    with db.connect() as conn:
+        try:
+            linhas = conn.execute(
+                "SELECT name, SUM(pageno > 0), SUM(pgsize), SUM(unused) FROM dbstat GROUP BY name"
+            ).fetchall()
+        except sqlite3.OperationalError:
+            return []  # SQLite compilado sem dbstat
+        tipos = dict(conn.execute("SELECT name, type FROM sqlite_master").fetchall())
+    out = [
+        {"nome": nome, "tipo": tipos.get(nome, "interno"), "paginas": int(paginas or 0), "bytes": int(total or 0),
+         "ocupacao": 1 - (livre or 0) / total if total else 0.0}
+        for nome, paginas, total, livre in linhas
+    ]
+    out.sort(key=lambda d: d["bytes"], reverse=True)
+    return out
+
+# ------------------ ANALYZE ------------------
+def _contagens_estatistica(conn: sqlite3.Connection) -> dict[str, int]:
+    """Tabela -> nº de linhas quando foi analisada (1º número do stat em sqlite_stat1)."""
+    if not db.table_exists(conn, "sqlite_stat1"):
+        return {}
+    out: dict[str, int] = {}
+    for tbl, stat in conn.execute("SELECT tbl, stat FROM sqlite_stat1"):
+        try:
+            out[tbl] = max(out.get(tbl, 0), int(str(stat).split()[0]))
+        except (ValueError, IndexError):
+            pass
+    return out
+
+def tabelas_desatualizadas(conn: sqlite3.Connection) -> list[str]:
+    """Tabelas com índice e sem estatística, ou cujo nº de linhas mudou mais que MUDANCA_ESTATISTICA vezes."""
+    from leilao.importacao import PREFIXO_PREPARO  # importacao importa backup, que importa este módulo
+
+    analisadas = _contagens_estatistica(conn)
+    com_indice = [r[0] for r in conn.execute(
+        "SELECT DISTINCT tbl_name FROM sqlite_master WHERE type = 'index' "
+        "AND tbl_name NOT LIKE 'sqlite\\_%' ESCAPE '\\' ORDER BY tbl_name"
+    )]
+    out = []
+    for tabela in com_indice:
+        if tabela.startswith(PREFIXO_PREPARO):
+            continue
+        linhas = conn.execute(f'SELECT COUNT(*) FROM "{tabela}"').fetchone()[0]
+        antes = analisadas.get(tabela)
+        if antes is None:
+            if linhas:
+                out.append(tabela)
+        elif max(linhas, 1) / max(antes, 1) > MUDANCA_ESTATISTICA or max(antes, 1) / max(linhas, 1) > MUDANCA_ESTATISTICA:
+            out.append(tabela)
+    return out
+
+def analisar(todas: bool = False) -> list[str]:
+    """ANALYZE (por amostragem) das tabelas desatualizadas, ou do banco todo; depois PRAGMA optimize.
+    Devolve as tabelas analisadas."""
+    with db.escrita() as conn:
+        conn.execute(f"PRAGMA analysis_limit = {int(LIMITE_ANALISE)}")
+        if todas:
+            conn.execute("ANALYZE")
+            tabelas = ["(todas)"]
+        else:
+            tabelas = tabelas_desatualizadas(conn)
+            for t in tabelas:
+                tarefas.avancar(None, f"ANALYZE {t}")
+                conn.execute(f'ANALYZE "{t}"')
+        # optimize da própria conexão: nas versões novas do SQLite revisa também o que a contagem não pega
+        conn.execute("PRAGMA optimize").fetchall()
+    return tabelas
+
+# ------------------ Espaço livre ------------------
+@contextmanager
+def _sem_transacao(mensagem: str):
+    """Conexão em autocommit com as escritas deste processo seguradas (VACUUM e incremental_vacuum
+    não rodam dentro da transação do escrita()). BancoOcupado se outro processo estiver gravando."""
+    with db.sem_escritas():
+        conn = db.connect()
+        conn.isolation_level = None
+        try:
+            yield conn
+        except sqlite3.OperationalError as e:
+            if "locked" in str(e).lower() or "busy" in str(e).lower():
+                raise db.BancoOcupado(mensagem) from e
+            raise
+        finally:
+            conn.close()
+
+def vacuo_incremental(paginas: int | None = None) -> int:
+    """Devolve ao disco as páginas livres (todas, ou `paginas`); só com auto_vacuum=INCREMENTAL.
+    Retorna quantas páginas foram liberadas."""
+    with _sem_transacao("Banco em uso por outra gravação; tente de novo em instantes.") as conn:
+        antes = _pragma(conn, "freelist_count")
+        if _pragma(conn, "auto_vacuum") != 2 or not antes:
+            return 0
+        # executescript: com execute() o sqlite3 do Python dá um passo só no pragma e libera uma página
+        conn.executescript(f"PRAGMA incremental_vacuum({int(paginas or 0)});")
+        return antes - _pragma(conn, "freelist_count")
+
+def compactar() -> dict:
+    """VACUUM completo: reescreve o arquivo sem páginas livres e já em auto_vacuum=INCREMENTAL.
+
+    Segura as escritas deste processo e pega o lock de escrita do arquivo durante a cópia;
+    leitores em WAL continuam lendo. O VACUUM preserva os rowids (as tabelas são copiadas
+    com a otimização de transferência), que lote_itens e o retrato usam como chave."""
+    antes = situacao()
+    if antes is None:
+        return {"antes": 0, "depois": 0}
+    tarefas.avancar(None, "VACUUM (reescrevendo o arquivo)")
+    with _sem_transacao("Banco em uso por outra gravação; tente compactar de novo em instantes.") as conn:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()  # o VACUUM passou o banco inteiro pelo -wal
+    depois = situacao()
+    return {"antes": antes["tamanho"] + antes["wal"], "depois": depois["tamanho"] + depois["wal"]}
+
+# ------------------ Rotina ------------------
+def rotina(compactar_se_preciso: bool = True) -> dict:
+    """ANALYZE do que mudou, optimize e espaço livre. Converte para auto_vacuum=INCREMENTAL
+    (um VACUUM) na primeira vez, se o banco for pequeno; senão só libera a freelist."""
+    sit = situacao()
+    if sit is None:
+        return {}
+    inicio = time.perf_counter()
+    tarefas.avancar(0.0, "Estatísticas do planejador")
+    res: dict = {"analisadas": analisar()}
+    tarefas.avancar(0.5, "Espaço livre")
+    res["liberadas"] = 0
+    res["compactado"] = None
+    if sit["auto_vacuum"] != "INCREMENTAL":
+        if compactar_se_preciso and sit["tamanho"] <= COMPACTAR_ATE_MB * 1024 * 1024:
+            res["compactado"] = compactar()
+    elif sit["fracao_livre"] >= LIVRES_MIN:
+        res["liberadas"] = vacuo_incremental()
+    res["duracao_s"] = round(time.perf_counter() - inicio, 3)
+    return res
+
+def ultima() -> dict | None:
+    """Registro da última rotina (tarefa), de qualquer processo."""
+    feitas = tarefas.listar(TIPO_TAREFA, limite=1)
+    return feitas[0] if feitas else None
+
+def pedir(motivo: str = "manual") -> str | None:
+    """Põe a rotina na fila (se já não houver uma); devolve o id da tarefa."""
+    global _escritas, _ultima_ts
+    with _lock:
+        if tarefas.listar(TIPO_TAREFA, ativas=True, limite=1):
+            return None
+        _escritas = 0
+        _ultima_ts = time.time()
+        return tarefas.enviar(TIPO_TAREFA, f"Manutenção do banco ({motivo})", rotina)
+
+def notificar(n: int = 1):
+    """Chamado por backup.registrar_escrita(): conta as escritas e dispara a rotina quando for a hora."""
+    global _escritas, _ultima_ts
+    with _lock:
+        _escritas += int(n)
+        if _ultima_ts is None:
+            u = ultima()
+            _ultima_ts = datetime.strptime(u["criada_em"], "%Y-%m-%d %H:%M:%S").timestamp() if u else 0.0
+        if _escritas >= A_CADA_ESCRITAS:
+            motivo = f"{_escritas} escritas"
+        elif time.time() - _ultima_ts >= INTERVALO_H * 3600:
+            motivo = "agendada"
+        else:
+            return
+    pedir(motivo)
@@ -0,0 +1,144 @@
+# leilao/perfil.py - cronômetro por etapas de cada execução (rerun) das páginas
+"""
+Cada página marca as etapas em sequência; cada `etapa()` encerra a anterior:
+
+    perfil.iniciar("Lotes")
+    perfil.etapa("schema");    ensure_schema()
+    perfil.etapa("consultas"); lotes = list_lotes()
+    perfil.etapa("widgets");   ...
+    perfil.finalizar()
+
+`medir(nome)` cronometra um trecho dentro da etapa atual (ex.: gerar o PDF dentro
+de "widgets"). Os totais de cada página ficam em memória (últimas execuções) para
+os percentis: `estatisticas()` -> p50/p95 por página e por etapa.
+
+Sem `iniciar()` na thread atual (CLI, benchmarks) tudo vira no-op.
+"""
+from __future__ import annotations
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+HISTORICO = 200  # execuções guardadas por página
+
+_local = threading.local()
+_lock = threading.Lock()
+_totais: dict[str, deque] = {}
+_por_etapa: dict[tuple[str, str], deque] = {}
+
+class Execucao:
+    """Uma execução de página: etapas em sequência + trechos medidos dentro delas."""
+
+    def __init__(self, pagina: str):
+        self.pagina = pagina
+        self.t0 = time.perf_counter()
+        self.etapas: list[dict] = []   # {"nome", "inicio_ms", "ms", "nivel"}
+        self._aberta: dict | None = None
+        self.total_ms: float | None = None
+        self.interrompida = False
+        self.etapa("início")  # config da página, barra lateral e título, até a primeira etapa marcada
+
+    def _agora_ms(self) -> float:
+        return (time.perf_counter() - self.t0) * 1000
+
+    def etapa(self, nome: str):
+        agora = self._agora_ms()
+        self._fechar(agora)
+        self._aberta = {"nome": nome, "inicio_ms": agora, "ms": 0.0, "nivel": 0}
+        self.etapas.append(self._aberta)
+
+    def _fechar(self, agora: float):
+        if self._aberta is not None:
+            self._aberta["ms"] = agora - self._aberta["inicio_ms"]
+            self._aberta = None
+
+    def finalizar(self, interrompida: bool = False) -> "Execucao":
+        if self.total_ms is not None:
+            return self
+        if interrompida:
+            # parou no meio (st.stop/erro): a etapa aberta não tem fim conhecido
+            if self._aberta is not None:
+                self.etapas.remove(self._aberta)
+                self._aberta = None
+            self.total_ms = max((e["inicio_ms"] + e["ms"] for e in self.etapas), default=0.0)
+            self.interrompida = True
+        else:
+            self.total_ms = self._agora_ms()
+            self._fechar(self.total_ms)
+        _guardar(self)
+        return self
+
+def _guardar(ex: Execucao):
+    with _lock:
+        _totais.setdefault(ex.pagina, deque(maxlen=HISTORICO)).append(ex.total_ms)
+        for e in ex.etapas:
+            if e["nivel"] == 0:
+                _por_etapa.setdefault((ex.pagina, e["nome"]), deque(maxlen=HISTORICO)).append(e["ms"])
+
+# ------------------ API usada pelas páginas ------------------
+def iniciar(pagina: str) -> Execucao:
+    ex = Execucao(pagina)
+    _local.atual = ex
+    return ex
+
+def atual() -> Execucao | None:
+    return getattr(_local, "atual", None)
+
+def etapa(nome: str):
+    ex = atual()
+    if ex is not None and ex.total_ms is None:
+        ex.etapa(nome)
+
+@contextmanager
+def medir(nome: str):
+    ex = atual()
+    if ex is None or ex.total_ms is not None:
+        yield
+        return
+    inicio = ex._agora_ms()
+    try:
+        yield
+    finally:
+        ex.etapas.append({"nome": nome, "inicio_ms": inicio, "ms": ex._agora_ms() - inicio, "nivel": 1})
+
+def finalizar() -> Execucao | None:
+    ex = atual()
+    _local.atual = None
+    return ex.finalizar() if ex is not None else None
+
+# ------------------ Percentis ------------------
+def percentil(valores, p: float) -> float:
+    """Percentil por posição mais próxima (sem interpolação), em ms."""
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    k = min(len(ordenados) - 1, max(0, math.ceil(p / 100 * len(ordenados)) - 1))
+    return ordenados[k]
+
+def estatisticas(pagina: str | None = None) -> list[dict]:
+    """[{pagina, execucoes, p50_ms, p95_ms, max_ms, ultimo_ms, etapas: [{nome, p50_ms, p95_ms}]}]"""
+    with _lock:
+        totais = {p: list(v) for p, v in _totais.items() if pagina is None or p == pagina}
+        etapas = {k: list(v) for k, v in _por_etapa.items() if k[0] in totais}
+    out = []
+    for pag, vals in sorted(totais.items()):
+        out.append({
+            "pagina": pag,
+            "execucoes": len(vals),
+            "p50_ms": percentil(vals, 50),
+            "p95_ms": percentil(vals, 95),
+            "max_ms": max(vals),
+            "ultimo_ms": vals[-1],
+            "etapas": [
+                {"nome": nome, "p50_ms": percentil(v, 50), "p95_ms": percentil(v, 95)}
+                for (p, nome), v in etapas.items() if p == pag
+            ],
+        })
+    return out
+
+def limpar():
+    with _lock:
+        _totais.clear()
+        _por_etapa.clear()
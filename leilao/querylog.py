@@ -0,0 +1,243 @@
+# leilao/querylog.py - registro das consultas SQL (tempo, linhas, página) e log das lentas
+"""
+Toda conexão aberta por `leilao.db.connect()` passa por aqui: cada comando vira um
+registro {quando, sql normalizado, ms, linhas, origem} em um buffer circular em
+memória (os mais antigos saem). Comandos acima de `limite_ms` também vão para
+logs/consultas_lentas.log. A página "Consultas" mostra o buffer.
+
+Com `ativo: false` a conexão é um sqlite3.Connection comum (sem custo nenhum).
+"""
+from __future__ import annotations
+import json
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from pathlib import Path
+
+_PKG_DIR = Path(__file__).resolve().parent
+APP_DIR = _PKG_DIR.parent
+LOGS_DIR = APP_DIR / "logs"
+CONFIG_PATH = LOGS_DIR / "consultas.json"
+SLOW_LOG_PATH = LOGS_DIR / "consultas_lentas.log"
+
+DEFAULT_CONFIG = {
+    "ativo": True,
+    "capacidade": 2000,      # registros mantidos em memória
+    "limite_ms": 250,        # acima disso o comando conta como lento
+    "gravar_lentas": True,   # grava os lentos em logs/consultas_lentas.log
+}
+
+_lock = threading.Lock()
+_config: dict | None = None
+_buffer: deque = deque(maxlen=DEFAULT_CONFIG["capacidade"])
+_slow_logger = None
+
+# ------------------ Configuração ------------------
+def config() -> dict:
+    global _config, _buffer
+    if _config is None:
+        cfg = dict(DEFAULT_CONFIG)
+        try:
+            cfg.update(json.loads(CONFIG_PATH.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            pass
+        with _lock:
+            _config = cfg
+            _buffer = deque(_buffer, maxlen=max(1, int(cfg["capacidade"])))
+    return _config
+
+def configurar(salvar: bool = True, **valores) -> dict:
+    """Atualiza a configuração (e grava em logs/consultas.json se `salvar`)."""
+    global _config, _buffer
+    cfg = {**config(), **{k: v for k, v in valores.items() if k in DEFAULT_CONFIG}}
+    with _lock:
+        _config = cfg
+        _buffer = deque(_buffer, maxlen=max(1, int(cfg["capacidade"])))
+    if salvar:
+        LOGS_DIR.mkdir(exist_ok=True)
+        CONFIG_PATH.write_text(json.dumps(cfg, indent=2), encoding="utf-8")
+    return cfg
+
+# ------------------ Normalização / origem ------------------
+# identificadores entre aspas duplas ficam (ex.: "M 0 - 8"); literais e números viram ?
+_RE_TOKENS = re.compile(r"""("(?:[^"]|"")*")|'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b""")
+_RE_LISTA = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_ESPACOS = re.compile(r"\s+")
+
+@lru_cache(maxsize=1024)
+def normalizar(sql: str) -> str:
+    """Texto do comando sem valores: `IN (?,?,?)` e `IN (1,2)` viram `IN (...)`."""
+    s = _RE_TOKENS.sub(lambda m: m.group(1) or "?", sql)
+    s = _RE_LISTA.sub("(...)", s)
+    return _RE_ESPACOS.sub(" ", s).strip()
+
+@lru_cache(maxsize=256)
+def _rotulo(filename: str) -> str | None:
+    if filename.startswith("<"):  # <stdin>, <frozen ...>, código gerado
+        return None
+    try:
+        p = Path(filename).resolve()
+        return p.relative_to(APP_DIR).as_posix()
+    except (ValueError, OSError):
+        return None
+
+def _origem() -> str:
+    """Primeiro arquivo do app (página/Início) na pilha; sem página (tarefa em segundo plano, CLI),
+    o módulo do pacote mais externo e a marca da sessão (db.definir_sessao)."""
+    pacote = None
+    f = sys._getframe(1)
+    while f is not None:
+        rot = _rotulo(f.f_code.co_filename)
+        if rot is not None and rot != "leilao/querylog.py":
+            if not rot.startswith("leilao/"):
+                return rot
+            pacote = rot
+        f = f.f_back
+    from leilao import db  # db importa este módulo
+    sessao = db.sessao_atual()
+    return f"{pacote or '?'} [{sessao}]" if sessao else (pacote or "?")
+
+# ------------------ Registro ------------------
+def _registrar_lenta(reg: dict):
+    global _slow_logger
+    if _slow_logger is None:
+        import logging
+        from logging.handlers import RotatingFileHandler
+
+        LOGS_DIR.mkdir(exist_ok=True)
+        lg = logging.getLogger("leilao.consultas_lentas")
+        lg.setLevel(logging.INFO)
+        lg.propagate = False
+        h = RotatingFileHandler(SLOW_LOG_PATH, maxBytes=1_000_000, backupCount=3, encoding="utf-8")
+        h.setFormatter(logging.Formatter("%(asctime)s\t%(message)s"))
+        lg.addHandler(h)
+        _slow_logger = lg
+    _slow_logger.info("%.1fms\t%s linhas\t%s\t%s", reg["ms"], reg["linhas"], reg["origem"], reg["sql"])
+
+def _somar(reg: dict, segundos: float, linhas: int):
+    reg["ms"] += segundos * 1000
+    reg["linhas"] += linhas
+    cfg = _config or DEFAULT_CONFIG
+    if not reg["lenta"] and reg["ms"] >= cfg["limite_ms"]:
+        reg["lenta"] = True  # loga uma vez, quando passa do limite (linhas lidas até ali)
+        if cfg["gravar_lentas"]:
+            try:
+                _registrar_lenta(reg)
+            except OSError:
+                pass
+
+def _novo(sql: str, segundos: float, linhas: int) -> dict:
+    reg = {"quando": time.time(), "sql": normalizar(sql), "ms": 0.0, "linhas": 0,
+           "origem": _origem(), "lenta": False}
+    _buffer.append(reg)  # deque.append é atômico; o lock só protege a troca do buffer
+    _somar(reg, segundos, linhas)
+    return reg
+
+class _Cursor(sqlite3.Cursor):
+    _reg: dict | None = None
+
+    def _fetch(self, metodo, *args):
+        t0 = time.perf_counter()
+        rows = metodo(*args)
+        if self._reg is not None:
+            n = 0 if rows is None else (len(rows) if isinstance(rows, list) else 1)
+            _somar(self._reg, time.perf_counter() - t0, n)
+        return rows
+
+    def execute(self, sql, parameters=(), /):
+        t0 = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._reg = _novo(sql, time.perf_counter() - t0, max(self.rowcount, 0))
+
+    def executemany(self, sql, seq_of_parameters, /):
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._reg = _novo(sql, time.perf_counter() - t0, max(self.rowcount, 0))
+
+    def executescript(self, sql_script, /):
+        t0 = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            self._reg = _novo(sql_script, time.perf_counter() - t0, 0)
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetch(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+    def __next__(self):
+        t0 = time.perf_counter()
+        row = super().__next__()  # StopIteration passa direto
+        if self._reg is not None:
+            _somar(self._reg, time.perf_counter() - t0, 1)
+        return row
+
+class _Medida:
+    """Mixin sobre uma subclasse de sqlite3.Connection.
+    Connection.execute* nativos não passam por self.cursor(); por isso são redefinidos."""
+
+    def cursor(self, factory=_Cursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=(), /):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters, /):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script, /):
+        return self.cursor().executescript(sql_script)
+
+@lru_cache(maxsize=None)
+def _classe_medida(base: type) -> type:
+    return type(f"{base.__name__}Medida", (_Medida, base), {})
+
+def connect(path, factory: type = sqlite3.Connection, **kwargs) -> sqlite3.Connection:
+    if not config()["ativo"]:
+        return sqlite3.connect(path, factory=factory, **kwargs)
+    return sqlite3.connect(path, factory=_classe_medida(factory), **kwargs)
+
+# ------------------ Consulta do buffer ------------------
+def registros() -> list[dict]:
+    """Cópia do buffer, do mais antigo para o mais recente."""
+    with _lock:
+        return [dict(r) for r in _buffer]
+
+def limpar():
+    with _lock:
+        _buffer.clear()
+
+def mais_lentas(regs: list[dict], n: int = 50) -> list[dict]:
+    return sorted(regs, key=lambda r: r["ms"], reverse=True)[:n]
+
+def mais_frequentes(regs: list[dict], n: int = 50) -> list[dict]:
+    """Agrupa por SQL normalizado: vezes, tempo total/médio/máximo, linhas e páginas."""
+    grupos: dict[str, dict] = {}
+    for r in regs:
+        g = grupos.setdefault(r["sql"], {"sql": r["sql"], "vezes": 0, "total_ms": 0.0, "max_ms": 0.0,
+                                         "linhas": 0, "lentas": 0, "origens": set()})
+        g["vezes"] += 1
+        g["total_ms"] += r["ms"]
+        g["max_ms"] = max(g["max_ms"], r["ms"])
+        g["linhas"] += r["linhas"]
+        g["lentas"] += r["lenta"]
+        g["origens"].add(r["origem"])
+    out = []
+    for g in grupos.values():
+        g["media_ms"] = g["total_ms"] / g["vezes"]
+        g["origens"] = ", ".join(sorted(g["origens"]))
+        out.append(g)
+    return sorted(out, key=lambda g: (g["vezes"], g["total_ms"]), reverse=True)[:n]
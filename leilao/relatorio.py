@@ -0,0 +1,263 @@
+# leilao/relatorio.py - agrupamento do lote por faixa etária/sexo e PDF do lote
+from __future__ import annotations
+from io import BytesIO
+import html as html_lib
+from typing import TYPE_CHECKING
+
+from leilao import esquema
+from leilao.db import connect
+from leilao.faixas import FAIXAS  # noqa: F401  (reexportado: páginas importam daqui)
+
+# ReportLab é pesado: só é importado dentro das funções de PDF (ver build_pdf),
+# para quem só precisa dos números (página, CLI) não carregá-lo.
+if TYPE_CHECKING:
+    from reportlab.platypus import Paragraph
+
+# ----------------------------------------------------------------------
+# Totais
+# ----------------------------------------------------------------------
+def totais_dos_itens(items: list[dict]) -> dict:
+    """Totais por faixa/sexo somando os itens já agrupados (quando não há lote_resumo)."""
+    tot = {"M": {label: 0 for label, _ in FAIXAS}, "F": {label: 0 for label, _ in FAIXAS}}
+    for it in items:
+        for label, _ in FAIXAS:
+            tot["M"][label] += int(it["M"].get(label, 0))
+            tot["F"][label] += int(it["F"].get(label, 0))
+    tot["total_M"] = sum(tot["M"].values())
+    tot["total_F"] = sum(tot["F"].values())
+    return tot
+
+# ----------------------------------------------------------------------
+# Query agregada
+# ----------------------------------------------------------------------
+def _num_sql(expr: str) -> str:
+    """Valor inteiro para ordenar (inteiro ou texto só com dígitos); o resto conta 0."""
+    return (
+        f"CASE typeof({expr}) WHEN 'integer' THEN {expr} "
+        f"WHEN 'text' THEN (CASE WHEN trim({expr}) <> '' AND trim({expr}) NOT GLOB '*[^0-9]*' "
+        f"THEN CAST(trim({expr}) AS INTEGER) ELSE 0 END) ELSE 0 END"
+    )
+
+def _coluna(esq, campo: str) -> str:
+    """`a."coluna"` do campo lógico (serie, lacre... de esquema.animais()); NULL se a planilha não tem a coluna."""
+    nome = getattr(esq, campo) if esq else None
+    return 'a."' + nome.replace('"', '""') + '"' if nome else "NULL"
+
+_SOMAS_FAIXAS = ",\n".join(
+    f"COALESCE(SUM(CASE WHEN af.sexo = '{sexo}' AND af.faixa = '{label}' THEN af.qtd END), 0)"
+    for label, _ in FAIXAS for sexo in ("M", "F")
+)
+
+def sql_lote_agrupado(esq) -> str:
+    """Consulta de fetch_lote_agrupado com os nomes das colunas de `esq` (esquema.animais())."""
+    return f"""
+    SELECT {_coluna(esq, "serie")} AS serie,
+           {_coluna(esq, "lacre")} AS lacre,
+           {_coluna(esq, "proprietario")} AS proprietario,
+           {_SOMAS_FAIXAS}
+    FROM lote_itens li
+    JOIN animais a ON a.rowid = li.animal_rowid
+    LEFT JOIN animal_faixas af ON af.animal_rowid = li.animal_rowid
+    WHERE li.lote_numero = ?
+    GROUP BY serie, lacre, proprietario
+    ORDER BY {_num_sql("lacre")}, {_num_sql("serie")}, MIN(li.id)
+"""
+
+def fetch_lote_agrupado(numero: int):
+    """Itens do lote agrupados por (série, lacre, proprietário), com as cabeças por sexo/faixa,
+    em ordem numérica de lacre/série. Agrupamento, somas e ordem ficam no SQL (uma consulta;
+    as faixas já vêm convertidas em animal_faixas): aqui só se monta o dicionário."""
+    esq = esquema.animais()
+    if esq is None:
+        return []
+    with connect() as conn:
+        rows = conn.execute(sql_lote_agrupado(esq), (int(numero),)).fetchall()
+    itens = []
+    for serie, lacre, proprietario, *qtds in rows:
+        it = {"serie": serie, "lacre": lacre, "proprietario": proprietario, "M": {}, "F": {}}
+        # colunas na ordem de _SOMAS_FAIXAS: M e F de cada faixa
+        for i, (label, _) in enumerate(FAIXAS):
+            it["M"][label] = qtds[2 * i]
+            it["F"][label] = qtds[2 * i + 1]
+        itens.append(it)
+    return itens
+
+# ----------------------------------------------------------------------
+# Util: truncar texto para PDF
+# ----------------------------------------------------------------------
+def truncate_text(text: str, max_width_pt: float, font_name: str = "Helvetica-Oblique", font_size: float = 8.0) -> str:
+    from reportlab.pdfbase import pdfmetrics
+
+    if text is None:
+        return ""
+    t = str(text)
+    if pdfmetrics.stringWidth(t, font_name, font_size) <= max_width_pt:
+        return t
+    ell = "…"
+    lo, hi = 0, len(t)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        cand = t[:mid].rstrip() + ell
+        if pdfmetrics.stringWidth(cand, font_name, font_size) <= max_width_pt:
+            lo = mid + 1
+        else:
+            hi = mid
+    mid = max(0, lo - 1)
+    return t[:mid].rstrip() + ell
+
+# ----------------------------------------------------------------------
+# Helper de formatação do PDF: negrito condicional (>0)
+# ----------------------------------------------------------------------
+def _pdf_num_cell(val: int, style_normal) -> "Paragraph | str":
+    from reportlab.platypus import Paragraph
+
+    v = int(val) if str(val).strip() not in ("", "None") else 0
+    if v > 0:
+        return Paragraph(f"<b>{v}</b>", style_normal)
+    return Paragraph(str(v), style_normal)
+
+# ----------------------------------------------------------------------
+# PDF
+# ----------------------------------------------------------------------
+def build_pdf(lote_info: dict, items: list[dict], totais: dict | None = None) -> bytes:
+    """PDF do lote. `totais` (GTA de Saída) vem de leilao.resumo.totais(); sem ele soma os itens."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, Spacer
+    from reportlab.lib.units import mm
+
+    buf = BytesIO()
+    doc = SimpleDocTemplate(
+        buf,
+        pagesize=A4,
+        leftMargin=2 * mm,
+        rightMargin=14 * mm,
+        topMargin=10 * mm,
+        bottomMargin=10 * mm,
+        title=f"Lote #{lote_info['numero']}",
+        author="Sistema de Lotes",
+    )
+    styles = getSampleStyleSheet()
+    title = ParagraphStyle("title_center", parent=styles["Title"], alignment=1, fontSize=20, leading=24, spaceAfter=6)
+    legend_title = ParagraphStyle("legend", parent=styles["Heading4"], alignment=0, fontSize=12, leading=14)
+    num_style = ParagraphStyle("num", parent=styles["Normal"], fontSize=9, alignment=1)  # centralizado
+
+    story = [Paragraph(f"Lote #{lote_info['numero']}", title), Spacer(1, 6)]
+
+    area_util_mm = (doc.pagesize[0] - doc.leftMargin - doc.rightMargin) / mm
+    w_serie, w_lacre, w_prop = 24 * mm, 18 * mm, 62 * mm
+    remaining = (area_util_mm * mm) - (w_serie + w_lacre + w_prop)
+    num_subcols = len(FAIXAS) * 2
+    w_sub = max(7 * mm, remaining / num_subcols)
+    colWidths = [w_serie, w_lacre, w_prop] + [w_sub] * num_subcols
+
+    left_pad = right_pad = 3
+    avail_prop_width = w_prop - left_pad - right_pad
+
+    head_top = ["", "", ""]
+    head_sub = ["Série", "Lacre", "Proprietário"]
+    for label, _ in FAIXAS:
+        head_top += [label, ""]
+        head_sub += ["M", "F"]
+    data = [head_top, head_sub]
+
+    for it in items:
+        nome = it.get("proprietario", "")
+        nome_trunc = truncate_text(nome, avail_prop_width, "Helvetica-Oblique", 8.0)
+        row = [it.get("serie", ""), it.get("lacre", ""), Paragraph(html_lib.escape(nome_trunc), ParagraphStyle("prop", parent=styles["Normal"], fontName="Helvetica-Oblique", fontSize=8, alignment=0))]
+        for label, _ in FAIXAS:
+            m_val = int(it["M"].get(label, 0))
+            f_val = int(it["F"].get(label, 0))
+            row.append(_pdf_num_cell(m_val, num_style))
+            row.append(_pdf_num_cell(f_val, num_style))
+        data.append(row)
+
+    if len(data) == 2:
+        data.append(["—"] * len(head_top))
+
+    table = Table(data, colWidths=colWidths, hAlign="LEFT", repeatRows=2)
+    style_cmds = [
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#f1f5f9")),
+        ("BACKGROUND", (0, 1), (-1, 1), colors.HexColor("#f8fafc")),
+        ("TEXTCOLOR",  (0, 0), (-1, 1), colors.HexColor("#111827")),
+        ("FONTNAME",   (0, 0), (-1, 1), "Helvetica-Bold"),
+        ("FONTNAME",   (0, 2), (-1, -1), "Helvetica"),
+        ("FONTSIZE",   (0, 0), (-1, 0), 10),
+        ("FONTSIZE",   (0, 1), (-1, 1), 9),
+        ("FONTSIZE",   (0, 2), (-1, -1), 9),
+        ("ALIGN",      (0, 0), (1, -1), "CENTER"),
+        ("ALIGN",      (2, 0), (2, -1), "LEFT"),
+        ("ALIGN",      (3, 0), (-1, -1), "CENTER"),
+        ("GRID",       (0, 0), (-1, -1), 0.25, colors.HexColor("#cbd5e1")),
+        ("VALIGN",     (0, 0), (-1, -1), "MIDDLE"),
+        ("ROWBACKGROUNDS", (0, 2), (-1, -1), [colors.white, colors.HexColor("#fafafa")]),
+        ("FONTNAME",   (2, 2), (2, -1), "Helvetica-Oblique"),
+        ("FONTSIZE",   (2, 2), (2, -1), 8),
+        ("LEFTPADDING",(2, 2), (2, -1), left_pad),
+        ("RIGHTPADDING",(2, 2), (2, -1), right_pad),
+    ]
+    c = 3
+    for _label, _ in FAIXAS:
+        style_cmds.append(("SPAN", (c, 0), (c + 1, 0)))
+        c += 2
+    table.setStyle(TableStyle(style_cmds))
+
+    story += [table, Spacer(1, 6), Paragraph(f"Total de linhas (lacre): <b>{len(items)}</b>", styles["Normal"])]
+
+    # Totais
+    if totais is None:
+        totais = totais_dos_itens(items)
+    tot_M, tot_F = totais["M"], totais["F"]
+    total_M_geral = totais["total_M"]
+    total_F_geral = totais["total_F"]
+
+    story += [Spacer(1, 12), Paragraph("GTA de Saída", legend_title), Spacer(1, 4)]
+
+    gta_top, gta_sub = [], []
+    for label, _ in FAIXAS:
+        gta_top += [label, ""]
+        gta_sub += ["M", "F"]
+    gta_top += ["Total", ""]
+    gta_sub += ["M", "F"]
+
+    gta_row = []
+    for label, _ in FAIXAS:
+        gta_row += [
+            _pdf_num_cell(tot_M[label], num_style),
+            _pdf_num_cell(tot_F[label], num_style),
+        ]
+    gta_row += [
+        _pdf_num_cell(total_M_geral, num_style),
+        _pdf_num_cell(total_F_geral, num_style),
+    ]
+
+    num_subcols_gta = len(FAIXAS) * 2 + 2
+    area_util_mm = (doc.pagesize[0] - doc.leftMargin - doc.rightMargin) / mm
+    w_gta = max(10 * mm, (area_util_mm * mm) / num_subcols_gta)
+
+    gta_table = Table([gta_top, gta_sub, gta_row], colWidths=[w_gta] * num_subcols_gta, hAlign="LEFT", repeatRows=2)
+    gta_style = [
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#eef2ff")),
+        ("BACKGROUND", (0, 1), (-1, 1), colors.HexColor("#f8fafc")),
+        ("GRID",       (0, 0), (-1, -1), 0.25, colors.HexColor("#cbd5e1")),
+        ("ALIGN",      (0, 0), (-1, -1), "CENTER"),
+        ("FONTNAME",   (0, 0), (-1, 1), "Helvetica-Bold"),
+        ("FONTNAME",   (0, 2), (-1, 2), "Helvetica"),
+        ("FONTSIZE",   (0, 0), (-1, 0), 10),
+        ("FONTSIZE",   (0, 1), (-1, 1), 9),
+        ("FONTSIZE",   (0, 2), (-1, 2), 10),
+        ("VALIGN",     (0, 0), (-1, -1), "MIDDLE"),
+    ]
+    c = 0
+    for _label, _ in FAIXAS:
+        gta_style.append(("SPAN", (c, 0), (c + 1, 0)))
+        c += 2
+    gta_style.append(("SPAN", (c, 0), (c + 1, 0)))  # "Total"
+
+    gta_table.setStyle(TableStyle(gta_style))
+    story.append(gta_table)
+
+    doc.build(story)
+    return buf.getvalue()
+
@@ -0,0 +1,147 @@
+# leilao/resumo.py - tabela lote_resumo (itens e cabeças por sexo/faixa), mantida por gatilhos
+"""
+`lote_resumo` guarda, por lote, o nº de itens e as cabeças de cada sexo/faixa
+(colunas m_0_8, f_0_8, ..., m_36p, f_36p) e os totais M/F. Gatilhos em `lotes`,
+`lote_itens` e `animal_faixas` somam/subtraem a diferença a cada gravação, então
+a grade de Lotes, o Imprimir e a GTA de Saída leem uma linha pronta em vez de
+agregar os itens do lote a cada rerun.
+
+As cabeças vêm de `animal_faixas` (leilao/faixas.py), que por sua vez é mantida
+por gatilhos em `animais`: editar um animal atualiza animal_faixas, que atualiza
+lote_resumo. Quando `animais` é substituída (página Dados), o banco é restaurado
+ou o mapa de faixas muda, reconstruir() refaz as duas tabelas.
+"""
+from __future__ import annotations
+import sqlite3
+
+from leilao import faixas
+from leilao.db import connect, table_exists
+from leilao.faixas import FAIXAS
+
+PREFIXO_GATILHO = "trg_resumo_"
+GATILHOS = ["lotes_ins", "lotes_del", "itens_ins", "itens_del", "itens_upd", "faixas_ins", "faixas_del", "faixas_upd"]
+
+def _coluna(sexo: str, label: str) -> str:
+    # "0–8" -> m_0_8 ; "36+" -> m_36p
+    return f"{sexo.lower()}_" + label.replace("–", "_").replace("+", "p")
+
+COLUNAS = [(sexo, label, _coluna(sexo, label)) for label, _ in FAIXAS for sexo in ("M", "F")]
+CAMPOS = ["numero", "itens"] + [c for _sx, _lb, c in COLUNAS] + ["total_m", "total_f"]
+
+# ----------------- Gatilhos -----------------
+def _do_animal(rid: str) -> dict[str, str]:
+    """Cabeças do animal `rid` por coluna do resumo (lidas de animal_faixas pela chave primária)."""
+    vals = {
+        c: f"COALESCE((SELECT qtd FROM animal_faixas WHERE animal_rowid = {rid} AND sexo = '{sx}' AND faixa = '{lb}'), 0)"
+        for sx, lb, c in COLUNAS
+    }
+    for sx in ("M", "F"):
+        vals[f"total_{sx.lower()}"] = (
+            f"COALESCE((SELECT SUM(qtd) FROM animal_faixas WHERE animal_rowid = {rid} AND sexo = '{sx}'), 0)"
+        )
+    return vals
+
+def _da_linha(ref: str) -> dict[str, str]:
+    """Contribuição de uma linha NEW/OLD de animal_faixas para cada coluna do resumo."""
+    vals = {c: f"CASE WHEN {ref}.sexo = '{sx}' AND {ref}.faixa = '{lb}' THEN {ref}.qtd ELSE 0 END" for sx, lb, c in COLUNAS}
+    for sx in ("M", "F"):
+        vals[f"total_{sx.lower()}"] = f"CASE WHEN {ref}.sexo = '{sx}' THEN {ref}.qtd ELSE 0 END"
+    return vals
+
+def _somar(sinal: str, vals: dict[str, str], where: str, itens: int = 0) -> str:
+    sets = [f"{c} = {c} {sinal} ({v})" for c, v in vals.items()]
+    if itens:
+        sets.insert(0, f"itens = itens {sinal} {itens}")
+    return f"UPDATE lote_resumo SET {', '.join(sets)} WHERE {where};"
+
+def _gatilhos() -> list[str]:
+    p = PREFIXO_GATILHO
+    lotes_do_animal = "numero IN (SELECT lote_numero FROM lote_itens WHERE animal_rowid = {}.animal_rowid)"
+    return [
+        f"CREATE TRIGGER {p}lotes_ins AFTER INSERT ON lotes BEGIN "
+        f"INSERT OR IGNORE INTO lote_resumo(numero) VALUES (NEW.numero); END",
+        f"CREATE TRIGGER {p}lotes_del AFTER DELETE ON lotes BEGIN "
+        f"DELETE FROM lote_resumo WHERE numero = OLD.numero; END",
+        f"CREATE TRIGGER {p}itens_ins AFTER INSERT ON lote_itens BEGIN "
+        + _somar("+", _do_animal("NEW.animal_rowid"), "numero = NEW.lote_numero", itens=1) + " END",
+        f"CREATE TRIGGER {p}itens_del AFTER DELETE ON lote_itens BEGIN "
+        + _somar("-", _do_animal("OLD.animal_rowid"), "numero = OLD.lote_numero", itens=1) + " END",
+        f"CREATE TRIGGER {p}itens_upd AFTER UPDATE OF lote_numero, animal_rowid ON lote_itens BEGIN "
+        + _somar("-", _do_animal("OLD.animal_rowid"), "numero = OLD.lote_numero", itens=1) + " "
+        + _somar("+", _do_animal("NEW.animal_rowid"), "numero = NEW.lote_numero", itens=1) + " END",
+        f"CREATE TRIGGER {p}faixas_ins AFTER INSERT ON animal_faixas BEGIN "
+        + _somar("+", _da_linha("NEW"), lotes_do_animal.format("NEW")) + " END",
+        f"CREATE TRIGGER {p}faixas_del AFTER DELETE ON animal_faixas BEGIN "
+        + _somar("-", _da_linha("OLD"), lotes_do_animal.format("OLD")) + " END",
+        f"CREATE TRIGGER {p}faixas_upd AFTER UPDATE ON animal_faixas BEGIN "
+        + _somar("-", _da_linha("OLD"), lotes_do_animal.format("OLD")) + " "
+        + _somar("+", _da_linha("NEW"), lotes_do_animal.format("NEW")) + " END",
+    ]
+
+def _nomes_gatilhos(conn) -> set[str]:
+    return {r[0] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='trigger' AND name LIKE ?", (PREFIXO_GATILHO + "%",)
+    )}
+
+def resumo_ok(conn: sqlite3.Connection) -> bool:
+    """lote_resumo, animal_faixas e todos os gatilhos presentes e atualizados."""
+    if not table_exists(conn, "lote_resumo") or not faixas.faixas_ok(conn):
+        return False
+    return {PREFIXO_GATILHO + n for n in GATILHOS} <= _nomes_gatilhos(conn)
+
+def reconstruir(conn: sqlite3.Connection):
+    """Refaz animal_faixas (a partir de `animais`) e `lote_resumo`, com seus gatilhos.
+    Roda dentro da transação de escrita do chamador (db.escrita())."""
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    # sem os gatilhos do resumo durante a carga de animal_faixas (somaria linha a linha)
+    for nome in _nomes_gatilhos(conn):
+        conn.execute(f"DROP TRIGGER IF EXISTS {nome}")
+    faixas.reconstruir(conn)
+
+    cols_sql = ", ".join(f"{c} INTEGER NOT NULL DEFAULT 0" for _sx, _lb, c in COLUNAS)
+    conn.execute("DROP TABLE IF EXISTS lote_resumo")
+    conn.execute(f"""
+    CREATE TABLE lote_resumo (
+        numero INTEGER PRIMARY KEY,
+        itens INTEGER NOT NULL DEFAULT 0,
+        {cols_sql},
+        total_m INTEGER NOT NULL DEFAULT 0,
+        total_f INTEGER NOT NULL DEFAULT 0
+    )""")
+    # carga inicial: um GROUP BY em animal_faixas, depois os gatilhos mantêm
+    somas = [f"COALESCE(SUM(CASE WHEN af.sexo = '{sx}' AND af.faixa = '{lb}' THEN af.qtd END), 0)" for sx, lb, _c in COLUNAS]
+    somas += [f"COALESCE(SUM(CASE WHEN af.sexo = '{sx}' THEN af.qtd END), 0)" for sx in ("M", "F")]
+    conn.execute(f"""
+        INSERT INTO lote_resumo({', '.join(CAMPOS)})
+        SELECT L.numero,
+               (SELECT COUNT(*) FROM lote_itens i WHERE i.lote_numero = L.numero),
+               {', '.join(somas)}
+        FROM lotes L
+        LEFT JOIN lote_itens li ON li.lote_numero = L.numero
+        LEFT JOIN animal_faixas af ON af.animal_rowid = li.animal_rowid
+        GROUP BY L.numero
+    """)
+    for sql in _gatilhos():
+        conn.execute(sql)
+
+# ----------------- Leitura -----------------
+def como_totais(d: dict) -> dict:
+    """Linha de lote_resumo ({campo: valor} de CAMPOS) no formato de totais() / build_pdf."""
+    return {
+        "numero": d.get("numero"),
+        "itens": d["itens"],
+        "M": {label: d[_coluna("M", label)] for label, _ in FAIXAS},
+        "F": {label: d[_coluna("F", label)] for label, _ in FAIXAS},
+        "total_M": d["total_m"],
+        "total_F": d["total_f"],
+    }
+
+def totais(numero: int) -> dict | None:
+    """{"itens", "M": {faixa: n}, "F": {...}, "total_M", "total_F"} do lote; None se não houver linha."""
+    with connect() as conn:
+        try:
+            r = conn.execute(f"SELECT {', '.join(CAMPOS)} FROM lote_resumo WHERE numero = ?", (int(numero),)).fetchone()
+        except sqlite3.OperationalError:
+            return None  # banco ainda sem lote_resumo (ensure_schema cria)
+    return como_totais(dict(zip(CAMPOS, r))) if r else None
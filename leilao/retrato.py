@@ -0,0 +1,223 @@
+# leilao/retrato.py - retrato (snapshot) de `animais` em memória, por colunas, compartilhado pelo processo
+"""
+Planilha, Editar e Duplicatas liam `animais` de novo a cada rerun, cada sessão
+com a sua cópia (lista de dicts: um objeto por célula). Aqui fica UMA cópia
+somente leitura por processo, guardada por colunas:
+
+- coluna só de inteiros (contagens por faixa, totais): `array` do menor tipo
+  que couber (1, 2, 4 ou 8 bytes por linha);
+- demais colunas (proprietário, município, lacre, série, datas): categorias
+  distintas + um código por linha (`array` de 2 ou 4 bytes), então cada nome
+  de proprietário/município existe uma vez só na memória.
+
+As páginas filtram posições do retrato (buscar(), onde(), grupos()) e montam só
+as linhas que vão mostrar.
+
+Quando o retrato vale: a tabela `versao_dados` guarda um código aleatório de
+`animais`, trocado por gatilhos a cada INSERT/UPDATE/DELETE e quando a tabela é
+substituída (importação). animais() lê esse código (uma linha) e só relê a
+tabela se ele mudou — inclusive se a mudança veio de outro processo (CLI) ou de
+uma restauração de backup.
+"""
+from __future__ import annotations
+import sqlite3
+import threading
+from array import array
+from bisect import bisect_left
+
+from leilao.db import connect, table_exists
+
+PREFIXO_GATILHO = "trg_versao_animais_"
+_NOVA_VERSAO = "lower(hex(randomblob(8)))"
+TAMANHO_BLOCO = 5000
+
+_lock = threading.Lock()
+_atual: "Retrato | None" = None
+
+# ----------------- Versão -----------------
+def _gatilhos() -> list[str]:
+    troca = f"UPDATE versao_dados SET versao = {_NOVA_VERSAO} WHERE tabela = 'animais';"
+    return [
+        f"CREATE TRIGGER {PREFIXO_GATILHO}{nome} AFTER {evento} ON animais BEGIN {troca} END"
+        for nome, evento in (("ins", "INSERT"), ("upd", "UPDATE"), ("del", "DELETE"))
+    ]
+
+def versao_ok(conn: sqlite3.Connection) -> bool:
+    """versao_dados existe e, havendo `animais`, os gatilhos estão lá (somem quando a tabela é substituída)."""
+    if not table_exists(conn, "versao_dados"):
+        return False
+    if not table_exists(conn, "animais"):
+        return True
+    nomes = {r[0] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='trigger' AND tbl_name='animais' AND name LIKE ?",
+        (PREFIXO_GATILHO + "%",),
+    )}
+    return len(nomes) == len(_gatilhos())
+
+def instalar_versao(conn: sqlite3.Connection):
+    """Cria versao_dados e os gatilhos em `animais`, com um código novo.
+    Roda dentro da transação de escrita do chamador (ensure_schema, importação)."""
+    conn.execute("CREATE TABLE IF NOT EXISTS versao_dados (tabela TEXT PRIMARY KEY, versao TEXT NOT NULL)")
+    conn.execute(
+        f"INSERT INTO versao_dados(tabela, versao) VALUES ('animais', {_NOVA_VERSAO}) "
+        f"ON CONFLICT(tabela) DO UPDATE SET versao = excluded.versao"
+    )
+    for nome, in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='trigger' AND name LIKE ?", (PREFIXO_GATILHO + "%",)
+    ).fetchall():
+        conn.execute(f"DROP TRIGGER IF EXISTS {nome}")
+    if table_exists(conn, "animais"):
+        for sql in _gatilhos():
+            conn.execute(sql)
+
+def versao(conn: sqlite3.Connection) -> str | None:
+    try:
+        r = conn.execute("SELECT versao FROM versao_dados WHERE tabela = 'animais'").fetchone()
+    except sqlite3.OperationalError:
+        return None  # banco ainda sem versao_dados (ensure_schema cria)
+    return r[0] if r else None
+
+# ----------------- Colunas -----------------
+def _tipo_inteiro(minimo: int, maximo: int) -> str | None:
+    for tipo in ("b", "h", "i", "q"):
+        limite = 1 << (array(tipo).itemsize * 8 - 1)
+        if -limite <= minimo and maximo < limite:
+            return tipo
+    return None
+
+class _Coluna:
+    """Categorias distintas + código de cada linha; vira array de inteiros se só houver inteiros."""
+    __slots__ = ("categorias", "codigos", "inteiros")
+
+    def __init__(self, categorias: list, codigos: array):
+        self.categorias, self.codigos, self.inteiros = categorias, codigos, None
+        if categorias and all(type(v) is int for v in categorias):
+            tipo = _tipo_inteiro(min(categorias), max(categorias))
+            if tipo:
+                self.inteiros = array(tipo, [categorias[c] for c in codigos])
+                self.categorias = self.codigos = None
+        elif len(categorias) < 1 << 16:
+            self.codigos = array("H", codigos)
+
+    def __getitem__(self, pos: int):
+        if self.inteiros is not None:
+            return self.inteiros[pos]
+        return self.categorias[self.codigos[pos]]
+
+    def posicoes(self, pred) -> list[int]:
+        """Posições cujo valor satisfaz `pred` (avaliado uma vez por valor distinto)."""
+        if self.inteiros is not None:
+            valores = self.inteiros
+            aceitos = {v for v in set(valores) if pred(v)}
+        else:
+            valores = self.codigos
+            aceitos = {c for c, v in enumerate(self.categorias) if pred(v)}
+        return [i for i, c in enumerate(valores) if c in aceitos] if aceitos else []
+
+    def grupos(self, chave) -> dict:
+        """{chave(valor): [posições]} (chave avaliada uma vez por valor distinto; None fica de fora)."""
+        out: dict = {}
+        if self.inteiros is not None:
+            valores, codigos = None, self.inteiros
+        else:
+            valores, codigos = self.categorias, self.codigos
+        chaves: dict = {}
+        for i, c in enumerate(codigos):
+            k = chaves[c] if c in chaves else chaves.setdefault(c, chave(valores[c] if valores is not None else c))
+            if k is not None:
+                out.setdefault(k, []).append(i)
+        return out
+
+    def bytes_aprox(self) -> int:
+        if self.inteiros is not None:
+            return self.inteiros.itemsize * len(self.inteiros)
+        return self.codigos.itemsize * len(self.codigos) + sum(len(str(v)) + 49 for v in self.categorias)
+
+class Retrato:
+    """Cópia somente leitura de `animais` (ordem de rowid). Não alterar: é a mesma para todas as sessões."""
+
+    def __init__(self, versao: str | None, colunas: list[str], rowids: array, dados: dict[str, _Coluna]):
+        self.versao = versao
+        self.colunas = colunas
+        self.rowids = rowids
+        self._dados = dados
+
+    def __len__(self) -> int:
+        return len(self.rowids)
+
+    def posicao(self, rowid: int) -> int | None:
+        i = bisect_left(self.rowids, int(rowid))
+        return i if i < len(self.rowids) and self.rowids[i] == int(rowid) else None
+
+    def valor(self, pos: int, coluna: str):
+        return self.rowids[pos] if coluna == "rowid" else self._dados[coluna][pos]
+
+    def linha(self, pos: int, colunas: list[str] | None = None) -> dict:
+        """{"rowid": ..., coluna: valor} da linha na posição `pos`."""
+        cols = self.colunas if colunas is None else colunas
+        out = {"rowid": self.rowids[pos]}
+        out.update((c, self._dados[c][pos]) for c in cols if c != "rowid")
+        return out
+
+    def tuplas(self, posicoes, colunas: list[str]) -> list[tuple]:
+        """Valores das `colunas` (pode incluir "rowid") em cada posição, como as linhas do cursor."""
+        fontes = [self.rowids if c == "rowid" else self._dados[c] for c in colunas]
+        return [tuple(f[p] for f in fontes) for p in posicoes]
+
+    def onde(self, coluna: str, pred) -> list[int]:
+        return self._dados[coluna].posicoes(pred)
+
+    def buscar(self, texto: str, colunas: list[str]) -> list[int]:
+        """Posições em que alguma das `colunas` contém `texto` (sem diferenciar maiúsculas)."""
+        s = texto.strip().lower()
+        achou: set[int] = set()
+        for c in colunas:
+            if c in self._dados:
+                achou.update(self.onde(c, lambda v: s in str(v or "").lower()))
+        return sorted(achou)
+
+    def grupos(self, coluna: str, chave=lambda v: v) -> dict:
+        return self._dados[coluna].grupos(chave)
+
+    def bytes_aprox(self) -> int:
+        """Tamanho aproximado dos dados (para a página Consultas / benchmarks)."""
+        return self.rowids.itemsize * len(self.rowids) + sum(c.bytes_aprox() for c in self._dados.values())
+
+def _carregar(conn: sqlite3.Connection, ver: str | None) -> Retrato:
+    cur = conn.execute("SELECT rowid, * FROM animais ORDER BY rowid")
+    colunas = [d[0] for d in cur.description][1:]
+    rowids = array("q")
+    # valor -> código, por coluna (a ordem de inserção do dict é a ordem dos códigos).
+    # 1 e 1.0 são a mesma chave num dict: numa coluna que misture os dois, fica o primeiro visto.
+    mapas: list[dict] = [{} for _ in colunas]
+    codigos = [array("I") for _ in colunas]
+    for bloco in iter(lambda: cur.fetchmany(TAMANHO_BLOCO), []):
+        por_coluna = list(zip(*bloco))
+        rowids.extend(por_coluna[0])
+        for m, cods, vals in zip(mapas, codigos, por_coluna[1:]):
+            cods.extend([m.setdefault(v, len(m)) for v in vals])
+    dados = {col: _Coluna(list(m), cods) for col, m, cods in zip(colunas, mapas, codigos)}
+    return Retrato(ver, colunas, rowids, dados)
+
+def animais() -> Retrato | None:
+    """Retrato atual de `animais` (None se a tabela não existe). Relê só quando a versão muda."""
+    global _atual
+    with connect() as conn:
+        ver = versao(conn)
+        if ver is not None and _atual is not None and _atual.versao == ver:
+            return _atual
+        with _lock:
+            if ver is not None and _atual is not None and _atual.versao == ver:
+                return _atual
+            # versão e dados na mesma transação de leitura (WAL: a mesma foto do banco)
+            conn.execute("BEGIN")
+            try:
+                ver = versao(conn)
+                if not table_exists(conn, "animais"):
+                    return None
+                novo = _carregar(conn, ver)
+            finally:
+                conn.rollback()
+            if ver is not None:  # sem versao_dados não dá para saber quando vence: não guarda
+                _atual = novo
+            return novo
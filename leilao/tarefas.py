@@ -0,0 +1,362 @@
+# leilao/tarefas.py - tarefas em segundo plano (importação, PDF, backup) com progresso e cancelamento
+"""
+Importar a planilha, gerar PDF, copiar/validar/restaurar o banco rodavam na
+thread do script: a página congelava e, se o operador clicasse em qualquer
+coisa, o rerun recomeçava o trabalho do zero. Agora a página só envia a tarefa
+e acompanha:
+
+    tid = tarefas.enviar("importar", "Importar 12000 linhas", salvar_animais, df)
+    ...
+    t = tarefas.obter(tid)      # {"estado", "progresso", "mensagem", "erro", ...}
+    df = tarefas.resultado(tid)
+
+- pool de threads para o que espera disco/SQLite (importação, cópias);
+  `processo=True` usa um pool de processos para o que só gasta CPU em Python
+  (ReportLab), sem disputar o GIL com as sessões;
+- a função da tarefa chama `avancar(feito, mensagem)` para informar o
+  progresso (no-op fora de uma tarefa, como perfil.etapa()); se o operador
+  cancelou, avancar() levanta Cancelada e a transação em andamento faz rollback;
+- o estado fica em `tarefas/tarefas.sqlite` (não no dados.db: a restauração
+  troca aquele arquivo e a importação segura o lock de escrita dele), então
+  a página encontra a tarefa de novo depois de um rerun ou em outra sessão;
+- resultado `bytes` vira arquivo em `tarefas/`, `Path` é guardado como
+  arquivo, o resto fica em memória (e em JSON, se couber).
+
+Tarefas que estavam na fila/rodando quando o servidor parou ficam "interrompida".
+"""
+from __future__ import annotations
+import json
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import ModuleType
+
+from leilao import db
+from leilao.db import APP_DIR
+
+TAREFAS_DIR = APP_DIR / "tarefas"
+THREADS = 2
+PROCESSOS = 1
+MANTER_DIAS = 7            # linhas e arquivos de tarefas terminadas há mais tempo são apagados
+MANTER_OBJETOS = 8         # resultados em memória (DataFrame da leitura etc.)
+INTERVALO_PROGRESSO_S = 0.25
+
+# estados: na_fila, rodando, concluida, falhou, cancelada, interrompida
+ATIVAS = ("na_fila", "rodando")
+_SQL_ATIVAS = "('na_fila', 'rodando')"
+
+_local = threading.local()
+
+class Cancelada(Exception):
+    """A tarefa foi cancelada pelo operador."""
+
+def _agora() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+# ------------------ API usada dentro da tarefa ------------------
+def avancar(feito: float | None = None, mensagem: str | None = None):
+    """Progresso da tarefa atual (0..1; None = indeterminado). Levanta Cancelada se pediram para cancelar.
+    Fora de uma tarefa (CLI, agendador, página) não faz nada."""
+    ex = getattr(_local, "atual", None)
+    if ex is not None:
+        ex.avancar(feito, mensagem)
+
+class _Tarefa:
+    """Estado em memória de uma tarefa deste processo."""
+
+    def __init__(self, executor: "Executor", tid: str, sessao: str | None = None):
+        self.executor = executor
+        self.id = tid
+        self.sessao = sessao  # marca de quem enviou (db.definir_sessao), reaplicada na thread do pool
+        self.cancelar = threading.Event()
+        self.future: Future | None = None
+        self._ultimo = 0.0
+
+    def avancar(self, feito: float | None, mensagem: str | None):
+        if self.cancelar.is_set():
+            raise Cancelada()
+        agora = time.monotonic()
+        # grava no máximo a cada INTERVALO_PROGRESSO_S, exceto troca de passo (mensagem) e fim
+        if mensagem is None and agora - self._ultimo < INTERVALO_PROGRESSO_S and (feito is None or feito < 1):
+            return
+        self._ultimo = agora
+        campos = {"progresso": None if feito is None else max(0.0, min(1.0, float(feito)))}
+        if mensagem is not None:
+            campos["mensagem"] = mensagem
+        self.executor._atualizar(self.id, **campos)
+
+# ------------------ Processo filho ------------------
+_main_lock = threading.Lock()
+
+@contextmanager
+def _sem_main_da_pagina():
+    """O ScriptRunner do Streamlit põe a página em sys.modules["__main__"], e o spawn reexecuta
+    o __main__ no filho (como __mp_main__) antes do initializer: o Início rodaria inteiro lá,
+    com agendador de backup e consultas no banco padrão. Enquanto os filhos são criados,
+    o __main__ é um módulo vazio (sem __file__, o spawn não reexecuta nada)."""
+    with _main_lock:
+        original = sys.modules.get("__main__")
+        vazio = ModuleType("__main__")
+        sys.modules["__main__"] = vazio
+        try:
+            yield
+        finally:
+            if sys.modules.get("__main__") is vazio:  # outra sessão pode ter começado um rerun nesse meio-tempo
+                sys.modules["__main__"] = original
+
+def _iniciar_processo(db_path: str):
+    db.set_db_path(db_path)
+    # o filho só executa a função da tarefa: se herdou threads (ex.: o agendador de backup),
+    # algum __main__ de página foi reexecutado aqui; melhor quebrar o pool que gravar no banco errado
+    extras = [t.name for t in threading.enumerate() if t is not threading.main_thread()]
+    if extras:
+        raise RuntimeError(f"Processo de tarefas iniciou com threads extras: {', '.join(extras)}")
+
+# ------------------ Executor ------------------
+class Executor:
+    """Uma instância por processo do servidor (ver `get_executor`)."""
+
+    def __init__(self, pasta: Path = TAREFAS_DIR, threads: int = THREADS, processos: int = PROCESSOS):
+        self.pasta = Path(pasta)
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        self.arquivo = self.pasta / "tarefas.sqlite"
+        self._threads = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="tarefa")
+        self._n_processos = processos
+        self._processos = None  # ProcessPoolExecutor, criado na primeira tarefa com processo=True
+        self._lock = threading.Lock()
+        self._tarefas: dict[str, _Tarefa] = {}
+        self._objetos: dict[str, object] = {}  # resultados que não vão para o banco, mais recentes por último
+        self._criar_tabela()
+        self._recuperar()
+
+    # ---- persistência ----
+    def _conectar(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.arquivo, timeout=5.0)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _criar_tabela(self):
+        with closing(self._conectar()) as conn, conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS tarefas (
+                id TEXT PRIMARY KEY,
+                tipo TEXT NOT NULL,
+                descricao TEXT,
+                estado TEXT NOT NULL,
+                progresso REAL,
+                mensagem TEXT,
+                sessao TEXT,
+                criada_em TEXT NOT NULL,
+                iniciada_em TEXT,
+                terminada_em TEXT,
+                resultado TEXT,
+                arquivo TEXT,
+                erro TEXT
+            )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tarefas_tipo ON tarefas(tipo, criada_em)")
+
+    def _recuperar(self):
+        """Tarefas do processo anterior que não terminaram; apaga as antigas e seus arquivos."""
+        limite = (datetime.now() - timedelta(days=MANTER_DIAS)).strftime("%Y-%m-%d %H:%M:%S")
+        with closing(self._conectar()) as conn, conn:
+            conn.execute(
+                f"UPDATE tarefas SET estado = 'interrompida', terminada_em = ? WHERE estado IN {_SQL_ATIVAS}", (_agora(),)
+            )
+            antigas = conn.execute("SELECT id, arquivo FROM tarefas WHERE criada_em < ?", (limite,)).fetchall()
+            conn.execute("DELETE FROM tarefas WHERE criada_em < ?", (limite,))
+        for r in antigas:
+            if r["arquivo"] and Path(r["arquivo"]).parent == self.pasta:
+                Path(r["arquivo"]).unlink(missing_ok=True)
+
+    def _atualizar(self, tid: str, **campos):
+        sets = ", ".join(f"{c} = ?" for c in campos)
+        with closing(self._conectar()) as conn, conn:
+            conn.execute(f"UPDATE tarefas SET {sets} WHERE id = ?", (*campos.values(), tid))
+
+    # ---- API usada pelas páginas ----
+    def enviar(self, tipo: str, descricao: str, funcao, *args, processo: bool = False,
+               sufixo: str = ".bin", **kwargs) -> str:
+        """Põe `funcao(*args, **kwargs)` na fila e retorna o id da tarefa.
+        `processo=True`: roda em outro processo (função e argumentos precisam ser "pickláveis";
+        sem progresso, e só dá para cancelar antes de começar). `sufixo`: do arquivo se o resultado for bytes."""
+        tid = uuid.uuid4().hex[:12]
+        sessao = db.sessao_atual()
+        with closing(self._conectar()) as conn, conn:
+            conn.execute(
+                "INSERT INTO tarefas(id, tipo, descricao, estado, sessao, criada_em) VALUES (?, ?, ?, 'na_fila', ?, ?)",
+                (tid, tipo, descricao, sessao, _agora()),
+            )
+        t = _Tarefa(self, tid, sessao)
+        with self._lock:
+            self._tarefas[tid] = t
+        if processo:
+            with self._lock:
+                if self._processos is None:
+                    import multiprocessing
+                    from concurrent.futures import ProcessPoolExecutor
+
+                    # spawn: não copia as threads do servidor para o filho (fork com threads pode travar)
+                    self._processos = ProcessPoolExecutor(
+                        max_workers=self._n_processos, mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_iniciar_processo, initargs=(str(db.DB_PATH),),
+                    )
+            self._atualizar(tid, estado="rodando", iniciada_em=_agora())
+            with _sem_main_da_pagina():  # submit() é quem cria o processo filho
+                t.future = self._processos.submit(funcao, *args, **kwargs)
+            t.future.add_done_callback(lambda f: self._terminar(t, f, sufixo))
+        else:
+            t.future = self._threads.submit(self._rodar, t, funcao, args, kwargs, sufixo)
+        return tid
+
+    def cancelar(self, tid: str) -> bool:
+        """Pede o cancelamento. False se a tarefa não é deste processo ou já terminou."""
+        with self._lock:
+            t = self._tarefas.get(tid)
+        if t is None or t.future is None or t.future.done():
+            return False
+        t.cancelar.set()
+        if t.future.cancel():  # ainda na fila: nem começa
+            self._atualizar(tid, estado="cancelada", terminada_em=_agora())
+            self._esquecer(tid)
+        else:
+            self._atualizar(tid, mensagem="Cancelando…")
+        return True
+
+    def obter(self, tid: str | None) -> dict | None:
+        if not tid:
+            return None
+        with closing(self._conectar()) as conn:
+            r = conn.execute("SELECT * FROM tarefas WHERE id = ?", (tid,)).fetchone()
+        return self._como_dict(r) if r else None
+
+    def listar(self, tipo: str | None = None, ativas: bool = False, limite: int = 10) -> list[dict]:
+        """Tarefas mais recentes primeiro (de todas as sessões)."""
+        sql, params = "SELECT * FROM tarefas WHERE 1 = 1", []
+        if tipo:
+            sql += " AND tipo = ?"
+            params.append(tipo)
+        if ativas:
+            sql += f" AND estado IN {_SQL_ATIVAS}"
+        sql += " ORDER BY criada_em DESC, rowid DESC LIMIT ?"
+        with closing(self._conectar()) as conn:
+            return [self._como_dict(r) for r in conn.execute(sql, (*params, int(limite)))]
+
+    def resultado(self, tid: str):
+        """Objeto retornado pela tarefa: o guardado em memória, os bytes do arquivo ou o JSON salvo."""
+        with self._lock:
+            if tid in self._objetos:
+                return self._objetos[tid]
+        t = self.obter(tid)
+        if t is None or t["estado"] != "concluida":
+            return None
+        if t["arquivo"]:
+            p = Path(t["arquivo"])
+            if p.parent != self.pasta:
+                return p  # arquivo de fora de tarefas/ (ex.: backup): quem chamou decide como ler
+            return p.read_bytes() if p.exists() else None
+        return t["resultado"]
+
+    @staticmethod
+    def _como_dict(r: sqlite3.Row) -> dict:
+        d = dict(r)
+        d["resultado"] = json.loads(d["resultado"]) if d["resultado"] else None
+        return d
+
+    # ---- execução ----
+    def _rodar(self, t: _Tarefa, funcao, args, kwargs, sufixo: str):
+        if t.cancelar.is_set():
+            self._atualizar(t.id, estado="cancelada", terminada_em=_agora())
+            self._esquecer(t.id)
+            return
+        self._atualizar(t.id, estado="rodando", iniciada_em=_agora())
+        _local.atual = t
+        # a marca da sessão é por thread: sem isto o diário e o log de consultas não sabem de quem é a tarefa
+        db.definir_sessao(t.sessao)
+        try:
+            valor = funcao(*args, **kwargs)
+        except Cancelada:
+            self._atualizar(t.id, estado="cancelada", terminada_em=_agora(), mensagem=None)
+        except Exception as e:
+            self._falhou(t, e)
+        else:
+            self._concluir(t, valor, sufixo)
+        finally:
+            _local.atual = None
+            db.definir_sessao(None)
+            self._esquecer(t.id)
+
+    def _terminar(self, t: _Tarefa, f: Future, sufixo: str):
+        """Fim de uma tarefa do pool de processos (callback do Future)."""
+        try:
+            if f.cancelled():
+                return  # cancelar() já gravou
+            if t.cancelar.is_set():
+                self._atualizar(t.id, estado="cancelada", terminada_em=_agora(), mensagem=None)
+            elif f.exception() is not None:
+                self._falhou(t, f.exception())
+                if type(f.exception()).__name__ == "BrokenProcessPool":
+                    with self._lock:  # um filho morreu: o pool não aceita mais nada, a próxima tarefa cria outro
+                        self._processos = None
+            else:
+                self._concluir(t, f.result(), sufixo)
+        finally:
+            self._esquecer(t.id)
+
+    def _falhou(self, t: _Tarefa, e: BaseException):
+        detalhe = "".join(traceback.format_exception(type(e), e, e.__traceback__)[-3:])
+        self._atualizar(t.id, estado="falhou", terminada_em=_agora(), erro=f"{e}\n\n{detalhe}".strip())
+
+    def _concluir(self, t: _Tarefa, valor, sufixo: str):
+        campos = {"estado": "concluida", "terminada_em": _agora(), "progresso": 1.0, "mensagem": None}
+        if isinstance(valor, (bytes, bytearray)):
+            destino = self.pasta / f"{t.id}{sufixo}"
+            destino.write_bytes(valor)
+            campos["arquivo"] = str(destino)
+        elif isinstance(valor, Path):
+            campos["arquivo"] = str(valor)
+        elif isinstance(valor, (dict, list, str, int, float, bool)):
+            campos["resultado"] = json.dumps(valor, default=str)
+        elif valor is not None:
+            with self._lock:
+                self._objetos[t.id] = valor
+                while len(self._objetos) > MANTER_OBJETOS:
+                    self._objetos.pop(next(iter(self._objetos)))
+        self._atualizar(t.id, **campos)
+
+    def _esquecer(self, tid: str):
+        with self._lock:
+            self._tarefas.pop(tid, None)
+
+# ------------------ Singleton por processo ------------------
+_instance: Executor | None = None
+_instance_lock = threading.Lock()
+
+def get_executor() -> Executor:
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = Executor()
+    return _instance
+
+def enviar(tipo: str, descricao: str, funcao, *args, **kwargs) -> str:
+    return get_executor().enviar(tipo, descricao, funcao, *args, **kwargs)
+
+def cancelar(tid: str) -> bool:
+    return get_executor().cancelar(tid)
+
+def obter(tid: str | None) -> dict | None:
+    return get_executor().obter(tid)
+
+def listar(tipo: str | None = None, ativas: bool = False, limite: int = 10) -> list[dict]:
+    return get_executor().listar(tipo, ativas, limite)
+
+def resultado(tid: str):
+    return get_executor().resultado(tid)
@@ -0,0 +1,155 @@
+# pages/10_Consultas.py
+from __future__ import annotations
+from datetime import datetime
+
+import streamlit as st
+from ui_nav import encerrar_perfil, hide_default_sidebar_nav, iniciar_perfil, render_sidebar_nav  # sidebar custom
+from leilao import perfil, querylog
+
+# ------------------ Config da página ------------------
+iniciar_perfil("Consultas SQL")
+st.set_page_config(page_title="Consultas SQL", page_icon="🐢", layout="wide")
+
+# sidebar com ícones (esconde a nativa)
+hide_default_sidebar_nav()
+render_sidebar_nav()
+
+st.title("🐢 Consultas SQL")
+st.caption(
+    "Tempo, linhas e página de origem de cada comando enviado ao banco (últimos registros, em memória). "
+    "Use para descobrir qual consulta deixa uma página lenta."
+)
+st.page_link("Inicio.py", label="⬅️ Voltar para Início", icon="🏠", use_container_width=True)
+
+# ------------------ Helpers ------------------
+def _linhas_tabela(regs: list[dict]) -> list[dict]:
+    return [
+        {
+            "Quando": datetime.fromtimestamp(r["quando"]).strftime("%d/%m %H:%M:%S"),
+            "ms": round(r["ms"], 2),
+            "Linhas": r["linhas"],
+            "Origem": r["origem"],
+            "Lenta": "🐢" if r["lenta"] else "",
+            "SQL": r["sql"],
+        }
+        for r in regs
+    ]
+
+# ------------------ Dados ------------------
+cfg = querylog.config()
+regs = querylog.registros()
+
+origens = sorted({r["origem"] for r in regs})
+col_f1, col_f2 = st.columns([1.2, 1])
+with col_f1:
+    origem = st.selectbox("Página de origem", ["(todas)"] + origens)
+with col_f2:
+    q = st.text_input("🔎 Filtrar SQL (trecho)", "", placeholder="ex.: lote_itens, animais...")
+if origem != "(todas)":
+    regs = [r for r in regs if r["origem"] == origem]
+if q:
+    regs = [r for r in regs if q.lower() in r["sql"].lower()]
+
+lentas = [r for r in regs if r["lenta"]]
+m1, m2, m3, m4 = st.columns(4)
+m1.metric("Comandos registrados", f"{len(regs)}", help=f"Capacidade do buffer: {cfg['capacidade']} comandos.")
+m2.metric(f"Lentos (≥ {cfg['limite_ms']} ms)", len(lentas))
+m3.metric("Tempo total", f"{sum(r['ms'] for r in regs) / 1000:.2f} s")
+m4.metric("Mais lento", f"{max((r['ms'] for r in regs), default=0):.1f} ms")
+
+if not cfg["ativo"]:
+    st.info("Registro de consultas **desativado**; ative abaixo para voltar a medir.")
+
+tab_lentas, tab_freq, tab_recentes = st.tabs(["Mais lentas", "Mais frequentes", "Recentes"])
+with tab_lentas:
+    if regs:
+        st.dataframe(_linhas_tabela(querylog.mais_lentas(regs)), use_container_width=True, hide_index=True)
+    else:
+        st.write("_Nenhum comando registrado ainda — navegue pelas páginas e volte aqui._")
+with tab_freq:
+    freq = querylog.mais_frequentes(regs)
+    st.dataframe(
+        [
+            {
+                "Vezes": g["vezes"],
+                "Total ms": round(g["total_ms"], 1),
+                "Média ms": round(g["media_ms"], 2),
+                "Máx ms": round(g["max_ms"], 1),
+                "Linhas": g["linhas"],
+                "Lentas": g["lentas"],
+                "Origens": g["origens"],
+                "SQL": g["sql"],
+            }
+            for g in freq
+        ],
+        use_container_width=True, hide_index=True,
+    )
+with tab_recentes:
+    st.dataframe(_linhas_tabela(list(reversed(regs[-200:]))), use_container_width=True, hide_index=True)
+
+# ------------------ Tempo por página ------------------
+st.divider()
+st.subheader("⏱️ Tempo por página")
+st.caption(
+    "Duração de cada execução (rerun) das páginas desde que o servidor subiu, "
+    f"últimas {perfil.HISTORICO} por página. Ligue **⏱️ Tempo desta execução** na barra lateral para ver as etapas."
+)
+est = perfil.estatisticas()
+if est:
+    st.dataframe(
+        [
+            {
+                "Página": e["pagina"],
+                "Execuções": e["execucoes"],
+                "p50 (s)": round(e["p50_ms"] / 1000, 3),
+                "p95 (s)": round(e["p95_ms"] / 1000, 3),
+                "Máx (s)": round(e["max_ms"] / 1000, 3),
+                "Última (s)": round(e["ultimo_ms"] / 1000, 3),
+                "Etapa mais lenta (p95)": max(e["etapas"], key=lambda x: x["p95_ms"])["nome"] if e["etapas"] else "",
+            }
+            for e in est
+        ],
+        use_container_width=True, hide_index=True,
+    )
+else:
+    st.write("_Nenhuma execução registrada ainda._")
+
+# ------------------ Configuração ------------------
+st.divider()
+st.subheader("⚙️ Configuração")
+with st.form("form_querylog"):
+    f1, f2, f3, f4 = st.columns(4)
+    with f1:
+        ativo = st.checkbox("Registrar consultas", value=bool(cfg["ativo"]))
+    with f2:
+        limite_ms = st.number_input("Lenta a partir de (ms)", min_value=1, step=50, value=int(cfg["limite_ms"]))
+    with f3:
+        capacidade = st.number_input("Guardar últimos (comandos)", min_value=100, step=500, value=int(cfg["capacidade"]))
+    with f4:
+        gravar = st.checkbox("Gravar lentas em arquivo", value=bool(cfg["gravar_lentas"]),
+                             help=f"Arquivo: `{querylog.SLOW_LOG_PATH.relative_to(querylog.APP_DIR)}`")
+    if st.form_submit_button("Salvar", use_container_width=True):
+        querylog.configurar(ativo=ativo, limite_ms=int(limite_ms), capacidade=int(capacidade), gravar_lentas=gravar)
+        st.toast("Configuração salva.", icon="✅")
+        st.rerun()
+
+c1, c2 = st.columns(2)
+with c1:
+    if st.button("Limpar registros", use_container_width=True):
+        querylog.limpar()
+        perfil.limpar()
+        st.rerun()
+with c2:
+    if querylog.SLOW_LOG_PATH.exists():
+        st.download_button(
+            "Baixar log de consultas lentas",
+            data=querylog.SLOW_LOG_PATH.read_bytes(),
+            file_name=querylog.SLOW_LOG_PATH.name,
+            mime="text/plain",
+            use_container_width=True,
+        )
+    else:
+        st.button("Baixar log de consultas lentas", disabled=True, use_container_width=True,
+                  help="Nenhuma consulta lenta gravada ainda.")
+
+encerrar_perfil()
@@ -0,0 +1,116 @@
+# pages/11_GTA.py
+from __future__ import annotations
+from datetime import date
+
+import streamlit as st
+
+from ui_nav import encerrar_perfil, hide_default_sidebar_nav, iniciar_perfil, render_sidebar_nav, url_temporaria  # sidebar custom
+from leilao import gta
+from leilao.db import ensure_schema
+from leilao.faixas import FAIXAS
+from leilao.lotes import list_lotes
+from leilao.perfil import etapa, medir
+
+# ------------------ Config da página ------------------
+iniciar_perfil("GTA Consolidada")
+st.set_page_config(page_title="GTA Consolidada", page_icon="📊", layout="wide")
+
+# sidebar com ícones (esconde a nativa)
+hide_default_sidebar_nav()
+render_sidebar_nav()
+
+st.title("📊 GTA Consolidada")
+st.caption(
+    "Totais da GTA de Saída (cabeças por sexo e faixa) somando vários lotes, com o subtotal de cada lote. "
+    "Use para o fechamento do leilão em vez de somar os PDFs dos lotes à mão."
+)
+
+etapa("schema")
+ensure_schema()
+
+# ------------------ Filtros ------------------
+etapa("filtros")
+todos = sorted(list_lotes(), key=lambda l: l["numero"])
+c1, c2, c3 = st.columns([1.2, 1, 2])
+with c1:
+    usar_periodo = st.checkbox("Filtrar por data de conclusão")
+    periodo = st.date_input(
+        "Concluídos entre", value=(date.today().replace(day=1), date.today()),
+        format="DD/MM/YYYY", disabled=not usar_periodo,
+    )
+with c2:
+    status_label = st.selectbox("Status", ["Todos", "Concluídos", "Pendentes"])
+with c3:
+    numeros = st.multiselect("Lotes (vazio = todos)", [l["numero"] for l in todos], placeholder="Escolha os lotes")
+
+de = ate = None
+if usar_periodo and isinstance(periodo, (list, tuple)) and periodo:
+    de = periodo[0]
+    ate = periodo[1] if len(periodo) > 1 else periodo[0]
+status = {"Concluídos": "concluido", "Pendentes": "pendente"}.get(status_label)
+
+# ------------------ Consulta ------------------
+etapa("consulta")
+dados = gta.consolidado(numeros, status, de, ate)
+total = dados["total"]
+
+m1, m2, m3, m4 = st.columns(4)
+m1.metric("Lotes", len(dados["lotes"]))
+m2.metric("Itens", total["itens"])
+m3.metric("Machos", total["total_M"])
+m4.metric("Fêmeas", total["total_F"])
+
+if not dados["lotes"]:
+    st.info(f"Nenhum lote para os filtros atuais ({dados['filtros']}).")
+    encerrar_perfil()
+    st.stop()
+
+# ------------------ Tabela ------------------
+etapa("tabela")
+def _linha_tabela(it: dict, rotulo: str) -> dict:
+    status_txt = {"concluido": "Concluído", "pendente": "Pendente"}.get(it["status"], "")
+    linha = {"Lote": rotulo, "Status": status_txt, "GTA": it["gta_saida"] or "", "Itens": it["itens"]}
+    for label, _ in FAIXAS:
+        linha[f"M {label}"] = it["M"][label]
+        linha[f"F {label}"] = it["F"][label]
+    linha["Total M"] = it["total_M"]
+    linha["Total F"] = it["total_F"]
+    return linha
+
+linhas = [_linha_tabela(it, str(it["numero"])) for it in dados["lotes"]]
+linhas.append(_linha_tabela({**total, "status": "", "gta_saida": ""}, "Total"))
+st.dataframe(linhas, use_container_width=True, hide_index=True)
+
+# ------------------ Arquivos ------------------
+etapa("arquivos")
+# gerados sob demanda; ficam em session_state enquanto os números não mudarem
+chave = ("gta_consolidada", tuple(sorted(numeros)), status, str(de), str(ate))
+cache = st.session_state.get("gta_consolidada")
+if cache and (cache["chave"] != chave or cache["dados"] != dados):
+    cache = None
+    st.session_state.pop("gta_consolidada", None)
+
+b1, b2 = st.columns(2)
+with b1:
+    if cache and "pdf" in cache:
+        st.download_button("⬇️ Baixar PDF", data=cache["pdf"], file_name="gta_consolidada.pdf",
+                           mime="application/pdf", use_container_width=True)
+        st.link_button("🔎 Abrir PDF em nova aba", use_container_width=True,
+                       url=url_temporaria(cache["pdf"], "application/pdf", "gta_consolidada.pdf", "abrir_gta_pdf"))
+    elif st.button("📄 Gerar PDF", type="primary", use_container_width=True):
+        with medir("build_pdf"):
+            cache = {**(cache or {"chave": chave, "dados": dados}), "pdf": gta.build_pdf(dados)}
+        st.session_state["gta_consolidada"] = cache
+        st.rerun()
+with b2:
+    if cache and "xlsx" in cache:
+        st.download_button("⬇️ Baixar XLSX", data=cache["xlsx"], file_name="gta_consolidada.xlsx",
+                           mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                           use_container_width=True)
+    elif st.button("📊 Gerar XLSX", use_container_width=True):
+        with medir("build_xlsx"):
+            cache = {**(cache or {"chave": chave, "dados": dados}), "xlsx": gta.build_xlsx(dados)}
+        st.session_state["gta_consolidada"] = cache
+        st.rerun()
+
+encerrar_perfil()
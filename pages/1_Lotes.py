@@ -1,130 +1,36 @@
 import streamlit as st
-import sqlite3
-from datetime import datetime
 import html as html_lib
-import base64
-import streamlit.components.v1 as components
 
-from ui_nav import hide_default_sidebar_nav, render_sidebar_nav  # sidebar custom
+from ui_nav import (  # sidebar custom
+    encerrar_perfil, hide_default_sidebar_nav, iniciar_perfil, render_sidebar_nav, rerun_fragmento,
+)
+from leilao.db import BancoOcupado, ensure_schema
+from leilao.lotes import ALTERADO, atribuir_gta, list_lotes, set_lote_status, set_lotes_status
+from leilao.perfil import etapa
 
 # ----------------- Config -----------------
+iniciar_perfil("Lotes")
 st.set_page_config(page_title="Lotes", page_icon="✅", layout="wide")
 hide_default_sidebar_nav()
 render_sidebar_nav()
 st.title("✅ Lotes")
-st.caption("Clique em um card para alternar o status do lote. Pendentes aparecem primeiro.")
-
-DB_PATH = "dados.db"
-
-def abrir_pdf_nova_aba(pdf_bytes: bytes):
-    b64 = base64.b64encode(pdf_bytes).decode("utf-8")
-    components.html(
-        f"""
-        <script>
-        (function() {{
-          try {{
-            const b64 = "{b64}";
-            const bin = atob(b64);
-            const len = bin.length;
-            const bytes = new Uint8Array(len);
-            for (let i = 0; i < len; i++) bytes[i] = bin.charCodeAt(i);
-            const blob = new Blob([bytes], {{ type: "application/pdf" }});
-            const url = URL.createObjectURL(blob);
-            const w = window.open("", "_blank");
-            if (w) {{ w.location = url; }}
-            else {{
-              const a = document.createElement('a');
-              a.href = url; a.target = "_blank"; a.click();
-            }}
-            setTimeout(() => URL.revokeObjectURL(url), 60000);
-          }} catch (e) {{
-            console.error("Falha ao abrir PDF:", e);
-            alert("Não foi possível abrir o PDF. Faça o download.");
-          }}
-        }})();
-        </script>
-        """,
-        height=0,
-    )
-
-# ----------------- DB helpers -----------------
-def _connect():
-    return sqlite3.connect(DB_PATH)
-
-def _ensure_schema_lotes_status():
-    with _connect() as conn:
-        conn.execute("""
-        CREATE TABLE IF NOT EXISTS lotes (
-            numero INTEGER PRIMARY KEY,
-            criado_em TEXT,
-            status TEXT NOT NULL DEFAULT 'pendente',
-            concluido_em TEXT,
-            gta_saida TEXT
-        )""")
-        cols = {r[1] for r in conn.execute("PRAGMA table_info(lotes)").fetchall()}
-        if "status" not in cols:
-            conn.execute("ALTER TABLE lotes ADD COLUMN status TEXT NOT NULL DEFAULT 'pendente'")
-        if "concluido_em" not in cols:
-            conn.execute("ALTER TABLE lotes ADD COLUMN concluido_em TEXT")
-        if "gta_saida" not in cols:
-            conn.execute("ALTER TABLE lotes ADD COLUMN gta_saida TEXT")
-        conn.execute("""
-        CREATE TABLE IF NOT EXISTS lote_itens (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            lote_numero INTEGER NOT NULL,
-            animal_rowid INTEGER NOT NULL,
-            UNIQUE(lote_numero, animal_rowid)
-        )""")
-        conn.commit()
-
-def _get_lote(numero: int):
-    with _connect() as conn:
-        r = conn.execute(
-            "SELECT numero, status, criado_em, concluido_em, gta_saida FROM lotes WHERE numero=?",
-            (int(numero),)
-        ).fetchone()
-    if r:
-        return {"numero": r[0], "status": r[1], "criado_em": r[2], "concluido_em": r[3], "gta_saida": r[4]}
-    return None
-
-def _list_lotes():
-    with _connect() as conn:
-        rows = conn.execute("""
-            SELECT L.numero,
-                   COALESCE(L.status,'pendente') AS status,
-                   L.criado_em,
-                   L.gta_saida,
-                   COUNT(I.id) AS itens
-            FROM lotes L
-            LEFT JOIN lote_itens I ON I.lote_numero = L.numero
-            GROUP BY L.numero, L.status, L.criado_em, L.gta_saida
-        """).fetchall()
-    return [{"numero": r[0], "status": r[1], "criado_em": r[2], "gta_saida": r[3], "itens": r[4]} for r in rows]
-
-def _set_lote_status(numero: int, status: str, gta_saida: str | None = None):
-    status = "concluido" if status == "concluido" else "pendente"
-    with _connect() as conn:
-        if status == "concluido":
-            conn.execute(
-                "UPDATE lotes SET status=?, concluido_em=?, gta_saida=? WHERE numero=?",
-                (status, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), gta_saida, int(numero)),
-            )
-        else:
-            conn.execute(
-                "UPDATE lotes SET status=?, concluido_em=NULL, gta_saida=NULL WHERE numero=?",
-                (status, int(numero)),
-            )
-        conn.commit()
+st.caption(
+    "Clique em um card para alternar o status do lote. Pendentes aparecem primeiro; "
+    "um lote recém-alterado muda de grupo ao recarregar a página."
+)
 
 # ----------------- Bootstrap -----------------
-_ensure_schema_lotes_status()
+etapa("schema")
+ensure_schema()
 
 # ----------------- Query + Ordenação -----------------
-lotes = _list_lotes()
+etapa("consultas")
+lotes = list_lotes()
 pendentes  = sorted([l for l in lotes if l["status"] != "concluido"], key=lambda x: x["numero"])
 concluidos = sorted([l for l in lotes if l["status"] == "concluido"], key=lambda x: x["numero"])
 
 # ----------------- Estilo -----------------
+etapa("widgets")
 st.markdown("""
 <style>
 :root{
@@ -175,21 +81,38 @@ div[data-testid="stButton"] > button{
 """, unsafe_allow_html=True)
 
 # ----------------- Estado -----------------
-if "pending_action" not in st.session_state:
-    st.session_state["pending_action"] = None
-if "pending_gta" not in st.session_state:
-    st.session_state["pending_gta"] = ""
+# Cada card é um fragmento: Concluir/Reabrir/Cancelar reexecutam só o card clicado.
+# acoes_lote: numero -> "concluir"/"reabrir" (painel de confirmação aberto no card)
+# lotes_atualizados: linha relida de um lote que mudou por um clique no card; vale até
+# a próxima execução da página inteira, que relê todos os lotes (e reagrupa/reordena).
+if "acoes_lote" not in st.session_state:
+    st.session_state["acoes_lote"] = {}
+st.session_state["lotes_atualizados"] = {}
+st.session_state["avisos_lote"] = {}
 
 def _open_conclude_dialog(numero: int):
-    st.session_state["pending_action"] = {"type": "concluir", "numero": int(numero)}
-    st.session_state["pending_gta"] = ""
+    st.session_state["acoes_lote"][int(numero)] = "concluir"
+    st.session_state[f"gta_input_{numero}"] = ""
 
 def _open_reopen_dialog(numero: int):
-    st.session_state["pending_action"] = {"type": "reabrir", "numero": int(numero)}
+    st.session_state["acoes_lote"][int(numero)] = "reabrir"
 
-def _close_dialog():
-    st.session_state["pending_action"] = None
-    st.session_state["pending_gta"] = ""
+def _close_dialog(numero: int):
+    st.session_state["acoes_lote"].pop(int(numero), None)
+
+def _aplicar_status(numero: int, status: str, gta: str | None = None):
+    """Grava o status e redesenha só este card; se outro operador já mudou o lote, avisa em vez de sobrescrever."""
+    try:
+        mudou = set_lote_status(numero, status, gta)
+    except BancoOcupado as e:
+        st.error(f"❌ {e}")
+        return
+    if not mudou:
+        atual = "concluído" if status == "concluido" else "pendente"
+        st.session_state["avisos_lote"][int(numero)] = f"Lote #{numero} já estava {atual} (alterado por outro operador)."
+    relido = list_lotes(numero)
+    st.session_state["lotes_atualizados"][int(numero)] = relido[0] if relido else None
+    _close_dialog(numero); rerun_fragmento()
 
 # ----------------- UI helpers -----------------
 def _render_inline_confirm(numero: int, tipo: str, gta_atual: str | None = None):
@@ -199,9 +122,8 @@ def _render_inline_confirm(numero: int, tipo: str, gta_atual: str | None = None)
 
         if tipo == "concluir":
             # apenas o input + botões (sem rótulo/linha extra)
-            st.session_state["pending_gta"] = st.text_input(
+            gta_digitada = st.text_input(
                 "Nº da GTA (opcional)",
-                value=st.session_state.get("pending_gta",""),
                 key=f"gta_input_{numero}",
                 placeholder="Informe o n° da GTA de saida ex: 010101-E",
                 label_visibility="collapsed",
@@ -209,15 +131,13 @@ def _render_inline_confirm(numero: int, tipo: str, gta_atual: str | None = None)
             c1, c2, c3 = st.columns([1,1,1])
             with c1:
                 if st.button("💾 Salvar", key=f"btn_save_concluir_{numero}", use_container_width=True):
-                    _set_lote_status(numero, "concluido", (st.session_state["pending_gta"] or None))
-                    _close_dialog(); st.rerun()
+                    _aplicar_status(numero, "concluido", (gta_digitada or None))
             with c2:
                 if st.button("✔️ Concluir", key=f"btn_concluir_sem_gta_{numero}", use_container_width=True):
-                    _set_lote_status(numero, "concluido", None)
-                    _close_dialog(); st.rerun()
+                    _aplicar_status(numero, "concluido", None)
             with c3:
                 if st.button("Cancelar", key=f"btn_cancel_concluir_{numero}", use_container_width=True):
-                    _close_dialog(); st.rerun()
+                    _close_dialog(numero); rerun_fragmento()
 
         elif tipo == "reabrir":
             # mensagem curta + botões
@@ -227,70 +147,172 @@ def _render_inline_confirm(numero: int, tipo: str, gta_atual: str | None = None)
             with c1:
                 lbl = "↩️ Reabrir e excluir GTA" if gta_atual else "↩️ Reabrir"
                 if st.button(lbl, key=f"btn_reabrir_{numero}", use_container_width=True):
-                    _set_lote_status(numero, "pendente")
-                    _close_dialog(); st.rerun()
+                    _aplicar_status(numero, "pendente")
             with c2:
                 if st.button("Cancelar", key=f"btn_cancel_reabrir_{numero}", use_container_width=True):
-                    _close_dialog(); st.rerun()
+                    _close_dialog(numero); rerun_fragmento()
 
         st.markdown("</div>", unsafe_allow_html=True)
 
-# ----------------- Grid -----------------
-def _render_grid(items_list):
-    if not items_list: return
-    COLS = 4
-    rows = (len(items_list) + COLS - 1) // COLS
-    idx = 0
-    for _ in range(rows):
-        cols = st.columns(COLS)
-        for c in cols:
-            if idx >= len(items_list): break
-            lote = items_list[idx]; idx += 1
+# ----------------- Card -----------------
+@st.fragment
+def _card(lote: dict):
+    """Um card. Num rerun só do fragmento o Streamlit repassa o `lote` da execução
+    completa: se o card mudou desde então, vale a linha relida em lotes_atualizados."""
+    numero = lote["numero"]
+    atualizados = st.session_state["lotes_atualizados"]
+    if numero in atualizados:
+        lote = atualizados[numero]
+        if lote is None:
+            st.caption(f"Lote #{numero} foi excluído.")
+            return
 
-            numero = lote["numero"]
-            status = lote["status"]
-            itens  = lote["itens"]
-            gta    = lote.get("gta_saida") or None
+    aviso = st.session_state["avisos_lote"].pop(numero, None)
+    if aviso:
+        st.warning(aviso)
 
-            done = (status == "concluido")
-            badge_text = "☑ Concluído" if done else "☐ Pendente"
-            badge_cls  = "ok" if done else "pending"
-            card_cls   = "card-concluido" if done else "card-pendente"
-            extra_meta = f" • GTA: <b>{html_lib.escape(gta)}</b>" if (done and gta) else ""
+    status = lote["status"]
+    itens  = lote["itens"]
+    cabecas = lote.get("cabecas", 0)
+    gta    = lote.get("gta_saida") or None
 
-            with c:
-                st.markdown(
+    done = (status == "concluido")
+    badge_text = "☑ Concluído" if done else "☐ Pendente"
+    badge_cls  = "ok" if done else "pending"
+    card_cls   = "card-concluido" if done else "card-pendente"
+    extra_meta = f" • GTA: <b>{html_lib.escape(gta)}</b>" if (done and gta) else ""
+
+    st.markdown(
 f"""
 <div class="card-lote {card_cls}">
   <span class="ribbon">{'Concluído' if done else 'Pendente'}</span>
   <div class="title">Lote #{numero}</div>
-  <div class="meta">Itens: <b>{itens}</b>{extra_meta}</div>
+  <div class="meta">Itens: <b>{itens}</b> • Cabeças: <b>{cabecas}</b>{extra_meta}</div>
   <div style="margin-top:8px;"><span class="badge {badge_cls}">{badge_text}</span></div>
 </div>
 """, unsafe_allow_html=True)
 
-                # linha de botões
-                b1, b2 = st.columns([1,1])
-                with b1:
-                    toggle_label = "↩️ Reabrir" if done else "✅ Concluir"
-                    if st.button(toggle_label, key=f"toggle_{numero}", use_container_width=True):
-                        if done: _open_reopen_dialog(numero)
-                        else:    _open_conclude_dialog(numero)
-                with b2:
-                    if st.button("🖨️ Imprimir", key=f"imprimir_{numero}", use_container_width=True):
-                        try:
-                            st.query_params.clear(); st.query_params["lote"] = str(numero)
-                        except Exception:
-                            st.experimental_set_query_params(lote=numero)
-                        st.session_state["lote_para_imprimir"] = int(numero)
-                        st.switch_page("pages/5_Imprimir.py")
-
-                # confirmação ancorada ao card acionado
-                pa = st.session_state.get("pending_action")
-                if pa and pa.get("numero") == numero:
-                    _render_inline_confirm(numero, pa.get("type"), gta_atual=gta)
+    st.checkbox("Marcar", key=f"sel_lote_{numero}", help="Para as ações em vários lotes (acima da grade)")
+
+    # linha de botões
+    b1, b2 = st.columns([1,1])
+    with b1:
+        toggle_label = "↩️ Reabrir" if done else "✅ Concluir"
+        if st.button(toggle_label, key=f"toggle_{numero}", use_container_width=True):
+            if done: _open_reopen_dialog(numero)
+            else:    _open_conclude_dialog(numero)
+    with b2:
+        if st.button("🖨️ Imprimir", key=f"imprimir_{numero}", use_container_width=True):
+            try:
+                st.query_params.clear(); st.query_params["lote"] = str(numero)
+            except Exception:
+                st.experimental_set_query_params(lote=numero)
+            st.session_state["lote_para_imprimir"] = int(numero)
+            st.switch_page("pages/5_Imprimir.py")
+
+    # confirmação ancorada ao card acionado (painel aberto para o outro status: descarta)
+    tipo = st.session_state["acoes_lote"].get(numero)
+    if tipo and tipo != ("reabrir" if done else "concluir"):
+        _close_dialog(numero); tipo = None
+    if tipo:
+        _render_inline_confirm(numero, tipo, gta_atual=gta)
+
+# ----------------- Grid -----------------
+def _render_grid(items_list):
+    if not items_list: return
+    COLS = 4
+    for i in range(0, len(items_list), COLS):
+        cols = st.columns(COLS)
+        for c, lote in zip(cols, items_list[i:i + COLS]):
+            with c:
+                _card(lote)
+
+# ----------------- Vários lotes -----------------
+ACOES_EM_MASSA = {"concluir": "concluído(s)", "reabrir": "reaberto(s)", "gta": "com GTA atribuída"}
+
+def _marcados() -> list[int]:
+    # lido na hora do clique: marcar um card só reexecuta o card, não esta parte da página
+    return [l["numero"] for l in lotes if st.session_state.get(f"sel_lote_{l['numero']}")]
+
+def _marcar(numeros, valor: bool = True):
+    for n in numeros:
+        st.session_state[f"sel_lote_{n}"] = valor
+
+def _aplicar_em_massa(acao: str, numeros: list[int], gta: str | None):
+    """Uma transação para todos os marcados; o resultado por lote aparece depois do rerun."""
+    try:
+        if acao == "concluir":
+            res = set_lotes_status(numeros, "concluido", gta)
+        elif acao == "reabrir":
+            res = set_lotes_status(numeros, "pendente")
+        else:
+            res = atribuir_gta(numeros, gta)
+    except BancoOcupado as e:
+        st.error(f"❌ {e}")
+        return
+    st.session_state["resultado_em_massa"] = (acao, res)
+    st.session_state.pop("confirmar_em_massa", None)
+    _marcar(res, False)
+    st.rerun()
+
+def _resultado_em_massa(acao: str, res: dict[int, str]):
+    feitos = [n for n, r in res.items() if r == ALTERADO]
+    outros = {n: r for n, r in res.items() if r != ALTERADO}
+    msg = f"{len(feitos)} lote(s) {ACOES_EM_MASSA[acao]}."
+    if outros:
+        st.warning(f"{msg} {len(outros)} sem alteração (detalhes abaixo).")
+    else:
+        st.success(f"✅ {msg}")
+    with st.expander("Resultado por lote", expanded=bool(outros)):
+        st.dataframe([{"Lote": n, "Resultado": r} for n, r in res.items()], hide_index=True, use_container_width=True)
+
+etapa("vários lotes")
+_res = st.session_state.pop("resultado_em_massa", None)
+if _res:
+    _resultado_em_massa(*_res)
+
+with st.expander("☑️ Ações em vários lotes", expanded="confirmar_em_massa" in st.session_state):
+    st.caption("Marque os cards (☐ Marcar) e escolha a ação: todos os marcados mudam numa única gravação.")
+    m1, m2, m3 = st.columns(3)
+    if m1.button("Marcar pendentes", key="marcar_pendentes", use_container_width=True):
+        _marcar(l["numero"] for l in pendentes)
+    if m2.button("Marcar concluídos", key="marcar_concluidos", use_container_width=True):
+        _marcar(l["numero"] for l in concluidos)
+    if m3.button("Limpar marcação", key="limpar_marcacao", use_container_width=True):
+        _marcar((l["numero"] for l in lotes), False)
+
+    gta_massa = st.text_input("Nº da GTA", key="gta_em_massa", placeholder="Para Concluir (opcional) ou Atribuir GTA")
+    a1, a2, a3 = st.columns(3)
+    acao = None
+    if a1.button("✅ Concluir marcados", key="concluir_marcados", use_container_width=True):
+        acao = "concluir"
+    if a2.button("↩️ Reabrir marcados", key="reabrir_marcados", use_container_width=True):
+        acao = "reabrir"
+    if a3.button("🧾 Atribuir GTA aos marcados", key="gta_marcados", use_container_width=True):
+        acao = "gta"
+    if acao:
+        marcados = _marcados()
+        if not marcados:
+            st.warning("Nenhum lote marcado.")
+        elif acao == "gta" and not gta_massa.strip():
+            st.warning("Informe o número da GTA.")
+        elif acao == "reabrir":
+            st.session_state["confirmar_em_massa"] = marcados  # reabrir apaga as GTAs: pede confirmação
+        else:
+            _aplicar_em_massa(acao, marcados, gta_massa.strip() or None)
+
+    confirmar = st.session_state.get("confirmar_em_massa")
+    if confirmar:
+        st.warning(f"Reabrir {len(confirmar)} lote(s)? As GTAs de saída deles serão excluídas.")
+        c1, c2 = st.columns(2)
+        if c1.button("↩️ Confirmar reabertura", key="confirmar_reabrir_marcados", use_container_width=True):
+            _aplicar_em_massa("reabrir", confirmar, None)
+        if c2.button("Cancelar", key="cancelar_reabrir_marcados", use_container_width=True):
+            st.session_state.pop("confirmar_em_massa", None)
+            st.rerun()
 
 # ----------------- Render -----------------
+etapa("cards")
 if pendentes: _render_grid(pendentes)
 
 if concluidos:
@@ -300,3 +322,39 @@ if concluidos:
 
 st.divider()
 st.write(f"**Resumo:** {len(pendentes)} pendente(s) • {len(concluidos)} concluído(s).")
+
+# ----------------- Exportar -----------------
+etapa("exportar")
+with st.expander("📊 Exportar lotes para Excel"):
+    e1, e2 = st.columns([1, 1])
+    with e1:
+        formato = st.radio("Formato", ["Planilha única", "Uma aba por lote"], horizontal=True, key="export_formato")
+    with e2:
+        export_status = st.selectbox("Lotes", ["Todos", "Concluídos", "Pendentes"], key="export_status")
+    por_lote = formato == "Uma aba por lote"
+    status_exp = {"Concluídos": "concluido", "Pendentes": "pendente"}.get(export_status)
+    # gerado sob demanda; vale enquanto formato/filtro e a lista de lotes não mudarem
+    chave_exp = (por_lote, status_exp, tuple((l["numero"], l["status"], l["itens"], l["cabecas"]) for l in lotes))
+    export_cache = st.session_state.get("export_lotes")
+    if export_cache and export_cache["chave"] != chave_exp:
+        export_cache = None
+        st.session_state.pop("export_lotes", None)
+    if export_cache:
+        st.download_button(
+            "⬇️ Baixar XLSX", data=export_cache["xlsx"], file_name="lotes.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            use_container_width=True,
+        )
+        st.caption(f"{export_cache['lotes']} lote(s), {export_cache['itens']} item(ns).")
+    elif st.button("📊 Gerar XLSX", key="btn_export_xlsx", use_container_width=True):
+        from io import BytesIO
+        from leilao.exportacao import exportar_xlsx
+        from leilao.perfil import medir
+
+        buf = BytesIO()
+        with medir("exportar_xlsx"):
+            n = exportar_xlsx(buf, status=status_exp, por_lote=por_lote)
+        st.session_state["export_lotes"] = {"chave": chave_exp, "xlsx": buf.getvalue(), **n}
+        st.rerun()
+
+encerrar_perfil()
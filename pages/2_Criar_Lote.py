@@ -1,10 +1,16 @@
 import streamlit as st
-import pandas as pd
-import sqlite3
-from datetime import datetime
-
-from ui_nav import hide_default_sidebar_nav, render_sidebar_nav  # << sidebar custom
 
+from ui_nav import encerrar_perfil, hide_default_sidebar_nav, iniciar_perfil, render_sidebar_nav  # << sidebar custom
+from leilao import busca, esquema, retrato
+from leilao.db import BancoOcupado, ensure_schema
+from leilao.lotes import (
+    delete_lote, dividir_lote, fetch_animal_by_lacre, fetch_animais_by_rowids, get_lote_itens,
+    juntar_lotes, list_lotes, lote_exists, lotes_of_animal, mover_itens, proximo_numero,
+    remove_lote_item, save_lote_itens, upsert_lote,
+)
+from leilao.perfil import etapa
+
+iniciar_perfil("Criar Lote")
 st.set_page_config(page_title="Criar Lote", page_icon="🆕", layout="wide")
 
 # sidebar com ícones (esconde a nativa)
@@ -12,109 +18,17 @@ hide_default_sidebar_nav()
 render_sidebar_nav()
 
 st.title("🆕 Criar Lote")
-# ---------------- utilitários ----------------
-DB_PATH = "dados.db"
-
-def _connect():
-    return sqlite3.connect(DB_PATH)
-
-def _ensure_schema():
-    with _connect() as conn:
-        conn.execute("""
-        CREATE TABLE IF NOT EXISTS lotes (
-            numero INTEGER PRIMARY KEY,
-            criado_em TEXT
-        )""")
-        conn.execute("""
-        CREATE TABLE IF NOT EXISTS lote_itens (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            lote_numero INTEGER NOT NULL,
-            animal_rowid INTEGER NOT NULL,
-            UNIQUE(lote_numero, animal_rowid)
-        )""")
-        conn.commit()
-
-def _lote_exists(numero: int) -> bool:
-    with _connect() as conn:
-        cur = conn.execute("SELECT 1 FROM lotes WHERE numero = ?", (numero,))
-        return cur.fetchone() is not None
-
-def _get_lote_itens(numero: int) -> list[int]:
-    with _connect() as conn:
-        cur = conn.execute("SELECT animal_rowid FROM lote_itens WHERE lote_numero = ? ORDER BY id", (numero,))
-        return [r[0] for r in cur.fetchall()]
-
-def _upsert_lote(numero: int):
-    with _connect() as conn:
-        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        conn.execute("INSERT OR IGNORE INTO lotes(numero, criado_em) VALUES(?, ?)", (numero, now))
-        conn.commit()
-
-def _save_lote_itens(numero: int, rowids: list[int]):
-    if not rowids:
-        return
-    with _connect() as conn:
-        for rid in rowids:
-            conn.execute(
-                "INSERT OR IGNORE INTO lote_itens(lote_numero, animal_rowid) VALUES(?, ?)",
-                (numero, int(rid))
-            )
-        conn.commit()
-
-def _remove_lote_item(numero: int, animal_rowid: int):
-    with _connect() as conn:
-        conn.execute("DELETE FROM lote_itens WHERE lote_numero = ? AND animal_rowid = ?", (numero, int(animal_rowid)))
-        conn.commit()
-
-def _delete_lote(numero: int):
-    """Exclui TODA a estrutura do lote: itens e o próprio lote."""
-    with _connect() as conn:
-        conn.execute("DELETE FROM lote_itens WHERE lote_numero = ?", (numero,))
-        conn.execute("DELETE FROM lotes WHERE numero = ?", (numero,))
-        conn.commit()
-
-def _fetch_animal_by_lacre(lacre_text: str) -> pd.DataFrame:
-    """
-    Busca por Lacre aceitando texto ou inteiro.
-    """
-    q = str(lacre_text).strip()
-    if not q:
-        return pd.DataFrame()
-    with _connect() as conn:
-        try:
-            df = pd.read_sql(
-                """
-                SELECT rowid, * 
-                FROM animais
-                WHERE CAST(Lacre AS TEXT) = ?
-                   OR Lacre = CAST(? AS INTEGER)
-                """,
-                conn, params=(q, q)
-            )
-        except Exception:
-            df = pd.DataFrame()
-    return df
-
-def _fetch_animais_by_rowids(rowids: list[int]) -> pd.DataFrame:
-    if not rowids:
-        return pd.DataFrame()
-    with _connect() as conn:
-        df = pd.read_sql(
-            f"SELECT rowid, * FROM animais WHERE rowid IN ({','.join(['?']*len(rowids))})",
-            conn, params=tuple(rowids)
-        )
-    order = {rid: i for i, rid in enumerate(rowids)}
-    df["__ord"] = df["rowid"].map(order)
-    df = df.sort_values("__ord").drop(columns=["__ord"])
-    return df
-
-def _lotes_of_animal(animal_rowid: int) -> list[int]:
-    with _connect() as conn:
-        cur = conn.execute("SELECT DISTINCT lote_numero FROM lote_itens WHERE animal_rowid = ?", (int(animal_rowid),))
-        return [r[0] for r in cur.fetchall()]
-
+# aviso deixado pelo rerun anterior (itens que outro operador salvou em outro lote)
+_aviso = st.session_state.pop("aviso_criar_lote", None)
+if _aviso:
+    st.warning(_aviso)
+_feito = st.session_state.pop("feito_criar_lote", None)
+if _feito:
+    st.success(_feito)
 # -------------- estado da página --------------
-_ensure_schema()
+etapa("schema")
+ensure_schema()
+esq = esquema.animais()
 if "lote_numero" not in st.session_state:
     st.session_state.lote_numero = None
 if "lote_buffer" not in st.session_state:
@@ -124,7 +38,115 @@ if "busca_lacre" not in st.session_state:
 if "confirm_delete" not in st.session_state:
     st.session_state.confirm_delete = False  # controle do fluxo de confirmação de exclusão
 
+def _campo(row: dict, campo: str, padrao="") -> str:
+    """Valor do campo lógico (serie, lacre, ... de esquema.animais()) na linha do animal."""
+    col = getattr(esq, campo) if esq else None
+    return row.get(col, padrao) if col else padrao
+
+def _mostrar_resultado(r: dict):
+    """Linha do animal encontrado com o botão de inserir (bloqueado se já estiver em algum lote)."""
+    rid = int(r["rowid"])
+    nserie = _campo(r, "serie")
+    nome = _campo(r, "proprietario")
+    muni = _campo(r, "municipio")
+    lacre = _campo(r, "lacre")
+    st.markdown(f"**Série {nserie} — Lacre {lacre}** — {nome} ({muni})")
+
+    # --- Checagem ADIANTADA: já pertence a algum lote? (inclui este)
+    lotes_existentes = lotes_of_animal(rid) if st.session_state.lote_numero else []
+    can_insert = True
+    if lotes_existentes:
+        if st.session_state.lote_numero in lotes_existentes:
+            st.info("Este item **já está salvo neste lote**.", icon="ℹ️")
+            can_insert = False
+        else:
+            st.warning(f"❗ Este lacre já pertence ao(s) lote(s): {', '.join(map(str, lotes_existentes))}. Não é possível inserir aqui.")
+            can_insert = False
+
+    ins_btn = st.columns([2, 4, 2])
+    if ins_btn[1].button("➕ Inserir no lote", key=f"ins_{rid}", disabled=not can_insert):
+        if not st.session_state.lote_numero:
+            st.error("Selecione um lote antes de inserir itens.")
+        else:
+            # Não rechecamos aqui: já foi checado acima. Apenas evita duplicar no buffer.
+            if rid not in st.session_state.lote_buffer:
+                st.session_state.lote_buffer.append(rid)
+                st.success("Item inserido no lote (pendente).")
+            else:
+                st.info("Este item já está pendente neste lote.")
+
+def _resumo_movidos(res: dict, destino: int) -> tuple[str, str | None]:
+    """(mensagem de sucesso, aviso) de mover/dividir/juntar."""
+    feito = f"{len(res['movidos'])} item(ns) passaram para o lote {destino}."
+    avisos = []
+    if res["ja_no_destino"]:
+        avisos.append(f"{len(res['ja_no_destino'])} já estavam no lote {destino} (só saíram da origem)")
+    if res.get("repetidos"):
+        avisos.append(f"{len(res['repetidos'])} estavam em mais de um dos lotes juntados (entraram uma vez só)")
+    if res["fora_da_origem"]:
+        avisos.append(f"{len(res['fora_da_origem'])} não estavam mais na origem (alterados por outro operador)")
+    return feito, ("; ".join(avisos) + ".") if avisos else None
+
+def _concluir_reorganizar(feito: str, aviso: str | None):
+    """Mensagens para depois do rerun; a seleção sai da sessão (os itens escolhidos já não são deste lote)."""
+    st.session_state["feito_criar_lote"] = feito
+    if aviso:
+        st.session_state["aviso_criar_lote"] = aviso
+    for k in ("reorg_itens", "reorg_todos", "reorg_origens"):
+        st.session_state.pop(k, None)
+    st.rerun()
+
+def _reorganizar(numero: int, rowids_salvos: list[int], salvos_por_rid: dict):
+    """Mover itens salvos para outro lote, dividir em um lote novo ou juntar outros lotes neste."""
+    def _rotulo(rid: int) -> str:
+        row = salvos_por_rid.get(rid, {})
+        return f"{rid} — Série {_campo(row, 'serie')} — Lacre {_campo(row, 'lacre')}"
+
+    with st.expander(f"🔀 Lote #{numero} — Mover / Dividir / Juntar", expanded=False):
+        op = st.radio(
+            "Operação", ["Mover itens", "Dividir em lote novo", "Juntar outros lotes neste"],
+            horizontal=True, key="reorg_op",
+        )
+        try:
+            if op == "Juntar outros lotes neste":
+                outros = [l["numero"] for l in sorted(list_lotes(), key=lambda l: l["numero"]) if l["numero"] != numero]
+                origens = st.multiselect("Lotes que passam para este (e são excluídos)", outros, key="reorg_origens")
+                if st.button(f"🔗 Juntar {len(origens)} lote(s) no lote {numero}", key="reorg_juntar", disabled=not origens):
+                    res = juntar_lotes(origens, numero)
+                    feito, aviso = _resumo_movidos(res, numero)
+                    _concluir_reorganizar(f"{feito} Lote(s) excluído(s): {', '.join(map(str, res['excluidos']))}.", aviso)
+                return
+
+            if not rowids_salvos:
+                st.caption("Este lote não tem itens salvos.")
+                return
+            todos = st.checkbox(f"Todos os {len(rowids_salvos)} itens salvos", key="reorg_todos")
+            sel = rowids_salvos if todos else st.multiselect(
+                "Itens", rowids_salvos, format_func=_rotulo, key="reorg_itens",
+                placeholder="Escolha os itens (ou marque Todos)",
+            )
+            if op == "Mover itens":
+                destino = st.number_input("Lote de destino", min_value=1, step=1, format="%d", key="reorg_destino")
+                if destino and int(destino) != numero and not lote_exists(int(destino)):
+                    st.caption(f"O lote {int(destino)} não existe e será criado.")
+                if st.button(f"➡️ Mover {len(sel)} item(ns) para o lote {int(destino)}", key="reorg_mover",
+                             disabled=not sel or int(destino) == numero):
+                    _concluir_reorganizar(*_resumo_movidos(mover_itens(numero, int(destino), sel), int(destino)))
+            else:
+                novo = st.number_input("Número do lote novo", min_value=1, step=1, format="%d",
+                                       value=proximo_numero(), key="reorg_novo")
+                if st.button(f"✂️ Levar {len(sel)} item(ns) para o lote novo {int(novo)}", key="reorg_dividir",
+                             disabled=not sel):
+                    novo, res = dividir_lote(numero, sel, int(novo))
+                    feito, aviso = _resumo_movidos(res, novo)
+                    _concluir_reorganizar(f"Lote {novo} criado. {feito}", aviso)
+        except BancoOcupado as e:
+            st.error(f"❌ {e}")
+        except ValueError as e:
+            st.error(f"❌ {e}")
+
 # Layout centralizado: uma coluna única no centro da página
+etapa("selecionar lote")
 center_cols = st.columns([1, 8, 1])
 with center_cols[1].container():
     st.subheader("Criar / Gerenciar Lote")
@@ -141,8 +163,8 @@ with center_cols[1].container():
             else:
                 st.session_state.lote_numero = int(numero_lote)
                 st.session_state.confirm_delete = False  # reset do fluxo de exclusão
-                if _lote_exists(st.session_state.lote_numero):
-                    saved_count = len(_get_lote_itens(st.session_state.lote_numero))
+                if lote_exists(st.session_state.lote_numero):
+                    saved_count = len(get_lote_itens(st.session_state.lote_numero))
                     st.session_state.lote_buffer = []  # não puxar salvos pro buffer
                     st.success(f"Lote {st.session_state.lote_numero} carregado ({saved_count} itens salvos).")
                 else:
@@ -155,70 +177,54 @@ with center_cols[1].container():
     # Expander 2 — Inserir Lacres
     # =========================
     with st.expander(f"🧷 Lote #{st.session_state.lote_numero if st.session_state.lote_numero else '—'} — Inserir Lacres", expanded=True):
+        etapa("busca por lacre")
         st.session_state.busca_lacre = st.text_input("Lacre", key="lacre_input", placeholder="Digite o número do lacre")
         s_btn = st.columns([2, 4, 2])
         if s_btn[1].button("🔍 Buscar por Lacre", key="buscar_lacre"):
             pass  # a busca usa a string em session_state
 
-        df_busca = _fetch_animal_by_lacre(st.session_state.busca_lacre)
-        if st.session_state.busca_lacre and df_busca.empty:
-            st.warning("Nenhum registro encontrado para este lacre.")
-
-        if not df_busca.empty:
+        resultados = fetch_animal_by_lacre(st.session_state.busca_lacre)
+        if resultados:
             st.markdown("**Resultado da busca:**")
-            for _, r in df_busca.iterrows():
-                rid = int(r["rowid"])
-                nserie = r.get("N.º Série", "")
-                nome = r.get("Proprietário Origem", "")
-                muni = r.get("Município Origem", "")
-                lacre = r.get("Lacre", "")
-                st.markdown(f"**Série {nserie} — Lacre {lacre}** — {nome} ({muni})")
-
-                # --- Checagem ADIANTADA: já pertence a algum lote? (inclui este)
-                lotes_existentes = _lotes_of_animal(rid) if st.session_state.lote_numero else []
-                can_insert = True
-                if lotes_existentes:
-                    if st.session_state.lote_numero in lotes_existentes:
-                        st.info("Este item **já está salvo neste lote**.", icon="ℹ️")
-                        can_insert = False
-                    else:
-                        st.warning(f"❗ Este lacre já pertence ao(s) lote(s): {', '.join(map(str, lotes_existentes))}. Não é possível inserir aqui.")
-                        can_insert = False
-
-                ins_btn = st.columns([2, 4, 2])
-                if ins_btn[1].button("➕ Inserir no lote", key=f"ins_{rid}", disabled=not can_insert):
-                    if not st.session_state.lote_numero:
-                        st.error("Selecione um lote antes de inserir itens.")
-                    else:
-                        # Não rechecamos aqui: já foi checado acima. Apenas evita duplicar no buffer.
-                        if rid not in st.session_state.lote_buffer:
-                            st.session_state.lote_buffer.append(rid)
-                            st.success("Item inserido no lote (pendente).")
-                        else:
-                            st.info("Este item já está pendente neste lote.")
+            for r in resultados:
+                _mostrar_resultado(r)
+        elif st.session_state.busca_lacre:
+            # lacre não existe: completa pelo início e sugere os parecidos (dígito trocado/faltando)
+            etapa("busca aproximada")
+            sugestoes = busca.lacres(st.session_state.busca_lacre, limite=8)
+            if not sugestoes:
+                st.warning("Nenhum registro encontrado para este lacre.")
+            else:
+                st.warning("Lacre não encontrado. Lacres parecidos:")
+                ret = retrato.animais()
+                for achado in sugestoes:
+                    for pos in achado.posicoes:
+                        _mostrar_resultado(ret.linha(pos))
 
     # =========================
     # Expander 3 — Itens do Lote (Pendentes x Salvos)
     # =========================
     # Itens salvos no banco
-    rowids_salvos = _get_lote_itens(st.session_state.lote_numero) if st.session_state.lote_numero else []
-    df_salvos = _fetch_animais_by_rowids(rowids_salvos) if rowids_salvos else pd.DataFrame()
+    etapa("itens: consultas")
+    rowids_salvos = get_lote_itens(st.session_state.lote_numero) if st.session_state.lote_numero else []
+    salvos_por_rid = fetch_animais_by_rowids(rowids_salvos)
 
     # Pendentes = buffer - salvos
     pendentes = [int(rid) for rid in st.session_state.lote_buffer if int(rid) not in set(rowids_salvos)]
-    df_buffer = _fetch_animais_by_rowids(pendentes)
+    buffer_por_rid = fetch_animais_by_rowids(pendentes)
 
+    etapa("itens: widgets")
     with st.expander(f"📦 Itens do Lote — pendentes: {len(pendentes)} | salvos: {len(rowids_salvos)}", expanded=True):
         # PENDENTES
         st.markdown("### Pendentes")
-        if df_buffer.empty:
+        if not buffer_por_rid:
             st.caption("Nenhum item pendente. Busque um lacre e clique em Inserir.")
         else:
             st.write("Use **Salvar** para gravar no banco ou **Remover** para tirar dos pendentes.")
             for rid in list(pendentes):
-                row = df_buffer.loc[df_buffer['rowid'] == rid] if 'rowid' in df_buffer.columns else None
-                serie = row['N.º Série'].values[0] if row is not None and not row.empty and 'N.º Série' in row.columns else ''
-                lacre = row['Lacre'].values[0] if row is not None and not row.empty and 'Lacre' in row.columns else ''
+                row = buffer_por_rid.get(rid, {})
+                serie = _campo(row, "serie")
+                lacre = _campo(row, "lacre")
                 # layout: descrição | Salvar | Remover (larguras para evitar quebra)
                 cols = st.columns([7, 2, 2])
                 cols[0].markdown(f"{rid} — Série {serie} — **Lacre {lacre}**")
@@ -229,11 +235,14 @@ with center_cols[1].container():
                         st.error("Nenhum número de lote selecionado.")
                     else:
                         try:
-                            _upsert_lote(st.session_state.lote_numero)
-                            _save_lote_itens(st.session_state.lote_numero, [int(rid)])
+                            upsert_lote(st.session_state.lote_numero)
+                            if save_lote_itens(st.session_state.lote_numero, [int(rid)]):
+                                st.session_state["aviso_criar_lote"] = f"Lacre {lacre} já foi salvo em outro lote por outro operador."
                             st.session_state.lote_buffer = [r for r in st.session_state.lote_buffer if int(r) != int(rid)]
                             st.success(f"Item salvo no lote {st.session_state.lote_numero}.")
                             st.rerun()
+                        except BancoOcupado as e:
+                            st.error(f"❌ {e}")
                         except Exception as e:
                             st.error("❌ Erro ao salvar este item.")
                             st.exception(e)
@@ -252,26 +261,38 @@ with center_cols[1].container():
         if not st.session_state.lote_numero:
             st.caption("Selecione ou carregue um lote para ver os itens salvos.")
         else:
-            if df_salvos.empty:
+            if not salvos_por_rid:
                 st.caption("Ainda não há itens salvos neste lote.")
             else:
                 st.write("Clique em **Remover** ao lado do item que deseja excluir do lote (salvo).")
                 for rid in rowids_salvos:
-                    row = df_salvos.loc[df_salvos['rowid'] == rid] if 'rowid' in df_salvos.columns else None
-                    serie = row['N.º Série'].values[0] if row is not None and not row.empty and 'N.º Série' in row.columns else ''
-                    lacre = row['Lacre'].values[0] if row is not None and not row.empty and 'Lacre' in row.columns else ''
+                    row = salvos_por_rid.get(rid, {})
+                    serie = _campo(row, "serie")
+                    lacre = _campo(row, "lacre")
                     cols = st.columns([8, 1])
                     cols[0].markdown(f"{rid} — Série {serie} — **Lacre {lacre}**")
                     if cols[1].button("🗑️ Remover", key=f"rem_sal_{rid}"):
-                        _remove_lote_item(st.session_state.lote_numero, int(rid))
-                        st.success("Item removido do lote.")
-                        st.rerun()
+                        try:
+                            remove_lote_item(st.session_state.lote_numero, int(rid))
+                        except BancoOcupado as e:
+                            st.error(f"❌ {e}")
+                        else:
+                            st.success("Item removido do lote.")
+                            st.rerun()
+
+    # =========================
+    # Expander 4 — Mover / Dividir / Juntar (uma gravação para todos os itens)
+    # =========================
+    if st.session_state.lote_numero and lote_exists(st.session_state.lote_numero):
+        etapa("reorganizar")
+        _reorganizar(st.session_state.lote_numero, rowids_salvos, salvos_por_rid)
 
     st.divider()
 
     # =========================
     # Rodapé — Salvar Lote & Excluir Lote
     # =========================
+    etapa("rodapé")
     footer = st.columns([3, 2, 2, 3])
     # Salvar Lote
     if footer[1].button("💾 Salvar Lote", key="salvar_lote"):
@@ -279,11 +300,17 @@ with center_cols[1].container():
             st.error("Nenhum número de lote selecionado.")
         else:
             try:
-                _upsert_lote(st.session_state.lote_numero)
-                _save_lote_itens(st.session_state.lote_numero, pendentes)  # só os novos
-                st.success(f"Lote {st.session_state.lote_numero} salvo com {len(pendentes)} item(ns) novo(s).")
+                upsert_lote(st.session_state.lote_numero)
+                ignorados = save_lote_itens(st.session_state.lote_numero, pendentes)  # só os novos
+                if ignorados:
+                    st.session_state["aviso_criar_lote"] = (
+                        f"{len(ignorados)} item(ns) não foram salvos: outro operador já os colocou em outro lote."
+                    )
+                st.success(f"Lote {st.session_state.lote_numero} salvo com {len(pendentes) - len(ignorados)} item(ns) novo(s).")
                 st.session_state.lote_buffer = []  # limpa pendentes
                 st.rerun()
+            except BancoOcupado as e:
+                st.error(f"❌ {e}")
             except Exception as e:
                 st.error("❌ Erro ao salvar o lote.")
                 st.exception(e)
@@ -306,16 +333,20 @@ with center_cols[1].container():
         conf_cols = st.columns([3, 2, 2, 3])
         if conf_cols[1].button("✅ Confirmar exclusão", key="confirmar_excluir_lote"):
             try:
-                _delete_lote(st.session_state.lote_numero)
+                delete_lote(st.session_state.lote_numero)
                 st.success(f"Lote {st.session_state.lote_numero} e todos os seus itens foram excluídos.")
                 # limpa estados
                 st.session_state.lote_buffer = []
                 st.session_state.lote_numero = None
                 st.session_state.confirm_delete = False
                 st.rerun()
+            except BancoOcupado as e:
+                st.error(f"❌ {e}")
             except Exception as e:
                 st.error("❌ Erro ao excluir o lote.")
                 st.exception(e)
 
         if conf_cols[2].button("↩️ Cancelar", key="cancelar_excluir_lote"):
             st.session_state.confirm_delete = False
+
+encerrar_perfil()
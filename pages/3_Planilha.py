@@ -1,9 +1,11 @@
 import streamlit as st
-import pandas as pd
-import sqlite3
 
-from ui_nav import hide_default_sidebar_nav, render_sidebar_nav  # sidebar custom
+from ui_nav import encerrar_perfil, hide_default_sidebar_nav, iniciar_perfil, render_sidebar_nav  # sidebar custom
+from leilao import busca, esquema, retrato
+from leilao.db import ensure_schema
+from leilao.perfil import etapa
 
+iniciar_perfil("Planilha")
 st.set_page_config(page_title="Planilha", page_icon="📑", layout="wide")
 
 # sidebar com ícones (esconde a nativa)
@@ -11,50 +13,51 @@ hide_default_sidebar_nav()
 render_sidebar_nav()
 
 st.title("📑 Planilha")
-def _connect():
-    return sqlite3.connect("dados.db")
-
-with _connect() as conn:
-    try:
-        df = pd.read_sql("SELECT rowid, * FROM animais", conn)
-    except Exception as e:
-        st.info("ℹ️ Ainda não há a tabela **animais** no banco (ou está vazia). Importe/insira registros para visualizar aqui.")
-        st.stop()
-
-if df.empty:
-    st.warning("⚠️ Nenhum dado encontrado na tabela **animais**.")
+etapa("consulta")
+ensure_schema()
+# retrato compartilhado de `animais` (uma cópia por processo, relida só quando os dados mudam)
+ret = retrato.animais()
+esq = esquema.animais()
+if ret is None or esq is None:
+    st.info("ℹ️ Ainda não há a tabela **animais** no banco (ou está vazia). Importe/insira registros para visualizar aqui.")
     st.stop()
 
-if df.empty:
-    st.warning("⚠️ Nenhum dado encontrado no banco.")
+if not len(ret):
+    st.warning("⚠️ Nenhum dado encontrado na tabela **animais**.")
     st.stop()
 
 st.markdown("### Registros salvos")
 
 # Busca por caracteres (filtrar por lacre, nome ou série)
+etapa("filtro")
 search = st.text_input("Pesquisar por lacre, nome ou série", value="", placeholder="Digite parte do lacre, nome do proprietário ou nº de série")
 
-# se houver texto de busca, filtra o DataFrame (case-insensitive, substring)
+# se houver texto de busca, filtra as posições do retrato (case-insensitive, substring);
+# o teste roda uma vez por valor distinto de cada coluna, não por linha
 if search:
-    s = search.strip().lower()
-    def _match(row):
-        # tenta obter valores possíveis e verificar se s está contido
-        lacre = str(row.get('Lacre', '') or '')
-        nome = str(row.get('Proprietário Origem', '') or '')
-        serie = str(row.get('N.º Série', '') or '')
-        return (s in lacre.lower()) or (s in nome.lower()) or (s in serie.lower())
-
-    df = df[df.apply(_match, axis=1)]
+    posicoes = ret.buscar(search, [c for c in (esq.lacre, esq.proprietario, esq.serie) if c])
+    if not posicoes:
+        # nada contém o texto: nomes sem acento/abreviados e lacres com dígito trocado ou faltando
+        etapa("busca aproximada")
+        parecidos = busca.proprietarios(search, limite=10) + busca.lacres(search, limite=10)
+        posicoes = list(dict.fromkeys(p for a in parecidos for p in a.posicoes))  # do mais parecido ao menos
+        if posicoes:
+            st.caption("Nenhum registro contém o texto; mostrando os parecidos (nome ou lacre).")
+else:
+    posicoes = range(len(ret))
 
 st.markdown("### Registros salvos")
 
-for _, row in df.iterrows():
+etapa("linhas")
+colunas = [c for c in (esq.lacre, esq.serie, esq.proprietario, esq.municipio) if c]
+for pos in posicoes:
+    row = ret.linha(pos, colunas)
     left, right = st.columns([8, 1])
     # montar linha principal incluindo Lacre
-    lacre_display = row.get('Lacre', '')
-    serie_display = row.get('N.º Série', '(sem nº)')
-    proprietario = row.get('Proprietário Origem', '')
-    municipio = row.get('Município Origem', '')
+    lacre_display = row.get(esq.lacre, '') if esq.lacre else ''
+    serie_display = row.get(esq.serie, '(sem nº)') if esq.serie else '(sem nº)'
+    proprietario = row.get(esq.proprietario, '') if esq.proprietario else ''
+    municipio = row.get(esq.municipio, '') if esq.municipio else ''
 
     left.markdown(
         f"**{serie_display}** — {proprietario} ({municipio})"
@@ -69,3 +72,5 @@ for _, row in df.iterrows():
         st.query_params.clear()
         st.query_params["rowid"] = rid                 # vai pré-preencher o text_input na Editar
         st.switch_page("pages/4_Editar.py")
+
+encerrar_perfil()
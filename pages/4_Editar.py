@@ -1,11 +1,16 @@
 import streamlit as st
-import pandas as pd
+import math
 import sqlite3
 from datetime import datetime, date
 
-from ui_nav import hide_default_sidebar_nav, render_sidebar_nav  # sidebar custom
+from ui_nav import encerrar_perfil, hide_default_sidebar_nav, iniciar_perfil, render_sidebar_nav  # sidebar custom
+from leilao.backup import registrar_escrita
+from leilao import esquema, retrato
+from leilao.db import BancoOcupado, connect, ensure_schema, escrita
+from leilao.perfil import etapa
 
 # ----------------- Config -----------------
+iniciar_perfil("Editar")
 st.set_page_config(page_title="Editar", page_icon="✏️", layout="wide")
 
 # sidebar com ícones (esconde a nativa)
@@ -15,22 +20,20 @@ render_sidebar_nav()
 st.title("✏️ Editar")
 
 # -------------------- Utilidades --------------------
-def _connect():
-    return sqlite3.connect("dados.db")
-
 def _qp_one(name: str):
     v = st.query_params.get(name)
     return v[0] if isinstance(v, list) else v
 
-def _load_row(conn, rid):
-    return pd.read_sql(
-        "SELECT rowid, * FROM animais WHERE rowid = ?",
-        conn,
-        params=(rid,),
-    )
+def _load_row(conn, rid) -> dict | None:
+    conn.row_factory = sqlite3.Row
+    r = conn.execute("SELECT rowid, * FROM animais WHERE rowid = ?", (rid,)).fetchone()
+    return dict(r) if r else None
+
+def _is_missing(x):
+    return x is None or (isinstance(x, float) and math.isnan(x))
 
 def _is_num(x):
-    return isinstance(x, (int, float)) and not pd.isna(x)
+    return isinstance(x, (int, float)) and not isinstance(x, bool) and not _is_missing(x)
 
 def _is_date_like(v):
     if isinstance(v, (datetime, date)):
@@ -52,22 +55,112 @@ def _to_str_dt(v):
     return str(v)
 
 # -------------------- Dados base para seletor --------------------
-with _connect() as conn:
-    try:
-        all_rows = pd.read_sql(
-            'SELECT rowid, `N.º Série`, `Proprietário Origem` FROM animais ORDER BY rowid',
-            conn
-        )
-    except Exception:
-        st.info("ℹ️ Não encontrei a tabela **animais**. Adicione dados antes de usar a edição.")
-        st.stop()
+etapa("seletor: consulta")
+ensure_schema()
+# rowids e séries vêm do retrato compartilhado de `animais` (o registro editado é lido do banco)
+ret = retrato.animais()
+esq = esquema.animais()
+if ret is None or esq is None or not esq.serie:
+    st.info("ℹ️ Não encontrei a tabela **animais**. Adicione dados antes de usar a edição.")
+    st.stop()
 
-if all_rows.empty:
+if not len(ret):
     st.info("ℹ️ A tabela **animais** está vazia. Insira registros para habilitar a edição.")
     st.stop()
-options = all_rows["rowid"].astype(int).tolist()
+options = ret.rowids.tolist()
+
+# -------------------- Edição em lote (grade) --------------------
+def _relatorio(res):
+    """Resultado da última gravação em lote (fica na sessão até a próxima)."""
+    if res.gravadas:
+        st.success(f"✅ {res.gravadas} célula(s) gravada(s).")
+    if res.conflitos:
+        st.warning(f"⚠️ {len(res.conflitos)} célula(s) não gravada(s): o registro mudou depois de carregado.")
+        st.dataframe(
+            [{"Registro": c.alteracao.rowid, "Coluna": c.alteracao.coluna, "Carregado": str(c.alteracao.antes),
+              "Atual": str(c.atual), "Seu valor": str(c.alteracao.depois), "Motivo": c.motivo}
+             for c in res.conflitos],
+            hide_index=True, use_container_width=True,
+        )
+    if res.invalidas:
+        st.error(f"❌ {len(res.invalidas)} célula(s) com valor inválido (não gravadas).")
+        st.dataframe(
+            [{"Registro": v.alteracao.rowid, "Coluna": v.alteracao.coluna,
+              "Valor": str(v.alteracao.depois), "Motivo": v.motivo} for v in res.invalidas],
+            hide_index=True, use_container_width=True,
+        )
+    if not (res.gravadas or res.conflitos or res.invalidas):
+        st.info("Nada mudou: os valores já eram esses.")
+
+def _grade():
+    """Vários registros numa grade filtrada e paginada; Salvar grava as células alteradas numa transação."""
+    import pandas as pd
+    from leilao import edicao
+
+    etapa("grade: filtro")
+    f1, f2 = st.columns([4, 1])
+    filtro = f1.text_input("Filtrar por lacre, nome ou série", key="grade_filtro",
+                           placeholder="Vazio = todos os registros")
+    tamanho = f2.selectbox("Por página", [25, 50, 100, 200], index=1, key="grade_tamanho")
+    campos = [c for c in (esq.lacre, esq.proprietario, esq.serie) if c]
+    posicoes = ret.buscar(filtro, campos) if filtro.strip() else range(len(ret))
+    paginas = max(1, math.ceil(len(posicoes) / tamanho))
+    if st.session_state.get("grade_pagina", 1) > paginas:
+        st.session_state["grade_pagina"] = paginas
+    pagina = st.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas, step=1, key="grade_pagina")
+    ids = [ret.rowids[p] for p in posicoes[(pagina - 1) * tamanho: pagina * tamanho]]
+    st.caption(f"{len(posicoes)} registro(s). Salve antes de trocar de filtro ou de página: as edições não salvas se perdem.")
+
+    # valores de referência lidos do banco ao abrir a página da grade (relidos depois de salvar)
+    etapa("grade: consulta")
+    estado = st.session_state.get("grade")
+    if estado is None or estado["ids"] != ids:
+        estado = {"ids": ids, "linhas": edicao.carregar(ids), "editor": st.session_state.get("grade_n", 0) + 1}
+        st.session_state["grade_n"] = estado["editor"]
+        st.session_state["grade"] = estado
+    if not estado["linhas"]:
+        st.info("Nenhum registro encontrado.")
+        return
+
+    res = st.session_state.pop("grade_relatorio", None)
+    if res is not None:
+        _relatorio(res)
+
+    etapa("grade: editor")
+    chave = f"grade_editor_{estado['editor']}"
+    st.data_editor(
+        pd.DataFrame(estado["linhas"]), key=chave, hide_index=True, num_rows="fixed",
+        disabled=["rowid"], use_container_width=True,
+    )
+    alteracoes = edicao.diferencas(estado["linhas"], (st.session_state.get(chave) or {}).get("edited_rows", {}))
+    b1, b2, _ = st.columns([2, 2, 4])
+    if b1.button(f"💾 Salvar {len(alteracoes)} alteração(ões)", key="grade_salvar",
+                 disabled=not alteracoes, use_container_width=True):
+        etapa("grade: gravar")
+        try:
+            res = edicao.aplicar(alteracoes)
+        except BancoOcupado as e:
+            st.error(f"❌ {e}")
+        else:
+            st.session_state["grade_relatorio"] = res
+            st.session_state.pop("grade", None)  # relê a página da grade (e limpa as edições)
+            st.rerun()
+    if b2.button("↩️ Descartar", key="grade_descartar", disabled=not alteracoes, use_container_width=True):
+        st.session_state.pop("grade", None)
+        st.rerun()
+
+modo = st.radio("Modo", ["Um registro", "Vários (grade)"], horizontal=True, key="modo_edicao")
+if modo == "Vários (grade)":
+    _grade()
+    encerrar_perfil()
+    st.stop()
+
+def _serie(rid: int):
+    pos = ret.posicao(rid)
+    return ret.valor(pos, esq.serie) if pos is not None else None
 
 # Pré-seleção: via URL ou fallback do session_state
+etapa("seletor: widgets")
 preselect_qp = _qp_one("rowid")
 if not preselect_qp and "last_rowid" in st.session_state:
     preselect_qp = st.session_state["last_rowid"]
@@ -92,8 +185,9 @@ txt_val = st.text_input(
 # -------------------- Selectbox (secundário) --------------------
 default_index = 0
 try:
-    if preselect_qp and int(preselect_qp) in options:
-        default_index = options.index(int(preselect_qp))
+    # posição no retrato = índice em options (os dois em ordem de rowid)
+    if preselect_qp and ret.posicao(int(preselect_qp)) is not None:
+        default_index = ret.posicao(int(preselect_qp))
 except Exception:
     pass
 
@@ -101,10 +195,7 @@ sel_val = st.selectbox(
     "Ou selecione o registro",
     options=options,
     index=default_index,
-    format_func=lambda rid: (
-        f"{rid} — Nº Série: "
-        f"{all_rows.loc[all_rows['rowid']==rid, 'N.º Série'].values[0]}"
-    ),
+    format_func=lambda rid: f"{rid} — Nº Série: {_serie(rid)}",
 )
 
 # -------------------- Botão Carregar --------------------
@@ -114,7 +205,7 @@ if st.button("Carregar"):
         chosen = str(int(sel_val))  # fallback
 
     # Validação
-    if not chosen.isdigit() or int(chosen) not in options:
+    if not chosen.isdigit() or ret.posicao(int(chosen)) is None:
         st.error("❌ ID inválido. Informe um rowid existente.")
         st.stop()
 
@@ -129,18 +220,20 @@ if st.button("Carregar"):
 rowid = _qp_one("rowid")
 if not rowid:
     st.info("Informe o ID acima ou selecione e clique em **Carregar**.")
+    encerrar_perfil()
     st.stop()
 
 # -------------------- Carregar registro e formulário --------------------
-with _connect() as conn:
-    df = _load_row(conn, rowid)
+etapa("registro: consulta")
+with connect() as conn:
+    registro = _load_row(conn, rowid)
 
-if df.empty:
+if registro is None:
     st.error("❌ Registro não encontrado.")
     st.stop()
 
-registro = df.iloc[0].to_dict()
 st.subheader(f"Registro #{rowid}")
+etapa("formulário")
 
 with st.form("editar_form"):
     novos = {}
@@ -177,11 +270,12 @@ with st.form("editar_form"):
                 novos[col] = st.number_input(col, value=basef, step=1.0)
 
         else:
-            novos[col] = st.text_input(col, value="" if pd.isna(val) else str(val))
+            novos[col] = st.text_input(col, value="" if _is_missing(val) else str(val))
 
     ok = st.form_submit_button("💾 Alterar")
 
 if ok:
+    etapa("gravar")
     def quote_ident(name: str) -> str:
         # Aspas duplas para identificadores SQLite; escapa aspas internas se houver
         return '"' + str(name).replace('"', '""') + '"'
@@ -199,14 +293,18 @@ if ok:
         # Valores + rowid no final
         values = list(novos.values()) + [int(rowid)]
 
-        with _connect() as conn:
+        with escrita() as conn:
             sql = f'UPDATE {quote_ident("animais")} SET {set_clause} WHERE rowid = ?'
             conn.execute(sql, values)
-            conn.commit()
+        registrar_escrita()
 
         st.success("✅ Registro atualizado com sucesso.")
         st.page_link("pages/3_Planilha.py", label="⬅️ Voltar para Planilha")
 
+    except BancoOcupado as e:
+        st.error(f"❌ {e}")
     except Exception as e:
         st.error("❌ Erro ao atualizar o registro.")
         st.exception(e)
+
+encerrar_perfil()
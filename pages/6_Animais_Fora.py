@@ -1,13 +1,15 @@
 # pages/6_Animais_Fora.py
 from __future__ import annotations
-from pathlib import Path
-import sqlite3
 import csv
 import io
 import streamlit as st
 
-from ui_nav import hide_default_sidebar_nav, render_sidebar_nav  # sidebar custom
+from ui_nav import encerrar_perfil, hide_default_sidebar_nav, iniciar_perfil, render_sidebar_nav  # sidebar custom
+from leilao import esquema
+from leilao.consultas import animais_fora
+from leilao.perfil import etapa
 
+iniciar_perfil("Animais Fora")
 st.set_page_config(page_title="Animais Fora", page_icon="🐄", layout="wide")
 
 # sidebar com ícones (esconde a nativa)
@@ -18,65 +20,29 @@ st.title("🐄 Animais Fora")
 
 st.caption("Registros da tabela `animais` que não possuem vínculo em `lote_itens`.")
 
-APP_DIR = Path(__file__).resolve().parent.parent if "__file__" in globals() else Path(".")
-DB_PATH = APP_DIR / "dados.db"
-
-# ---------------- Helpers ----------------
-def _connect():
-    return sqlite3.connect(DB_PATH)
-
-def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
-    cur = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=? LIMIT 1", (name,))
-    return cur.fetchone() is not None
-
-def _colnames(conn: sqlite3.Connection, table: str) -> list[str]:
-    return [r[1] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()]
-
-def _pick_existing(candidates: list[str], existing: set[str]) -> str | None:
-    """Retorna o primeiro nome de coluna que existir (case-sensitive como no SQLite)."""
-    for c in candidates:
-        if c in existing:
-            return c
-    return None
-
 # ---------------- Detecção de colunas ----------------
-with _connect() as conn:
-    if not _table_exists(conn, "animais"):
-        st.error("Tabela `animais` não encontrada.")
-        st.stop()
-
-    cols = set(_colnames(conn, "animais"))
+etapa("schema")
+esq = esquema.animais()  # nomes resolvidos uma vez por versão do schema (leilao/esquema.py)
+if esq is None:
+    st.error("Tabela `animais` não encontrada.")
+    st.stop()
 
-serie_col = _pick_existing(['N.º Série', 'Nº Série', 'Numero Série', 'N_Serie', 'Serie', 'Série'], cols) or 'rowid'
-lacre_col = _pick_existing(['Lacre', 'LACRE', 'lacre'], cols) or 'Lacre'
-prop_col  = _pick_existing(['Proprietário Origem', 'Proprietario Origem', 'Proprietário', 'Proprietario', 'Origem'], cols) or 'Proprietário Origem'
+serie_col = esq.serie or 'rowid'
+lacre_col = esq.lacre or 'Lacre'
+prop_col  = esq.proprietario or 'Proprietário Origem'
 
 # ---------------- Busca ----------------
 q = st.text_input("🔎 Buscar por Série / Lacre / Proprietário", "", placeholder="ex.: 123, ABC..., João...")
 
 # ---------------- Query ----------------
-rows = []
+etapa("consulta")
+rows, has_lote_itens = animais_fora(serie_col, lacre_col, prop_col)
+if not has_lote_itens:
+    st.warning("Tabela `lote_itens` não existe. Considerando que todos os animais estão fora de lote.")
 total = 0
-with _connect() as conn:
-    has_lote_itens = _table_exists(conn, "lote_itens")
-    if not has_lote_itens:
-        st.warning("Tabela `lote_itens` não existe. Considerando que todos os animais estão fora de lote.")
-        sql = f'SELECT "{serie_col}" as serie, "{lacre_col}" as lacre, "{prop_col}" as proprietario FROM animais'
-        rows = conn.execute(sql).fetchall()
-    else:
-        sql = f"""
-            SELECT a."{serie_col}" as serie,
-                   a."{lacre_col}" as lacre,
-                   a."{prop_col}"  as proprietario
-            FROM animais a
-            WHERE NOT EXISTS (
-              SELECT 1 FROM lote_itens li
-              WHERE li.animal_rowid = a.rowid
-            )
-        """
-        rows = conn.execute(sql).fetchall()
 
 # filtro em memória
+etapa("filtro")
 def _match(row: tuple[str,str,str], term: str) -> bool:
     term = term.strip().lower()
     if not term:
@@ -90,6 +56,7 @@ total = len(filtered)
 st.write(f"**Total encontrados:** {total}")
 
 # Baixar CSV
+etapa("csv")
 if filtered:
     buf = io.StringIO()
     writer = csv.writer(buf)
@@ -100,9 +67,12 @@ if filtered:
     st.download_button("⬇️ Baixar CSV", data=csv_bytes, file_name="animais_fora_de_lote.csv", use_container_width=True)
 
 # Dataframe
+etapa("tabela")
 if filtered:
     # Streamlit aceita lista de dicts
     data = [{"Série": r[0], "Lacre": r[1], "Proprietário Origem": r[2]} for r in filtered]
     st.dataframe(data, use_container_width=True, hide_index=True)
 else:
     st.info("Nenhum registro fora de lote para os filtros atuais.")
+
+encerrar_perfil()
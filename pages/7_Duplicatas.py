@@ -1,18 +1,18 @@
 ﻿# pages/7_Duplicatas.py
 from __future__ import annotations
-import sqlite3
+import csv
+import io
 from pathlib import Path
-from typing import List
 
 import streamlit as st
-from ui_nav import hide_default_sidebar_nav, render_sidebar_nav  # sidebar custom
-
-try:
-    import pandas as pd
-except ImportError:
-    pd = None  # evita crash se pandas não estiver instalado
+from ui_nav import encerrar_perfil, hide_default_sidebar_nav, iniciar_perfil, render_sidebar_nav  # sidebar custom
+from leilao import esquema, retrato
+from leilao.consultas import grupos_duplicados
+from leilao.db import connect, ensure_schema
+from leilao.perfil import etapa
 
 # ------------------ Config da página ------------------
+iniciar_perfil("Duplicatas")
 st.set_page_config(page_title="Duplicatas", page_icon="🧩", layout="wide")
 
 # sidebar com ícones (esconde a nativa)
@@ -23,52 +23,39 @@ st.title("🧩 Duplicatas")
 st.caption("Grupos de animais com o mesmo **Lacre**.")
 st.page_link("Inicio.py", label="⬅️ Voltar para Início", icon="🏠", use_container_width=True)
 
-APP_DIR = Path(__file__).resolve().parent.parent if "__file__" in globals() else Path(".")
-DB_PATH = APP_DIR / "dados.db"
 # ------------------ Helpers ------------------
-def _connect() -> sqlite3.Connection:
-    return sqlite3.connect(DB_PATH)
-
-def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
-    cur = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=? LIMIT 1", (name,))
-    return cur.fetchone() is not None
+def _csv_bytes(rows: list[tuple], headers: list[str]) -> bytes:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(headers)
+    writer.writerows(rows)
+    return buf.getvalue().encode("utf-8-sig")
 
-def _columns(conn: sqlite3.Connection, table: str) -> List[str]:
-    return [r[1] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+# ------------------ Consultas iniciais ------------------
+etapa("consultas")
+ensure_schema()
+# linhas dos grupos vêm do retrato compartilhado de `animais` (sem uma consulta por grupo)
+ret = retrato.animais()
+if ret is None:
+    st.error("Tabela `animais` não encontrada no banco de dados.")
+    st.stop()
 
-def _df_from_rows(rows: list[tuple], headers: list[str]):
-    if pd is None:
-        return None
-    return pd.DataFrame.from_records(rows, columns=headers)
+cols = ret.colunas
+esq = esquema.animais()  # nomes das colunas desta planilha (leilao/esquema.py)
+col_lacre = esq.lacre if esq else None
+preferidos = ["rowid", esq.serie, esq.lacre, esq.proprietario, esq.idade, "Sexo"] if esq else ["rowid"]
+mostrar = [c for c in preferidos if c and (c == "rowid" or c in cols)]
+for c in cols:
+    if c not in mostrar and c != "rowid":
+        mostrar.append(c)
+    if len(mostrar) >= 12:
+        break
 
-# ------------------ Consultas iniciais ------------------
-with _connect() as conn:
-    if not _table_exists(conn, "animais"):
-        st.error("Tabela `animais` não encontrada no banco de dados.")
-        st.stop()
-
-    cols = _columns(conn, "animais")
-
-    preferidos = ["rowid", "N.º Série", "Lacre", "Proprietário Origem", "Idade", "Idade (meses)", "Sexo"]
-    mostrar = [c for c in preferidos if (c == "rowid" or c in cols)]
-    for c in cols:
-        if c not in mostrar and c != "rowid":
-            mostrar.append(c)
-        if len(mostrar) >= 12:
-            break
-
-    grupos: list[tuple[str, int]] = conn.execute(
-        """
-        SELECT Lacre, COUNT(*) AS cnt
-        FROM animais
-        WHERE Lacre IS NOT NULL AND TRIM(Lacre) <> ''
-        GROUP BY Lacre
-        HAVING COUNT(*) > 1
-        ORDER BY cnt DESC, Lacre
-        """
-    ).fetchall()
+with connect() as conn:
+    grupos = grupos_duplicados(conn)
 
 # ------------------ Filtros ------------------
+etapa("filtros")
 col_f1, col_f2 = st.columns([1.2, 1])
 with col_f1:
     q = st.text_input("🔎 Buscar lacre (ou parte)", "", placeholder="ex.: 123, ABC...")
@@ -86,64 +73,48 @@ if not grupos:
     st.info("Nenhuma duplicata encontrada (ou o filtro não retornou resultados).")
     if backup_path:
         st.page_link(backup_path, label="💾 Ir para Backup", icon="💾", use_container_width=True)
+    encerrar_perfil()
     st.stop()
 
 # ------------------ Relatório geral (CSV) ------------------
-if pd is not None:
-    with _connect() as conn:
-        all_rows: list[tuple] = []
-        headers = ["Lacre", "rowid"] + [c for c in cols]
-        for lacre, cnt in grupos:
-            rs = conn.execute(
-                'SELECT ? as "Lacre", rowid, * FROM animais WHERE TRIM(Lacre)=? ORDER BY rowid',
-                (str(lacre), str(lacre)),
-            ).fetchall()
-            all_rows.extend(rs)
-
-        df_all = _df_from_rows(all_rows, headers)
-        if df_all is not None and not df_all.empty:
-            csv_all = df_all.to_csv(index=False).encode("utf-8-sig")
-            st.download_button(
-                "⬇️ Baixar CSV (todos os grupos)",
-                data=csv_all,
-                file_name="duplicatas_lacre.csv",
-                use_container_width=True,
-            )
+etapa("csv geral")
+# posições de cada lacre (como TRIM(Lacre) no SQLite), numa passada só pelo retrato
+por_lacre = ret.grupos(col_lacre, lambda v: None if v is None else str(v).strip(" ")) if col_lacre in cols else {}
+all_rows: list[tuple] = []
+headers = ["Lacre", "rowid"] + [c for c in cols]
+for lacre, cnt in grupos:
+    all_rows.extend((str(lacre),) + t for t in ret.tuplas(por_lacre.get(str(lacre), []), ["rowid"] + cols))
+
+if all_rows:
+    st.download_button(
+        "⬇️ Baixar CSV (todos os grupos)",
+        data=_csv_bytes(all_rows, headers),
+        file_name="duplicatas_lacre.csv",
+        use_container_width=True,
+    )
 
 st.divider()
 
 # ------------------ Listagem por grupo ------------------
+etapa("grupos")
 st.markdown("### Grupos de duplicados por **Lacre**")
 
 for lacre, cnt in grupos:
     with st.expander(f"🔁 Lacre **{lacre}** — {cnt} registro(s)"):
-        with _connect() as conn:
-            select_cols = []
-            if "rowid" in mostrar:
-                select_cols.append("rowid")
-            select_cols += [f'"{c}"' for c in mostrar if c != "rowid"]
-            sql = f'SELECT {", ".join(select_cols)} FROM animais WHERE TRIM(Lacre)=? ORDER BY rowid'
-            rows = conn.execute(sql, (str(lacre),)).fetchall()
-
-        headers = [c if c != '"rowid"' else "rowid" for c in select_cols]
-        headers = [h.strip('"') for h in headers]
-
-        if pd is not None:
-            df = _df_from_rows(rows, headers)
-            if df is not None and not df.empty:
-                st.dataframe(df, use_container_width=True, hide_index=True)
-                csv = df.to_csv(index=False).encode("utf-8-sig")
-                st.download_button(
-                    "Baixar CSV deste grupo",
-                    data=csv,
-                    file_name=f"duplicatas_{lacre}.csv",
-                    use_container_width=True,
-                )
-            else:
-                st.info("Sem registros para exibir neste grupo.")
+        headers = (["rowid"] if "rowid" in mostrar else []) + [c for c in mostrar if c != "rowid"]
+        rows = ret.tuplas(por_lacre.get(str(lacre), []), headers)
+
+        if rows:
+            # Streamlit aceita lista de dicts (sem precisar do pandas)
+            st.dataframe([dict(zip(headers, r)) for r in rows], use_container_width=True, hide_index=True)
+            st.download_button(
+                "Baixar CSV deste grupo",
+                data=_csv_bytes(rows, headers),
+                file_name=f"duplicatas_{lacre}.csv",
+                use_container_width=True,
+            )
         else:
-            st.write(f"Campos: {', '.join(headers)}")
-            st.write(rows)
+            st.info("Sem registros para exibir neste grupo.")
 
 st.divider()
 
@@ -151,3 +122,5 @@ st.divider()
 st.page_link("Inicio.py", label="⬅️ Voltar para Início", icon="🏠", use_container_width=True)
 if backup_path:
     st.page_link(backup_path, label="💾 Ir para Backup", icon="💾", use_container_width=True)
+
+encerrar_perfil()
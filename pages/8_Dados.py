@@ -1,10 +1,17 @@
 import streamlit as st
-import pandas as pd
-import sqlite3
-from io import BytesIO
 
-from ui_nav import hide_default_sidebar_nav, render_sidebar_nav  # sidebar custom
+from ui_nav import (  # sidebar custom
+    acompanhar_tarefa, encerrar_perfil, fim_da_tarefa, hide_default_sidebar_nav, iniciar_perfil, render_sidebar_nav,
+)
+from leilao import tarefas
+from leilao.db import BancoOcupado
+from leilao.importacao import (
+    LIMITE_AMOSTRA, amostra, contar_animais, descartar_preparo, ler_planilha, preparo_existe,
+    trocar_animais, validar_preparo,
+)
+from leilao.perfil import etapa
 
+iniciar_perfil("Dados")
 st.set_page_config(page_title="Dados", page_icon="🗂️", layout="wide")
 hide_default_sidebar_nav()
 render_sidebar_nav()
@@ -12,98 +19,71 @@ render_sidebar_nav()
 st.title("🗂️ Dados")
 st.markdown("Carregue um arquivo com os dados do leilão (HTML, Excel, LibreOffice etc.).")
 
-COLUNAS_OBRIGATORIAS = [
-    "N.º Série", "Data Emissão", "Proprietário Origem", "Município Origem",
-    "M 0 - 8", "F 0 - 8", "M 9 - 12", "F 9 - 12",
-    "M 13 - 24", "F 13 - 24", "M 25 - 36", "F 25 - 36",
-    "M 36 +", "F 36 +", "Total M", "Total F", "Total Animais", "Lacre"
-]
-
 uploaded_file = st.file_uploader("📤 Selecione o arquivo", type=["xlsx", "xls", "ods", "html"])
 
-def read_html_table(file):
-    """
-    Tenta ler a primeira tabela de um HTML usando lxml; se falhar, tenta bs4+html5lib.
-    """
-    # try lxml first
-    try:
-        file.seek(0)
-        tables = pd.read_html(file, flavor="lxml")
-        if not tables:
-            raise ValueError("Nenhuma tabela encontrada no HTML (lxml).")
-        return tables[0]
-    except Exception as e_lxml:
-        # fallback: bs4 + html5lib
-        try:
-            file.seek(0)
-            tables = pd.read_html(file, flavor="bs4")
-            if not tables:
-                raise ValueError("Nenhuma tabela encontrada no HTML (bs4).")
-            return tables[0]
-        except Exception as e_bs4:
-            raise RuntimeError(
-                "Falha ao ler HTML. Instale as dependências: "
-                "`pip install lxml` ou `pip install beautifulsoup4 html5lib`.\n"
-                f"Detalhes lxml: {e_lxml}\nDetalhes bs4/html5lib: {e_bs4}"
-            )
-
-def carregar_dataframe(uploaded_file):
-    ext = uploaded_file.name.split(".")[-1].lower()
-    if ext == "html":
-        return read_html_table(uploaded_file)
-    elif ext in ["xlsx", "xls"]:
-        try:
-            uploaded_file.seek(0)
-            return pd.read_excel(uploaded_file)  # usa openpyxl (xlsx) / xlrd (xls) se instalados
-        except ImportError as e:
-            raise RuntimeError(
-                "Dependências para Excel não encontradas. "
-                "Instale com: `pip install openpyxl xlrd`.\n" + str(e)
-            )
-    elif ext == "ods":
-        try:
-            uploaded_file.seek(0)
-            return pd.read_excel(uploaded_file, engine="odf")
-        except ImportError as e:
-            raise RuntimeError(
-                "Dependência para ODS não encontrada. "
-                "Instale com: `pip install odfpy`.\n" + str(e)
-            )
-    else:
-        raise RuntimeError("❌ Tipo de arquivo não suportado.")
-
 # --- UI principal ---
+# ler a planilha e gravar no banco rodam como tarefas em segundo plano (leilao/tarefas.py):
+# a página não congela e um rerun no meio não recomeça nem perde o trabalho.
+# A leitura vai para uma tabela de preparo no banco (leilao/importacao.py): a sessão guarda
+# só o nome dela; a prévia e a validação são consultas.
+def _esquecer_leitura():
+    """Apaga a tabela de preparo da leitura desta sessão (depois de gravada ela já virou `animais`:
+    o DROP IF EXISTS não faz nada; durante a gravação ele espera a troca terminar)."""
+    leitura = st.session_state.pop("leitura_planilha", None)
+    if leitura:
+        t = tarefas.obter(leitura["tarefa"])
+        if t is not None and t["estado"] == "concluida" and isinstance(t["resultado"], dict):
+            try:
+                descartar_preparo(t["resultado"]["tabela"])
+            except BancoOcupado:
+                pass  # fica para limpar_preparos() na próxima leitura
+
+etapa("ler arquivo")
+preparo = None  # {"tabela", "linhas"} da leitura concluída
 if uploaded_file:
-    try:
-        df = carregar_dataframe(uploaded_file)
-
-        colunas_arquivo = df.columns.tolist()
-        faltantes = [c for c in COLUNAS_OBRIGATORIAS if c not in colunas_arquivo]
-        if faltantes:
-            st.error(f"❌ Colunas obrigatórias faltando no arquivo: {faltantes}")
-            st.stop()
-
-        df_filtrado = df[COLUNAS_OBRIGATORIAS].copy()
-        st.success("✅ Arquivo carregado com sucesso.")
-        st.dataframe(df_filtrado, use_container_width=True)
-        st.session_state["df_filtrado"] = df_filtrado
-
-    except Exception as e:
-        st.error("❌ Erro ao processar o arquivo.")
-        st.exception(e)
+    leitura = st.session_state.get("leitura_planilha")
+    if not leitura or leitura["arquivo"] != uploaded_file.file_id:
+        _esquecer_leitura()
+        tid = tarefas.enviar("ler_planilha", f"Ler {uploaded_file.name}", ler_planilha,
+                             uploaded_file.getvalue(), uploaded_file.name)
+        leitura = st.session_state["leitura_planilha"] = {"arquivo": uploaded_file.file_id, "tarefa": tid}
+
+    t = tarefas.obter(leitura["tarefa"])
+    if t is None:  # registro da tarefa apagado (pasta tarefas/ limpa): lê de novo
+        st.session_state.pop("leitura_planilha", None)
+        st.rerun()
+    importacao = tarefas.obter(leitura.get("importacao"))  # se falhou/cancelou, o preparo continua lá
+    if importacao is not None and importacao["estado"] in tarefas.ATIVAS:
+        st.caption("Gravando este arquivo no banco (acompanhe abaixo).")
+    elif importacao is not None and importacao["estado"] == "concluida":
+        st.info("Este arquivo já foi gravado no banco. Selecione outro arquivo para uma nova importação.")
+    elif t["estado"] in tarefas.ATIVAS:
+        acompanhar_tarefa(t["id"])
+    elif fim_da_tarefa(t):
+        if not preparo_existe(t["resultado"]["tabela"]):  # limpa (outra sessão/restauração): lê de novo
+            st.session_state.pop("leitura_planilha", None)
+            st.rerun()
+        preparo = t["resultado"]
+        etapa("prévia")
+        st.success(f"✅ Arquivo carregado: {preparo['linhas']} linha(s).")
+        st.dataframe(amostra(preparo["tabela"]), use_container_width=True)
+        if preparo["linhas"] > LIMITE_AMOSTRA:
+            st.caption(f"Prévia: primeiras {LIMITE_AMOSTRA} de {preparo['linhas']} linhas.")
+        etapa("validação")
+        problemas = validar_preparo(preparo["tabela"])
+        if problemas:
+            st.warning("⚠️ Conferência do arquivo:\n\n" + "\n".join(f"- {d}: **{n}**" for d, n in problemas))
+        else:
+            st.caption("✔️ Conferência do arquivo: nenhum problema encontrado.")
+        if not preparo["linhas"]:
+            preparo = None
 else:
     st.info("Nenhum arquivo selecionado ainda.")
-    st.session_state.pop("df_filtrado", None)
+    _esquecer_leitura()
 
 # --- Info sobre REPLACE + confirmação ---
-def _db_count():
-    try:
-        with sqlite3.connect("dados.db") as conn:
-            return conn.execute("SELECT COUNT(1) FROM animais").fetchone()[0]
-    except Exception:
-        return None
-
-qtd_atual = _db_count()
+etapa("contagem")
+qtd_atual = contar_animais()
 if qtd_atual is None:
     st.caption("📄 A tabela **animais** ainda não existe no banco.")
 else:
@@ -111,21 +91,31 @@ else:
 
 st.warning(
     "⚠️ **Atenção:** salvar irá **substituir completamente** a tabela **animais** "
-    "no banco `dados.db` (`if_exists='replace'`). Todos os dados atuais serão **perdidos** "
+    "no banco `dados.db`. Todos os dados atuais serão **perdidos** "
     "e substituídos **apenas** pelos registros do arquivo carregado."
 )
 
+etapa("widgets")
 confirm = st.checkbox(
     "Sim, entendo as consequências e desejo **substituir** a tabela `animais`."
 )
 
-can_save = ("df_filtrado" in st.session_state) and confirm
+# uma importação por vez (de qualquer operador): a que estiver rodando aparece aqui
+gravando = tarefas.listar("importar", ativas=True, limite=1)
+can_save = preparo is not None and confirm and not gravando
 
 if st.button("💾 Salvar no Banco de Dados", type="primary", disabled=not can_save):
-    try:
-        with sqlite3.connect("dados.db") as conn:
-            st.session_state["df_filtrado"].to_sql("animais", conn, if_exists="replace", index=False)
-        st.success("✅ Dados salvos com sucesso (tabela `animais` foi **substituída**).")
-    except Exception as e:
-        st.error("❌ Erro ao salvar os dados no banco.")
-        st.exception(e)
+    tid = tarefas.enviar("importar", f"Importar {preparo['linhas']} linhas", trocar_animais, preparo["tabela"])
+    st.session_state["tarefa_importar"] = st.session_state["leitura_planilha"]["importacao"] = tid
+    st.rerun()
+
+etapa("gravar")
+if gravando:
+    acompanhar_tarefa(gravando[0]["id"])
+else:
+    # desfecho mostrado uma vez, no rerun em que a tarefa terminou
+    t = tarefas.obter(st.session_state.pop("tarefa_importar", None))
+    if t is not None and fim_da_tarefa(t):
+        st.success(f"✅ Dados salvos com sucesso (tabela `animais` foi **substituída**, {t['resultado']} linhas).")
+
+encerrar_perfil()
@@ -1,19 +1,21 @@
 # pages/9_Backup.py
 from __future__ import annotations
-import os
-import io
-import time
-import shutil
-import sqlite3
 from datetime import datetime
+from io import BytesIO
 from pathlib import Path
 import streamlit as st
 
-from ui_nav import hide_default_sidebar_nav, render_sidebar_nav  # sidebar custom
+from ui_nav import (  # sidebar custom
+    acompanhar_tarefa, encerrar_perfil, fim_da_tarefa, hide_default_sidebar_nav, iniciar_perfil, render_sidebar_nav,
+)
+from leilao import db, manutencao, tarefas
+from leilao.backup import AUTO_PREFIX, BACKUPS_DIR, get_scheduler, make_timestamped_backup, restore_backup
+from leilao.perfil import etapa
 
 # --------------------------------------------------
 # Config
 # --------------------------------------------------
+iniciar_perfil("Backup")
 st.set_page_config(page_title="Backup", page_icon="💾", layout="wide")
 
 # sidebar com ícones (esconde a nativa)
@@ -26,9 +28,7 @@ st.markdown("Faça **download** do banco atual ou **restaure** a partir de um ar
 st.markdown("Faça **download** do banco atual ou **restaure** a partir de um arquivo `.sqlite`/`.db`.")
 
 # Caminhos
-APP_DIR = Path(__file__).resolve().parent.parent if "__file__" in globals() else Path(".")
-DB_PATH = APP_DIR / "dados.db"
-BACKUPS_DIR = APP_DIR / "backups"
+DB_PATH = db.DB_PATH
 BACKUPS_DIR.mkdir(exist_ok=True)
 
 # --------------------------------------------------
@@ -41,83 +41,55 @@ def _fmt_bytes(n: int) -> str:
         n /= 1024.0
     return f"{n:.1f} PB"
 
-def is_sqlite_file(buf_or_path) -> bool:
-    """Checa header 'SQLite format 3\\0' + abre e roda um integrity_check."""
-    try:
-        if isinstance(buf_or_path, (str, os.PathLike, Path)):
-            p = Path(buf_or_path)
-            if not p.exists():
-                return False
-            with p.open("rb") as f:
-                header = f.read(16)
-            tmp_path = p  # validaremos com conexão logo abaixo
-        else:
-            # Uploaded file-like
-            pos = buf_or_path.tell()
-            buf_or_path.seek(0)
-            header = buf_or_path.read(16)
-            buf_or_path.seek(pos)
-            # gravar temporariamente para testar com sqlite3
-            tmp_path = BACKUPS_DIR / f"_tmp_validate_{int(time.time()*1000)}.sqlite"
-            with tmp_path.open("wb") as out:
-                buf_or_path.seek(0)
-                shutil.copyfileobj(buf_or_path, out)
-            buf_or_path.seek(0)
-
-        if header != b"SQLite format 3\x00":
-            if tmp_path.name.startswith("_tmp_validate_") and tmp_path.exists():
-                tmp_path.unlink(missing_ok=True)
-            return False
-
-        # tenta abrir e fazer integrity check
-        ok = False
-        try:
-            with sqlite3.connect(f"file:{tmp_path}?mode=ro", uri=True) as conn:
-                cur = conn.execute("PRAGMA integrity_check;")
-                row = cur.fetchone()
-                ok = (row and row[0] == "ok")
-        finally:
-            # limpar tmp se necessário
-            if tmp_path.name.startswith("_tmp_validate_") and tmp_path.exists():
-                tmp_path.unlink(missing_ok=True)
-        return ok
-    except Exception:
-        # limpeza de segurança
-        try:
-            if 'tmp_path' in locals() and tmp_path.name.startswith("_tmp_validate_") and tmp_path.exists():
-                tmp_path.unlink(missing_ok=True)
-        except Exception:
-            pass
-        return False
-
-def make_timestamped_backup(src: Path) -> Path | None:
-    if not src.exists():
-        return None
-    ts = datetime.now().strftime("%Y%m%d-%H%M%S")
-    dst = BACKUPS_DIR / f"dados-{ts}.sqlite"
-    shutil.copy2(src, dst)
-    return dst
-
 def read_file_bytes(p: Path) -> bytes:
     with p.open("rb") as f:
         return f.read()
 
+def _resumo_manutencao(res: dict) -> str:
+    """Resultado de manutencao.rotina() ou de manutencao.compactar() em uma linha."""
+    partes = []
+    if "analisadas" in res:
+        partes.append(f"ANALYZE: {', '.join(res['analisadas']) or 'estatísticas em dia'}")
+    comp = res.get("compactado") or (res if "depois" in res else None)
+    if comp:
+        partes.append(f"VACUUM: {_fmt_bytes(comp['antes'])} → {_fmt_bytes(comp['depois'])}")
+    if res.get("liberadas"):
+        partes.append(f"{res['liberadas']} página(s) livre(s) devolvida(s) ao disco")
+    return " • ".join(partes) or "nada a fazer"
+
 # --------------------------------------------------
 # Seção: Baixar Backup (local)
 # --------------------------------------------------
+etapa("download")
 st.header("⬇️ Baixar backup (local)")
 if DB_PATH.exists():
     size = DB_PATH.stat().st_size
     mtime = datetime.fromtimestamp(DB_PATH.stat().st_mtime).strftime("%d/%m/%Y %H:%M")
     st.caption(f"Arquivo: `{DB_PATH.name}` • {_fmt_bytes(size)} • Atualizado em {mtime}")
-    st.download_button(
-        label="Download do banco de dados",
-        data=read_file_bytes(DB_PATH),
-        file_name=f"{DB_PATH.name}",
-        mime="application/octet-stream",
-        type="primary",
-        use_container_width=True,
-    )
+    # cópia online (inclui o que ainda está no -wal) feita numa tarefa em segundo plano;
+    # o arquivo só é lido para o download depois de pronto
+    t = tarefas.obter(st.session_state.get("tarefa_copia"))
+    copia = tarefas.resultado(t["id"]) if t is not None and t["estado"] == "concluida" else None
+    if t is not None and t["estado"] in tarefas.ATIVAS:
+        acompanhar_tarefa(t["id"])
+    elif isinstance(copia, Path) and copia.exists():
+        st.download_button(
+            label=f"Download da cópia de {t['terminada_em'][11:16]} ({copia.name})",
+            data=read_file_bytes(copia),
+            file_name=f"{DB_PATH.name}",
+            mime="application/octet-stream",
+            type="primary",
+            use_container_width=True,
+        )
+        if st.button("Gerar nova cópia", use_container_width=True):
+            st.session_state.pop("tarefa_copia", None)
+            st.rerun()
+    else:
+        if t is not None:
+            fim_da_tarefa(t)
+        if st.button("Preparar cópia para download", type="primary", use_container_width=True):
+            st.session_state["tarefa_copia"] = tarefas.enviar("copia", "Cópia do banco para download", make_timestamped_backup)
+            st.rerun()
 else:
     st.warning("Banco de dados não encontrado em `dados.db`.")
 
@@ -136,6 +108,7 @@ st.divider()
 # --------------------------------------------------
 # Seção: Restaurar Backup
 # --------------------------------------------------
+etapa("restaurar")
 st.header("⬆️ Restaurar backup")
 st.markdown(
     "Envie um arquivo `.sqlite` ou `.db`. "
@@ -149,60 +122,147 @@ with col_a:
 with col_b:
     confirm = st.checkbox("Confirmo que desejo substituir o banco atual", value=False)
 
-restore_btn = st.button("Restaurar agora", type="primary", use_container_width=True, disabled=not (uploaded and confirm))
+# uma restauração por vez; roda como tarefa (validação, backup do atual e troca do arquivo)
+restaurando = tarefas.listar("restaurar", ativas=True, limite=1)
+restore_btn = st.button("Restaurar agora", type="primary", use_container_width=True,
+                        disabled=not (uploaded and confirm) or bool(restaurando))
 
 if restore_btn and uploaded:
-    # 1) validar arquivo
-    if not is_sqlite_file(uploaded):
-        st.error("Arquivo enviado não parece ser um banco SQLite válido (falha na assinatura ou no `PRAGMA integrity_check`).")
-        st.stop()
-
-    # 2) grava para um tmp
-    tmp_incoming = BACKUPS_DIR / f"_incoming_{int(time.time()*1000)}.sqlite"
-    with tmp_incoming.open("wb") as out:
-        uploaded.seek(0)
-        shutil.copyfileobj(uploaded, out)
-
-    try:
-        # 3) backup automático (opcional)
-        backup_path = None
-        if do_auto_backup and DB_PATH.exists():
-            backup_path = make_timestamped_backup(DB_PATH)
-
-        # 4) troca atômica
-        #    - renomeia DB atual para .old (fallback extra) e move o novo para o lugar
-        old_path = APP_DIR / "dados.old.sqlite"
-        if old_path.exists():
-            old_path.unlink(missing_ok=True)
-        if DB_PATH.exists():
-            os.replace(DB_PATH, old_path)
-        os.replace(tmp_incoming, DB_PATH)  # coloca o novo no lugar
-
-        # 5) sanity check final
-        if not is_sqlite_file(DB_PATH):
-            # rollback
-            if DB_PATH.exists():
-                DB_PATH.unlink(missing_ok=True)
-            if old_path.exists():
-                os.replace(old_path, DB_PATH)
-            st.error("Falha na validação final do banco restaurado. O banco anterior foi recuperado.")
-            st.stop()
-
-        # tudo certo — removemos o .old
-        if old_path.exists():
-            old_path.unlink(missing_ok=True)
+    st.session_state["tarefa_restaurar"] = tarefas.enviar(
+        "restaurar", f"Restaurar {uploaded.name}", restore_backup, BytesIO(uploaded.getvalue()), auto_backup=do_auto_backup,
+    )
+    st.rerun()
 
+if restaurando:
+    acompanhar_tarefa(restaurando[0]["id"])
+else:
+    # desfecho mostrado uma vez, no rerun em que a tarefa terminou
+    t = tarefas.obter(st.session_state.pop("tarefa_restaurar", None))
+    if t is not None and fim_da_tarefa(t):
         msg = "Banco restaurado com sucesso."
-        if backup_path:
-            msg += f" Backup automático criado: `{backup_path.name}`."
+        if t["arquivo"]:
+            msg += f" Backup automático criado: `{Path(t['arquivo']).name}`."
         st.success(msg)
         st.toast("Pronto! Recarregue a página que usa o banco para ver os dados restaurados.", icon="✅")
 
-    except Exception as e:
-        # em caso de erro crítico, tentamos limpar tmp e restaurar .old
-        if tmp_incoming.exists():
-            tmp_incoming.unlink(missing_ok=True)
-        st.exception(e)
+# --------------------------------------------------
+# Seção: Backups automáticos (agendador em segundo plano)
+# --------------------------------------------------
+st.divider()
+etapa("automáticos")
+st.header("⏱️ Backups automáticos")
+st.caption(
+    f"Cópias online (API de backup do SQLite) feitas em segundo plano, sem travar a página. "
+    f"Arquivos `{AUTO_PREFIX}*.sqlite` na pasta `./backups`."
+)
+
+scheduler = get_scheduler()
+stt = scheduler.status()
+cfg = stt["config"]
+ult = stt["ultimo"]
+
+m1, m2, m3, m4 = st.columns(4)
+m1.metric("Último backup", f"{ult['inicio']:%d/%m %H:%M}" if ult else "—")
+m2.metric("Duração", f"{ult['duracao_s']:.2f} s" if ult else "—")
+m3.metric("Tamanho", _fmt_bytes(ult["tamanho"]) if ult else "—")
+m4.metric("Escritas desde o último", int(stt["escritas_pendentes"]))
+
+info_parts = []
+if stt["em_andamento"]:
+    info_parts.append("🔄 backup em andamento")
+if ult:
+    info_parts.append(f"arquivo `{ult['arquivo']}` ({ult['motivo']})")
+if stt["proximo"]:
+    info_parts.append(f"próximo por intervalo: {stt['proximo']:%d/%m/%Y %H:%M}")
+if not cfg.get("ativo"):
+    info_parts.append("agendamento **desativado**")
+if info_parts:
+    st.caption(" • ".join(info_parts))
+if stt["ultimo_erro"]:
+    st.error(f"Falha no último backup automático: {stt['ultimo_erro']}")
+
+with st.form("form_agendamento"):
+    f1, f2, f3, f4 = st.columns(4)
+    with f1:
+        ativo = st.checkbox("Ativo", value=bool(cfg.get("ativo")))
+    with f2:
+        intervalo_min = st.number_input("Intervalo (min)", min_value=0, step=5, value=int(cfg.get("intervalo_min") or 0),
+                                        help="0 = sem backup por tempo.")
+    with f3:
+        a_cada = st.number_input("A cada N escritas", min_value=0, step=10, value=int(cfg.get("a_cada_escritas") or 0),
+                                 help="0 = sem backup por volume de alterações.")
+    with f4:
+        manter = st.number_input("Manter (arquivos)", min_value=1, step=1, value=int(cfg.get("manter") or 1))
+    if st.form_submit_button("Salvar agendamento", use_container_width=True):
+        scheduler.configure(ativo=ativo, intervalo_min=int(intervalo_min), a_cada_escritas=int(a_cada), manter=int(manter))
+        st.toast("Agendamento atualizado.", icon="✅")
+
+if st.button("Fazer backup automático agora", use_container_width=True, disabled=stt["em_andamento"]):
+    scheduler.run_now()
+    st.toast("Backup solicitado; ele roda em segundo plano.", icon="⏱️")
+
+# --------------------------------------------------
+# Seção: Manutenção (ANALYZE, espaço livre, VACUUM)
+# --------------------------------------------------
+st.divider()
+etapa("manutenção")
+st.header("🧹 Manutenção do banco")
+st.caption(
+    f"Estatísticas do planejador (ANALYZE) e devolução das páginas livres ao disco rodam sozinhas em segundo plano "
+    f"a cada {manutencao.A_CADA_ESCRITAS} escritas ou uma vez por dia, se houve alterações."
+)
+
+sit = manutencao.situacao()
+if sit is None:
+    st.caption("Banco ainda não criado.")
+else:
+    ult_m = manutencao.ultima()
+    n1, n2, n3, n4 = st.columns(4)
+    n1.metric("Tamanho do arquivo", _fmt_bytes(sit["tamanho"]),
+              help=f"Mais {_fmt_bytes(sit['wal'])} no -wal (alterações ainda não copiadas para o arquivo principal).")
+    n2.metric("Páginas livres", f"{sit['livres']} ({sit['fracao_livre']:.0%})",
+              help=f"{sit['paginas']} páginas de {sit['page_size']} bytes; as livres ocupam disco sem guardar dados.")
+    n3.metric("auto_vacuum", sit["auto_vacuum"])
+    n4.metric("Última manutenção", f"{datetime.strptime(ult_m['criada_em'], '%Y-%m-%d %H:%M:%S'):%d/%m %H:%M}" if ult_m else "—")
+    if sit["auto_vacuum"] != "INCREMENTAL":
+        st.info("O banco ainda não devolve sozinho o espaço liberado (auto_vacuum=" + sit["auto_vacuum"] + "). "
+                + ("A próxima manutenção converte com um VACUUM."
+                   if sit["tamanho"] <= manutencao.COMPACTAR_ATE_MB * 1024 * 1024 else "Use **Compactar** fora do horário do leilão."))
+    if not sit["estatisticas"]:
+        st.caption("Sem estatísticas do planejador (ANALYZE nunca rodou neste banco).")
+
+    mantendo = tarefas.listar(manutencao.TIPO_TAREFA, ativas=True, limite=1)
+    b1, b2 = st.columns(2)
+    if b1.button("Rodar manutenção agora", use_container_width=True, disabled=bool(mantendo)):
+        st.session_state["tarefa_manutencao"] = manutencao.pedir("manual")
+        st.rerun()
+    if b2.button("Compactar (VACUUM)", use_container_width=True, disabled=bool(mantendo),
+                 help="Reescreve o arquivo inteiro sem páginas livres. Enquanto roda, as gravações esperam."):
+        st.session_state["tarefa_manutencao"] = tarefas.enviar(manutencao.TIPO_TAREFA, "Compactar o banco (VACUUM)",
+                                                               manutencao.compactar)
+        st.rerun()
+    if mantendo:
+        acompanhar_tarefa(mantendo[0]["id"])
+    else:
+        t = tarefas.obter(st.session_state.pop("tarefa_manutencao", None))
+        if t is not None and fim_da_tarefa(t):
+            st.success(f"✅ {t['descricao']}: {_resumo_manutencao(t['resultado'] or {})}.")
+        elif ult_m is not None and ult_m["estado"] == "concluida" and isinstance(ult_m["resultado"], dict):
+            st.caption(f"Última: {ult_m['descricao']} — {_resumo_manutencao(ult_m['resultado'])}.")
+
+    with st.expander("Ocupação por tabela e índice"):
+        st.caption("Lê o arquivo inteiro (tabela virtual dbstat): calcule só quando precisar.")
+        if st.button("Calcular ocupação"):
+            st.session_state["ocupacao_banco"] = manutencao.fragmentacao()
+        ocup = st.session_state.get("ocupacao_banco")
+        if ocup:
+            st.dataframe(
+                [{"Nome": f["nome"], "Tipo": f["tipo"], "Páginas": f["paginas"], "Tamanho": _fmt_bytes(f["bytes"]),
+                  "Ocupação": f"{f['ocupacao']:.0%}"} for f in ocup],
+                use_container_width=True, hide_index=True,
+            )
+        elif ocup is not None:
+            st.caption("Esta instalação do SQLite não tem a tabela dbstat.")
 
 # --------------------------------------------------
 # (Futuro) Backup/restore na nuvem
@@ -211,6 +271,7 @@ with st.expander("☁️ Integração com nuvem (em breve)"):
     st.markdown(
         "- **Upload** automático do backup mais recente para um bucket (Supabase Storage, S3, etc.).\n"
         "- **Download**/restauração direto da nuvem.\n"
-        "- **Agendamentos** (ex.: diário) para criar backups incrementais.\n"
-        "\n> Quando conectarmos, basta trocar as funções `make_timestamped_backup`/`read_file_bytes` por chamadas do provedor."
+        "\n> Quando conectarmos, basta trocar as funções `make_timestamped_backup` (em `leilao/backup.py`)/`read_file_bytes` por chamadas do provedor."
     )
+
+encerrar_perfil()
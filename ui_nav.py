@@ -1,5 +1,11 @@
 # ui_nav.py
+import html
+from functools import lru_cache
+from pathlib import Path
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from leilao import db, perfil, tarefas
 
 def hide_default_sidebar_nav():
     st.markdown("""
@@ -8,19 +14,16 @@ def hide_default_sidebar_nav():
     </style>
     """, unsafe_allow_html=True)
 
-from pathlib import Path
-import streamlit as st
+@lru_cache(maxsize=1)
+def _home_page() -> str:
+    # escolhe o arquivo de entrada disponível (resolvido uma vez por processo, não a cada rerun)
+    for nome in ("Inicio.py", "inicio.py", "main.py"):
+        if Path(nome).exists():
+            return nome
+    return "Inicio.py"  # padrão
 
 def render_sidebar_nav():
-    # escolhe o arquivo de entrada disponível
-    if Path("Inicio.py").exists():
-        home = "Inicio.py"
-    elif Path("inicio.py").exists():
-        home = "inicio.py"
-    elif Path("main.py").exists():
-        home = "main.py"
-    else:
-        home = "Inicio.py"  # padrão
+    home = _home_page()
 
     st.sidebar.markdown("### Navegação")
     st.sidebar.page_link(home,                       label="Início",        icon="🏠")
@@ -29,7 +32,112 @@ def render_sidebar_nav():
     st.sidebar.page_link("pages/3_Planilha.py",     label="Planilha",      icon="📑")
     st.sidebar.page_link("pages/4_Editar.py",       label="Editar",        icon="✏️")
     st.sidebar.page_link("pages/5_Imprimir.py",     label="Imprimir",      icon="🖨️")
+    st.sidebar.page_link("pages/11_GTA.py",         label="GTA Consolidada", icon="📊")
     st.sidebar.page_link("pages/6_Animais_Fora.py", label="Animais Fora",  icon="🐄")
     st.sidebar.page_link("pages/7_Duplicatas.py",   label="Duplicatas",    icon="🧩")
     st.sidebar.page_link("pages/8_Dados.py",        label="Dados",         icon="🗂️")
     st.sidebar.page_link("pages/9_Backup.py",       label="Backup",        icon="💾")
+    st.sidebar.page_link("pages/10_Consultas.py",   label="Consultas SQL", icon="🐢")
+
+    st.sidebar.divider()
+    st.session_state["perfil_sidebar"] = st.sidebar.toggle(
+        "⏱️ Tempo desta execução",
+        value=st.session_state.get("perfil_sidebar", False),
+        help="Mostra, no fim da barra lateral, quanto cada etapa da página levou nesta execução.",
+    )
+
+# ------------------ Perfil por etapas (leilao/perfil.py) ------------------
+def iniciar_perfil(pagina: str):
+    """Chamar no topo da página, antes de qualquer trabalho."""
+    anterior = st.session_state.get("_perfil_execucao")
+    if anterior is not None:
+        anterior.finalizar(interrompida=True)  # execução anterior parou em st.stop/st.rerun
+    st.session_state["_perfil_execucao"] = perfil.iniciar(pagina)
+    # marca das gravações desta execução no diário de alterações: página + sessão do navegador
+    ctx = get_script_run_ctx()
+    db.definir_sessao(f"{pagina} {ctx.session_id[:8]}" if ctx else pagina)
+
+def _fmt_ms(ms: float) -> str:
+    return f"{ms / 1000:.2f} s" if ms >= 1000 else f"{ms:.1f} ms" if ms < 10 else f"{ms:.0f} ms"
+
+def encerrar_perfil():
+    """Chamar no fim da página: fecha a execução e, se ligado, desenha a cascata na barra lateral."""
+    ex = perfil.finalizar()
+    if ex is None or not st.session_state.get("perfil_sidebar"):
+        return
+    total = ex.total_ms or 1.0
+    linhas = []
+    for e in ex.etapas:
+        esquerda = e["inicio_ms"] / total * 100
+        largura = max(e["ms"] / total * 100, 0.5)
+        cor = "#94a3b8" if e["nivel"] else "#f59e0b"
+        nome = ("↳ " if e["nivel"] else "") + html.escape(e["nome"])
+        linhas.append(
+            f'<div style="display:flex;justify-content:space-between;font-size:.8rem">'
+            f'<span>{nome}</span><span>{_fmt_ms(e["ms"])}</span></div>'
+            f'<div style="position:relative;height:6px;background:#f3f4f6;border-radius:3px;margin-bottom:6px">'
+            f'<div style="position:absolute;left:{esquerda:.1f}%;width:{largura:.1f}%;height:6px;'
+            f'background:{cor};border-radius:3px"></div></div>'
+        )
+    st.sidebar.markdown(f"**{html.escape(ex.pagina)}: {_fmt_ms(ex.total_ms)}**", unsafe_allow_html=True)
+    st.sidebar.markdown("".join(linhas), unsafe_allow_html=True)
+    est = perfil.estatisticas(ex.pagina)
+    if est:
+        e = est[0]
+        st.sidebar.caption(f"p50 {_fmt_ms(e['p50_ms'])} • p95 {_fmt_ms(e['p95_ms'])} • {e['execucoes']} execuções")
+
+# ------------------ Fragmentos ------------------
+def rerun_fragmento():
+    """Roda de novo só o fragmento atual (clique dentro de um @st.fragment).
+
+    Se o clique chegou numa execução completa da página (outro widget mudou junto,
+    ou AppTest, que não reexecuta fragmentos sozinhos), roda a página inteira."""
+    ctx = get_script_run_ctx()
+    st.rerun(scope="fragment" if ctx is not None and ctx.fragment_ids_this_run else "app")
+
+# ------------------ Arquivos gerados (PDF) por URL ------------------
+def url_temporaria(dados: bytes | str, mimetype: str, nome: str, chave: str) -> str:
+    """URL curta (/media/...) servida pelo próprio Streamlit, como a do st.download_button.
+
+    O navegador busca o arquivo numa requisição HTTP comum (em vez de recebê-lo em base64
+    dentro da página e decodificar em JavaScript). Vale enquanto a página continuar
+    pedindo a URL a cada execução; depois o Streamlit descarta o arquivo.
+    `chave` identifica o lugar na página (uma URL por chave e sessão)."""
+    from streamlit import runtime
+
+    return runtime.get_instance().media_file_mgr.add(dados, mimetype, chave, file_name=nome)
+
+# ------------------ Tarefas em segundo plano (leilao/tarefas.py) ------------------
+@st.fragment(run_every=1.0)
+def acompanhar_tarefa(tid: str):
+    """Progresso de uma tarefa na fila/rodando, com botão de cancelar. Só este trecho roda de novo
+    (a cada 1 s); quando a tarefa termina, a página inteira roda de novo e mostra o resultado."""
+    t = tarefas.obter(tid)
+    if t is None or t["estado"] not in tarefas.ATIVAS:
+        st.rerun()
+    texto = t["descricao"] or t["tipo"]
+    if t["estado"] == "na_fila":
+        texto = f"Na fila: {texto}"
+    elif t["mensagem"]:
+        texto = f"{texto} — {t['mensagem']}"
+    c1, c2 = st.columns([5, 1], vertical_alignment="bottom")
+    c1.progress(t["progresso"] or 0.0, text=f"⏳ {texto}")
+    if c2.button("✖️ Cancelar", key=f"cancelar_tarefa_{tid}", use_container_width=True):
+        if not tarefas.cancelar(tid):
+            st.warning("Não foi possível cancelar: a tarefa já terminou ou é de outro processo.")
+
+def fim_da_tarefa(t: dict) -> bool:
+    """Mostra o desfecho de uma tarefa que não deu certo; True se ela foi concluída."""
+    if t["estado"] == "concluida":
+        return True
+    if t["estado"] == "falhou":
+        erro = (t["erro"] or "").split("\n\n", 1)
+        st.error(f"❌ {t['descricao']}: {erro[0]}")
+        if len(erro) > 1:
+            with st.expander("Detalhes do erro"):
+                st.code(erro[1])
+    elif t["estado"] == "cancelada":
+        st.info(f"{t['descricao']}: cancelada.")
+    elif t["estado"] == "interrompida":
+        st.warning(f"{t['descricao']}: interrompida (o servidor reiniciou). Tente de novo.")
+    return False